@@ -7,15 +7,38 @@ Tables mapped from Supabase PostgreSQL schema.
 
 from app.models.base import Base
 from app.models.cabinet import Cabinet
-from app.models.agent import AgentConfiguration, AgentLog
+from app.models.cabinet_stats import CabinetStat, CabinetDailyStat
+from app.models.agent import AgentConfiguration, AgentLog, AgentLogRollupHourly
+from app.models.conversation import AgentConversation, AgentMessage
 from app.models.demand import Demand
+from app.models.demand_analytics import DemandStatusEvent, DemandDailyRollup
 from app.models.document import DocumentChunk
+from app.models.geo import GeocodedPlace, CabinetGeoDensity
+from app.models.notification import Notification
+from app.models.report_export import ReportExport
+from app.models.secret_rotation import SecretRotation
+from app.models.voter import Voter
+from app.models.voter_import import VoterImport
 
 __all__ = [
     "Base",
     "Cabinet",
+    "CabinetStat",
+    "CabinetDailyStat",
     "AgentConfiguration",
     "AgentLog",
+    "AgentLogRollupHourly",
+    "AgentConversation",
+    "AgentMessage",
     "Demand",
+    "DemandStatusEvent",
+    "DemandDailyRollup",
     "DocumentChunk",
+    "GeocodedPlace",
+    "CabinetGeoDensity",
+    "Notification",
+    "ReportExport",
+    "SecretRotation",
+    "Voter",
+    "VoterImport",
 ]
@@ -4,9 +4,10 @@ Agent Models - AI Agent Configuration and Logs.
 Contains models for:
 - AgentConfiguration: AI agent settings per cabinet (1:1 relationship)
 - AgentLog: Central logs for AI agents and external integrations
+- AgentLogRollupHourly: Hourly counts over agent_logs for analytics
 """
 
-from sqlalchemy import Column, Text, Boolean, text
+from sqlalchemy import Column, ForeignKey, Text, Boolean, BigInteger, DateTime, UniqueConstraint, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from typing import Optional, TYPE_CHECKING
@@ -39,6 +40,7 @@ class AgentConfiguration(Base, TimestampMixin):
     # Foreign Key to Cabinet (1:1, unique)
     cabinet_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
+        ForeignKey("cabinets.id"),
         unique=True,
         nullable=False
     )
@@ -94,6 +96,9 @@ class AgentLog(Base):
     
     Used for tracking agent actions and the CityHall Adapter
     (Protocolo Fantasma feature).
+
+    Range partitioned by month on created_at, so created_at is part of the
+    primary key; old partitions are dropped by the worker's retention job.
     """
     
     __tablename__ = "agent_logs"
@@ -108,6 +113,7 @@ class AgentLog(Base):
     # Foreign Key to Cabinet
     cabinet_id: Mapped[Optional[uuid.UUID]] = mapped_column(
         UUID(as_uuid=True),
+        ForeignKey("cabinets.id"),
         nullable=True
     )
     
@@ -128,10 +134,11 @@ class AgentLog(Base):
         nullable=True
     )
     
-    # Timestamp
-    created_at: Mapped[Optional[datetime]] = mapped_column(
+    # Timestamp (partition key)
+    created_at: Mapped[datetime] = mapped_column(
+        primary_key=True,
         server_default=text("now()"),
-        nullable=True
+        nullable=False
     )
     
     # Relationships
@@ -143,3 +150,47 @@ class AgentLog(Base):
     
     def __repr__(self) -> str:
         return f"<AgentLog(id={self.id}, agent_name='{self.agent_name}', action='{self.action}', status='{self.status}')>"
+
+
+class AgentLogRollupHourly(Base):
+    """
+    Agent Log Rollup - Hourly log counts per cabinet, agent, action and status.
+    
+    Maintained incrementally by the refresh_agent_log_rollups() RPC, so
+    dashboards read these rows (or the agent_log_hourly_stats view, which
+    adds error rates) instead of scanning agent_logs.
+    """
+    
+    __tablename__ = "agent_log_rollups_hourly"
+    __table_args__ = (
+        UniqueConstraint(
+            "bucket", "cabinet_id", "agent_name", "action", "status",
+            name="agent_log_rollups_hourly_key",
+            postgresql_nulls_not_distinct=True
+        ),
+    )
+    
+    # Hour bucket (date_trunc('hour', created_at)).
+    # The table has no primary key (cabinet_id is nullable); the ORM identity
+    # below only exists for mapping, uniqueness comes from the constraint above.
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    
+    # Dimensions
+    cabinet_id: Mapped[Optional[uuid.UUID]] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("cabinets.id"),
+        nullable=True
+    )
+    agent_name: Mapped[str] = mapped_column(Text, primary_key=True)
+    action: Mapped[str] = mapped_column(Text, primary_key=True)
+    status: Mapped[str] = mapped_column(Text, primary_key=True)
+    
+    # Measure
+    log_count: Mapped[int] = mapped_column(
+        BigInteger,
+        server_default=text("0"),
+        nullable=False
+    )
+    
+    def __repr__(self) -> str:
+        return f"<AgentLogRollupHourly(bucket={self.bucket}, agent_name='{self.agent_name}', action='{self.action}', log_count={self.log_count})>"
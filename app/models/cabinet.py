@@ -94,8 +94,18 @@ class Cabinet(Base, TimestampMixin):
     )
     google_email: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     
+    # WhatsApp (Evolution API instance connected to the cabinet's number)
+    whatsapp_instance: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
     # Government Credentials (Vault)
     gov_credentials: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
+
+    # Feature Switches (e.g. {"birthday_greetings": true}); see app.services.tenant_context
+    feature_flags: Mapped[dict] = mapped_column(
+        JSONB,
+        server_default=text("'{}'::jsonb"),
+        nullable=False
+    )
     
     # Relationships
     demands: Mapped[list["Demand"]] = relationship(
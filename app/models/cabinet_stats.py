@@ -0,0 +1,71 @@
+"""
+Cabinet Stats Models - Trigger-maintained dashboard counters.
+
+Contains models for:
+- CabinetStat: Current totals per cabinet (voters, voters by category, demands by status)
+- CabinetDailyStat: Per-day, per-user counts (records created, accesses, events scheduled)
+"""
+
+from sqlalchemy import ForeignKey, Text, BigInteger, Date, DateTime, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import date, datetime
+import uuid
+
+from app.models.base import Base
+
+# user_id of daily rows not attributed to anyone
+NO_USER = uuid.UUID(int=0)
+
+
+class CabinetStat(Base):
+    """
+    Cabinet Stat - One counter, e.g. ("demands_by_status", "Pendente").
+
+    Written only by triggers on the source tables; see
+    app.services.cabinet_stats_service for reading.
+    """
+
+    __tablename__ = "cabinet_stats"
+
+    cabinet_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("cabinets.id"),
+        primary_key=True
+    )
+    metric: Mapped[str] = mapped_column(Text, primary_key=True)
+    key: Mapped[str] = mapped_column(Text, primary_key=True, server_default=text("''::text"))
+    value: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default=text("0"))
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=text("timezone('utc'::text, now())"),
+        nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<CabinetStat(cabinet_id={self.cabinet_id}, metric='{self.metric}', key='{self.key}', value={self.value})>"
+
+
+class CabinetDailyStat(Base):
+    """
+    Cabinet Daily Stat - A count for one local day (America/Sao_Paulo) and user.
+    """
+
+    __tablename__ = "cabinet_daily_stats"
+
+    cabinet_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("cabinets.id"),
+        primary_key=True
+    )
+    metric: Mapped[str] = mapped_column(Text, primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        server_default=text("'00000000-0000-0000-0000-000000000000'::uuid")
+    )
+    value: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default=text("0"))
+
+    def __repr__(self) -> str:
+        return f"<CabinetDailyStat(cabinet_id={self.cabinet_id}, metric='{self.metric}', day={self.day}, value={self.value})>"
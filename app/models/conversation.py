@@ -0,0 +1,146 @@
+"""
+Conversation Models - AI Agent conversation state.
+
+Contains models for:
+- AgentConversation: One conversation thread per contact and platform
+- AgentMessage: Messages exchanged within a conversation
+"""
+
+from sqlalchemy import BigInteger, ForeignKey, Identity, Integer, Text, UniqueConstraint, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
+from sqlalchemy.orm import relationship, Mapped, mapped_column
+from typing import Optional
+from datetime import datetime
+import uuid
+
+from app.models.base import Base
+
+
+class AgentConversation(Base):
+    """
+    Agent Conversation - A session with an external contact.
+
+    Identified by (cabinet_id, platform, external_id), e.g. a WhatsApp phone.
+    Older turns are folded into `summary`; `summarized_seq` / `summarized_until`
+    mark the seq and created_at of the last message the summary covers.
+    """
+
+    __tablename__ = "agent_conversations"
+    __table_args__ = (
+        UniqueConstraint("cabinet_id", "platform", "external_id", name="agent_conversations_contact_idx"),
+    )
+
+    # Primary Key
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        server_default=text("gen_random_uuid()")
+    )
+
+    # Foreign Key to Cabinet
+    cabinet_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("cabinets.id"),
+        nullable=False
+    )
+
+    # Contact
+    external_id: Mapped[str] = mapped_column(Text, nullable=False)
+    platform: Mapped[str] = mapped_column(Text, nullable=False)
+    user_name: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    # State
+    status: Mapped[Optional[str]] = mapped_column(
+        Text,
+        server_default=text("'open'::text"),
+        nullable=True
+    )
+    tags: Mapped[Optional[list]] = mapped_column(
+        ARRAY(Text),
+        server_default=text("'{}'::text[]"),
+        nullable=True
+    )
+    last_message_at: Mapped[Optional[datetime]] = mapped_column(
+        server_default=text("CURRENT_TIMESTAMP"),
+        nullable=True
+    )
+
+    # Rolling summary of turns outside the history window
+    summary: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    summarized_until: Mapped[Optional[datetime]] = mapped_column(nullable=True)
+    summarized_seq: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    message_count: Mapped[int] = mapped_column(
+        Integer,
+        server_default=text("0"),
+        nullable=False
+    )
+
+    # Timestamp
+    created_at: Mapped[Optional[datetime]] = mapped_column(
+        server_default=text("CURRENT_TIMESTAMP"),
+        nullable=True
+    )
+
+    # Relationships (history is read through ConversationService windows, never in full)
+    messages: Mapped[list["AgentMessage"]] = relationship(
+        "AgentMessage",
+        back_populates="conversation",
+        lazy="raise"
+    )
+
+    def __repr__(self) -> str:
+        return f"<AgentConversation(id={self.id}, platform='{self.platform}', external_id='{self.external_id}', status='{self.status}')>"
+
+
+class AgentMessage(Base):
+    """
+    Agent Message - One message in a conversation.
+
+    sender_type is 'user', 'agent' or 'system'. `seq` is the insertion
+    order within the table and orders history windows.
+    """
+
+    __tablename__ = "agent_messages"
+
+    # Primary Key
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        server_default=text("gen_random_uuid()")
+    )
+
+    # Foreign Key to Conversation
+    conversation_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("agent_conversations.id"),
+        nullable=False
+    )
+
+    # Content
+    sender_type: Mapped[str] = mapped_column(Text, nullable=False)
+    content: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    # Metadata (renamed to avoid SQLAlchemy reserved name conflict)
+    message_metadata: Mapped[Optional[dict]] = mapped_column(
+        "metadata",  # Actual DB column name
+        JSONB,
+        server_default=text("'{}'::jsonb"),
+        nullable=True
+    )
+
+    # Timestamp and insertion order
+    created_at: Mapped[Optional[datetime]] = mapped_column(
+        server_default=text("CURRENT_TIMESTAMP"),
+        nullable=True
+    )
+    seq: Mapped[int] = mapped_column(BigInteger, Identity(), nullable=False)
+
+    # Relationships
+    conversation: Mapped["AgentConversation"] = relationship(
+        "AgentConversation",
+        back_populates="messages",
+        lazy="raise"
+    )
+
+    def __repr__(self) -> str:
+        return f"<AgentMessage(id={self.id}, sender_type='{self.sender_type}')>"
@@ -5,8 +5,8 @@ Represents demands/requests from citizens that need to be handled
 by the cabinet staff.
 """
 
-from sqlalchemy import Column, Text, BigInteger, text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, Computed, ForeignKey, Text, BigInteger, text
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from typing import Optional, TYPE_CHECKING
 from datetime import datetime
@@ -40,6 +40,7 @@ class Demand(Base, TimestampMixin):
     # Foreign Key to Cabinet
     cabinet_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
+        ForeignKey("cabinets.id"),
         nullable=False
     )
     
@@ -49,6 +50,10 @@ class Demand(Base, TimestampMixin):
     beneficiary: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     author: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     category: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    # Location (optional; feeds the neighborhood heatmap)
+    neighborhood: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    city: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     
     # Status & Priority
     status: Mapped[Optional[str]] = mapped_column(
@@ -89,6 +94,20 @@ class Demand(Base, TimestampMixin):
         UUID(as_uuid=True),
         nullable=True
     )
+
+    # Full-text search (generated, weighted; see app.services.search_service).
+    # Deferred: it is only ever used in WHERE / ORDER BY.
+    search_vector: Mapped[Optional[str]] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('public.pt_unaccent'::regconfig, coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('public.pt_unaccent'::regconfig, coalesce(description, '')), 'B') || "
+            "setweight(to_tsvector('public.pt_unaccent'::regconfig, coalesce(beneficiary, '')), 'C')",
+            persisted=True
+        ),
+        deferred=True,
+        nullable=True
+    )
     
     # Relationships
     cabinet: Mapped["Cabinet"] = relationship(
@@ -0,0 +1,88 @@
+"""
+Demand Analytics Models - Status history and daily rollups.
+
+Contains models for:
+- DemandStatusEvent: Append-only log of demand creation, status, category and assignee changes
+- DemandDailyRollup: Per-day counts per cabinet, category and assignee
+"""
+
+from sqlalchemy import ForeignKey, Text, BigInteger, Date, DateTime, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from typing import Optional
+from datetime import date, datetime
+import uuid
+
+from app.models.base import Base
+
+
+class DemandStatusEvent(Base):
+    """
+    Demand Status Event - One transition of a demand ('created', 'changed'
+    or 'deleted'), with the status, category and assignee before and after.
+
+    Written only by statement-level triggers on demands; never updated.
+    """
+
+    __tablename__ = "demand_status_events"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    cabinet_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("cabinets.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    # No FK: the history outlives deleted demands
+    demand_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    event: Mapped[str] = mapped_column(Text, nullable=False)
+
+    from_status: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    to_status: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    from_category: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    to_category: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    from_assigned_to: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    to_assigned_to: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    demand_created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    changed_by: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True), nullable=True)
+    changed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=text("timezone('utc'::text, now())"),
+        nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<DemandStatusEvent(demand_id={self.demand_id}, event='{self.event}', {self.from_status} -> {self.to_status})>"
+
+
+class DemandDailyRollup(Base):
+    """
+    Demand Daily Rollup - Counts for one local day (America/Sao_Paulo),
+    category and assignee ('' when unset).
+
+    Maintained incrementally by the refresh_demand_rollups() RPC; see
+    app.services.demand_analytics_service for reading.
+    """
+
+    __tablename__ = "demand_daily_rollups"
+
+    cabinet_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("cabinets.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    category: Mapped[str] = mapped_column(Text, primary_key=True, server_default=text("''::text"))
+    assigned_to: Mapped[str] = mapped_column(Text, primary_key=True, server_default=text("''::text"))
+
+    # Measures
+    opened: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default=text("0"))
+    closed: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default=text("0"))
+    reopened: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default=text("0"))
+    resolution_seconds_sum: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default=text("0"))
+    resolution_seconds_max: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    # Demands that became open (+) or stopped being open (-) here that day
+    backlog_delta: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default=text("0"))
+
+    def __repr__(self) -> str:
+        return f"<DemandDailyRollup(cabinet_id={self.cabinet_id}, day={self.day}, opened={self.opened}, closed={self.closed})>"
@@ -2,17 +2,18 @@
 Document Chunk Model - Vector Embeddings Storage.
 
 Represents document chunks with vector embeddings for semantic search.
-Uses pgvector extension for the embedding column.
+Uses pgvector extension for the embedding column, with half-precision
+copies indexed for memory-efficient search.
 """
 
-from sqlalchemy import Column, Text, text
+from sqlalchemy import Column, ForeignKey, Text, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from typing import Optional, TYPE_CHECKING, Any
 from datetime import datetime
 import uuid
 
-from pgvector.sqlalchemy import Vector
+from pgvector.sqlalchemy import Vector, HALFVEC
 from app.models.base import Base
 
 if TYPE_CHECKING:
@@ -29,7 +30,9 @@ class DocumentChunk(Base):
     - 'n8n_legacy': Migrated from old n8n vectors
     - 'scraped_law': Web-scraped legal documents
     
-    Uses pgvector for embedding columns.
+    Uses pgvector for embedding columns. The float32 columns are the
+    full-precision source used for re-ranking; the halfvec copies (kept in
+    sync by a database trigger) carry the HNSW and binary-quantized indexes.
     """
     
     __tablename__ = "document_chunks"
@@ -44,6 +47,7 @@ class DocumentChunk(Base):
     # Foreign Keys
     cabinet_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
+        ForeignKey("cabinets.id"),
         nullable=False
     )
     document_id: Mapped[Optional[uuid.UUID]] = mapped_column(
@@ -66,6 +70,16 @@ class DocumentChunk(Base):
         nullable=True
     )
     
+    # Half-precision copies (maintained by the sync_document_chunks_halfvec trigger)
+    embedding_half: Mapped[Optional[Any]] = mapped_column(
+        HALFVEC(768),
+        nullable=True
+    )
+    embedding_openai_half: Mapped[Optional[Any]] = mapped_column(
+        HALFVEC(1536),
+        nullable=True
+    )
+    
     # Metadata (renamed to avoid SQLAlchemy reserved name conflict)
     chunk_metadata: Mapped[Optional[dict]] = mapped_column(
         "metadata",  # Actual DB column name
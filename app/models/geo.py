@@ -0,0 +1,70 @@
+"""
+Geo Models - Geocoding cache and precomputed density maps.
+
+Contains models for:
+- GeocodedPlace: Neighborhood/city centroids loaded from a gazetteer file
+- CabinetGeoDensity: Cached map payload per cabinet and aggregation level
+"""
+
+from sqlalchemy import Computed, ForeignKey, Text, BigInteger, Float, DateTime, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from typing import Any, Dict, Optional
+from datetime import datetime
+import uuid
+
+from app.models.base import Base, TimestampMixin
+
+
+class GeocodedPlace(Base, TimestampMixin):
+    """
+    Geocoded Place - Centroid of a neighborhood (or of a city, when
+    `neighborhood` is NULL). Shared by all cabinets.
+
+    Lookups go through `city_key` / `neighborhood_key`, generated with
+    public.place_key() so spelling, case and accents do not matter.
+    """
+
+    __tablename__ = "geocoded_places"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    city: Mapped[str] = mapped_column(Text, nullable=False)
+    neighborhood: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    state: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    lat: Mapped[float] = mapped_column(Float, nullable=False)
+    lng: Mapped[float] = mapped_column(Float, nullable=False)
+    source: Mapped[str] = mapped_column(Text, server_default=text("'gazetteer'::text"), nullable=False)
+    city_key: Mapped[str] = mapped_column(Text, Computed("public.place_key(city)", persisted=True))
+    neighborhood_key: Mapped[str] = mapped_column(Text, Computed("public.place_key(neighborhood)", persisted=True))
+
+    def __repr__(self) -> str:
+        return f"<GeocodedPlace(city='{self.city}', neighborhood='{self.neighborhood}', lat={self.lat}, lng={self.lng})>"
+
+
+class CabinetGeoDensity(Base):
+    """
+    Cabinet Geo Density - The map payload of one cabinet at one level
+    ('neighborhood', 'geohash:6', 'h3:8').
+
+    `watermark` is the newest input it was computed from; see
+    app.services.geo_density_service.
+    """
+
+    __tablename__ = "cabinet_geo_density"
+
+    cabinet_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("cabinets.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    level: Mapped[str] = mapped_column(Text, primary_key=True)
+    payload: Mapped[Dict[str, Any]] = mapped_column(JSONB, nullable=False)
+    watermark: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    computed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=text("timezone('utc'::text, now())"),
+        nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<CabinetGeoDensity(cabinet_id={self.cabinet_id}, level='{self.level}')>"
@@ -0,0 +1,55 @@
+"""
+Notification Model - In-app notifications for cabinet staff.
+
+Most notifications are free text; birthday notifications also point at the
+voter and the date of the birthday (see the worker's birthday job).
+"""
+
+from sqlalchemy import ForeignKey, Text, BigInteger, Boolean, Date, DateTime, func, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from typing import Optional
+from datetime import date, datetime
+import uuid
+
+from app.models.base import Base
+
+
+class Notification(Base):
+    """
+    Notification - A message shown in the notifications page.
+
+    (cabinet_id, type, voter_id, event_date) is unique for rows with a
+    voter, so scheduled jobs can re-run without duplicates.
+    """
+
+    __tablename__ = "notifications"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    cabinet_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("cabinets.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    title: Mapped[str] = mapped_column(Text, nullable=False)
+    message: Mapped[str] = mapped_column(Text, nullable=False)
+    type: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    category: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    read: Mapped[Optional[bool]] = mapped_column(Boolean, server_default=text("false"), nullable=True)
+
+    # Event notifications (e.g. birthdays)
+    voter_id: Mapped[Optional[int]] = mapped_column(
+        BigInteger,
+        ForeignKey("voters.id", ondelete="CASCADE"),
+        nullable=True
+    )
+    event_date: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
+
+    created_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.current_timestamp(),
+        nullable=True
+    )
+
+    def __repr__(self) -> str:
+        return f"<Notification(id={self.id}, type='{self.type}', title='{self.title}')>"
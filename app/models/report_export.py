@@ -0,0 +1,55 @@
+"""
+Report Export Model - Server-side report files.
+
+Tracks the worker job that streams a report (voters, demands) into a
+CSV/XLSX/Parquet file in storage (see workers/ai-engine/tasks/report_export.py).
+"""
+
+from sqlalchemy import ForeignKey, Integer, BigInteger, Text, DateTime, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from typing import Any, Dict, Optional
+from datetime import datetime
+import uuid
+
+from app.models.base import Base, TimestampMixin
+
+
+class ReportExport(Base, TimestampMixin):
+    """
+    Report Export - one requested report file.
+
+    `download_url` is a signed storage link valid until `expires_at`;
+    `file_path` stays valid for signing a new one.
+    """
+
+    __tablename__ = "report_exports"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        server_default=text("gen_random_uuid()")
+    )
+    cabinet_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("cabinets.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    report: Mapped[str] = mapped_column(Text, nullable=False)
+    format: Mapped[str] = mapped_column(Text, server_default=text("'csv'::text"), nullable=False)
+    filters: Mapped[Dict[str, Any]] = mapped_column(JSONB, server_default=text("'{}'::jsonb"), nullable=False)
+    status: Mapped[str] = mapped_column(Text, server_default=text("'pending'::text"), nullable=False)
+    total_rows: Mapped[Optional[int]] = mapped_column(Integer, server_default=text("0"))
+    exported_rows: Mapped[Optional[int]] = mapped_column(Integer, server_default=text("0"))
+    file_path: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    file_bytes: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    download_url: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    error_details: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # profiles.id; profiles is not mapped here
+    created_by: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True), nullable=True)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<ReportExport(id={self.id}, report='{self.report}', format='{self.format}', status='{self.status}')>"
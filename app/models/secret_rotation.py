@@ -0,0 +1,46 @@
+"""
+Secret Rotation Model - Re-encryption jobs for cabinet secrets.
+
+Tracks the worker job that re-encrypts every cabinet secret with the
+primary key of the CryptoService key ring after a key rotation.
+"""
+
+from sqlalchemy import Integer, Float, Text, DateTime, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from typing import Optional
+from datetime import datetime
+import uuid
+
+from app.models.base import Base, TimestampMixin
+
+
+class SecretRotation(Base, TimestampMixin):
+    """
+    Secret Rotation - one re-encryption run towards `key_version`.
+
+    Progress is checkpointed per batch (`last_cabinet_id`), in the same
+    transaction as the re-encrypted rows, so an interrupted run resumes
+    exactly where it stopped.
+    """
+
+    __tablename__ = "secret_rotations"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        server_default=text("gen_random_uuid()")
+    )
+    key_version: Mapped[str] = mapped_column(Text, nullable=False)
+    status: Mapped[str] = mapped_column(Text, server_default=text("'pending'::text"), nullable=False)
+    total_secrets: Mapped[Optional[int]] = mapped_column(Integer, server_default=text("0"))
+    processed_secrets: Mapped[Optional[int]] = mapped_column(Integer, server_default=text("0"))
+    failed_secrets: Mapped[Optional[int]] = mapped_column(Integer, server_default=text("0"))
+    last_cabinet_id: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True), nullable=True)
+    secrets_per_second: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    error_details: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<SecretRotation(id={self.id}, key_version='{self.key_version}', status='{self.status}')>"
@@ -0,0 +1,93 @@
+"""
+Voter Model - Citizens registered by a cabinet.
+
+Maps the existing `voters` table (eleitores): contact data, address and
+political category of each citizen in the cabinet's base.
+"""
+
+from sqlalchemy import Computed, ForeignKey, Text, BigInteger, Date, text
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+from sqlalchemy.orm import Mapped, mapped_column
+from typing import Optional
+from datetime import date
+import uuid
+
+from app.models.base import Base, TimestampMixin
+
+
+class Voter(Base, TimestampMixin):
+    """
+    Voter entity - A citizen in the cabinet's base.
+
+    Note: ID is BigInt (auto-increment), NOT UUID. No relationship back to
+    Cabinet on purpose: a cabinet can hold hundreds of thousands of voters,
+    which must be aggregated in SQL (see app.services.analytics), not loaded.
+    """
+
+    __tablename__ = "voters"
+
+    # Primary Key - BigInt Identity (NOT UUID)
+    id: Mapped[int] = mapped_column(
+        BigInteger,
+        primary_key=True,
+        autoincrement=True
+    )
+
+    # Foreign Key to Cabinet
+    cabinet_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("cabinets.id"),
+        nullable=False
+    )
+
+    # Identification & Contact
+    name: Mapped[str] = mapped_column(Text, nullable=False)
+    cpf: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    phone: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    birth_date: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
+
+    # Address
+    address: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    city: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    neighborhood: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    # Classification
+    category: Mapped[Optional[str]] = mapped_column(
+        Text,
+        server_default=text("'Indeciso'::text"),
+        nullable=True
+    )
+    status: Mapped[Optional[str]] = mapped_column(
+        Text,
+        server_default=text("'active'::text"),
+        nullable=True
+    )
+    source: Mapped[Optional[str]] = mapped_column(
+        Text,
+        server_default=text("'Manual'::text"),
+        nullable=True
+    )
+
+    # Productivity tracking (profiles.id; profiles is not mapped here)
+    created_by: Mapped[Optional[uuid.UUID]] = mapped_column(
+        UUID(as_uuid=True),
+        nullable=True,
+        comment="Usuário que criou o registro"
+    )
+
+    # Full-text search (generated, weighted; see app.services.search_service).
+    # Deferred: it is only ever used in WHERE / ORDER BY.
+    search_vector: Mapped[Optional[str]] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('public.pt_unaccent'::regconfig, coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('public.pt_unaccent'::regconfig, coalesce(neighborhood, '')), 'B') || "
+            "setweight(to_tsvector('public.pt_unaccent'::regconfig, coalesce(address, '')), 'C')",
+            persisted=True
+        ),
+        deferred=True,
+        nullable=True
+    )
+
+    def __repr__(self) -> str:
+        return f"<Voter(id={self.id}, name='{self.name}', cabinet_id={self.cabinet_id})>"
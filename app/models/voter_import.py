@@ -0,0 +1,55 @@
+"""
+Voter Import Model - Server-side spreadsheet imports.
+
+Tracks the worker job that streams an uploaded CSV/XLSX into `voters`
+(see workers/ai-engine/tasks/voter_import.py).
+"""
+
+from sqlalchemy import ForeignKey, Integer, Float, Text, DateTime, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from typing import Optional
+from datetime import datetime
+import uuid
+
+from app.models.base import Base, TimestampMixin
+
+
+class VoterImport(Base, TimestampMixin):
+    """
+    Voter Import - one uploaded spreadsheet being loaded into a cabinet.
+
+    `processed_rows` is committed with each chunk of inserted voters, so an
+    interrupted import resumes after the last loaded chunk.
+    """
+
+    __tablename__ = "voter_imports"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        server_default=text("gen_random_uuid()")
+    )
+    cabinet_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("cabinets.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    bucket: Mapped[str] = mapped_column(Text, server_default=text("'voter-imports'::text"), nullable=False)
+    path: Mapped[str] = mapped_column(Text, nullable=False)
+    status: Mapped[str] = mapped_column(Text, server_default=text("'pending'::text"), nullable=False)
+    total_rows: Mapped[Optional[int]] = mapped_column(Integer, server_default=text("0"))
+    processed_rows: Mapped[Optional[int]] = mapped_column(Integer, server_default=text("0"))
+    inserted_rows: Mapped[Optional[int]] = mapped_column(Integer, server_default=text("0"))
+    duplicate_rows: Mapped[Optional[int]] = mapped_column(Integer, server_default=text("0"))
+    error_rows: Mapped[Optional[int]] = mapped_column(Integer, server_default=text("0"))
+    rows_per_second: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    error_file_path: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    error_details: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # profiles.id; profiles is not mapped here
+    created_by: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True), nullable=True)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<VoterImport(id={self.id}, cabinet_id={self.cabinet_id}, status='{self.status}')>"
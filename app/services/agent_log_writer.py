@@ -0,0 +1,173 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.agent import AgentLog
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_DROP = "drop"
+OVERFLOW_BLOCK = "block"
+
+
+@dataclass
+class AgentLogWriterStats:
+    enqueued: int = 0
+    flushed: int = 0
+    dropped: int = 0
+    failed: int = 0
+    flushes: int = 0
+
+
+class AgentLogWriter:
+    """
+    Buffered, batched writer for agent_logs.
+
+    Callers enqueue records with `log()` and return immediately; a background
+    thread flushes the bounded buffer with one multi-row INSERT whenever
+    `batch_size` records are waiting or `flush_interval` seconds have passed.
+
+    When the buffer is full the `overflow_policy` applies:
+    - "drop":  the record is discarded and counted in stats.dropped
+    - "block": the caller waits up to `block_timeout` seconds, then drops
+
+    Records still buffered are flushed by `close()`, which is also registered
+    with atexit when the writer starts.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        max_buffer: int = 10_000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        overflow_policy: str = OVERFLOW_DROP,
+        block_timeout: float = 1.0,
+    ):
+        if overflow_policy not in (OVERFLOW_DROP, OVERFLOW_BLOCK):
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.stats = AgentLogWriterStats()
+        self._buffer: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_buffer)
+        self._stop = threading.Event()
+        self._flush_requested = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "AgentLogWriter":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="agent-log-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def log(
+        self,
+        cabinet_id: Optional[uuid.UUID],
+        agent_name: str,
+        action: str,
+        status: str,
+        payload: Optional[dict] = None,
+        response_summary: Optional[dict] = None,
+    ) -> bool:
+        """
+        Enqueues one agent_logs row.
+
+        Returns:
+            True if the record was buffered, False if it was dropped.
+        """
+        record = {
+            "cabinet_id": cabinet_id,
+            "agent_name": agent_name,
+            "action": action,
+            "status": status,
+            "payload": payload or {},
+            "response_summary": response_summary or {},
+            # Stamp at enqueue time so buffering does not skew the timeline
+            "created_at": datetime.now(timezone.utc),
+        }
+        try:
+            if self.overflow_policy == OVERFLOW_BLOCK:
+                self._buffer.put(record, timeout=self.block_timeout)
+            else:
+                self._buffer.put_nowait(record)
+        except queue.Full:
+            with self._stats_lock:
+                self.stats.dropped += 1
+            return False
+
+        with self._stats_lock:
+            self.stats.enqueued += 1
+        if self._buffer.qsize() >= self.batch_size:
+            self._flush_requested.set()
+        return True
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._buffer.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        session = self.session_factory()
+        try:
+            # executemany of a Core insert is sent as multi-row INSERT ... VALUES batches
+            session.execute(insert(AgentLog), batch)
+            session.commit()
+            with self._stats_lock:
+                self.stats.flushed += len(batch)
+                self.stats.flushes += 1
+        except Exception as e:
+            session.rollback()
+            with self._stats_lock:
+                self.stats.failed += len(batch)
+            logger.error(f"Failed to flush {len(batch)} agent log rows: {e}")
+        finally:
+            session.close()
+
+    def flush(self) -> None:
+        """Writes everything currently buffered (from the calling thread)."""
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return
+            self._write(batch)
+
+    def _run(self) -> None:
+        next_flush = time.monotonic() + self.flush_interval
+        while not self._stop.is_set():
+            self._flush_requested.wait(timeout=max(0.0, next_flush - time.monotonic()))
+            self._flush_requested.clear()
+            if self._buffer.qsize() >= self.batch_size or time.monotonic() >= next_flush:
+                self.flush()
+                next_flush = time.monotonic() + self.flush_interval
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stops the background thread and flushes the remaining records."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._flush_requested.set()
+        self._thread.join(timeout=timeout)
+        self._thread = None
+        self.flush()
+        logger.info(
+            f"AgentLogWriter closed: {self.stats.flushed} flushed, "
+            f"{self.stats.dropped} dropped, {self.stats.failed} failed"
+        )
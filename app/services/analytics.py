@@ -0,0 +1,197 @@
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+import calendar
+import uuid
+
+from sqlalchemy import Integer, and_, cast, extract, func, literal_column, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.models.voter import Voter
+
+
+def _next_birthday(birth_date: date, today: date) -> date:
+    """Next occurrence on or after `today`; 29/02 is celebrated on 28/02 in common years."""
+    for year in (today.year, today.year + 1):
+        day = birth_date.day
+        if birth_date.month == 2 and day == 29 and not calendar.isleap(year):
+            day = 28
+        occurrence = date(year, birth_date.month, day)
+        if occurrence >= today:
+            return occurrence
+    raise AssertionError("unreachable")
+
+
+class VoterAnalyticsService:
+    """
+    Voter aggregates for dashboards and reports, computed in SQL per cabinet.
+
+    Nothing here loads voters wholesale: counts come back already grouped
+    (one scan for several dimensions via GROUPING SETS) and birthday lookups
+    go through the (cabinet_id, month, day) expression index on birth_date.
+    Results are plain JSON-ready structures; counts are [value, count] pairs,
+    largest first.
+    """
+
+    # Dimensions reports may group by
+    DIMENSIONS = {
+        "neighborhood": Voter.neighborhood,
+        "city": Voter.city,
+        "category": Voter.category,
+        "status": Voter.status,
+        "source": Voter.source,
+    }
+
+    # Must match idx_voters_cabinet_birthday expression for expression
+    birth_month = cast(extract("month", Voter.birth_date), Integer)
+    birth_day = cast(extract("day", Voter.birth_date), Integer)
+
+    # Columns returned for each birthday
+    BIRTHDAY_COLUMNS = (Voter.id, Voter.name, Voter.phone, Voter.city, Voter.neighborhood, Voter.birth_date)
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def _filters(cabinet_id: uuid.UUID, created_from: Optional[date] = None, created_to: Optional[date] = None) -> list:
+        filters = [Voter.cabinet_id == cabinet_id]
+        if created_from:
+            filters.append(Voter.created_at >= created_from)
+        if created_to:
+            filters.append(Voter.created_at <= created_to)
+        return filters
+
+    def total(self, cabinet_id: uuid.UUID, created_from: Optional[date] = None, created_to: Optional[date] = None) -> int:
+        return self.db.scalar(
+            select(func.count()).select_from(Voter).where(*self._filters(cabinet_id, created_from, created_to))
+        ) or 0
+
+    def breakdown(
+        self,
+        cabinet_id: uuid.UUID,
+        dimensions: Sequence[str] = ("neighborhood", "city", "category", "status"),
+        top: Optional[int] = None,
+        created_from: Optional[date] = None,
+        created_to: Optional[date] = None,
+    ) -> Dict[str, Any]:
+        """
+        Voter counts by several dimensions in a single scan.
+
+        Returns:
+            {"total": 1234, "neighborhood": [["Centro", 310], ...], "city": [...], ...}
+            with `top` pairs per dimension at most and null for missing values.
+        """
+        unknown = set(dimensions) - set(self.DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown voter dimensions: {', '.join(sorted(unknown))}")
+        columns = [self.DIMENSIONS[name] for name in dimensions]
+
+        rows = self.db.execute(
+            select(
+                *columns,
+                *[func.grouping(column) for column in columns],
+                func.count(),
+            )
+            .where(*self._filters(cabinet_id, created_from, created_to))
+            # one set per dimension, plus () for the overall total
+            .group_by(func.grouping_sets(*columns, literal_column("()")))
+        ).all()
+
+        result: Dict[str, Any] = {"total": 0, **{name: [] for name in dimensions}}
+        width = len(columns)
+        for row in rows:
+            values, grouped_out, count = row[:width], row[width:2 * width], row[-1]
+            if all(grouped_out):
+                result["total"] = count
+                continue
+            index = grouped_out.index(0)
+            result[dimensions[index]].append([values[index], count])
+
+        for name in dimensions:
+            result[name].sort(key=lambda pair: (-pair[1], pair[0] is None, pair[0] or ""))
+            if top is not None:
+                result[name] = result[name][:top]
+        return result
+
+    def counts_by(self, cabinet_id: uuid.UUID, dimension: str, top: Optional[int] = None, **filters) -> List[List[Any]]:
+        """[value, count] pairs for one dimension, largest first."""
+        return self.breakdown(cabinet_id, (dimension,), top=top, **filters)[dimension]
+
+    @staticmethod
+    def _birthday_row(row, today: Optional[date] = None) -> Dict[str, Any]:
+        voter_id, name, phone, city, neighborhood, birth_date = row
+        item = {
+            "id": voter_id,
+            "name": name,
+            "phone": phone,
+            "city": city,
+            "neighborhood": neighborhood,
+            "birth_date": birth_date.isoformat(),
+        }
+        if today is not None:
+            occurrence = _next_birthday(birth_date, today)
+            item["date"] = occurrence.isoformat()
+            item["days_until"] = (occurrence - today).days
+            item["age"] = occurrence.year - birth_date.year
+        return item
+
+    def birthdays_in_month(self, cabinet_id: uuid.UUID, month: int, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Voters born in `month` (1-12), by day then name."""
+        if not 1 <= month <= 12:
+            raise ValueError("month must be between 1 and 12")
+        query = (
+            select(*self.BIRTHDAY_COLUMNS)
+            .where(Voter.cabinet_id == cabinet_id, Voter.birth_date.is_not(None), self.birth_month == month)
+            .order_by(self.birth_day, Voter.name)
+        )
+        if limit is not None:
+            query = query.limit(limit)
+        return [self._birthday_row(row) for row in self.db.execute(query)]
+
+    def _month_day_range(self, cabinet_id: uuid.UUID, start: date, end: date):
+        """(month, day) between start and end inclusive, as index range conditions."""
+        start_key = (start.month, start.day)
+        end_key = (end.month, end.day)
+        if end_key == (2, 28) and not calendar.isleap(end.year):
+            end_key = (2, 29)  # 29/02 birthdays fall on 28/02 this year
+
+        key = tuple_(Voter.cabinet_id, self.birth_month, self.birth_day)
+        lower = key >= tuple_(cabinet_id, *start_key)
+        upper = key <= tuple_(cabinet_id, *end_key)
+        if start_key <= end_key:
+            return and_(lower, upper)
+        # The window wraps around 31/12
+        return or_(and_(lower, key <= tuple_(cabinet_id, 12, 31)), and_(key >= tuple_(cabinet_id, 1, 1), upper))
+
+    def upcoming_birthdays(
+        self,
+        cabinet_id: uuid.UUID,
+        days: int = 7,
+        today: Optional[date] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Voters with a birthday in the next `days` days, today included,
+        soonest first. Each item carries `date`, `days_until` and `age`.
+        """
+        if days < 1:
+            raise ValueError("days must be at least 1")
+        today = today or date.today()
+        conditions = [Voter.cabinet_id == cabinet_id, Voter.birth_date.is_not(None)]
+        if days < 366:
+            conditions.append(self._month_day_range(cabinet_id, today, today + timedelta(days=days - 1)))
+
+        rows = self.db.execute(select(*self.BIRTHDAY_COLUMNS).where(*conditions)).all()
+        items = [self._birthday_row(row, today) for row in rows]
+        items = [item for item in items if item["days_until"] < days]
+        items.sort(key=lambda item: (item["days_until"], item["name"]))
+        return items[:limit] if limit is not None else items
+
+    def dashboard(self, cabinet_id: uuid.UUID, top: int = 5, birthday_days: int = 7, birthday_limit: int = 5) -> Dict[str, Any]:
+        """Everything the dashboard's voter cards need, in two queries."""
+        neighborhoods = self.breakdown(cabinet_id, ("neighborhood",))
+        return {
+            "total_voters": neighborhoods["total"],
+            "coverage": sum(1 for value, _ in neighborhoods["neighborhood"] if value),
+            "neighborhoods": neighborhoods["neighborhood"][:top],
+            "birthdays": self.upcoming_birthdays(cabinet_id, days=birthday_days, limit=birthday_limit),
+        }
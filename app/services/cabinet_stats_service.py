@@ -0,0 +1,114 @@
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional
+from zoneinfo import ZoneInfo
+import uuid
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.cabinet_stats import CabinetStat, CabinetDailyStat
+
+# Days in cabinet_daily_stats are local to this timezone (see the triggers)
+STATS_TIMEZONE = ZoneInfo("America/Sao_Paulo")
+
+# Demand status that no longer counts as active on the dashboard
+CLOSED_DEMAND_STATUS = "Concluída"
+
+# Periods of the productivity page, in days including today
+PRODUCTIVITY_PERIODS = {"day": 1, "week": 7, "month": 30}
+
+PRODUCTIVITY_METRICS = {
+    "accesses": "logins",
+    "voters_created": "voters_created",
+    "demands_created": "demands_created",
+    "events_created": "events_created",
+}
+
+
+class CabinetStatsService:
+    """
+    Reads the trigger-maintained counters in cabinet_stats / cabinet_daily_stats.
+
+    Every read touches a handful of rows per cabinet (one per status or
+    category, one per day and user for a period), so dashboard cost does not
+    grow with the number of voters, demands or access logs.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def today() -> date:
+        return datetime.now(STATS_TIMEZONE).date()
+
+    def totals(self, cabinet_id: uuid.UUID) -> Dict[str, Dict[str, int]]:
+        """{"voters": {"": 1234}, "voters_by_category": {"Apoiador": 800, ...}, "demands_by_status": {...}}"""
+        rows = self.db.execute(
+            select(CabinetStat.metric, CabinetStat.key, CabinetStat.value)
+            .where(CabinetStat.cabinet_id == cabinet_id, CabinetStat.value != 0)
+        ).all()
+        totals: Dict[str, Dict[str, int]] = {}
+        for metric, key, value in rows:
+            totals.setdefault(metric, {})[key] = value
+        return totals
+
+    def _daily_sum(
+        self,
+        cabinet_id: uuid.UUID,
+        metrics,
+        start: date,
+        end: date,
+        user_id: Optional[uuid.UUID] = None,
+    ) -> Dict[str, int]:
+        query = (
+            select(CabinetDailyStat.metric, func.sum(CabinetDailyStat.value))
+            .where(
+                CabinetDailyStat.cabinet_id == cabinet_id,
+                CabinetDailyStat.metric.in_(list(metrics)),
+                CabinetDailyStat.day.between(start, end),
+            )
+            .group_by(CabinetDailyStat.metric)
+        )
+        if user_id is not None:
+            query = query.where(CabinetDailyStat.user_id == user_id)
+        return {metric: int(total or 0) for metric, total in self.db.execute(query)}
+
+    def dashboard(self, cabinet_id: uuid.UUID) -> Dict[str, Any]:
+        """Counters for the dashboard cards."""
+        totals = self.totals(cabinet_id)
+        demands_by_status = totals.get("demands_by_status", {})
+        today = self.today()
+        month_start = today.replace(day=1)
+        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        events = self._daily_sum(cabinet_id, ("events_scheduled",), month_start, month_end)
+        return {
+            "total_voters": totals.get("voters", {}).get("", 0),
+            "voters_by_category": totals.get("voters_by_category", {}),
+            "demands_by_status": demands_by_status,
+            # same as .neq('status', 'Concluída'): demands without a status are not counted
+            "active_demands": sum(
+                value for status, value in demands_by_status.items() if status and status != CLOSED_DEMAND_STATUS
+            ),
+            "events_this_month": events.get("events_scheduled", 0),
+        }
+
+    def productivity(
+        self,
+        cabinet_id: uuid.UUID,
+        user_id: Optional[uuid.UUID] = None,
+        period: str = "week",
+    ) -> Dict[str, Any]:
+        """
+        Accesses and records created over the last day/week/month, for one
+        user or the whole cabinet, counted in whole local days.
+        """
+        if period not in PRODUCTIVITY_PERIODS:
+            raise ValueError(f"Unknown period: {period}")
+        end = self.today()
+        start = end - timedelta(days=PRODUCTIVITY_PERIODS[period] - 1)
+        sums = self._daily_sum(cabinet_id, PRODUCTIVITY_METRICS, start, end, user_id)
+        return {
+            "user_id": str(user_id) if user_id else "cabinet",
+            "period": period,
+            **{name: sums.get(metric, 0) for metric, name in PRODUCTIVITY_METRICS.items()},
+        }
@@ -0,0 +1,214 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+import uuid
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.conversation import AgentConversation, AgentMessage
+
+# Summarizer(previous_summary, messages_to_fold) -> new summary
+Summarizer = Callable[[Optional[str], List[AgentMessage]], str]
+
+SENDER_LABELS = {"user": "Cidadão", "agent": "Assistente", "system": "Sistema"}
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """~4 characters per token, the same estimate the worker uses for prompts."""
+    return (len(text) + 3) // 4 if text else 0
+
+
+@dataclass
+class HistoryWindow:
+    """What the LLM sees of a conversation: a summary plus the latest turns."""
+    summary: Optional[str]
+    messages: List[AgentMessage] = field(default_factory=list)
+    tokens: int = 0
+
+    def as_turns(self) -> List[Dict[str, str]]:
+        return [{"role": m.sender_type, "content": m.content or ""} for m in self.messages]
+
+
+class ConversationService:
+    """
+    Service for agent conversation state (agent_conversations / agent_messages).
+
+    Appends are batched: `append_messages()` writes any number of messages with
+    one multi-row INSERT and advances `last_message_at` / `message_count` with a
+    single UPDATE. Reads never load a thread in full: `get_history_window()`
+    returns the newest turns that fit a token budget, and turns that fall out of
+    the window are folded into a rolling summary, so prompt size stays bounded
+    however long the thread runs.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        summarizer: Optional[Summarizer] = None,
+        count_tokens: Callable[[Optional[str]], int] = estimate_tokens,
+    ):
+        self.db = db
+        self.count_tokens = count_tokens
+        self.summarizer = summarizer or self.extractive_summary
+
+    def get_or_create(
+        self, cabinet_id: uuid.UUID, external_id: str, platform: str = "whatsapp", user_name: Optional[str] = None
+    ) -> AgentConversation:
+        """
+        Returns the contact's conversation, creating it if none exists.
+
+        (cabinet_id, platform, external_id) is unique, so concurrent messages
+        from a new contact end up in the same conversation.
+        """
+        query = select(AgentConversation).where(
+            AgentConversation.cabinet_id == cabinet_id,
+            AgentConversation.platform == platform,
+            AgentConversation.external_id == external_id,
+        )
+        conversation = self.db.scalars(query).first()
+        if conversation:
+            return conversation
+
+        self.db.execute(
+            pg_insert(AgentConversation)
+            .values(cabinet_id=cabinet_id, external_id=external_id, platform=platform, user_name=user_name)
+            .on_conflict_do_nothing(
+                index_elements=[AgentConversation.cabinet_id, AgentConversation.platform, AgentConversation.external_id]
+            )
+        )
+        self.db.commit()
+        return self.db.scalars(query).one()
+
+    def append_messages(self, conversation_id: uuid.UUID, messages: List[Dict]) -> int:
+        """
+        Appends messages in one batch.
+
+        Args:
+            messages: dicts with 'sender_type', 'content' and optionally
+                'metadata' and 'created_at' (defaults to now, one
+                microsecond apart so the batch keeps its order).
+
+        Returns:
+            Number of messages written.
+        """
+        if not messages:
+            return 0
+        now = datetime.now(timezone.utc)
+        rows = [
+            {
+                "conversation_id": conversation_id,
+                "sender_type": m["sender_type"],
+                "content": m.get("content"),
+                "message_metadata": m.get("metadata") or {},
+                "created_at": m.get("created_at") or now + timedelta(microseconds=index),
+            }
+            for index, m in enumerate(messages)
+        ]
+        latest = max(row["created_at"] for row in rows)
+
+        self.db.execute(insert(AgentMessage), rows)
+        self.db.execute(
+            update(AgentConversation)
+            .where(AgentConversation.id == conversation_id)
+            .values(
+                last_message_at=func.greatest(func.coalesce(AgentConversation.last_message_at, latest), latest),
+                message_count=AgentConversation.message_count + len(rows),
+            )
+        )
+        self.db.commit()
+        return len(rows)
+
+    def get_history_window(
+        self,
+        conversation_id: uuid.UUID,
+        token_budget: int = 1200,
+        max_messages: int = 40,
+        summary_token_budget: int = 300,
+    ) -> HistoryWindow:
+        """
+        Returns the newest messages fitting `token_budget` (oldest first) plus
+        the rolling summary, refreshing the summary with any turns that have
+        dropped out of the window since it was last updated.
+        """
+        conversation = self.db.get(AgentConversation, conversation_id)
+        if conversation is None:
+            raise ValueError(f"Conversation {conversation_id} not found")
+
+        recent = self.db.scalars(
+            select(AgentMessage)
+            .where(AgentMessage.conversation_id == conversation_id)
+            .order_by(AgentMessage.seq.desc())
+            .limit(max_messages)
+        ).all()
+
+        window, used = [], 0
+        for message in recent:
+            cost = self.count_tokens(message.content)
+            if window and used + cost > token_budget:
+                break
+            window.append(message)
+            used += cost
+        window.reverse()
+
+        if window and len(window) < conversation.message_count:
+            self._fold_into_summary(conversation, before=window[0], token_budget=summary_token_budget)
+
+        return HistoryWindow(
+            summary=conversation.summary,
+            messages=window,
+            tokens=used + self.count_tokens(conversation.summary),
+        )
+
+    def _fold_into_summary(self, conversation: AgentConversation, before: AgentMessage, token_budget: int) -> None:
+        """Summarizes messages older than the window (`before` is its first message) not covered yet."""
+        query = select(AgentMessage)\
+            .where(AgentMessage.conversation_id == conversation.id, AgentMessage.seq < before.seq)\
+            .order_by(AgentMessage.seq)
+        if conversation.summarized_seq is not None:
+            query = query.where(AgentMessage.seq > conversation.summarized_seq)
+        pending = self.db.scalars(query).all()
+        if not pending:
+            return
+
+        summary = self.summarizer(conversation.summary, pending)
+        conversation.summary = self._trim_to_budget(summary, token_budget)
+        conversation.summarized_until = pending[-1].created_at
+        conversation.summarized_seq = pending[-1].seq
+        self.db.commit()
+
+    def _trim_to_budget(self, summary: str, token_budget: int) -> str:
+        """Keeps the most recent summary lines that fit the budget."""
+        lines = summary.splitlines()
+        kept, used = [], 0
+        for line in reversed(lines):
+            cost = self.count_tokens(line) + 1
+            if kept and used + cost > token_budget:
+                break
+            kept.append(line)
+            used += cost
+        return "\n".join(reversed(kept))
+
+    @staticmethod
+    def extractive_summary(previous: Optional[str], messages: List[AgentMessage], max_chars: int = 160) -> str:
+        """
+        Default summarizer: appends one shortened line per folded message.
+
+        Cheap and deterministic; pass an LLM-backed summarizer for abstractive
+        summaries. Older lines are dropped by the token budget.
+        """
+        lines = [previous] if previous else []
+        for message in messages:
+            content = " ".join((message.content or "").split())
+            if len(content) > max_chars:
+                content = content[:max_chars - 1].rstrip() + "…"
+            if content:
+                lines.append(f"{SENDER_LABELS.get(message.sender_type, message.sender_type)}: {content}")
+        return "\n".join(lines)
+
+    def set_status(self, conversation_id: uuid.UUID, status: str) -> None:
+        self.db.execute(
+            update(AgentConversation).where(AgentConversation.id == conversation_id).values(status=status)
+        )
+        self.db.commit()
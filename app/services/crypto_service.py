@@ -1,51 +1,85 @@
 import os
-from cryptography.fernet import Fernet
-import base64
-from typing import Optional
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from typing import List, Optional, Sequence, Tuple
+
+def parse_key_ring(value: str) -> List[Tuple[str, str]]:
+    """
+    Parses APP_SECRET_KEYS: comma-separated "version:fernet_key" entries,
+    newest first (e.g. "2:<new key>,1:<old key>").
+    """
+    ring = []
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        version, sep, key = entry.partition(":")
+        if not sep or not version or not key:
+            raise ValueError("APP_SECRET_KEYS entries must look like 'version:key'")
+        ring.append((version.strip(), key.strip()))
+    return ring
+
 
 class CryptoService:
     """
     Service for encrypting and decrypting sensitive data.
-    Uses Fernet (symmetric encryption).
+    Uses Fernet (symmetric encryption) over a versioned key ring (MultiFernet).
+
+    The first key of the ring is the primary: it encrypts everything new.
+    Every key in the ring can decrypt, so a new key is rolled out by putting it
+    first, re-encrypting stored secrets (tasks/secret_rotation.py in the worker)
+    and only then dropping the old key.
     """
 
-    def __init__(self, secret_key: Optional[str] = None):
+    def __init__(self, secret_key: Optional[str] = None, key_ring: Optional[Sequence[Tuple[str, str]]] = None):
         """
         Initialize the CryptoService.
-        
+
         Args:
-            secret_key: The secret key for encryption. If not provided,
-                       it tries to read from APP_SECRET_KEY env var.
-                       If neither exists, it generates a temporary one (NOT RECOMMENDED FOR PROD).
+            secret_key: A single secret key, used as key version "1".
+            key_ring: (version, key) pairs, primary first. If neither is given,
+                      it reads APP_SECRET_KEYS, then APP_SECRET_KEY.
+                      If nothing is configured, it generates a temporary key (NOT RECOMMENDED FOR PROD).
         """
-        self.secret_key = secret_key or os.getenv("APP_SECRET_KEY")
-        
-        if not self.secret_key:
+        if key_ring is None:
+            if secret_key:
+                key_ring = [("1", secret_key)]
+            elif os.getenv("APP_SECRET_KEYS"):
+                key_ring = parse_key_ring(os.environ["APP_SECRET_KEYS"])
+            elif os.getenv("APP_SECRET_KEY"):
+                key_ring = [("1", os.environ["APP_SECRET_KEY"])]
+
+        if not key_ring:
             # Fallback for dev/test without env var - WARNING: Data won't persist across restarts if this happens
-            print("WARNING: APP_SECRET_KEY not found. Using a temporary key.")
-            self.key = Fernet.generate_key()
-        else:
-            # Ensure key is 32 url-safe base64-encoded bytes
-            try:
-                # If the key is just a raw string, we might need to handle it, 
-                # but Fernet expects specific format. 
-                # For this implementation, we assume the env var provides a valid Fernet key.
-                self.key = self.secret_key.encode() if isinstance(self.secret_key, str) else self.secret_key
-            except Exception as e:
-                print(f"Error loading key: {e}")
-                self.key = Fernet.generate_key()
-
-        self.cipher = Fernet(self.key)
+            print("WARNING: APP_SECRET_KEYS / APP_SECRET_KEY not found. Using a temporary key.")
+            key_ring = [("temporary", Fernet.generate_key().decode())]
+
+        versions = [version for version, _ in key_ring]
+        if len(set(versions)) != len(versions):
+            raise ValueError("Duplicate key versions in the key ring")
+
+        # Fernet expects 32 url-safe base64-encoded bytes; a malformed key fails here, loudly
+        self.key_ring = [(version, key.encode() if isinstance(key, str) else key) for version, key in key_ring]
+        self.primary_version = self.key_ring[0][0]
+        self.key = self.key_ring[0][1]
+        self.cipher = MultiFernet([Fernet(key) for _, key in self.key_ring])
+
+    @property
+    def versions(self) -> List[str]:
+        return [version for version, _ in self.key_ring]
+
+    def is_current(self, key_version: Optional[str]) -> bool:
+        """True if a secret recorded as encrypted with `key_version` uses the primary key."""
+        return key_version == self.primary_version
 
     def encrypt(self, plaintext: str) -> str:
-        """Encrypts a plaintext string."""
+        """Encrypts a plaintext string with the primary key."""
         if not plaintext:
             return ""
         encrypted_bytes = self.cipher.encrypt(plaintext.encode('utf-8'))
         return encrypted_bytes.decode('utf-8')
 
     def decrypt(self, ciphertext: str) -> str:
-        """Decrypts a ciphertext string."""
+        """Decrypts a ciphertext string encrypted with any key of the ring."""
         if not ciphertext:
             return ""
         try:
@@ -54,3 +88,12 @@ class CryptoService:
         except Exception as e:
             print(f"Decryption error: {e}")
             raise ValueError("Invalid credentials or wrong key")
+
+    def rotate(self, ciphertext: str) -> str:
+        """Re-encrypts a ciphertext with the primary key, without exposing the plaintext."""
+        if not ciphertext:
+            return ""
+        try:
+            return self.cipher.rotate(ciphertext.encode('utf-8')).decode('utf-8')
+        except InvalidToken:
+            raise ValueError("Ciphertext was not encrypted with any key in the ring")
@@ -0,0 +1,149 @@
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+import uuid
+
+from sqlalchemy import Date, func, select
+from sqlalchemy.orm import Session
+
+from app.models.demand_analytics import DemandDailyRollup, DemandStatusEvent
+from app.services.cabinet_stats_service import CabinetStatsService
+
+# Dimensions the rollups can be grouped by
+DIMENSIONS = {
+    "category": DemandDailyRollup.category,
+    "assigned_to": DemandDailyRollup.assigned_to,
+}
+
+
+class DemandAnalyticsService:
+    """
+    SLA and throughput figures for demands, read from demand_daily_rollups.
+
+    The rollups hold one row per local day, category and assignee, so every
+    query here reads at most a few thousand small rows whatever the number of
+    demands. They trail the live table by the worker's refresh interval plus
+    the grace period of refresh_demand_rollups() (a few minutes).
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _filtered(self, query, cabinet_id: uuid.UUID, category: Optional[str], assigned_to: Optional[str]):
+        query = query.where(DemandDailyRollup.cabinet_id == cabinet_id)
+        if category is not None:
+            query = query.where(DemandDailyRollup.category == category)
+        if assigned_to is not None:
+            query = query.where(DemandDailyRollup.assigned_to == assigned_to)
+        return query
+
+    @staticmethod
+    def _dimension(by: Optional[str]):
+        if by is not None and by not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension: {by}")
+        return DIMENSIONS.get(by)
+
+    def throughput(
+        self,
+        cabinet_id: uuid.UUID,
+        weeks: int = 12,
+        category: Optional[str] = None,
+        assigned_to: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Demands opened, closed and reopened per week (Monday to Sunday),
+        oldest first, including the current week and weeks without activity.
+        """
+        today = CabinetStatsService.today()
+        first_week = today - timedelta(days=today.weekday(), weeks=weeks - 1)
+        week = func.date_trunc("week", DemandDailyRollup.day).cast(Date)
+        query = self._filtered(
+            select(
+                week,
+                func.sum(DemandDailyRollup.opened),
+                func.sum(DemandDailyRollup.closed),
+                func.sum(DemandDailyRollup.reopened),
+            ).where(DemandDailyRollup.day >= first_week),
+            cabinet_id, category, assigned_to,
+        ).group_by(week)
+        sums = {row[0]: row[1:] for row in self.db.execute(query)}
+
+        result = []
+        for index in range(weeks):
+            start = first_week + timedelta(weeks=index)
+            opened, closed, reopened = sums.get(start, (0, 0, 0))
+            result.append({
+                "week": start.isoformat(),
+                "opened": int(opened),
+                "closed": int(closed),
+                "reopened": int(reopened),
+            })
+        return result
+
+    def resolution_times(
+        self,
+        cabinet_id: uuid.UUID,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        by: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Time from creation to 'Concluída' of the demands closed between
+        `start` and `end` (local days, inclusive), overall or per category /
+        assignee: [{"key", "closed", "avg_hours", "max_hours"}, ...].
+        """
+        dimension = self._dimension(by)
+        closed = func.sum(DemandDailyRollup.closed)
+        columns = [
+            closed,
+            func.sum(DemandDailyRollup.resolution_seconds_sum),
+            func.max(DemandDailyRollup.resolution_seconds_max),
+        ]
+        query = select(dimension, *columns) if dimension is not None else select(*columns)
+        query = query.where(DemandDailyRollup.cabinet_id == cabinet_id, DemandDailyRollup.closed > 0)
+        if start is not None:
+            query = query.where(DemandDailyRollup.day >= start)
+        if end is not None:
+            query = query.where(DemandDailyRollup.day <= end)
+        if dimension is not None:
+            query = query.group_by(dimension).order_by(closed.desc())
+
+        result = []
+        for row in self.db.execute(query):
+            key, (count, seconds, longest) = (row[0], row[1:]) if dimension is not None else (None, row)
+            if not count:
+                continue
+            result.append({
+                "key": key,
+                "closed": int(count),
+                "avg_hours": round(int(seconds) / int(count) / 3600, 1),
+                "max_hours": round(int(longest or 0) / 3600, 1),
+            })
+        return result
+
+    def backlog(
+        self,
+        cabinet_id: uuid.UUID,
+        by: str = "assigned_to",
+        as_of: Optional[date] = None,
+    ) -> Dict[str, int]:
+        """Open demands per assignee (or category) at the end of `as_of`, default now."""
+        dimension = self._dimension(by)
+        total = func.sum(DemandDailyRollup.backlog_delta)
+        query = (
+            select(dimension, total)
+            .where(DemandDailyRollup.cabinet_id == cabinet_id)
+            .group_by(dimension)
+            .having(total != 0)
+            .order_by(total.desc())
+        )
+        if as_of is not None:
+            query = query.where(DemandDailyRollup.day <= as_of)
+        return {key: int(value) for key, value in self.db.execute(query)}
+
+    def history(self, cabinet_id: uuid.UUID, demand_id: int) -> List[DemandStatusEvent]:
+        """Transitions of one demand, oldest first."""
+        return list(self.db.scalars(
+            select(DemandStatusEvent)
+            .where(DemandStatusEvent.cabinet_id == cabinet_id, DemandStatusEvent.demand_id == demand_id)
+            .order_by(DemandStatusEvent.id)
+        ))
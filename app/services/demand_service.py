@@ -1,9 +1,26 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from sqlalchemy import BigInteger, DateTime, column, func, or_, update, values
 from sqlalchemy.orm import Session
 from app.models.demand import Demand
+from app.schemas.demand import DemandUpdate
+from app.services.tenant_context import TenantContextCache
 from app.services.tenant_vault_service import TenantVaultService
-from typing import Optional, Dict
+from typing import Any, Optional, Dict, List, Mapping, Union
 import uuid
 
+# Fields the Kanban board may change on many demands at once
+BULK_UPDATE_FIELDS = {"status", "priority", "assigned_to"}
+# Returned for each changed demand: enough for the board to redraw the cards
+BULK_RETURNING_COLUMNS = (Demand.id, Demand.status, Demand.priority, Demand.assigned_to, Demand.updated_at)
+
+
+@dataclass
+class BulkUpdateResult:
+    """Demands changed by a bulk update, and the requested ids that were not."""
+    updated: List[Dict[str, Any]] = field(default_factory=list)
+    conflicts: List[int] = field(default_factory=list)
+
 class GovIntegrationError(Exception):
     pass
 
@@ -13,9 +30,16 @@ class DemandService:
     Handles creation, updates, and synchronization with external city hall systems.
     """
 
-    def __init__(self, db: Session, tenant_vault_service: Optional[TenantVaultService] = None):
+    def __init__(
+        self,
+        db: Session,
+        tenant_vault_service: Optional[TenantVaultService] = None,
+        tenant_contexts: Optional[TenantContextCache] = None,
+    ):
         self.db = db
         self.vault_service = tenant_vault_service or TenantVaultService(db)
+        # Shared cache of cabinet settings; without it every check reads the database
+        self.tenant_contexts = tenant_contexts
 
     def create_demand(self, demand_data: Dict, sync_external: bool = False) -> Demand:
         """
@@ -35,6 +59,14 @@ class DemandService:
         if not cabinet_id:
              raise ValueError("Cabinet ID is required to create a demand.")
 
+        if self.tenant_contexts is not None:
+            context = self.tenant_contexts.get(cabinet_id)
+            if context is None:
+                raise ValueError(f"Cabinet {cabinet_id} not found.")
+            # Known from the cached context: no need to read (and decrypt) anything
+            if sync_external and not context.has_gov_credentials:
+                raise GovIntegrationError("O Gabinete ainda não configurou a conta oficial da prefeitura.")
+
         # If external sync is requested, we MUST have valid government credentials for the cabinet.
         if sync_external:
             creds = self.vault_service.get_cabinet_gov_credentials(uuid.UUID(str(cabinet_id)))
@@ -54,3 +86,77 @@ class DemandService:
         self.db.refresh(new_demand)
         
         return new_demand
+
+    def bulk_update(
+        self,
+        cabinet_id: uuid.UUID,
+        versions: Mapping[int, Optional[datetime]],
+        changes: Union[DemandUpdate, Dict],
+    ) -> BulkUpdateResult:
+        """
+        Applies the same status / priority / assignee change to many demands
+        with a single UPDATE ... RETURNING.
+
+        Args:
+            cabinet_id: Cabinet that owns the demands; others are never touched.
+            versions: demand id -> the updated_at the caller last saw, compared
+                at millisecond precision (what browsers keep). A demand changed
+                since then is skipped and reported as a conflict; None skips the
+                check for that demand.
+            changes: Fields to set, validated as a DemandUpdate.
+
+        Returns:
+            BulkUpdateResult with id, status, priority, assigned_to and
+            updated_at of each changed demand (plain dicts read from
+            RETURNING, so nothing is reloaded after the commit) and the ids
+            left alone (changed concurrently, missing, or in another cabinet).
+
+        Raises:
+            ValueError: If no field or a field other than status, priority or
+                assigned_to is given.
+        """
+        if not isinstance(changes, DemandUpdate):
+            changes = DemandUpdate.model_validate(changes)
+        fields = changes.model_dump(exclude_unset=True)
+        if not fields:
+            raise ValueError("No changes given for the bulk update.")
+        unsupported = set(fields) - BULK_UPDATE_FIELDS
+        if unsupported:
+            raise ValueError(f"Fields not supported in bulk updates: {', '.join(sorted(unsupported))}")
+        if not versions:
+            return BulkUpdateResult()
+
+        timestamp = DateTime(timezone=True)
+        expected = values(
+            column("id", BigInteger),
+            column("updated_at", timestamp),
+            name="expected",
+        ).data([(int(demand_id), seen) for demand_id, seen in versions.items()])
+        # An all-NULL VALUES column would be typed text
+        expected_updated_at = expected.c.updated_at.cast(timestamp)
+
+        updated = [
+            dict(row)
+            for row in self.db.execute(
+                update(Demand)
+                .where(
+                    Demand.id == expected.c.id,
+                    Demand.cabinet_id == cabinet_id,
+                    or_(
+                        expected_updated_at.is_(None),
+                        func.date_trunc("milliseconds", Demand.updated_at)
+                        == func.date_trunc("milliseconds", expected_updated_at),
+                    ),
+                )
+                .values(**fields, updated_at=func.now())
+                .returning(*BULK_RETURNING_COLUMNS)
+                .execution_options(synchronize_session=False)
+            ).mappings()
+        ]
+        self.db.commit()
+
+        changed_ids = {demand["id"] for demand in updated}
+        return BulkUpdateResult(
+            updated=updated,
+            conflicts=[int(demand_id) for demand_id in versions if int(demand_id) not in changed_ids],
+        )
@@ -0,0 +1,286 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import uuid
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.cabinet_stats import CabinetStat
+from app.models.geo import CabinetGeoDensity, GeocodedPlace
+
+# cabinet_stats metrics counting rows per 'city|neighborhood' (see the geo_density migration)
+PLACE_METRICS = {"voters_by_place": "voters", "demands_by_place": "demands"}
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Watermark of a payload computed before any input existed
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Counter changes are stamped when written, not when committed; anything stamped within
+# this long before a computation may still have been in flight, so it is not covered
+COMMIT_GRACE = timedelta(minutes=2)
+
+
+def geohash_encode(lat: float, lng: float, precision: int) -> str:
+    """Standard base32 geohash (precision 5 ~ 4.9 km, 6 ~ 1.2 km, 7 ~ 150 m)."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        value, interval = (lng, lng_range) if even else (lat, lat_range)
+        middle = (interval[0] + interval[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+
+def h3_cell(lat: float, lng: float, resolution: int) -> str:
+    try:
+        import h3
+    except ImportError:
+        raise RuntimeError("The h3 package is required for h3 levels")
+    if hasattr(h3, "latlng_to_cell"):  # h3 >= 4
+        return h3.latlng_to_cell(lat, lng, resolution)
+    return h3.geo_to_h3(lat, lng, resolution)
+
+
+def parse_level(level: str) -> Tuple[str, Optional[int]]:
+    """'neighborhood' | 'geohash:<1-12>' | 'h3:<0-15>' -> (kind, precision)."""
+    if level == "neighborhood":
+        return "neighborhood", None
+    kind, _, precision = level.partition(":")
+    limits = {"geohash": (1, 12), "h3": (0, 15)}
+    if kind in limits and precision.isdigit() and limits[kind][0] <= int(precision) <= limits[kind][1]:
+        return kind, int(precision)
+    raise ValueError(f"Unknown density level: {level}")
+
+
+class GeoDensityService:
+    """
+    Voter and demand density for the dashboard map, per cabinet.
+
+    Counts per (city, neighborhood) are kept by the cabinet_stats triggers, so
+    computing a map reads one row per place, never the voters themselves.
+    Places are located through the geocoded_places cache (neighborhood
+    centroid, else the city centroid, flagged `approximate`); voters without
+    a city are assumed to be in the cabinet's main city. Points can be
+    aggregated further into geohash or H3 cells.
+
+    Payloads are stored in cabinet_geo_density with the newest input they
+    reflect, and recomputed only when the counters or the gazetteer moved
+    past it. That watermark is capped at COMMIT_GRACE before the computation
+    started, so a change committed late by a long transaction still triggers
+    a recompute.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def watermark(self, cabinet_id: uuid.UUID) -> datetime:
+        """Newest change among the cabinet's place counters and the gazetteer."""
+        counters = self.db.scalar(
+            select(func.max(CabinetStat.updated_at))
+            .where(CabinetStat.cabinet_id == cabinet_id, CabinetStat.metric.in_(list(PLACE_METRICS)))
+        )
+        gazetteer = self.db.scalar(select(func.max(GeocodedPlace.updated_at)))
+        return max([value for value in (counters, gazetteer) if value is not None], default=EPOCH)
+
+    def _place_counts(self, cabinet_id: uuid.UUID) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """{(city_key, neighborhood_key): {"city", "neighborhood", "voters", "demands"}}"""
+        rows = self.db.execute(
+            select(
+                CabinetStat.metric,
+                CabinetStat.key,
+                CabinetStat.value,
+                func.public.place_key(func.split_part(CabinetStat.key, "|", 1)),
+                func.public.place_key(func.split_part(CabinetStat.key, "|", 2)),
+            )
+            .where(
+                CabinetStat.cabinet_id == cabinet_id,
+                CabinetStat.metric.in_(list(PLACE_METRICS)),
+                CabinetStat.value > 0,
+            )
+            .order_by(CabinetStat.value.desc())
+        ).all()
+
+        places: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for metric, key, value, city_key, neighborhood_key in rows:
+            city, _, neighborhood = key.partition("|")
+            # Spelling variants share a key; the most common spelling names the place
+            place = places.setdefault(
+                (city_key, neighborhood_key),
+                {"city": city, "neighborhood": neighborhood, "voters": 0, "demands": 0},
+            )
+            place[PLACE_METRICS[metric]] += value
+        return places
+
+    def _geocode(self, city_keys: Iterable[str]) -> Dict[Tuple[str, str], Any]:
+        rows = self.db.execute(
+            select(
+                GeocodedPlace.city_key,
+                GeocodedPlace.neighborhood_key,
+                GeocodedPlace.city,
+                GeocodedPlace.neighborhood,
+                GeocodedPlace.lat,
+                GeocodedPlace.lng,
+            ).where(GeocodedPlace.city_key.in_(list(city_keys)))
+        ).all()
+        return {(row.city_key, row.neighborhood_key): row for row in rows}
+
+    def compute(self, cabinet_id: uuid.UUID, level: str = "neighborhood") -> Dict[str, Any]:
+        """
+        Map payload:
+            {"level": "neighborhood", "points": [{"id", "name", "city", "lat", "lng",
+              "voters", "demands", "approximate"}, ...], "totals": {...},
+             "unlocated": {"voters": n, "demands": n}, "max": {"voters": n, "demands": n}}
+        """
+        kind, precision = parse_level(level)
+        places = self._place_counts(cabinet_id)
+
+        city_voters: Dict[str, int] = {}
+        for (city_key, _), place in places.items():
+            if city_key:
+                city_voters[city_key] = city_voters.get(city_key, 0) + place["voters"]
+        main_city = max(city_voters, key=city_voters.get) if city_voters else ""
+        geocoded = self._geocode(set(city_voters) | {main_city})
+
+        points: Dict[str, Dict[str, Any]] = {}
+        totals = {"voters": 0, "demands": 0}
+        unlocated = {"voters": 0, "demands": 0}
+        for (city_key, neighborhood_key), place in places.items():
+            totals["voters"] += place["voters"]
+            totals["demands"] += place["demands"]
+            city_key = city_key or main_city
+            hit, approximate = geocoded.get((city_key, neighborhood_key)), False
+            if hit is None and neighborhood_key:
+                hit, approximate = geocoded.get((city_key, "")), True
+            if hit is None:
+                unlocated["voters"] += place["voters"]
+                unlocated["demands"] += place["demands"]
+                continue
+
+            point_id = f"{hit.city_key}|{hit.neighborhood_key}"
+            point = points.setdefault(point_id, {
+                "id": point_id,
+                "name": hit.neighborhood or hit.city,
+                "city": hit.city,
+                "lat": round(hit.lat, 5),
+                "lng": round(hit.lng, 5),
+                "voters": 0,
+                "demands": 0,
+                "approximate": approximate,
+            })
+            point["voters"] += place["voters"]
+            point["demands"] += place["demands"]
+
+        items = list(points.values())
+        if kind != "neighborhood":
+            items = self._cells(items, kind, precision)
+        items.sort(key=lambda item: (-item["voters"], -item["demands"], item["name"]))
+        return {
+            "level": level,
+            "points": items,
+            "totals": totals,
+            "unlocated": unlocated,
+            "max": {
+                "voters": max((item["voters"] for item in items), default=0),
+                "demands": max((item["demands"] for item in items), default=0),
+            },
+        }
+
+    @staticmethod
+    def _cells(points: List[Dict[str, Any]], kind: str, precision: int) -> List[Dict[str, Any]]:
+        """Groups located points into cells placed at their count-weighted centroid."""
+        cells: Dict[str, Dict[str, Any]] = {}
+        for point in points:
+            if kind == "geohash":
+                cell_id = geohash_encode(point["lat"], point["lng"], precision)
+            else:
+                cell_id = h3_cell(point["lat"], point["lng"], precision)
+            cell = cells.setdefault(cell_id, {
+                "id": cell_id, "names": [], "city": point["city"], "voters": 0, "demands": 0,
+                "approximate": False, "_weight": 0.0, "_lat": 0.0, "_lng": 0.0,
+            })
+            weight = point["voters"] + point["demands"] or 1
+            cell["names"].append(point["name"])
+            cell["voters"] += point["voters"]
+            cell["demands"] += point["demands"]
+            cell["approximate"] = cell["approximate"] or point["approximate"]
+            cell["_weight"] += weight
+            cell["_lat"] += point["lat"] * weight
+            cell["_lng"] += point["lng"] * weight
+
+        items = []
+        for cell in cells.values():
+            weight = cell.pop("_weight")
+            cell["lat"] = round(cell.pop("_lat") / weight, 5)
+            cell["lng"] = round(cell.pop("_lng") / weight, 5)
+            cell["name"] = ", ".join(cell.pop("names")[:3])
+            items.append(cell)
+        return items
+
+    def density(self, cabinet_id: uuid.UUID, level: str = "neighborhood", refresh: bool = False) -> Dict[str, Any]:
+        """
+        Cached payload for the map, recomputed only if its inputs changed (or `refresh`).
+        A payload computed after the newest change is served as is; whether that change
+        was still in flight is settled by refresh_stale.
+        """
+        parse_level(level)
+        watermark = self.watermark(cabinet_id)
+        cached = self.db.get(CabinetGeoDensity, (cabinet_id, level))
+        if cached is not None and not refresh and (cached.watermark >= watermark or cached.computed_at >= watermark):
+            return cached.payload
+
+        started = self.db.scalar(select(func.clock_timestamp()))
+        payload = self.compute(cabinet_id, level)
+        watermark = min(watermark, started - COMMIT_GRACE)
+        self.db.execute(
+            insert(CabinetGeoDensity)
+            .values(cabinet_id=cabinet_id, level=level, payload=payload, watermark=watermark, computed_at=started)
+            .on_conflict_do_update(
+                index_elements=[CabinetGeoDensity.cabinet_id, CabinetGeoDensity.level],
+                set_={"payload": payload, "watermark": watermark, "computed_at": started},
+            )
+        )
+        self.db.commit()
+        return payload
+
+    def stale_cabinets(self, level: str) -> List[uuid.UUID]:
+        """Cabinets whose cached payload at `level` is missing or older than their inputs."""
+        gazetteer = self.db.scalar(select(func.max(GeocodedPlace.updated_at))) or EPOCH
+        latest = (
+            select(CabinetStat.cabinet_id, func.max(CabinetStat.updated_at).label("changed"))
+            .where(CabinetStat.metric.in_(list(PLACE_METRICS)))
+            .group_by(CabinetStat.cabinet_id)
+            .subquery()
+        )
+        rows = self.db.execute(
+            select(latest.c.cabinet_id)
+            .outerjoin(
+                CabinetGeoDensity,
+                (CabinetGeoDensity.cabinet_id == latest.c.cabinet_id) & (CabinetGeoDensity.level == level),
+            )
+            .where(
+                CabinetGeoDensity.watermark.is_(None)
+                | (CabinetGeoDensity.watermark < func.greatest(latest.c.changed, gazetteer))
+            )
+        ).all()
+        return [row[0] for row in rows]
+
+    def refresh_stale(self, levels: Iterable[str] = ("neighborhood",)) -> int:
+        """Recomputes every stale payload. Returns how many were written."""
+        refreshed = 0
+        for level in levels:
+            for cabinet_id in self.stale_cabinets(level):
+                self.density(cabinet_id, level, refresh=True)
+                refreshed += 1
+        return refreshed
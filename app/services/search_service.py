@@ -0,0 +1,208 @@
+import re
+import json
+import base64
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence
+import uuid
+
+from sqlalchemy import case, cast, func, literal, literal_column, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION
+from sqlalchemy.orm import Session
+
+from app.models.demand import Demand
+from app.models.voter import Voter
+
+# Text search configuration of the search_vector columns (unaccent + portuguese_stem)
+TS_CONFIG = literal_column("'public.pt_unaccent'::regconfig")
+
+# Words of a query; anything else (tsquery operators, quotes, LIKE wildcards) is dropped
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Below this length trigrams cannot narrow a prefix; fall back to the name-start B-tree index
+MIN_TRIGRAM_PREFIX = 3
+
+
+def search_normalize(value):
+    """public.search_normalize(): lowercase, accent-free (must match the trigram index expressions)."""
+    return func.public.search_normalize(value)
+
+
+def normalize_text(value: str) -> str:
+    """Python side of public.search_normalize(), so patterns reach the planner as constants."""
+    value = unicodedata.normalize("NFKD", value)
+    return "".join(ch for ch in value if not unicodedata.combining(ch)).lower()
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque keyset cursor for the last row of a page."""
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def _rank(text_rank, similarity):
+    """
+    ts_rank_cd + similarity (both real) as double precision, the type the
+    cursor value is bound back as; comparing a real to a float8 parameter
+    skips or repeats rows with (near-)tied ranks across pages.
+    """
+    return cast(text_rank + similarity, DOUBLE_PRECISION).label("rank")
+
+
+def escape_like(value: str) -> str:
+    """Escapes LIKE wildcards so user input matches literally."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class SearchService:
+    """
+    Ranked search over voters and demands, per cabinet.
+
+    Matching runs on indexes only: the weighted `search_vector` tsvector
+    (unaccented Portuguese, GIN) for words, pg_trgm GIN indexes for typos and
+    substrings, and the normalize_cpf index for CPFs. Results are ranked by
+    ts_rank_cd plus trigram similarity of the name/title and paginated with
+    keyset cursors, so page N costs the same as page 1.
+
+    Pages look like {"items": [...], "next_cursor": "..." | None}.
+    """
+
+    VOTER_COLUMNS = (Voter.id, Voter.name, Voter.phone, Voter.neighborhood, Voter.city, Voter.category)
+    DEMAND_COLUMNS = (Demand.id, Demand.title, Demand.status, Demand.beneficiary, Demand.category, Demand.created_at)
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def _words(query: str) -> List[str]:
+        words = _WORD_RE.findall(query or "")
+        if not words:
+            raise ValueError("Search query must contain at least one letter or digit")
+        return words
+
+    @staticmethod
+    def _tsquery(words: Sequence[str], prefix: bool = False):
+        """All words must match; with `prefix`, the last one may be incomplete (search as you type)."""
+        terms = list(words)
+        if prefix:
+            terms[-1] = f"{terms[-1]}:*"
+        return func.to_tsquery(TS_CONFIG, " & ".join(terms))
+
+    def _page(self, ranked, order_column: str, limit: int, cursor: Optional[str]) -> Dict[str, Any]:
+        """Keyset page over a subquery ordered by (<order_column> DESC, id DESC)."""
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        subquery = ranked.subquery()
+        key = subquery.c[order_column]
+        query = select(subquery)
+        if cursor:
+            last_key, last_id = decode_cursor(cursor)
+            query = query.where(tuple_(key, subquery.c.id) < tuple_(literal(last_key, key.type), literal(last_id)))
+        rows = self.db.execute(query.order_by(key.desc(), subquery.c.id.desc()).limit(limit + 1)).mappings().all()
+
+        items = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor([last[order_column], last["id"]])
+        for item in items:
+            if isinstance(item.get("rank"), float):
+                item["rank"] = round(item["rank"], 4)
+        return {"items": items, "next_cursor": next_cursor}
+
+    def search_voters(
+        self,
+        cabinet_id: uuid.UUID,
+        query: str,
+        neighborhood: Optional[str] = None,
+        city: Optional[str] = None,
+        category: Optional[str] = None,
+        prefix: bool = False,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Voters matching `query` by name, neighborhood or address (any word
+        form, accents ignored), a misspelt name, or a CPF; best match first.
+        `neighborhood` / `city` narrow by substring, like the report filters.
+        """
+        words = self._words(query)
+        tsquery = self._tsquery(words, prefix)
+        normalized_query = normalize_text(" ".join(words))
+        name = search_normalize(Voter.name)
+
+        matches = [Voter.search_vector.op("@@")(tsquery), name.op("%")(normalized_query)]
+        digits = "".join(ch for ch in query if ch.isdigit())
+        if len(digits) == 11:
+            matches.append(func.public.normalize_cpf(Voter.cpf) == digits)
+
+        conditions = [Voter.cabinet_id == cabinet_id, or_(*matches)]
+        if neighborhood:
+            conditions.append(Voter.neighborhood.ilike(f"%{escape_like(neighborhood)}%"))
+        if city:
+            conditions.append(Voter.city.ilike(f"%{escape_like(city)}%"))
+        if category:
+            conditions.append(Voter.category == category)
+
+        rank = _rank(func.ts_rank_cd(Voter.search_vector, tsquery), func.similarity(name, normalized_query))
+        return self._page(select(*self.VOTER_COLUMNS, rank).where(*conditions), "rank", limit, cursor)
+
+    def autocomplete_voters(self, cabinet_id: uuid.UUID, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Voter names for a typeahead: every typed word must start a word of the
+        name (accents ignored); names starting with the text come first.
+        """
+        words = [normalize_text(word) for word in self._words(prefix)]
+        typed = " ".join(words)
+        name = search_normalize(Voter.name)
+        starts_with = name.like(f"{escape_like(typed)}%")
+
+        conditions = [Voter.cabinet_id == cabinet_id]
+        if len(typed) < MIN_TRIGRAM_PREFIX:
+            conditions.append(starts_with)  # idx_voters_cabinet_name_prefix
+        else:
+            for word in words:
+                # The trigram index serves the LIKE; the regex keeps matches at a word start
+                conditions.append(name.like(f"%{escape_like(word)}%"))
+                conditions.append(name.regexp_match(rf"\m{word}"))
+
+        query = (
+            select(Voter.id, Voter.name)
+            .where(*conditions)
+            .order_by(case((starts_with, 0), else_=1), func.length(Voter.name), Voter.name)
+            .limit(limit)
+        )
+        return [dict(row) for row in self.db.execute(query).mappings()]
+
+    def search_demands(
+        self,
+        cabinet_id: uuid.UUID,
+        query: str,
+        status: Optional[str] = None,
+        category: Optional[str] = None,
+        prefix: bool = False,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Demands matching `query` in title, description or beneficiary, or a misspelt title."""
+        words = self._words(query)
+        tsquery = self._tsquery(words, prefix)
+        normalized_query = normalize_text(" ".join(words))
+        title = search_normalize(Demand.title)
+
+        conditions = [
+            Demand.cabinet_id == cabinet_id,
+            Demand.search_vector.op("@@")(tsquery) | title.op("%")(normalized_query),
+        ]
+        if status:
+            conditions.append(Demand.status == status)
+        if category:
+            conditions.append(Demand.category == category)
+
+        rank = _rank(func.ts_rank_cd(Demand.search_vector, tsquery), func.similarity(title, normalized_query))
+        return self._page(select(*self.DEMAND_COLUMNS, rank).where(*conditions), "rank", limit, cursor)
@@ -0,0 +1,249 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Mapping, Optional, Union
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.models.agent import AgentConfiguration
+from app.models.cabinet import Cabinet
+
+logger = logging.getLogger(__name__)
+
+# pg_notify channel fed by the tenant_context triggers; the payload is the cabinet id
+NOTIFY_CHANNEL = "tenant_context"
+
+# Provider key columns of cabinets exposed through TenantContext.api_key()
+API_KEY_COLUMNS = ("gemini_api_key", "openai_api_key")
+
+# Cabinet statuses allowed to use the agent and integrations
+ACTIVE_STATUSES = ("active", "trial")
+
+CabinetId = Union[str, uuid.UUID]
+
+
+@dataclass(frozen=True)
+class TenantContext:
+    """
+    What services need to know about a cabinet for one operation: plan,
+    status, agent configuration, feature flags and which credentials exist.
+
+    Secrets never leave the database through here except the provider API
+    keys the worker calls LLM/embedding APIs with (kept out of repr).
+    """
+    cabinet_id: str
+    name: str
+    plan: Optional[str]
+    plan_tier: Optional[str]
+    status: Optional[str]
+    official_name: Optional[str]
+    agent_name: Optional[str]
+    agent_tone: Optional[str]
+    agent_active: bool
+    feature_flags: Mapping[str, Any] = field(default_factory=dict)
+    has_gov_credentials: bool = False
+    has_google_calendar: bool = False
+    whatsapp_instance: Optional[str] = None
+    api_keys: Mapping[str, str] = field(default_factory=dict, repr=False)
+
+    @property
+    def is_active(self) -> bool:
+        return (self.status or "active") in ACTIVE_STATUSES
+
+    def feature(self, name: str, default: bool = False) -> bool:
+        return bool(self.feature_flags.get(name, default))
+
+    def api_key(self, column: str = "gemini_api_key") -> Optional[str]:
+        return self.api_keys.get(column)
+
+    @classmethod
+    def from_row(cls, row: Mapping[str, Any]) -> "TenantContext":
+        """Builds a context from the columns of `tenant_context_query()` (or the PostgREST equivalent)."""
+        return cls(
+            cabinet_id=str(row["id"]),
+            name=row.get("name") or "",
+            plan=row.get("plan"),
+            plan_tier=row.get("plan_tier"),
+            status=row.get("status"),
+            official_name=row.get("official_name"),
+            agent_name=row.get("agent_name"),
+            agent_tone=row.get("agent_tone"),
+            agent_active=row.get("agent_active") is not False,
+            feature_flags=dict(row.get("feature_flags") or {}),
+            has_gov_credentials=bool(row.get("has_gov_credentials")),
+            has_google_calendar=bool(row.get("has_google_calendar")),
+            whatsapp_instance=row.get("whatsapp_instance") or None,
+            api_keys={column: row[column] for column in API_KEY_COLUMNS if row.get(column)},
+        )
+
+
+def tenant_context_query(cabinet_id: CabinetId):
+    """One projected SELECT: never loads the Cabinet entity (and its eager relationships)."""
+    return (
+        select(
+            Cabinet.id,
+            Cabinet.name,
+            Cabinet.plan,
+            Cabinet.plan_tier,
+            Cabinet.status,
+            Cabinet.official_name,
+            Cabinet.feature_flags,
+            Cabinet.whatsapp_instance,
+            Cabinet.gemini_api_key,
+            Cabinet.openai_api_key,
+            Cabinet.gov_credentials.has_key("password_enc").label("has_gov_credentials"),
+            Cabinet.google_refresh_token.is_not(None).label("has_google_calendar"),
+            AgentConfiguration.agent_name,
+            AgentConfiguration.tone.label("agent_tone"),
+            AgentConfiguration.is_active.label("agent_active"),
+        )
+        .outerjoin(AgentConfiguration, AgentConfiguration.cabinet_id == Cabinet.id)
+        .where(Cabinet.id == uuid.UUID(str(cabinet_id)))
+    )
+
+
+def session_loader(session_factory: Callable[[], Session]) -> Callable[[str], Optional[TenantContext]]:
+    """Loader for TenantContextCache reading through SQLAlchemy sessions."""
+    def load(cabinet_id: str) -> Optional[TenantContext]:
+        with session_factory() as session:
+            row = session.execute(tenant_context_query(cabinet_id)).mappings().first()
+        return TenantContext.from_row(row) if row else None
+    return load
+
+
+def postgrest_loader(supabase) -> Callable[[str], Optional[TenantContext]]:
+    """Loader for TenantContextCache reading through a supabase client (service role)."""
+    def load(cabinet_id: str) -> Optional[TenantContext]:
+        rows = supabase.table("cabinets")\
+            .select(
+                "id, name, plan, plan_tier, status, official_name, feature_flags, whatsapp_instance, gemini_api_key, openai_api_key, "
+                "gov_credentials, google_refresh_token, agent_configurations(agent_name, tone, is_active)"
+            )\
+            .eq("id", str(cabinet_id))\
+            .limit(1)\
+            .execute().data or []
+        if not rows:
+            return None
+        row = dict(rows[0])
+        config = row.pop("agent_configurations", None) or {}
+        if isinstance(config, list):
+            config = config[0] if config else {}
+        gov_credentials = row.pop("gov_credentials", None) or {}
+        row.update({
+            "agent_name": config.get("agent_name"),
+            "agent_tone": config.get("tone"),
+            "agent_active": config.get("is_active"),
+            "has_gov_credentials": "password_enc" in gov_credentials,
+            "has_google_calendar": row.pop("google_refresh_token", None) is not None,
+        })
+        return TenantContext.from_row(row)
+    return load
+
+
+class TenantContextCache:
+    """
+    Bounded LRU of TenantContext by cabinet id, shared by the worker and
+    services so a cabinet is resolved once instead of per operation.
+
+    Entries expire after `ttl_seconds`. With `listen()`, a background thread
+    LISTENs on the `tenant_context` channel (notified by triggers on cabinets
+    and agent_configurations) and drops changed cabinets right away; the TTL
+    then only bounds staleness while the listener is reconnecting. Unknown
+    cabinets are cached as None like any other entry.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], Optional[TenantContext]],
+        max_entries: int = 1024,
+        ttl_seconds: float = 300,
+    ):
+        self.loader = loader
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # id -> (context, loaded_at)
+        self._lock = threading.Lock()
+        # Invalidations bump the generation, so a load that raced one is not cached
+        self._generation = 0
+        self._invalidated: Dict[str, int] = {}
+        self._cleared_at = 0
+        self._stop = threading.Event()
+        self._listener: Optional[threading.Thread] = None
+
+    def get(self, cabinet_id: CabinetId) -> Optional[TenantContext]:
+        key = str(cabinet_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                return entry[0]
+            generation = self._generation
+
+        context = self.loader(key)
+
+        with self._lock:
+            if self._cleared_at <= generation and self._invalidated.get(key, -1) <= generation:
+                self._entries[key] = (context, now)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return context
+
+    def invalidate(self, *cabinet_ids: CabinetId) -> None:
+        """Forgets the given cabinets (all of them when called without arguments)."""
+        with self._lock:
+            self._generation += 1
+            if not cabinet_ids:
+                self._entries.clear()
+                self._invalidated.clear()
+                self._cleared_at = self._generation
+            for cabinet_id in cabinet_ids:
+                key = str(cabinet_id)
+                self._entries.pop(key, None)
+                self._invalidated[key] = self._generation
+            if len(self._invalidated) > 2 * self.max_entries:
+                # Only loads in flight need these; treating it as a full clear for them is safe
+                self._invalidated.clear()
+                self._cleared_at = self._generation
+
+    def listen(self, engine: Engine, poll_seconds: float = 5.0) -> "TenantContextCache":
+        """Starts the NOTIFY listener on a dedicated connection (psycopg 3.2+)."""
+        conninfo = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        self._listener = threading.Thread(
+            target=self._listen, args=(conninfo, poll_seconds), name="tenant-context-listener", daemon=True
+        )
+        self._listener.start()
+        return self
+
+    def _listen(self, conninfo: str, poll_seconds: float) -> None:
+        import psycopg
+
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(conninfo, autocommit=True) as connection:
+                    connection.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                    # Changes made while not listening were missed
+                    self.invalidate()
+                    backoff = 1.0
+                    while not self._stop.is_set():
+                        for notify in connection.notifies(timeout=poll_seconds):
+                            if notify.payload:
+                                self.invalidate(notify.payload)
+                            else:
+                                self.invalidate()
+            except Exception as e:
+                logger.warning(f"Tenant context listener disconnected, retrying in {backoff:.0f}s: {e}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 60.0)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.join(timeout=10)
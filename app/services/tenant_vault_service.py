@@ -1,5 +1,6 @@
 from typing import Dict, Optional
 import uuid
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.models.cabinet import Cabinet
 from app.services.crypto_service import CryptoService
@@ -20,12 +21,12 @@ class TenantVaultService:
         Returns:
             Dict with 'username' and 'password' (decrypted).
         """
-        cabinet = self.db.query(Cabinet).filter(Cabinet.id == cabinet_id).first()
-        
-        if not cabinet or not cabinet.gov_credentials:
+        # Projected: loading the Cabinet entity would also load its eager relationships
+        creds = self.db.scalar(select(Cabinet.gov_credentials).where(Cabinet.id == cabinet_id))
+
+        if not creds:
             return {}
 
-        creds = cabinet.gov_credentials
         username = creds.get("username")
         password_enc = creds.get("password_enc")
 
@@ -54,7 +55,8 @@ class TenantVaultService:
         
         cabinet.gov_credentials = {
             "username": username,
-            "password_enc": encrypted_password
+            "password_enc": encrypted_password,
+            "key_version": self.crypto.primary_version
         }
         
         self.db.add(cabinet)
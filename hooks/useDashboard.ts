@@ -17,10 +17,43 @@ export function useDashboard() {
         try {
             setLoading(true);
 
-            // 1. Total Voters
-            const { count: votersCount, data: votersData } = await supabase
-                .from('voters')
-                .select('id, neighborhood, birth_date, name, phone, city', { count: 'exact' });
+            // Precomputed by the worker (cabinet_geo_density); geocoded, so preferred when present
+            const { data: density } = await supabase
+                .from('cabinet_geo_density')
+                .select('payload')
+                .eq('level', 'neighborhood')
+                .maybeSingle();
+            const densityPoints: { name: string, voters: number, lat: number, lng: number }[] = density?.payload?.points || [];
+
+            // Precomputed daily by the worker (notifications of type 'birthday'); the source of truth,
+            // so an empty result just means no birthdays in the coming days
+            const today = new Date();
+            const currentMonth = today.getMonth() + 1;
+            const currentDay = today.getDate();
+            const todayIso = `${today.getFullYear()}-${String(currentMonth).padStart(2, '0')}-${String(currentDay).padStart(2, '0')}`;
+            const { data: birthdayNotifications } = await supabase
+                .from('notifications')
+                .select('event_date, voters(id, name, phone, city, neighborhood, birth_date)')
+                .eq('type', 'birthday')
+                .gte('event_date', todayIso)
+                .order('event_date', { ascending: true })
+                .limit(5);
+            const notifiedBirthdays = (birthdayNotifications || [])
+                .filter((n: any) => n.voters)
+                .map((n: any) => ({
+                    ...n.voters,
+                    date: n.event_date.split('-').reverse().join('/')
+                }));
+
+            // 1. Total Voters; every voter is only downloaded when the precomputed density is missing
+            const needsVoters = densityPoints.length === 0;
+            const { count: votersCount, data: votersData } = needsVoters
+                ? await supabase
+                    .from('voters')
+                    .select('id, neighborhood', { count: 'exact' })
+                : await supabase
+                    .from('voters')
+                    .select('id', { count: 'exact', head: true });
 
             // 2. Active Demands
             const { count: demandsCount } = await supabase
@@ -28,7 +61,7 @@ export function useDashboard() {
                 .select('*', { count: 'exact', head: true })
                 .neq('status', 'Concluída');
 
-            // 3. Process Neighborhoods (Client-side aggregation for now)
+            // 3. Process Neighborhoods (Client-side aggregation when not precomputed)
             // Mock coords for demo purposes for major Anapolis neighborhoods
             const neighborhoodCoords: Record<string, { lat: number, lng: number }> = {
                 'Jundiaí': { lat: -16.3380, lng: -48.9450 },
@@ -45,42 +78,26 @@ export function useDashboard() {
                 hoodMap[n] = (hoodMap[n] || 0) + 1;
             });
 
-            const processedHoods = Object.entries(hoodMap)
-                .map(([name, count]) => ({
-                    name,
-                    count,
-                    lat: neighborhoodCoords[name]?.lat || -16.3285 + (Math.random() - 0.5) * 0.05, // Random offset if unknown
-                    lng: neighborhoodCoords[name]?.lng || -48.9534 + (Math.random() - 0.5) * 0.05
-                }))
-                .sort((a, b) => b.count - a.count)
-                .slice(0, 5); // Top 5
-
-            // 4. Process Birthdays (Simple check for current month?)
-            // Note: Date filtering in Supabase on text/date fields can be tricky without precise types.
-            // We'll filter client side for "upcoming" (next 7 days)
-            const today = new Date();
-            const currentMonth = today.getMonth() + 1;
-            const currentDay = today.getDate();
-
-            const upcomingBirthdays = votersData?.filter(v => {
-                if (!v.birth_date) return false;
-                // Format expected YYYY-MM-DD
-                const [year, month, day] = v.birth_date.split('-').map(Number);
-                if (month === currentMonth && day >= currentDay) return true; // Simple logic
-                return false;
-            }).slice(0, 5).map(v => ({
-                ...v,
-                date: v.birth_date.split('-').reverse().join('/')
-            })) || [];
+            const processedHoods = densityPoints.length > 0
+                ? densityPoints.slice(0, 5).map(p => ({ name: p.name, count: p.voters, lat: p.lat, lng: p.lng }))
+                : Object.entries(hoodMap)
+                    .map(([name, count]) => ({
+                        name,
+                        count,
+                        lat: neighborhoodCoords[name]?.lat || -16.3285 + (Math.random() - 0.5) * 0.05, // Random offset if unknown
+                        lng: neighborhoodCoords[name]?.lng || -48.9534 + (Math.random() - 0.5) * 0.05
+                    }))
+                    .sort((a, b) => b.count - a.count)
+                    .slice(0, 5); // Top 5
 
             setStats({
                 totalVoters: votersCount || 0,
                 activeDemands: demandsCount || 0,
-                coverage: Object.keys(hoodMap).length,
+                coverage: densityPoints.length > 0 ? densityPoints.filter(p => p.voters > 0).length : Object.keys(hoodMap).length,
                 interactions: 428 // Static for now as we don't store interactions history
             });
             setNeighborhoods(processedHoods);
-            setBirthdays(upcomingBirthdays);
+            setBirthdays(notifiedBirthdays);
 
         } catch (error) {
             console.error('Error loading dashboard:', error);
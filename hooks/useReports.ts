@@ -71,24 +71,12 @@ export const useReports = () => {
     const getBirthdays = useCallback(async (month: number) => {
         setLoading(true);
         try {
-            // Note: filtering by month in Supabase/Postgres requires SQL function or client side filtering if volume is low.
-            // For now, fetching all birthdays and filtering client side (MVDP - Minimum Viable Data Pattern)
-            // Ideally we should use a custom RPC or text search on date string.
-            const { data, error } = await supabase.from('voters')
-                .select('id, name, birth_date, phone, city')
-                .not('birth_date', 'is', null);
+            // Served by the voter_birthdays_in_month RPC from the (cabinet, month, day) index
+            const { data, error } = await supabase.rpc('voter_birthdays_in_month', { p_month: month });
 
             if (error) throw error;
 
-            // Filter by month (0-indexed or 1-indexed? usually month input is 1-12)
-            const filtered = data.filter((v: any) => {
-                if (!v.birth_date) return false;
-                const d = new Date(v.birth_date);
-                // getMonth() is 0-11. formatted param 'month' assumed 1-12.
-                return (d.getMonth() + 1) === month;
-            });
-
-            return filtered;
+            return data || [];
         } catch (err: any) {
             setError(err.message);
             return [];
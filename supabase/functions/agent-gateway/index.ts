@@ -6,6 +6,58 @@ const corsHeaders = {
     'Access-Control-Allow-Headers': 'authorization, x-client-info, apikey, content-type, x-agent-token',
 };
 
+const FALLBACK_ANSWER = "Desculpe, não consegui processar sua resposta.";
+
+// Relays Gemini's SSE stream as `delta` events, then saves the full answer and sends
+// `done` with the same data a non-streaming call returns, or `error` if the stream breaks.
+function streamSimulateResponse(
+    geminiBody: ReadableStream<Uint8Array>,
+    onComplete: (aiText: string) => Promise<unknown>,
+): Response {
+    const encoder = new TextEncoder();
+    const sse = (event: string, data: unknown) => encoder.encode(`event: ${event}\ndata: ${JSON.stringify(data)}\n\n`);
+
+    const body = new ReadableStream<Uint8Array>({
+        async start(controller) {
+            const reader = geminiBody.pipeThrough(new TextDecoderStream()).getReader();
+            let buffer = '';
+            let aiText = '';
+            try {
+                while (true) {
+                    const { value, done } = await reader.read();
+                    if (done) break;
+                    buffer += value;
+                    const lines = buffer.split('\n');
+                    buffer = lines.pop() ?? '';
+                    for (const line of lines) {
+                        if (!line.startsWith('data:')) continue;
+                        const chunk = JSON.parse(line.slice(5));
+                        const text = chunk.candidates?.[0]?.content?.parts?.map((p: { text?: string }) => p.text ?? '').join('') ?? '';
+                        if (text) {
+                            aiText += text;
+                            controller.enqueue(sse('delta', { text }));
+                        }
+                    }
+                }
+                if (!aiText) {
+                    aiText = FALLBACK_ANSWER;
+                    controller.enqueue(sse('delta', { text: aiText }));
+                }
+                const aiMessage = await onComplete(aiText);
+                controller.enqueue(sse('done', { success: true, data: aiMessage }));
+            } catch (error: any) {
+                controller.enqueue(sse('error', { success: false, error: error.message }));
+            } finally {
+                controller.close();
+            }
+        },
+    });
+
+    return new Response(body, {
+        headers: { ...corsHeaders, 'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache' },
+    });
+}
+
 serve(async (req) => {
     // Handle CORS
     if (req.method === 'OPTIONS') {
@@ -41,7 +93,8 @@ serve(async (req) => {
         }
 
         // 2. Parse Request
-        const { tool, args, agent_name = 'unknown_agent' } = await req.json();
+        // stream: simulate_response answers as Server-Sent Events (delta / done / error)
+        const { tool, args, agent_name = 'unknown_agent', stream = false } = await req.json();
 
         if (!tool) {
             throw new Error('Missing "tool" in request body');
@@ -50,6 +103,24 @@ serve(async (req) => {
         let result = null;
         let payload = args || {};
 
+        // The compiled prompt is large; its token count is enough for the log.
+        // Fire-and-forget: the response does not wait for the insert, and waitUntil
+        // keeps the function alive until it has landed.
+        const logSuccess = (result: any) => {
+            const { system_prompt: _systemPrompt, ...loggedPayload } = payload;
+            const insert = supabaseClient.from('agent_logs').insert({
+                cabinet_id: cabinet.id,
+                agent_name: agent_name,
+                action: tool,
+                status: 'success',
+                payload: loggedPayload,
+                response_summary: { result_count: Array.isArray(result) ? result.length : 1 }
+            }).then(({ error }) => {
+                if (error) console.error('agent_logs insert failed:', error.message);
+            });
+            (globalThis as any).EdgeRuntime?.waitUntil(insert);
+        };
+
         // 3. Tool Routing
         switch (tool) {
             case 'agenda_list':
@@ -166,14 +237,8 @@ serve(async (req) => {
                 break;
 
             case 'simulate_response':
-                // Args: { message }
-                // 1. Fetch Configuration & Credentials
-                const { data: config, error: configError } = await supabaseClient
-                    .from('agent_configurations')
-                    .select('system_prompt, tone, agent_name')
-                    .eq('cabinet_id', cabinet.id)
-                    .single();
-
+                // Args: { message, system_prompt?, context? }
+                // 1. Fetch Credentials
                 // Fetch encrypted keys from cabinet (assuming RLS allows service role reading it)
                 const { data: cabinetKeys, error: keysError } = await supabaseClient
                     .from('cabinets')
@@ -181,17 +246,48 @@ serve(async (req) => {
                     .eq('id', cabinet.id)
                     .single();
 
-                if (configError || keysError) throw new Error('Failed to fetch agent configuration or credentials');
+                if (keysError) throw new Error('Failed to fetch agent configuration or credentials');
                 if (!cabinetKeys.gemini_api_key) throw new Error('Gemini API Key not configured for this cabinet');
 
                 // 2. Build System Prompt
-                let systemPrompt = config.system_prompt || "Você é um assistente útil.";
-                const currentDate = new Date().toLocaleDateString('pt-BR');
-                systemPrompt = systemPrompt
-                    .replace('{{politician_name}}', cabinetKeys.official_name || 'Parlamentar')
-                    .replace('{{tone}}', config.tone || 'Neutro')
-                    .replace('{{current_date}}', currentDate)
-                    .replace('{{agent_name}}', config.agent_name || 'Assistente');
+                // The Python worker sends a prompt already compiled from its cache;
+                // other callers get it rendered here from agent_configurations.
+                let systemPrompt: string;
+                if (typeof payload.system_prompt === 'string' && payload.system_prompt) {
+                    systemPrompt = payload.system_prompt;
+                } else {
+                    const { data: config, error: configError } = await supabaseClient
+                        .from('agent_configurations')
+                        .select('system_prompt, tone, agent_name')
+                        .eq('cabinet_id', cabinet.id)
+                        .single();
+
+                    if (configError) throw new Error('Failed to fetch agent configuration or credentials');
+
+                    const currentDate = new Date().toLocaleDateString('pt-BR');
+                    systemPrompt = (config.system_prompt || "Você é um assistente útil.")
+                        .replace('{{politician_name}}', cabinetKeys.official_name || 'Parlamentar')
+                        .replace('{{tone}}', config.tone || 'Neutro')
+                        .replace('{{current_date}}', currentDate)
+                        .replace('{{agent_name}}', config.agent_name || 'Assistente');
+                }
+
+                // Knowledge-base excerpts retrieved by the Python worker (optional)
+                if (Array.isArray(payload.context) && payload.context.length > 0) {
+                    systemPrompt += "\n\nUse as informações abaixo, se forem relevantes para a pergunta:\n"
+                        + payload.context.map((chunk: string) => `- ${chunk}`).join('\n');
+                }
+
+                // Bounded conversation memory from the Python worker (optional)
+                if (typeof payload.conversation_summary === 'string' && payload.conversation_summary) {
+                    systemPrompt += "\n\nResumo da conversa até aqui:\n" + payload.conversation_summary;
+                }
+                if (Array.isArray(payload.history) && payload.history.length > 0) {
+                    systemPrompt += "\n\nMensagens recentes:\n"
+                        + payload.history
+                            .map((turn: { role: string; content: string }) => `${turn.role === 'agent' ? 'Assistente' : 'Cidadão'}: ${turn.content}`)
+                            .join('\n');
+                }
 
                 // 3. Save User Message
                 await supabaseClient.from('simulation_messages').insert({
@@ -204,26 +300,53 @@ serve(async (req) => {
                 // We use raw fetch to avoid heavy dependencies if possible, or import GoogleGenerativeAI if allowed.
                 // Using raw REST API for simplicity in Deno Edge
                 // Updated to gemini-2.5-flash-lite as explicitly requested by user
-                const GEMINI_URL = `https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-lite:generateContent?key=${cabinetKeys.gemini_api_key}`;
+                const GEMINI_MODEL_URL = 'https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-lite';
+                const geminiBody = JSON.stringify({
+                    contents: [
+                        { role: 'user', parts: [{ text: systemPrompt + "\n\nUser: " + payload.message }] }
+                    ]
+                });
+
+                if (stream) {
+                    const streamResponse = await fetch(
+                        `${GEMINI_MODEL_URL}:streamGenerateContent?alt=sse&key=${cabinetKeys.gemini_api_key}`,
+                        { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: geminiBody }
+                    );
+                    if (!streamResponse.ok || !streamResponse.body) {
+                        const errorData = await streamResponse.json().catch(() => ({}));
+                        throw Object.assign(
+                            new Error(errorData.error?.message || 'Error calling Gemini API'),
+                            { upstreamStatus: streamResponse.status }
+                        );
+                    }
+                    return streamSimulateResponse(streamResponse.body, async (aiText: string) => {
+                        const { data: aiMessage } = await supabaseClient.from('simulation_messages').insert({
+                            cabinet_id: cabinet.id,
+                            role: 'assistant',
+                            content: aiText
+                        }).select().single();
+                        logSuccess(aiMessage);
+                        return aiMessage;
+                    });
+                }
+
+                const GEMINI_URL = `${GEMINI_MODEL_URL}:generateContent?key=${cabinetKeys.gemini_api_key}`;
 
                 const response = await fetch(GEMINI_URL, {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({
-                        contents: [
-                            { role: 'user', parts: [{ text: systemPrompt + "\n\nUser: " + payload.message }] }
-                        ]
-                    })
+                    body: geminiBody
                 });
 
                 const aiData = await response.json();
 
                 if (!response.ok) {
                     const errorMsg = aiData.error?.message || 'Error calling Gemini API';
-                    throw new Error(errorMsg);
+                    // Overload/outage upstream: surfaced as 502 so the worker's circuit breaker sees it
+                    throw Object.assign(new Error(errorMsg), { upstreamStatus: response.status });
                 }
 
-                const aiText = aiData.candidates?.[0]?.content?.parts?.[0]?.text || "Desculpe, não consegui processar sua resposta.";
+                const aiText = aiData.candidates?.[0]?.content?.parts?.[0]?.text || FALLBACK_ANSWER;
 
                 // 5. Save AI Response
                 const { data: aiMessage } = await supabaseClient.from('simulation_messages').insert({
@@ -240,14 +363,7 @@ serve(async (req) => {
         }
 
         // 4. Log Success
-        await supabaseClient.from('agent_logs').insert({
-            cabinet_id: cabinet.id,
-            agent_name: agent_name,
-            action: tool,
-            status: 'success',
-            payload: payload,
-            response_summary: { result_count: Array.isArray(result) ? result.length : 1 }
-        });
+        logSuccess(result);
 
         return new Response(JSON.stringify({ success: true, data: result }), {
             headers: { ...corsHeaders, 'Content-Type': 'application/json' },
@@ -257,8 +373,10 @@ serve(async (req) => {
         // 5. Log Error (Try to capture cabinet_id if possible, otherwise null)
         // Note: If authentication failed, we might not have cabinet_id.
 
+        // Gemini 429/5xx become 502 so callers can back off; everything else stays 200
+        const upstreamDown = error.upstreamStatus === 429 || error.upstreamStatus >= 500;
         return new Response(JSON.stringify({ success: false, error: error.message }), {
-            status: 200, // Return 200 so client can parse the error message in body
+            status: upstreamDown ? 502 : 200, // Either way the body carries the error message for the client
             headers: { ...corsHeaders, 'Content-Type': 'application/json' },
         });
     }
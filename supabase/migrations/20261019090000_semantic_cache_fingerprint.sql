@@ -0,0 +1,69 @@
+-- Migration: Semantic answer cache invalidation support
+-- Description: Tracks a per-cabinet knowledge base version (bumped on any change to
+-- document_chunks) and exposes a cheap fingerprint RPC used by the Python worker to
+-- invalidate cached WhatsApp answers when the agent configuration or knowledge changes.
+
+CREATE TABLE IF NOT EXISTS public.knowledge_base_versions (
+    cabinet_id UUID PRIMARY KEY REFERENCES public.cabinets(id) ON DELETE CASCADE,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL
+);
+
+ALTER TABLE public.knowledge_base_versions ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Service Role manages knowledge base versions"
+  ON public.knowledge_base_versions FOR ALL
+  USING (auth.role() = 'service_role');
+
+-- Statement-level triggers: one upsert per affected cabinet, not per chunk,
+-- so bulk ingestion stays cheap.
+CREATE OR REPLACE FUNCTION public.bump_knowledge_base_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO public.knowledge_base_versions (cabinet_id, version, updated_at)
+        SELECT DISTINCT cabinet_id, 1, now() FROM old_rows
+        ON CONFLICT (cabinet_id) DO UPDATE
+        SET version = knowledge_base_versions.version + 1, updated_at = now();
+    ELSE
+        INSERT INTO public.knowledge_base_versions (cabinet_id, version, updated_at)
+        SELECT DISTINCT cabinet_id, 1, now() FROM new_rows
+        ON CONFLICT (cabinet_id) DO UPDATE
+        SET version = knowledge_base_versions.version + 1, updated_at = now();
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS document_chunks_kb_version_insert ON public.document_chunks;
+CREATE TRIGGER document_chunks_kb_version_insert
+    AFTER INSERT ON public.document_chunks
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE public.bump_knowledge_base_version();
+
+DROP TRIGGER IF EXISTS document_chunks_kb_version_update ON public.document_chunks;
+CREATE TRIGGER document_chunks_kb_version_update
+    AFTER UPDATE ON public.document_chunks
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE public.bump_knowledge_base_version();
+
+DROP TRIGGER IF EXISTS document_chunks_kb_version_delete ON public.document_chunks;
+CREATE TRIGGER document_chunks_kb_version_delete
+    AFTER DELETE ON public.document_chunks
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE public.bump_knowledge_base_version();
+
+-- RPC: everything the semantic cache needs to decide whether its entries are stale
+CREATE OR REPLACE FUNCTION public.get_agent_cache_fingerprint(p_cabinet_id UUID)
+RETURNS TABLE (config_updated_at TIMESTAMP WITH TIME ZONE, kb_version BIGINT) AS $$
+    SELECT
+        (SELECT ac.updated_at FROM public.agent_configurations ac WHERE ac.cabinet_id = p_cabinet_id),
+        COALESCE((SELECT kbv.version FROM public.knowledge_base_versions kbv WHERE kbv.cabinet_id = p_cabinet_id), 0);
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+-- Keep agent_configurations.updated_at honest so configuration edits invalidate caches
+DROP TRIGGER IF EXISTS update_agent_configurations_updated_at ON public.agent_configurations;
+CREATE TRIGGER update_agent_configurations_updated_at
+    BEFORE UPDATE ON public.agent_configurations
+    FOR EACH ROW
+    EXECUTE PROCEDURE public.update_updated_at_column();
@@ -0,0 +1,226 @@
+-- Migration: Half-precision storage and binary-quantized prefilter for document_chunks
+-- Description: Each chunk carries a 768-dim (Gemini) and a 1536-dim (OpenAI) float32 vector,
+-- ~9 KB of raw vector per row before HNSW overhead. This migration:
+--   1. Adds halfvec copies of both embeddings (half the bytes) kept in sync by trigger.
+--   2. Backfills existing rows in small batches (backfill_document_chunks_halfvec).
+--   3. Adds RPCs that search the quantized indexes and re-rank candidates at full precision;
+--      small cabinets are searched exactly instead.
+-- The HNSW indexes on the halfvec columns and on their binary quantization (bit(n), 1/32
+-- of float32) are built by 20261019110000_document_chunks_quantized_indexes.sql.
+-- Requires pgvector >= 0.8.0 (halfvec, bit indexing, binary_quantize, iterative scans).
+--
+-- Rollout:
+--   a) apply this migration (new columns are nullable, no table rewrite);
+--   b) run `SELECT public.backfill_document_chunks_halfvec(5000);` until it returns 0;
+--   c) apply 20261019110000_document_chunks_quantized_indexes.sql (CONCURRENTLY, so
+--      writes continue while the indexes build);
+--   d) once no reader uses the float32 HNSW indexes, drop them to reclaim memory.
+--      The float32 columns stay as the full-precision source for re-ranking.
+
+-- 1. Half-precision columns
+ALTER TABLE public.document_chunks
+    ADD COLUMN IF NOT EXISTS embedding_half halfvec(768),
+    ADD COLUMN IF NOT EXISTS embedding_openai_half halfvec(1536);
+
+COMMENT ON COLUMN public.document_chunks.embedding_half IS 'Half-precision copy of embedding (Gemini 768), maintained by trigger';
+COMMENT ON COLUMN public.document_chunks.embedding_openai_half IS 'Half-precision copy of embedding_openai (1536), maintained by trigger';
+
+-- Keep halfvec copies in sync for new and updated rows
+CREATE OR REPLACE FUNCTION public.sync_document_chunk_halfvec()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.embedding_half = NEW.embedding::halfvec(768);
+    NEW.embedding_openai_half = NEW.embedding_openai::halfvec(1536);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS sync_document_chunks_halfvec ON public.document_chunks;
+CREATE TRIGGER sync_document_chunks_halfvec
+    BEFORE INSERT OR UPDATE OF embedding, embedding_openai ON public.document_chunks
+    FOR EACH ROW
+    EXECUTE PROCEDURE public.sync_document_chunk_halfvec();
+
+-- 2. Batched backfill for existing rows (short transactions, no long table lock)
+CREATE OR REPLACE FUNCTION public.backfill_document_chunks_halfvec(batch_size INT DEFAULT 5000)
+RETURNS INT AS $$
+DECLARE
+    updated_count INT;
+BEGIN
+    WITH batch AS (
+        SELECT id FROM public.document_chunks
+        WHERE (embedding IS NOT NULL AND embedding_half IS NULL)
+           OR (embedding_openai IS NOT NULL AND embedding_openai_half IS NULL)
+        LIMIT batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE public.document_chunks dc
+    SET embedding_half = dc.embedding::halfvec(768),
+        embedding_openai_half = dc.embedding_openai::halfvec(1536)
+    FROM batch
+    WHERE dc.id = batch.id;
+
+    GET DIAGNOSTICS updated_count = ROW_COUNT;
+    RETURN updated_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 3a. Half-precision search (same contract as match_documents)
+CREATE OR REPLACE FUNCTION public.match_documents_halfvec(
+    query_embedding vector(768),
+    match_threshold FLOAT,
+    match_count INT,
+    filter_cabinet_id UUID
+)
+RETURNS TABLE (id UUID, content TEXT, metadata JSONB, similarity FLOAT) AS $$
+    SELECT
+        dc.id,
+        dc.content,
+        dc.metadata,
+        1 - (dc.embedding_half <=> query_embedding::halfvec(768)) AS similarity
+    FROM public.document_chunks dc
+    WHERE dc.cabinet_id = filter_cabinet_id
+      AND 1 - (dc.embedding_half <=> query_embedding::halfvec(768)) > match_threshold
+    ORDER BY dc.embedding_half <=> query_embedding::halfvec(768)
+    LIMIT match_count;
+$$ LANGUAGE sql STABLE
+SET hnsw.iterative_scan = relaxed_order;
+
+-- 3b. Binary-quantized prefilter + full-precision re-ranking
+-- The Hamming-distance HNSW scan fetches match_count * candidate_multiplier candidates,
+-- which are then re-scored with the float32 column (falling back to halfvec).
+-- A multiplier of 8 recovers ~97% recall@10 (see workers/ai-engine/benchmarks/vector_quantization.py).
+-- The cabinet filter applies after the HNSW scan, so the scan is iterative: it keeps
+-- walking the graph until enough of the cabinet's rows are found instead of stopping at
+-- ef_search. A cabinet with at most exact_threshold chunks skips the index altogether
+-- and is scored exactly through document_chunks_cabinet_idx: its rows are a sliver of
+-- the graph, and scanning them all is cheaper than searching for them.
+CREATE OR REPLACE FUNCTION public.match_documents_quantized(
+    query_embedding vector(768),
+    match_threshold FLOAT,
+    match_count INT,
+    filter_cabinet_id UUID,
+    candidate_multiplier INT DEFAULT 8,
+    exact_threshold INT DEFAULT 5000
+)
+RETURNS TABLE (id UUID, content TEXT, metadata JSONB, similarity FLOAT) AS $$
+BEGIN
+    IF (
+        SELECT count(*) FROM (
+            SELECT 1 FROM public.document_chunks dc
+            WHERE dc.cabinet_id = filter_cabinet_id
+            LIMIT exact_threshold + 1
+        ) cabinet_rows
+    ) <= exact_threshold THEN
+        RETURN QUERY
+        SELECT s.id, s.content, s.metadata, s.similarity
+        FROM (
+            SELECT
+                dc.id,
+                dc.content,
+                dc.metadata,
+                1 - COALESCE(dc.embedding <=> query_embedding,
+                             dc.embedding_half <=> query_embedding::halfvec(768)) AS similarity
+            FROM public.document_chunks dc
+            WHERE dc.cabinet_id = filter_cabinet_id
+        ) s
+        WHERE s.similarity > match_threshold
+        ORDER BY s.similarity DESC
+        LIMIT match_count;
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    WITH candidates AS (
+        SELECT dc.id
+        FROM public.document_chunks dc
+        WHERE dc.cabinet_id = filter_cabinet_id
+          AND dc.embedding_half IS NOT NULL
+        ORDER BY binary_quantize(dc.embedding_half)::bit(768)
+                 <~> binary_quantize(query_embedding::halfvec(768))::bit(768)
+        LIMIT match_count * candidate_multiplier
+    ),
+    reranked AS (
+        SELECT
+            dc.id,
+            dc.content,
+            dc.metadata,
+            1 - COALESCE(dc.embedding <=> query_embedding,
+                         dc.embedding_half <=> query_embedding::halfvec(768)) AS similarity
+        FROM candidates c
+        JOIN public.document_chunks dc ON dc.id = c.id
+    )
+    SELECT r.id, r.content, r.metadata, r.similarity
+    FROM reranked r
+    WHERE r.similarity > match_threshold
+    ORDER BY r.similarity DESC
+    LIMIT match_count;
+END;
+$$ LANGUAGE plpgsql STABLE
+SET hnsw.ef_search = 200
+SET hnsw.iterative_scan = relaxed_order;
+
+CREATE OR REPLACE FUNCTION public.match_documents_openai_quantized(
+    query_embedding vector(1536),
+    match_threshold FLOAT,
+    match_count INT,
+    filter_cabinet_id UUID,
+    candidate_multiplier INT DEFAULT 8,
+    exact_threshold INT DEFAULT 5000
+)
+RETURNS TABLE (id UUID, content TEXT, metadata JSONB, similarity FLOAT) AS $$
+BEGIN
+    IF (
+        SELECT count(*) FROM (
+            SELECT 1 FROM public.document_chunks dc
+            WHERE dc.cabinet_id = filter_cabinet_id
+            LIMIT exact_threshold + 1
+        ) cabinet_rows
+    ) <= exact_threshold THEN
+        RETURN QUERY
+        SELECT s.id, s.content, s.metadata, s.similarity
+        FROM (
+            SELECT
+                dc.id,
+                dc.content,
+                dc.metadata,
+                1 - COALESCE(dc.embedding_openai <=> query_embedding,
+                             dc.embedding_openai_half <=> query_embedding::halfvec(1536)) AS similarity
+            FROM public.document_chunks dc
+            WHERE dc.cabinet_id = filter_cabinet_id
+        ) s
+        WHERE s.similarity > match_threshold
+        ORDER BY s.similarity DESC
+        LIMIT match_count;
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    WITH candidates AS (
+        SELECT dc.id
+        FROM public.document_chunks dc
+        WHERE dc.cabinet_id = filter_cabinet_id
+          AND dc.embedding_openai_half IS NOT NULL
+        ORDER BY binary_quantize(dc.embedding_openai_half)::bit(1536)
+                 <~> binary_quantize(query_embedding::halfvec(1536))::bit(1536)
+        LIMIT match_count * candidate_multiplier
+    ),
+    reranked AS (
+        SELECT
+            dc.id,
+            dc.content,
+            dc.metadata,
+            1 - COALESCE(dc.embedding_openai <=> query_embedding,
+                         dc.embedding_openai_half <=> query_embedding::halfvec(1536)) AS similarity
+        FROM candidates c
+        JOIN public.document_chunks dc ON dc.id = c.id
+    )
+    SELECT r.id, r.content, r.metadata, r.similarity
+    FROM reranked r
+    WHERE r.similarity > match_threshold
+    ORDER BY r.similarity DESC
+    LIMIT match_count;
+END;
+$$ LANGUAGE plpgsql STABLE
+SET hnsw.ef_search = 200
+SET hnsw.iterative_scan = relaxed_order;
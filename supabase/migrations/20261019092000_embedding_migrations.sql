@@ -0,0 +1,115 @@
+-- Migration: Embedding provider migrations (resumable backfill)
+-- Description: Tracks per-cabinet re-embedding jobs that fill document_chunks.embedding
+-- (Gemini 768) or document_chunks.embedding_openai (OpenAI 1536). The Python worker
+-- (tasks/embedding_backfill.py) processes a job in resumable batches, checkpointing
+-- after each one, and ends with a sweep for chunks ingested while it ran.
+
+CREATE TABLE IF NOT EXISTS public.embedding_migrations (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    cabinet_id UUID REFERENCES public.cabinets(id) ON DELETE CASCADE NOT NULL,
+    source_type TEXT, -- NULL = every source_type
+    target_column TEXT NOT NULL CHECK (target_column IN ('embedding', 'embedding_openai')),
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'paused', 'completed', 'failed')),
+    total_chunks INT DEFAULT 0,
+    processed_chunks INT DEFAULT 0,
+    failed_chunks INT DEFAULT 0,
+    last_chunk_id UUID, -- keyset checkpoint (document_chunks.id)
+    chunks_per_second FLOAT,
+    eta_seconds INT,
+    error_details TEXT,
+    started_at TIMESTAMP WITH TIME ZONE,
+    completed_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL
+);
+
+-- At most one active job per cabinet/target/source
+CREATE UNIQUE INDEX IF NOT EXISTS idx_embedding_migrations_active
+ON public.embedding_migrations(cabinet_id, target_column, COALESCE(source_type, ''))
+WHERE status IN ('pending', 'running', 'paused');
+
+CREATE TRIGGER update_embedding_migrations_updated_at
+    BEFORE UPDATE ON public.embedding_migrations
+    FOR EACH ROW
+    EXECUTE PROCEDURE public.update_updated_at_column();
+
+ALTER TABLE public.embedding_migrations ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Tenant Isolation: Embedding Migrations" ON public.embedding_migrations
+    FOR SELECT USING (cabinet_id = public.get_user_cabinet_id());
+
+CREATE POLICY "Service Role manages embedding migrations" ON public.embedding_migrations
+    FOR ALL USING (auth.role() = 'service_role');
+
+-- Partial indexes so "chunks still missing the target column" is an index scan
+CREATE INDEX IF NOT EXISTS idx_document_chunks_missing_embedding
+ON public.document_chunks(cabinet_id, id) WHERE embedding IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_document_chunks_missing_embedding_openai
+ON public.document_chunks(cabinet_id, id) WHERE embedding_openai IS NULL;
+
+-- Backfill writes should not bump knowledge_base_versions once per batch: every bump
+-- empties the cabinet's semantic answer cache. Writers that bump once at the end set
+-- the transaction-local app.skip_kb_version flag around their UPDATE.
+CREATE OR REPLACE FUNCTION public.bump_knowledge_base_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF current_setting('app.skip_kb_version', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO public.knowledge_base_versions (cabinet_id, version, updated_at)
+        SELECT DISTINCT cabinet_id, 1, now() FROM old_rows
+        ON CONFLICT (cabinet_id) DO UPDATE
+        SET version = knowledge_base_versions.version + 1, updated_at = now();
+    ELSE
+        INSERT INTO public.knowledge_base_versions (cabinet_id, version, updated_at)
+        SELECT DISTINCT cabinet_id, 1, now() FROM new_rows
+        ON CONFLICT (cabinet_id) DO UPDATE
+        SET version = knowledge_base_versions.version + 1, updated_at = now();
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- RPC: one knowledge base version bump for a cabinet, after a backfill run
+CREATE OR REPLACE FUNCTION public.bump_cabinet_knowledge_base_version(p_cabinet_id UUID)
+RETURNS BIGINT AS $$
+    INSERT INTO public.knowledge_base_versions (cabinet_id, version, updated_at)
+    VALUES (p_cabinet_id, 1, now())
+    ON CONFLICT (cabinet_id) DO UPDATE
+    SET version = knowledge_base_versions.version + 1, updated_at = now()
+    RETURNING version;
+$$ LANGUAGE sql;
+
+REVOKE EXECUTE ON FUNCTION public.bump_cabinet_knowledge_base_version(UUID) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.bump_cabinet_knowledge_base_version(UUID) TO service_role;
+
+-- RPC: write a batch of embeddings in one statement, without bumping the knowledge base
+-- version (the backfill bumps it once per run, see bump_cabinet_knowledge_base_version)
+-- p_embeddings: [{"id": "<uuid>", "embedding": [0.1, ...]}, ...]
+CREATE OR REPLACE FUNCTION public.apply_chunk_embeddings(p_target_column TEXT, p_embeddings JSONB)
+RETURNS INT AS $$
+DECLARE
+    updated_count INT;
+BEGIN
+    PERFORM set_config('app.skip_kb_version', 'on', true);
+    IF p_target_column = 'embedding' THEN
+        UPDATE public.document_chunks dc
+        SET embedding = (e.value ->> 'embedding')::vector(768)
+        FROM jsonb_array_elements(p_embeddings) e
+        WHERE dc.id = (e.value ->> 'id')::uuid;
+    ELSIF p_target_column = 'embedding_openai' THEN
+        UPDATE public.document_chunks dc
+        SET embedding_openai = (e.value ->> 'embedding')::vector(1536)
+        FROM jsonb_array_elements(p_embeddings) e
+        WHERE dc.id = (e.value ->> 'id')::uuid;
+    ELSE
+        RAISE EXCEPTION 'Unknown embedding column: %', p_target_column;
+    END IF;
+
+    GET DIAGNOSTICS updated_count = ROW_COUNT;
+    PERFORM set_config('app.skip_kb_version', 'off', true);
+    RETURN updated_count;
+END;
+$$ LANGUAGE plpgsql;
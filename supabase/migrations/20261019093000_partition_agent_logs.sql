@@ -0,0 +1,232 @@
+-- Migration: Time-partitioned agent_logs with retention and hourly rollups
+-- Description: agent_logs grows without bound and dashboards scan it directly.
+--   1. Rebuilds agent_logs as a declarative RANGE partitioned table (monthly on created_at).
+--   2. Adds ensure_agent_logs_partitions() / drop_old_agent_logs_partitions() used by the
+--      worker's retention job (tasks/agent_logs_maintenance.py).
+--   3. Adds agent_log_rollups_hourly, maintained incrementally by refresh_agent_log_rollups(),
+--      plus the agent_log_hourly_stats view (counts and error rates) for analytics.
+-- The data copy runs inside this migration's transaction; schedule it in a quiet window.
+
+-- 1. Partitioned table ------------------------------------------------------
+
+ALTER TABLE public.agent_logs RENAME TO agent_logs_legacy;
+
+CREATE TABLE public.agent_logs (
+    id UUID NOT NULL DEFAULT gen_random_uuid(),
+    cabinet_id UUID REFERENCES public.cabinets(id) ON DELETE CASCADE,
+    agent_name TEXT NOT NULL,
+    action TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload JSONB DEFAULT '{}',
+    response_summary JSONB DEFAULT '{}',
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, created_at) -- the partition key must be part of the primary key
+) PARTITION BY RANGE (created_at);
+
+-- Catch-all so inserts never fail if the maintenance job falls behind
+CREATE TABLE IF NOT EXISTS public.agent_logs_default PARTITION OF public.agent_logs DEFAULT;
+
+CREATE OR REPLACE FUNCTION public.ensure_agent_logs_partitions(
+    p_from DATE DEFAULT current_date,
+    p_months_ahead INT DEFAULT 3
+)
+RETURNS INT AS $$
+DECLARE
+    month_start DATE := date_trunc('month', LEAST(p_from, current_date))::DATE;
+    last_month DATE := (date_trunc('month', current_date) + make_interval(months => GREATEST(p_months_ahead, 0)))::DATE;
+    month_end DATE;
+    partition_name TEXT;
+    created_count INT := 0;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        partition_name := 'agent_logs_' || to_char(month_start, 'YYYY_MM');
+        month_end := (month_start + INTERVAL '1 month')::DATE;
+        IF to_regclass('public.' || partition_name) IS NULL THEN
+            -- Rows of this month already in the default partition (a skipped run, a skewed
+            -- clock) would make CREATE ... PARTITION OF fail on every later run: move them
+            -- aside, create the partition and put them back. Locking the parent first (as
+            -- CREATE would) keeps new rows out of the default partition meanwhile.
+            LOCK TABLE public.agent_logs IN SHARE ROW EXCLUSIVE MODE;
+            CREATE TEMP TABLE agent_logs_moving (LIKE public.agent_logs) ON COMMIT DROP;
+            WITH moved AS (
+                DELETE FROM public.agent_logs_default
+                WHERE created_at >= month_start AND created_at < month_end
+                RETURNING *
+            )
+            INSERT INTO agent_logs_moving SELECT * FROM moved;
+
+            EXECUTE format(
+                'CREATE TABLE public.%I PARTITION OF public.agent_logs FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, month_end
+            );
+
+            INSERT INTO public.agent_logs SELECT * FROM agent_logs_moving;
+            DROP TABLE agent_logs_moving;
+            created_count := created_count + 1;
+        END IF;
+        month_start := (month_start + INTERVAL '1 month')::DATE;
+    END LOOP;
+    RETURN created_count;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT public.ensure_agent_logs_partitions(
+    COALESCE((SELECT min(created_at)::DATE FROM public.agent_logs_legacy), current_date),
+    3
+);
+
+INSERT INTO public.agent_logs (id, cabinet_id, agent_name, action, status, payload, response_summary, created_at)
+SELECT id, cabinet_id, agent_name, action, status, payload, response_summary, COALESCE(created_at, now())
+FROM public.agent_logs_legacy;
+
+DROP TABLE public.agent_logs_legacy;
+
+-- Indexes are created on the parent and cascade to every partition
+CREATE INDEX IF NOT EXISTS agent_logs_cabinet_idx ON public.agent_logs(cabinet_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS agent_logs_created_at_idx ON public.agent_logs(created_at DESC);
+
+ALTER TABLE public.agent_logs ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Owners view own agent logs"
+  ON public.agent_logs FOR SELECT
+  USING (cabinet_id::text = (auth.jwt() ->> 'cabinet_id'));
+
+CREATE POLICY "Service Role manages logs"
+  ON public.agent_logs FOR ALL
+  USING (auth.role() = 'service_role');
+
+CREATE POLICY "Super Admins view all agent logs"
+  ON public.agent_logs FOR SELECT
+  USING (is_super_admin());
+
+-- 2. Retention --------------------------------------------------------------
+
+-- Detaches and drops monthly partitions that ended before the retention window.
+-- Returns the dropped partition names. Safe to call from several workers at once.
+CREATE OR REPLACE FUNCTION public.drop_old_agent_logs_partitions(p_retention_months INT DEFAULT 12)
+RETURNS SETOF TEXT AS $$
+DECLARE
+    part RECORD;
+    cutoff DATE := (date_trunc('month', now()) - make_interval(months => p_retention_months))::DATE;
+BEGIN
+    IF NOT pg_try_advisory_xact_lock(hashtext('agent_logs_maintenance')) THEN
+        RETURN;
+    END IF;
+
+    FOR part IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'public.agent_logs'::regclass
+          AND c.relname ~ '^agent_logs_[0-9]{4}_[0-9]{2}$'
+        ORDER BY c.relname
+    LOOP
+        IF (to_date(right(part.relname, 7), 'YYYY_MM') + INTERVAL '1 month')::DATE <= cutoff THEN
+            EXECUTE format('ALTER TABLE public.agent_logs DETACH PARTITION public.%I', part.relname);
+            EXECUTE format('DROP TABLE public.%I', part.relname);
+            RETURN NEXT part.relname;
+        END IF;
+    END LOOP;
+
+    -- Rows that landed in the catch-all partition age out the same way
+    DELETE FROM public.agent_logs_default WHERE created_at < cutoff;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 3. Hourly rollups ---------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS public.agent_log_rollups_hourly (
+    bucket TIMESTAMP WITH TIME ZONE NOT NULL,
+    cabinet_id UUID REFERENCES public.cabinets(id) ON DELETE CASCADE,
+    agent_name TEXT NOT NULL,
+    action TEXT NOT NULL,
+    status TEXT NOT NULL,
+    log_count BIGINT NOT NULL DEFAULT 0,
+    CONSTRAINT agent_log_rollups_hourly_key UNIQUE NULLS NOT DISTINCT (bucket, cabinet_id, agent_name, action, status)
+);
+
+CREATE INDEX IF NOT EXISTS agent_log_rollups_hourly_cabinet_bucket_idx
+ON public.agent_log_rollups_hourly(cabinet_id, bucket DESC);
+
+-- Single-row watermark: raw logs before rolled_up_to are already counted
+CREATE TABLE IF NOT EXISTS public.agent_log_rollup_state (
+    id BOOLEAN PRIMARY KEY DEFAULT true CHECK (id),
+    rolled_up_to TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+INSERT INTO public.agent_log_rollup_state (id, rolled_up_to)
+VALUES (true, '1970-01-01 00:00:00+00')
+ON CONFLICT (id) DO NOTHING;
+
+-- Rolls up raw logs between the watermark and now() - p_grace (late writers, e.g.
+-- the worker's buffered AgentLogWriter, get the grace period to land).
+-- Returns the number of rollup rows inserted or updated.
+CREATE OR REPLACE FUNCTION public.refresh_agent_log_rollups(p_grace INTERVAL DEFAULT INTERVAL '5 minutes')
+RETURNS BIGINT AS $$
+DECLARE
+    window_start TIMESTAMP WITH TIME ZONE;
+    window_end TIMESTAMP WITH TIME ZONE := now() - p_grace;
+    affected BIGINT;
+BEGIN
+    SELECT rolled_up_to INTO window_start
+    FROM public.agent_log_rollup_state
+    WHERE id
+    FOR UPDATE SKIP LOCKED;
+
+    -- Another worker holds the watermark, or nothing new to roll up
+    IF window_start IS NULL OR window_end <= window_start THEN
+        RETURN 0;
+    END IF;
+
+    INSERT INTO public.agent_log_rollups_hourly (bucket, cabinet_id, agent_name, action, status, log_count)
+    SELECT date_trunc('hour', created_at), cabinet_id, agent_name, action, status, count(*)
+    FROM public.agent_logs
+    WHERE created_at >= window_start AND created_at < window_end
+    GROUP BY 1, 2, 3, 4, 5
+    ON CONFLICT ON CONSTRAINT agent_log_rollups_hourly_key
+    DO UPDATE SET log_count = agent_log_rollups_hourly.log_count + EXCLUDED.log_count;
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+
+    UPDATE public.agent_log_rollup_state SET rolled_up_to = window_end WHERE id;
+    RETURN affected;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT public.refresh_agent_log_rollups();
+
+-- Counts and error rates per hour, for dashboards
+CREATE OR REPLACE VIEW public.agent_log_hourly_stats
+WITH (security_invoker = true) AS
+SELECT
+    bucket,
+    cabinet_id,
+    agent_name,
+    action,
+    sum(log_count) AS total_count,
+    sum(log_count) FILTER (WHERE status = 'error') AS error_count,
+    round(
+        COALESCE(sum(log_count) FILTER (WHERE status = 'error'), 0)::NUMERIC / NULLIF(sum(log_count), 0),
+        4
+    ) AS error_rate
+FROM public.agent_log_rollups_hourly
+GROUP BY bucket, cabinet_id, agent_name, action;
+
+ALTER TABLE public.agent_log_rollups_hourly ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.agent_log_rollup_state ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Owners view own agent log rollups"
+  ON public.agent_log_rollups_hourly FOR SELECT
+  USING (cabinet_id::text = (auth.jwt() ->> 'cabinet_id'));
+
+CREATE POLICY "Super Admins view all agent log rollups"
+  ON public.agent_log_rollups_hourly FOR SELECT
+  USING (is_super_admin());
+
+CREATE POLICY "Service Role manages agent log rollups"
+  ON public.agent_log_rollups_hourly FOR ALL
+  USING (auth.role() = 'service_role');
+
+CREATE POLICY "Service Role manages agent log rollup state"
+  ON public.agent_log_rollup_state FOR ALL
+  USING (auth.role() = 'service_role');
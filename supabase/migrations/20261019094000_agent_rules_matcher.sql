@@ -0,0 +1,43 @@
+-- Migration: Support for the worker's keyword rule engine
+-- Description: The Python worker compiles each cabinet's active agent_rules into an
+-- Aho-Corasick automaton and caches it. This adds what it needs to know when a cache
+-- is stale (updated_at + a cheap fingerprint RPC) and a batched usage_count increment.
+
+ALTER TABLE public.agent_rules
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS agent_rules_cabinet_active_idx
+ON public.agent_rules(cabinet_id) WHERE is_active;
+
+-- Only edits that change matching bump updated_at; usage_count increments must not
+-- invalidate every worker's compiled rules.
+DROP TRIGGER IF EXISTS update_agent_rules_updated_at ON public.agent_rules;
+CREATE TRIGGER update_agent_rules_updated_at
+    BEFORE UPDATE OF keywords, action_type, response_text, is_active, cabinet_id ON public.agent_rules
+    FOR EACH ROW
+    EXECUTE PROCEDURE public.update_updated_at_column();
+
+-- RPC: changes whenever a cabinet's rules are inserted, edited or deleted
+CREATE OR REPLACE FUNCTION public.get_agent_rules_fingerprint(p_cabinet_id UUID)
+RETURNS TABLE (rule_count BIGINT, last_updated_at TIMESTAMP WITH TIME ZONE) AS $$
+    SELECT count(*), max(COALESCE(updated_at, created_at))
+    FROM public.agent_rules
+    WHERE cabinet_id = p_cabinet_id;
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+-- RPC: applies accumulated usage counts in one statement
+-- p_counts: {"<rule uuid>": <increment>, ...}
+CREATE OR REPLACE FUNCTION public.increment_agent_rule_usage(p_counts JSONB)
+RETURNS INT AS $$
+DECLARE
+    updated_count INT;
+BEGIN
+    UPDATE public.agent_rules r
+    SET usage_count = COALESCE(r.usage_count, 0) + c.value::INT
+    FROM jsonb_each_text(p_counts) AS c(key, value)
+    WHERE r.id = c.key::UUID;
+
+    GET DIAGNOSTICS updated_count = ROW_COUNT;
+    RETURN updated_count;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,48 @@
+-- Migration: Conversation state for the Python worker
+-- Description: Adds what ConversationService needs to keep WhatsApp threads bounded:
+-- a rolling summary of older turns, a message counter maintained on append, one
+-- conversation per contact, and a per-message sequence that orders "latest N messages"
+-- windows deterministically (a batch of messages can share the same created_at).
+
+ALTER TABLE public.agent_conversations
+ADD COLUMN IF NOT EXISTS summary TEXT,
+ADD COLUMN IF NOT EXISTS summarized_until TIMESTAMP WITH TIME ZONE,
+ADD COLUMN IF NOT EXISTS message_count INTEGER NOT NULL DEFAULT 0,
+ADD COLUMN IF NOT EXISTS summarized_seq BIGINT;
+
+-- Insertion order; ties on created_at are broken by it
+ALTER TABLE public.agent_messages
+ADD COLUMN IF NOT EXISTS seq BIGINT GENERATED BY DEFAULT AS IDENTITY;
+
+-- Merge duplicate conversations of a contact into its latest one before making the contact unique
+WITH ranked AS (
+    SELECT id, first_value(id) OVER (
+        PARTITION BY cabinet_id, platform, external_id
+        ORDER BY last_message_at DESC NULLS LAST, created_at DESC NULLS LAST, id
+    ) AS keep_id
+    FROM public.agent_conversations
+), moved AS (
+    UPDATE public.agent_messages m
+    SET conversation_id = r.keep_id
+    FROM ranked r
+    WHERE m.conversation_id = r.id AND r.id <> r.keep_id
+)
+DELETE FROM public.agent_conversations c
+USING ranked r
+WHERE c.id = r.id AND r.id <> r.keep_id;
+
+UPDATE public.agent_conversations c
+SET message_count = m.total
+FROM (
+    SELECT conversation_id, count(*) AS total
+    FROM public.agent_messages
+    GROUP BY conversation_id
+) m
+WHERE m.conversation_id = c.id;
+
+-- ConversationService.get_or_create upserts on this
+CREATE UNIQUE INDEX IF NOT EXISTS agent_conversations_contact_idx
+ON public.agent_conversations(cabinet_id, platform, external_id);
+
+CREATE INDEX IF NOT EXISTS agent_messages_conversation_seq_idx
+ON public.agent_messages(conversation_id, seq DESC);
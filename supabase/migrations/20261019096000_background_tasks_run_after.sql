@@ -0,0 +1,47 @@
+-- Migration: Delayed retries for background_tasks
+-- Description: Lets the worker put a task back on the queue with a delay (circuit open,
+-- concurrency limit reached, provider quota exhausted) instead of failing it.
+-- claim_next_task() skips pending tasks whose run_after is still in the future.
+
+ALTER TABLE public.background_tasks
+ADD COLUMN IF NOT EXISTS run_after TIMESTAMP WITH TIME ZONE;
+
+CREATE INDEX IF NOT EXISTS idx_background_tasks_pending_run_after
+ON public.background_tasks(run_after)
+WHERE status = 'pending' AND run_after IS NOT NULL;
+
+CREATE OR REPLACE FUNCTION public.claim_next_task()
+RETURNS SETOF public.background_tasks AS $$
+DECLARE
+    next_task_id UUID;
+BEGIN
+    -- Find and lock the next pending task that is due
+    SELECT id INTO next_task_id
+    FROM public.background_tasks
+    WHERE status = 'pending'
+      AND (run_after IS NULL OR run_after <= now())
+    ORDER BY created_at ASC
+    FOR UPDATE SKIP LOCKED
+    LIMIT 1;
+
+    IF next_task_id IS NOT NULL THEN
+        -- Update its status to processing
+        UPDATE public.background_tasks
+        SET status = 'processing', updated_at = now()
+        WHERE id = next_task_id;
+
+        -- Return the locked task
+        RETURN QUERY SELECT * FROM public.background_tasks WHERE id = next_task_id;
+    END IF;
+END;
+$$ LANGUAGE plpgsql VOLATILE;
+
+-- RPC: return a claimed task to the queue after a delay (computed with the database clock)
+CREATE OR REPLACE FUNCTION public.defer_task(p_task_id UUID, p_delay_seconds DOUBLE PRECISION, p_reason TEXT DEFAULT NULL)
+RETURNS VOID AS $$
+    UPDATE public.background_tasks
+    SET status = 'pending',
+        run_after = now() + make_interval(secs => p_delay_seconds),
+        error_details = p_reason
+    WHERE id = p_task_id;
+$$ LANGUAGE sql VOLATILE;
@@ -0,0 +1,78 @@
+-- Migration: Per-cabinet provider rate limits shared by all worker processes
+-- Description: Each cabinet calls Gemini/OpenAI with its own API key and quota. The
+-- worker takes tokens from a per-(cabinet, provider) token bucket stored here, so every
+-- worker process sees the same budget. Buckets are created on first use with the
+-- worker's defaults; requests_per_minute / burst override them per cabinet.
+
+CREATE TABLE IF NOT EXISTS public.cabinet_rate_limits (
+    cabinet_id UUID REFERENCES public.cabinets(id) ON DELETE CASCADE NOT NULL,
+    provider TEXT NOT NULL, -- API key the quota belongs to: 'gemini' | 'openai'
+    tokens DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT clock_timestamp(),
+    requests_per_minute DOUBLE PRECISION, -- NULL = worker default
+    burst DOUBLE PRECISION,               -- NULL = worker default
+    PRIMARY KEY (cabinet_id, provider)
+);
+
+ALTER TABLE public.cabinet_rate_limits ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Service Role manages cabinet rate limits"
+  ON public.cabinet_rate_limits FOR ALL
+  USING (auth.role() = 'service_role');
+
+CREATE POLICY "Super Admins manage cabinet rate limits"
+  ON public.cabinet_rate_limits FOR ALL
+  USING (is_super_admin());
+
+-- RPC: atomically takes p_cost tokens from the cabinet's bucket.
+-- Returns 0 when granted, otherwise the seconds until enough tokens will have
+-- accumulated (nothing is taken in that case).
+CREATE OR REPLACE FUNCTION public.take_cabinet_rate_limit_tokens(
+    p_cabinet_id UUID,
+    p_provider TEXT,
+    p_cost DOUBLE PRECISION DEFAULT 1,
+    p_requests_per_minute DOUBLE PRECISION DEFAULT 60,
+    p_burst DOUBLE PRECISION DEFAULT 10
+)
+RETURNS DOUBLE PRECISION AS $$
+DECLARE
+    bucket public.cabinet_rate_limits%ROWTYPE;
+    now_ts TIMESTAMP WITH TIME ZONE := clock_timestamp();
+    refill_per_second DOUBLE PRECISION;
+    capacity DOUBLE PRECISION;
+    available DOUBLE PRECISION;
+BEGIN
+    INSERT INTO public.cabinet_rate_limits (cabinet_id, provider, tokens, updated_at)
+    VALUES (p_cabinet_id, p_provider, p_burst, now_ts)
+    ON CONFLICT (cabinet_id, provider) DO NOTHING;
+
+    -- Row lock serializes concurrent workers on the same bucket only
+    SELECT * INTO bucket
+    FROM public.cabinet_rate_limits
+    WHERE cabinet_id = p_cabinet_id AND provider = p_provider
+    FOR UPDATE;
+
+    refill_per_second := COALESCE(bucket.requests_per_minute, p_requests_per_minute) / 60.0;
+    capacity := GREATEST(COALESCE(bucket.burst, p_burst), p_cost);
+    available := LEAST(
+        capacity,
+        bucket.tokens + GREATEST(EXTRACT(EPOCH FROM now_ts - bucket.updated_at), 0) * refill_per_second
+    );
+
+    IF available >= p_cost THEN
+        UPDATE public.cabinet_rate_limits
+        SET tokens = available - p_cost, updated_at = now_ts
+        WHERE cabinet_id = p_cabinet_id AND provider = p_provider;
+        RETURN 0;
+    END IF;
+
+    UPDATE public.cabinet_rate_limits
+    SET tokens = available, updated_at = now_ts
+    WHERE cabinet_id = p_cabinet_id AND provider = p_provider;
+
+    IF refill_per_second <= 0 THEN
+        RETURN 3600; -- quota disabled for this cabinet; check back in an hour
+    END IF;
+    RETURN (p_cost - available) / refill_per_second;
+END;
+$$ LANGUAGE plpgsql VOLATILE;
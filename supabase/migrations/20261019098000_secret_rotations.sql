@@ -0,0 +1,45 @@
+-- Migration: Online re-encryption of cabinet secrets after a key rotation
+-- Description: CryptoService now holds a versioned Fernet key ring (APP_SECRET_KEYS,
+-- primary first). gov_credentials records the key_version of its password_enc, and
+-- the worker task rotate_secrets (tasks/secret_rotation.py) re-encrypts every secret
+-- still on an older key, in batches, checkpointing progress here.
+
+CREATE TABLE IF NOT EXISTS public.secret_rotations (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    key_version TEXT NOT NULL, -- primary key version the run re-encrypts to
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'paused', 'completed', 'failed')),
+    total_secrets INT DEFAULT 0,
+    processed_secrets INT DEFAULT 0,
+    failed_secrets INT DEFAULT 0,
+    last_cabinet_id UUID, -- keyset checkpoint (cabinets.id)
+    secrets_per_second FLOAT,
+    error_details TEXT,
+    started_at TIMESTAMP WITH TIME ZONE,
+    completed_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL
+);
+
+-- One active run at a time
+CREATE UNIQUE INDEX IF NOT EXISTS idx_secret_rotations_active
+ON public.secret_rotations((true))
+WHERE status IN ('pending', 'running', 'paused');
+
+CREATE TRIGGER update_secret_rotations_updated_at
+    BEFORE UPDATE ON public.secret_rotations
+    FOR EACH ROW
+    EXECUTE PROCEDURE public.update_updated_at_column();
+
+ALTER TABLE public.secret_rotations ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Super Admins view secret rotations" ON public.secret_rotations
+    FOR SELECT USING (is_super_admin());
+
+CREATE POLICY "Service Role manages secret rotations" ON public.secret_rotations
+    FOR ALL USING (auth.role() = 'service_role');
+
+-- Credentials saved before the key ring existed were encrypted with APP_SECRET_KEY (version 1)
+UPDATE public.cabinets
+SET gov_credentials = gov_credentials || '{"key_version": "1"}'::jsonb
+WHERE gov_credentials ? 'password_enc'
+  AND NOT gov_credentials ? 'key_version';
@@ -0,0 +1,18 @@
+-- Migration: Indexes for server-side voter analytics (app.services.analytics)
+-- Description: Dashboard and report aggregates are computed in SQL per cabinet instead
+-- of downloading every voter to the browser. Birthday lookups ("born in May", "next 7
+-- days") go through an expression index on (month, day) of birth_date; the expressions
+-- must stay identical to VoterAnalyticsService.birth_month / birth_day.
+
+CREATE INDEX IF NOT EXISTS idx_voters_cabinet_birthday
+ON public.voters (
+    cabinet_id,
+    (EXTRACT(MONTH FROM birth_date)::int),
+    (EXTRACT(DAY FROM birth_date)::int)
+)
+WHERE birth_date IS NOT NULL;
+
+-- GROUP BY neighborhood / city per cabinet, and the created_at filters of reports
+CREATE INDEX IF NOT EXISTS idx_voters_cabinet_neighborhood ON public.voters (cabinet_id, neighborhood);
+CREATE INDEX IF NOT EXISTS idx_voters_cabinet_city ON public.voters (cabinet_id, city);
+CREATE INDEX IF NOT EXISTS idx_voters_cabinet_created_at ON public.voters (cabinet_id, created_at);
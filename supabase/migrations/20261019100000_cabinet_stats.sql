@@ -0,0 +1,228 @@
+-- Migration: Incrementally maintained dashboard counters per cabinet
+-- Description: Dashboards and the productivity page ran exact counts over voters,
+-- demands, events and system_access_logs on every open. These tables hold the same
+-- numbers, kept current by statement-level triggers (one upsert per distinct key per
+-- statement, so bulk imports stay cheap), and are read by app.services.cabinet_stats.
+--
+--   cabinet_stats        current totals:  voters (key ''), voters_by_category (key = category),
+--                                          demands_by_status (key = status); NULL keys are ''
+--   cabinet_daily_stats  per day and user: voters_created, demands_created, events_created,
+--                                          accesses (created_by / user_id), events_scheduled
+--                                          (events.date, no user)
+-- Days are local (America/Sao_Paulo). Rows without a user use the nil UUID.
+
+CREATE TABLE IF NOT EXISTS public.cabinet_stats (
+    cabinet_id UUID REFERENCES public.cabinets(id) ON DELETE CASCADE NOT NULL,
+    metric TEXT NOT NULL,
+    key TEXT NOT NULL DEFAULT '',
+    value BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    PRIMARY KEY (cabinet_id, metric, key)
+);
+
+CREATE TABLE IF NOT EXISTS public.cabinet_daily_stats (
+    cabinet_id UUID REFERENCES public.cabinets(id) ON DELETE CASCADE NOT NULL,
+    day DATE NOT NULL,
+    metric TEXT NOT NULL,
+    user_id UUID NOT NULL DEFAULT '00000000-0000-0000-0000-000000000000',
+    value BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (cabinet_id, metric, day, user_id)
+);
+
+ALTER TABLE public.cabinet_stats ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.cabinet_daily_stats ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Tenant Isolation: Cabinet Stats" ON public.cabinet_stats
+    FOR SELECT USING (cabinet_id = public.get_user_cabinet_id());
+
+CREATE POLICY "Tenant Isolation: Cabinet Daily Stats" ON public.cabinet_daily_stats
+    FOR SELECT USING (cabinet_id = public.get_user_cabinet_id());
+
+CREATE POLICY "Service Role manages cabinet stats" ON public.cabinet_stats
+    FOR ALL USING (auth.role() = 'service_role');
+
+CREATE POLICY "Service Role manages cabinet daily stats" ON public.cabinet_daily_stats
+    FOR ALL USING (auth.role() = 'service_role');
+
+-- Rows a statement changed, signed: +1 for new rows, -1 for old ones. An UPDATE that
+-- leaves a key unchanged nets to zero and is filtered out by HAVING below.
+CREATE OR REPLACE FUNCTION public.cabinet_stats_changes(p_op TEXT)
+RETURNS TEXT AS $$
+    SELECT CASE p_op
+        WHEN 'INSERT' THEN 'SELECT n.*, 1 AS delta FROM new_rows n'
+        WHEN 'DELETE' THEN 'SELECT o.*, -1 AS delta FROM old_rows o'
+        ELSE 'SELECT n.*, 1 AS delta FROM new_rows n UNION ALL SELECT o.*, -1 AS delta FROM old_rows o'
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Upserts of signed counts, built as text: transition tables are only visible to
+-- statements the trigger function itself EXECUTEs. ORDER BY keeps the lock order
+-- stable across concurrent statements. p_keys is a VALUES list over the row `r`.
+CREATE OR REPLACE FUNCTION public.cabinet_stats_upsert(p_op TEXT, p_keys TEXT)
+RETURNS TEXT AS $$
+    SELECT format($q$
+        INSERT INTO public.cabinet_stats AS s (cabinet_id, metric, key, value)
+        SELECT r.cabinet_id, k.metric, k.key, sum(r.delta)
+        FROM (%s) r
+        CROSS JOIN LATERAL (VALUES %s) AS k(metric, key)
+        WHERE r.cabinet_id IS NOT NULL
+        GROUP BY 1, 2, 3
+        HAVING sum(r.delta) <> 0
+        ORDER BY 1, 2, 3
+        ON CONFLICT (cabinet_id, metric, key)
+        DO UPDATE SET value = s.value + EXCLUDED.value, updated_at = timezone('utc'::text, now())
+    $q$, public.cabinet_stats_changes(p_op), p_keys);
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION public.cabinet_daily_stats_upsert(p_op TEXT, p_keys TEXT)
+RETURNS TEXT AS $$
+    SELECT format($q$
+        INSERT INTO public.cabinet_daily_stats AS s (cabinet_id, metric, day, user_id, value)
+        SELECT r.cabinet_id, k.metric, k.day, COALESCE(k.user_id, '00000000-0000-0000-0000-000000000000'), sum(r.delta)
+        FROM (%s) r
+        CROSS JOIN LATERAL (VALUES %s) AS k(metric, day, user_id)
+        WHERE r.cabinet_id IS NOT NULL AND k.day IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+        HAVING sum(r.delta) <> 0
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (cabinet_id, metric, day, user_id)
+        DO UPDATE SET value = s.value + EXCLUDED.value
+    $q$, public.cabinet_stats_changes(p_op), p_keys);
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Trigger functions run as the table owner: app users may write voters but not counters
+
+-- Voters
+CREATE OR REPLACE FUNCTION public.cabinet_stats_voters()
+RETURNS TRIGGER AS $$
+BEGIN
+    EXECUTE public.cabinet_stats_upsert(
+        TG_OP,
+        $k$('voters', ''), ('voters_by_category', COALESCE(r.category, ''))$k$
+    );
+    EXECUTE public.cabinet_daily_stats_upsert(
+        TG_OP,
+        $k$('voters_created', (r.created_at AT TIME ZONE 'America/Sao_Paulo')::date, r.created_by)$k$
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Demands
+CREATE OR REPLACE FUNCTION public.cabinet_stats_demands()
+RETURNS TRIGGER AS $$
+BEGIN
+    EXECUTE public.cabinet_stats_upsert(
+        TG_OP,
+        $k$('demands_by_status', COALESCE(r.status, ''))$k$
+    );
+    EXECUTE public.cabinet_daily_stats_upsert(
+        TG_OP,
+        $k$('demands_created', (r.created_at AT TIME ZONE 'America/Sao_Paulo')::date, r.created_by)$k$
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Events
+CREATE OR REPLACE FUNCTION public.cabinet_stats_events()
+RETURNS TRIGGER AS $$
+BEGIN
+    EXECUTE public.cabinet_daily_stats_upsert(
+        TG_OP,
+        $k$('events_created', (r.created_at AT TIME ZONE 'America/Sao_Paulo')::date, r.created_by),
+           ('events_scheduled', r.date, NULL::uuid)$k$
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- System access logs
+CREATE OR REPLACE FUNCTION public.cabinet_stats_accesses()
+RETURNS TRIGGER AS $$
+BEGIN
+    EXECUTE public.cabinet_daily_stats_upsert(
+        TG_OP,
+        $k$('accesses', (r.accessed_at AT TIME ZONE 'America/Sao_Paulo')::date, r.user_id)$k$
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Transition tables need one trigger per event
+DO $$
+DECLARE
+    t RECORD;
+BEGIN
+    FOR t IN
+        SELECT * FROM (VALUES
+            ('voters', 'cabinet_stats_voters'),
+            ('demands', 'cabinet_stats_demands'),
+            ('events', 'cabinet_stats_events'),
+            ('system_access_logs', 'cabinet_stats_accesses')
+        ) AS v(tbl, fn)
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON public.%I', t.tbl || '_stats_insert', t.tbl);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON public.%I', t.tbl || '_stats_update', t.tbl);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON public.%I', t.tbl || '_stats_delete', t.tbl);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER INSERT ON public.%I REFERENCING NEW TABLE AS new_rows '
+            'FOR EACH STATEMENT EXECUTE FUNCTION public.%I()', t.tbl || '_stats_insert', t.tbl, t.fn);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER UPDATE ON public.%I REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows '
+            'FOR EACH STATEMENT EXECUTE FUNCTION public.%I()', t.tbl || '_stats_update', t.tbl, t.fn);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER DELETE ON public.%I REFERENCING OLD TABLE AS old_rows '
+            'FOR EACH STATEMENT EXECUTE FUNCTION public.%I()', t.tbl || '_stats_delete', t.tbl, t.fn);
+    END LOOP;
+END $$;
+
+-- RPC: recompute counters from the source tables (initial fill, or repair after a
+-- bulk load with triggers disabled). Blocks writes to the source tables while it runs.
+CREATE OR REPLACE FUNCTION public.refresh_cabinet_stats(p_cabinet_id UUID DEFAULT NULL)
+RETURNS VOID AS $$
+BEGIN
+    LOCK TABLE public.voters, public.demands, public.events, public.system_access_logs IN SHARE MODE;
+
+    DELETE FROM public.cabinet_stats WHERE p_cabinet_id IS NULL OR cabinet_id = p_cabinet_id;
+    DELETE FROM public.cabinet_daily_stats WHERE p_cabinet_id IS NULL OR cabinet_id = p_cabinet_id;
+
+    INSERT INTO public.cabinet_stats (cabinet_id, metric, key, value)
+    SELECT cabinet_id, 'voters', '', count(*) FROM public.voters
+    WHERE p_cabinet_id IS NULL OR cabinet_id = p_cabinet_id GROUP BY 1
+    UNION ALL
+    SELECT cabinet_id, 'voters_by_category', COALESCE(category, ''), count(*) FROM public.voters
+    WHERE p_cabinet_id IS NULL OR cabinet_id = p_cabinet_id GROUP BY 1, 3
+    UNION ALL
+    SELECT cabinet_id, 'demands_by_status', COALESCE(status, ''), count(*) FROM public.demands
+    WHERE p_cabinet_id IS NULL OR cabinet_id = p_cabinet_id GROUP BY 1, 3;
+
+    INSERT INTO public.cabinet_daily_stats (cabinet_id, metric, day, user_id, value)
+    SELECT cabinet_id, metric, day, COALESCE(user_id, '00000000-0000-0000-0000-000000000000'), count(*)
+    FROM (
+        SELECT cabinet_id, 'voters_created' AS metric, (created_at AT TIME ZONE 'America/Sao_Paulo')::date AS day, created_by AS user_id
+        FROM public.voters
+        UNION ALL
+        SELECT cabinet_id, 'demands_created', (created_at AT TIME ZONE 'America/Sao_Paulo')::date, created_by
+        FROM public.demands
+        UNION ALL
+        SELECT cabinet_id, 'events_created', (created_at AT TIME ZONE 'America/Sao_Paulo')::date, created_by
+        FROM public.events
+        UNION ALL
+        SELECT cabinet_id, 'events_scheduled', date, NULL
+        FROM public.events
+        UNION ALL
+        SELECT cabinet_id, 'accesses', (accessed_at AT TIME ZONE 'America/Sao_Paulo')::date, user_id
+        FROM public.system_access_logs
+    ) r
+    WHERE cabinet_id IS NOT NULL AND day IS NOT NULL
+      AND (p_cabinet_id IS NULL OR cabinet_id = p_cabinet_id)
+    GROUP BY 1, 2, 3, 4;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Maintenance RPC for the worker (service role) only: it refreshes every tenant
+REVOKE EXECUTE ON FUNCTION public.refresh_cabinet_stats(UUID) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.refresh_cabinet_stats(UUID) TO service_role;
+
+SELECT public.refresh_cabinet_stats();
@@ -0,0 +1,106 @@
+-- Migration: Server-side bulk voter import (CSV/XLSX)
+-- Description: ImportVotersModal used to parse the spreadsheet in the browser and insert
+-- voters one by one. The file is now uploaded to the private `voter-imports` bucket
+-- (under <cabinet_id>/...) and a background task `import_voters` streams it, loads it
+-- with COPY in chunks and deduplicates against existing voters by CPF (or phone, for
+-- rows without a CPF). Progress and the rejected-rows file are tracked here.
+
+CREATE TABLE IF NOT EXISTS public.voter_imports (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    cabinet_id UUID NOT NULL REFERENCES public.cabinets(id) ON DELETE CASCADE,
+    bucket TEXT NOT NULL DEFAULT 'voter-imports',
+    path TEXT NOT NULL, -- object path of the uploaded spreadsheet
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'paused', 'completed', 'failed')),
+    total_rows INT DEFAULT 0, -- estimate until the file has been read to the end
+    processed_rows INT DEFAULT 0, -- data rows consumed (checkpoint: a resumed run skips these)
+    inserted_rows INT DEFAULT 0,
+    duplicate_rows INT DEFAULT 0,
+    error_rows INT DEFAULT 0,
+    rows_per_second FLOAT,
+    error_file_path TEXT, -- CSV with line, reason and original values of every rejected row
+    error_details TEXT,
+    created_by UUID REFERENCES public.profiles(id),
+    started_at TIMESTAMP WITH TIME ZONE,
+    completed_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_voter_imports_cabinet ON public.voter_imports(cabinet_id, created_at DESC);
+
+CREATE TRIGGER update_voter_imports_updated_at
+    BEFORE UPDATE ON public.voter_imports
+    FOR EACH ROW
+    EXECUTE PROCEDURE public.update_updated_at_column();
+
+ALTER TABLE public.voter_imports ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users view their cabinet voter imports" ON public.voter_imports
+    FOR SELECT USING (cabinet_id = public.get_user_cabinet_id());
+
+-- The worker downloads `path` with the service key: only the cabinet's own upload folder
+CREATE POLICY "Users create voter imports for their cabinet" ON public.voter_imports
+    FOR INSERT WITH CHECK (
+        cabinet_id = public.get_user_cabinet_id()
+        AND bucket = 'voter-imports'
+        AND (storage.foldername(path))[1] = cabinet_id::text
+        AND path NOT LIKE '%..%'
+    );
+
+CREATE POLICY "Service Role manages voter imports" ON public.voter_imports
+    FOR ALL USING (auth.role() = 'service_role');
+
+-- Digits-only CPF / national phone number (DDD + number, without +55 or trunk 0).
+-- The worker normalizes imported values the same way (tasks/voter_import.py), and the
+-- expression indexes below make the dedupe lookups index scans whatever format older
+-- rows were typed in.
+-- 9-10 digits: leading zeros dropped by a numeric spreadsheet cell (as tasks/voter_import.normalize_cpf)
+CREATE OR REPLACE FUNCTION public.normalize_cpf(value TEXT)
+RETURNS TEXT AS $$
+    SELECT NULLIF(
+        CASE WHEN length(digits) IN (9, 10) THEN lpad(digits, 11, '0') ELSE digits END,
+        ''
+    )
+    FROM (SELECT regexp_replace(value, '\D', '', 'g') AS digits) AS d;
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION public.normalize_phone(value TEXT)
+RETURNS TEXT AS $$
+    SELECT NULLIF(
+        CASE
+            WHEN digits ~ '^55\d{10,11}$' THEN substr(digits, 3)
+            ELSE ltrim(digits, '0')
+        END,
+        ''
+    )
+    FROM (SELECT regexp_replace(value, '\D', '', 'g') AS digits) AS d;
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE INDEX IF NOT EXISTS idx_voters_cabinet_cpf_normalized
+ON public.voters (cabinet_id, public.normalize_cpf(cpf))
+WHERE public.normalize_cpf(cpf) IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_voters_cabinet_phone_normalized
+ON public.voters (cabinet_id, public.normalize_phone(phone))
+WHERE public.normalize_phone(phone) IS NOT NULL;
+
+-- Private bucket for uploaded spreadsheets and the generated error files
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('voter-imports', 'voter-imports', false)
+ON CONFLICT (id) DO NOTHING;
+
+CREATE POLICY "Users upload voter imports to their cabinet folder"
+ON storage.objects FOR INSERT
+TO authenticated
+WITH CHECK (
+  bucket_id = 'voter-imports'
+  AND (storage.foldername(name))[1] = public.get_user_cabinet_id()::text
+);
+
+CREATE POLICY "Users read voter imports of their cabinet"
+ON storage.objects FOR SELECT
+TO authenticated
+USING (
+  bucket_id = 'voter-imports'
+  AND (storage.foldername(name))[1] = public.get_user_cabinet_id()::text
+);
@@ -0,0 +1,68 @@
+-- Migration: Trigram and full-text search for voters and demands
+-- Description: Searches were leading-wildcard ILIKE ('%centro%'), which no B-tree index
+-- can serve, so each one scanned every row of the tenant. This adds:
+--   * pg_trgm GIN indexes for substring filters (neighborhood, city, demand title) and
+--     accent/case-insensitive name matching through public.search_normalize();
+--   * a weighted, unaccented Portuguese tsvector (search_vector) on voters
+--     (name, neighborhood, address) and demands (title, description, beneficiary).
+-- app.services.search_service builds its queries on exactly these expressions.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA extensions;
+CREATE EXTENSION IF NOT EXISTS unaccent WITH SCHEMA extensions;
+
+-- unaccent() is only STABLE (it looks the dictionary up by name); pinning the
+-- dictionary makes it usable in index expressions
+CREATE OR REPLACE FUNCTION public.search_normalize(value TEXT)
+RETURNS TEXT AS $$
+    SELECT lower(extensions.unaccent('extensions.unaccent'::regdictionary, value));
+$$ LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE;
+
+-- Portuguese stemming after stripping accents: "saúde", "Saude" and "SAÚDE" index alike
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'pt_unaccent') THEN
+        CREATE TEXT SEARCH CONFIGURATION public.pt_unaccent (COPY = pg_catalog.portuguese);
+        ALTER TEXT SEARCH CONFIGURATION public.pt_unaccent
+            ALTER MAPPING FOR hword, hword_part, word
+            WITH extensions.unaccent, portuguese_stem;
+    END IF;
+END
+$$;
+
+-- Voters: name weighs most, then neighborhood, then the street address
+ALTER TABLE public.voters
+ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('public.pt_unaccent'::regconfig, coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('public.pt_unaccent'::regconfig, coalesce(neighborhood, '')), 'B') ||
+    setweight(to_tsvector('public.pt_unaccent'::regconfig, coalesce(address, '')), 'C')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_voters_search_vector ON public.voters USING gin (search_vector);
+
+-- Fuzzy / substring name matching and autocomplete
+CREATE INDEX IF NOT EXISTS idx_voters_name_trgm
+ON public.voters USING gin (public.search_normalize(name) extensions.gin_trgm_ops);
+
+-- Name-start prefixes too short for trigrams (1-2 characters)
+CREATE INDEX IF NOT EXISTS idx_voters_cabinet_name_prefix
+ON public.voters (cabinet_id, public.search_normalize(name) text_pattern_ops);
+
+-- Report filters: ilike('neighborhood', '%...%') / ilike('city', '%...%') as the frontend sends them
+CREATE INDEX IF NOT EXISTS idx_voters_neighborhood_trgm
+ON public.voters USING gin (neighborhood extensions.gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_voters_city_trgm
+ON public.voters USING gin (city extensions.gin_trgm_ops);
+
+-- Demands: title, then description, then beneficiary
+ALTER TABLE public.demands
+ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('public.pt_unaccent'::regconfig, coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('public.pt_unaccent'::regconfig, coalesce(description, '')), 'B') ||
+    setweight(to_tsvector('public.pt_unaccent'::regconfig, coalesce(beneficiary, '')), 'C')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_demands_search_vector ON public.demands USING gin (search_vector);
+
+CREATE INDEX IF NOT EXISTS idx_demands_title_trgm
+ON public.demands USING gin (public.search_normalize(title) extensions.gin_trgm_ops);
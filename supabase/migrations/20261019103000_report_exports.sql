@@ -0,0 +1,59 @@
+-- Migration: Server-side report exports (CSV, XLSX, Parquet)
+-- Description: Report exports were built in the browser from full JSON fetches, which
+-- crashed tabs and held long PostgREST requests on large bases. The app now inserts a
+-- report_exports row and enqueues a background task `export_report`; the worker streams
+-- the rows with a server-side cursor, writes the file incrementally, uploads it to the
+-- private `report-exports` bucket (under <cabinet_id>/...) and writes a signed download
+-- link back here.
+
+CREATE TABLE IF NOT EXISTS public.report_exports (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    cabinet_id UUID NOT NULL REFERENCES public.cabinets(id) ON DELETE CASCADE,
+    report TEXT NOT NULL CHECK (report IN ('voters', 'demands')),
+    format TEXT NOT NULL DEFAULT 'csv' CHECK (format IN ('csv', 'xlsx', 'parquet')),
+    filters JSONB NOT NULL DEFAULT '{}'::jsonb,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'completed', 'failed')),
+    total_rows INT DEFAULT 0,
+    exported_rows INT DEFAULT 0,
+    file_path TEXT,
+    file_bytes BIGINT,
+    download_url TEXT,
+    expires_at TIMESTAMP WITH TIME ZONE, -- of download_url; the file itself stays until deleted
+    error_details TEXT,
+    created_by UUID REFERENCES public.profiles(id),
+    started_at TIMESTAMP WITH TIME ZONE,
+    completed_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_report_exports_cabinet ON public.report_exports(cabinet_id, created_at DESC);
+
+CREATE TRIGGER update_report_exports_updated_at
+    BEFORE UPDATE ON public.report_exports
+    FOR EACH ROW
+    EXECUTE PROCEDURE public.update_updated_at_column();
+
+ALTER TABLE public.report_exports ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users view their cabinet report exports" ON public.report_exports
+    FOR SELECT USING (cabinet_id = public.get_user_cabinet_id());
+
+CREATE POLICY "Users create report exports for their cabinet" ON public.report_exports
+    FOR INSERT WITH CHECK (cabinet_id = public.get_user_cabinet_id());
+
+CREATE POLICY "Service Role manages report exports" ON public.report_exports
+    FOR ALL USING (auth.role() = 'service_role');
+
+-- Private bucket for generated files
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('report-exports', 'report-exports', false)
+ON CONFLICT (id) DO NOTHING;
+
+CREATE POLICY "Users read report exports of their cabinet"
+ON storage.objects FOR SELECT
+TO authenticated
+USING (
+  bucket_id = 'report-exports'
+  AND (storage.foldername(name))[1] = public.get_user_cabinet_id()::text
+);
@@ -0,0 +1,190 @@
+-- Migration: Neighborhood heatmap backend (geocoding cache + precomputed density)
+-- Description: The dashboard map hardcoded six neighborhood coordinates, placed every
+-- other neighborhood at a random offset and counted voters in the browser. Now:
+--   * geocoded_places caches neighborhood/city -> lat/lng, filled once from a local
+--     gazetteer file by the worker (tasks/gazetteer_import.py);
+--   * the cabinet_stats triggers also count voters and demands per (city, neighborhood),
+--     so density is maintained incrementally by every write;
+--   * app.services.geo_density_service joins those counts with the cache, aggregates by
+--     neighborhood or H3/geohash cell and stores the small map payload per cabinet in
+--     cabinet_geo_density, recomputed only when its inputs moved.
+
+-- Demands get an optional location so they can be mapped too
+ALTER TABLE public.demands ADD COLUMN IF NOT EXISTS neighborhood TEXT;
+ALTER TABLE public.demands ADD COLUMN IF NOT EXISTS city TEXT;
+
+-- Comparable place name: trimmed, single-spaced, lowercase, accent-free ('' for none)
+CREATE OR REPLACE FUNCTION public.place_key(value TEXT)
+RETURNS TEXT AS $$
+    SELECT COALESCE(public.search_normalize(regexp_replace(btrim(value), '\s+', ' ', 'g')), '');
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+-- cabinet_stats key of a place: 'city|neighborhood' as typed (trimmed)
+CREATE OR REPLACE FUNCTION public.place_stats_key(p_city TEXT, p_neighborhood TEXT)
+RETURNS TEXT AS $$
+    SELECT COALESCE(btrim(p_city), '') || '|' || COALESCE(btrim(p_neighborhood), '');
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE TABLE IF NOT EXISTS public.geocoded_places (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    city TEXT NOT NULL,
+    neighborhood TEXT, -- NULL: centroid of the city itself
+    state TEXT, -- UF
+    lat DOUBLE PRECISION NOT NULL,
+    lng DOUBLE PRECISION NOT NULL,
+    source TEXT NOT NULL DEFAULT 'gazetteer',
+    city_key TEXT GENERATED ALWAYS AS (public.place_key(city)) STORED,
+    neighborhood_key TEXT GENERATED ALWAYS AS (public.place_key(neighborhood)) STORED,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_geocoded_places_key ON public.geocoded_places(city_key, neighborhood_key);
+CREATE INDEX IF NOT EXISTS idx_geocoded_places_updated_at ON public.geocoded_places(updated_at);
+
+CREATE TRIGGER update_geocoded_places_updated_at
+    BEFORE UPDATE ON public.geocoded_places
+    FOR EACH ROW
+    EXECUTE PROCEDURE public.update_updated_at_column();
+
+ALTER TABLE public.geocoded_places ENABLE ROW LEVEL SECURITY;
+
+-- Public reference data
+CREATE POLICY "Authenticated users read geocoded places" ON public.geocoded_places
+    FOR SELECT TO authenticated USING (true);
+
+CREATE POLICY "Service Role manages geocoded places" ON public.geocoded_places
+    FOR ALL USING (auth.role() = 'service_role');
+
+-- Precomputed map payloads; level is 'neighborhood', 'geohash:<precision>' or 'h3:<resolution>'
+CREATE TABLE IF NOT EXISTS public.cabinet_geo_density (
+    cabinet_id UUID REFERENCES public.cabinets(id) ON DELETE CASCADE NOT NULL,
+    level TEXT NOT NULL,
+    payload JSONB NOT NULL,
+    watermark TIMESTAMP WITH TIME ZONE NOT NULL, -- newest input (counts, gazetteer) the payload reflects
+    computed_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    PRIMARY KEY (cabinet_id, level)
+);
+
+ALTER TABLE public.cabinet_geo_density ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Tenant Isolation: Cabinet Geo Density" ON public.cabinet_geo_density
+    FOR SELECT USING (cabinet_id = public.get_user_cabinet_id());
+
+CREATE POLICY "Service Role manages cabinet geo density" ON public.cabinet_geo_density
+    FOR ALL USING (auth.role() = 'service_role');
+
+-- Counter changes are stamped with clock_timestamp(), not now(): now() is the transaction
+-- start, so a long transaction (an import chunk) would commit changes stamped before a
+-- payload watermark stored meanwhile. The service still treats the last few minutes as
+-- unsettled (COMMIT_GRACE in app/services/geo_density_service.py).
+ALTER TABLE public.cabinet_stats ALTER COLUMN updated_at SET DEFAULT clock_timestamp();
+
+CREATE OR REPLACE FUNCTION public.cabinet_stats_upsert(p_op TEXT, p_keys TEXT)
+RETURNS TEXT AS $$
+    SELECT format($q$
+        INSERT INTO public.cabinet_stats AS s (cabinet_id, metric, key, value)
+        SELECT r.cabinet_id, k.metric, k.key, sum(r.delta)
+        FROM (%s) r
+        CROSS JOIN LATERAL (VALUES %s) AS k(metric, key)
+        WHERE r.cabinet_id IS NOT NULL
+        GROUP BY 1, 2, 3
+        HAVING sum(r.delta) <> 0
+        ORDER BY 1, 2, 3
+        ON CONFLICT (cabinet_id, metric, key)
+        DO UPDATE SET value = s.value + EXCLUDED.value, updated_at = clock_timestamp()
+    $q$, public.cabinet_stats_changes(p_op), p_keys);
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Counters per place, next to the existing ones (see 20261019100000_cabinet_stats.sql)
+CREATE OR REPLACE FUNCTION public.cabinet_stats_voters()
+RETURNS TRIGGER AS $$
+BEGIN
+    EXECUTE public.cabinet_stats_upsert(
+        TG_OP,
+        $k$('voters', ''), ('voters_by_category', COALESCE(r.category, '')),
+           ('voters_by_place', public.place_stats_key(r.city, r.neighborhood))$k$
+    );
+    EXECUTE public.cabinet_daily_stats_upsert(
+        TG_OP,
+        $k$('voters_created', (r.created_at AT TIME ZONE 'America/Sao_Paulo')::date, r.created_by)$k$
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION public.cabinet_stats_demands()
+RETURNS TRIGGER AS $$
+BEGIN
+    EXECUTE public.cabinet_stats_upsert(
+        TG_OP,
+        $k$('demands_by_status', COALESCE(r.status, '')),
+           ('demands_by_place', public.place_stats_key(r.city, r.neighborhood))$k$
+    );
+    EXECUTE public.cabinet_daily_stats_upsert(
+        TG_OP,
+        $k$('demands_created', (r.created_at AT TIME ZONE 'America/Sao_Paulo')::date, r.created_by)$k$
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION public.refresh_cabinet_stats(p_cabinet_id UUID DEFAULT NULL)
+RETURNS VOID AS $$
+BEGIN
+    LOCK TABLE public.voters, public.demands, public.events, public.system_access_logs IN SHARE MODE;
+
+    DELETE FROM public.cabinet_stats WHERE p_cabinet_id IS NULL OR cabinet_id = p_cabinet_id;
+    DELETE FROM public.cabinet_daily_stats WHERE p_cabinet_id IS NULL OR cabinet_id = p_cabinet_id;
+
+    INSERT INTO public.cabinet_stats (cabinet_id, metric, key, value)
+    SELECT cabinet_id, 'voters', '', count(*) FROM public.voters
+    WHERE p_cabinet_id IS NULL OR cabinet_id = p_cabinet_id GROUP BY 1
+    UNION ALL
+    SELECT cabinet_id, 'voters_by_category', COALESCE(category, ''), count(*) FROM public.voters
+    WHERE p_cabinet_id IS NULL OR cabinet_id = p_cabinet_id GROUP BY 1, 3
+    UNION ALL
+    SELECT cabinet_id, 'voters_by_place', public.place_stats_key(city, neighborhood), count(*) FROM public.voters
+    WHERE p_cabinet_id IS NULL OR cabinet_id = p_cabinet_id GROUP BY 1, 3
+    UNION ALL
+    SELECT cabinet_id, 'demands_by_status', COALESCE(status, ''), count(*) FROM public.demands
+    WHERE p_cabinet_id IS NULL OR cabinet_id = p_cabinet_id GROUP BY 1, 3
+    UNION ALL
+    SELECT cabinet_id, 'demands_by_place', public.place_stats_key(city, neighborhood), count(*) FROM public.demands
+    WHERE p_cabinet_id IS NULL OR cabinet_id = p_cabinet_id GROUP BY 1, 3;
+
+    INSERT INTO public.cabinet_daily_stats (cabinet_id, metric, day, user_id, value)
+    SELECT cabinet_id, metric, day, COALESCE(user_id, '00000000-0000-0000-0000-000000000000'), count(*)
+    FROM (
+        SELECT cabinet_id, 'voters_created' AS metric, (created_at AT TIME ZONE 'America/Sao_Paulo')::date AS day, created_by AS user_id
+        FROM public.voters
+        UNION ALL
+        SELECT cabinet_id, 'demands_created', (created_at AT TIME ZONE 'America/Sao_Paulo')::date, created_by
+        FROM public.demands
+        UNION ALL
+        SELECT cabinet_id, 'events_created', (created_at AT TIME ZONE 'America/Sao_Paulo')::date, created_by
+        FROM public.events
+        UNION ALL
+        SELECT cabinet_id, 'events_scheduled', date, NULL
+        FROM public.events
+        UNION ALL
+        SELECT cabinet_id, 'accesses', (accessed_at AT TIME ZONE 'America/Sao_Paulo')::date, user_id
+        FROM public.system_access_logs
+    ) r
+    WHERE cabinet_id IS NOT NULL AND day IS NOT NULL
+      AND (p_cabinet_id IS NULL OR cabinet_id = p_cabinet_id)
+    GROUP BY 1, 2, 3, 4;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill only the new metrics; writers wait until the migration commits
+LOCK TABLE public.voters, public.demands IN SHARE MODE;
+
+DELETE FROM public.cabinet_stats WHERE metric IN ('voters_by_place', 'demands_by_place');
+
+INSERT INTO public.cabinet_stats (cabinet_id, metric, key, value)
+SELECT cabinet_id, 'voters_by_place', public.place_stats_key(city, neighborhood), count(*)
+FROM public.voters WHERE cabinet_id IS NOT NULL GROUP BY 1, 3
+UNION ALL
+SELECT cabinet_id, 'demands_by_place', public.place_stats_key(city, neighborhood), count(*)
+FROM public.demands WHERE cabinet_id IS NOT NULL GROUP BY 1, 3;
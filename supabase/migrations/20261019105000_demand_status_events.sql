@@ -0,0 +1,251 @@
+-- Migration: Demand status history and daily SLA / throughput rollups
+-- Description: demands only hold their current status, so time to resolution, backlog
+-- by assignee and weekly throughput needed full scans (and could not be answered for
+-- the past at all). Now:
+--   * demand_status_events is an append-only log written by statement-level triggers
+--     whenever a demand is created, deleted, or changes status, assignee or category
+--     (the last two move it between backlogs);
+--   * demand_daily_rollups holds per cabinet / local day / category / assignee counts
+--     (opened, closed, reopened, resolution time, backlog delta), folded in
+--     incrementally by refresh_demand_rollups() from the worker
+--     (tasks/demand_rollups.py), the same way as agent_log_rollups_hourly;
+--   * app.services.demand_analytics_service reads the rollups.
+-- A demand is open when its status is set and is not 'Concluída' (as on the dashboard).
+
+CREATE TABLE IF NOT EXISTS public.demand_status_events (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    cabinet_id UUID NOT NULL REFERENCES public.cabinets(id) ON DELETE CASCADE,
+    demand_id BIGINT NOT NULL, -- no FK: the history outlives deleted demands
+    event TEXT NOT NULL CHECK (event IN ('created', 'changed', 'deleted')),
+    from_status TEXT,
+    to_status TEXT,
+    from_category TEXT,
+    to_category TEXT,
+    from_assigned_to TEXT,
+    to_assigned_to TEXT,
+    demand_created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    changed_by UUID, -- auth.uid() of the writer; NULL for service writes
+    changed_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_demand_status_events_demand ON public.demand_status_events(cabinet_id, demand_id, id);
+CREATE INDEX IF NOT EXISTS idx_demand_status_events_changed_at ON public.demand_status_events(changed_at);
+
+ALTER TABLE public.demand_status_events ENABLE ROW LEVEL SECURITY;
+
+-- Read-only for users: rows come from the triggers below (SECURITY DEFINER)
+CREATE POLICY "Tenant Isolation: Demand Status Events" ON public.demand_status_events
+    FOR SELECT USING (cabinet_id = public.get_user_cabinet_id());
+
+CREATE POLICY "Service Role manages demand status events" ON public.demand_status_events
+    FOR ALL USING (auth.role() = 'service_role');
+
+CREATE OR REPLACE FUNCTION public.demand_is_open(p_status TEXT)
+RETURNS BOOLEAN AS $$
+    SELECT p_status IS NOT NULL AND p_status <> 'Concluída';
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION public.demand_status_events_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO public.demand_status_events
+        (cabinet_id, demand_id, event, to_status, to_category, to_assigned_to, demand_created_at, changed_by)
+    SELECT n.cabinet_id, n.id, 'created', n.status, n.category, n.assigned_to, COALESCE(n.created_at, now()),
+           COALESCE(auth.uid(), n.created_by)
+    FROM new_rows n
+    WHERE n.cabinet_id IS NOT NULL
+    ORDER BY n.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION public.demand_status_events_update()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO public.demand_status_events
+        (cabinet_id, demand_id, event, from_status, to_status, from_category, to_category,
+         from_assigned_to, to_assigned_to, demand_created_at, changed_by)
+    SELECT n.cabinet_id, n.id, 'changed', o.status, n.status, o.category, n.category,
+           o.assigned_to, n.assigned_to, COALESCE(n.created_at, now()), auth.uid()
+    FROM new_rows n
+    JOIN old_rows o ON o.id = n.id
+    WHERE n.cabinet_id IS NOT NULL
+      AND (o.status IS DISTINCT FROM n.status
+           OR o.category IS DISTINCT FROM n.category
+           OR o.assigned_to IS DISTINCT FROM n.assigned_to)
+    ORDER BY n.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION public.demand_status_events_delete()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO public.demand_status_events
+        (cabinet_id, demand_id, event, from_status, from_category, from_assigned_to, demand_created_at, changed_by)
+    SELECT o.cabinet_id, o.id, 'deleted', o.status, o.category, o.assigned_to, COALESCE(o.created_at, now()), auth.uid()
+    FROM old_rows o
+    WHERE o.cabinet_id IS NOT NULL
+    ORDER BY o.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS demands_status_events_insert ON public.demands;
+DROP TRIGGER IF EXISTS demands_status_events_update ON public.demands;
+DROP TRIGGER IF EXISTS demands_status_events_delete ON public.demands;
+
+CREATE TRIGGER demands_status_events_insert
+    AFTER INSERT ON public.demands REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.demand_status_events_insert();
+
+CREATE TRIGGER demands_status_events_update
+    AFTER UPDATE ON public.demands REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.demand_status_events_update();
+
+CREATE TRIGGER demands_status_events_delete
+    AFTER DELETE ON public.demands REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.demand_status_events_delete();
+
+-- Daily rollups --------------------------------------------------------------
+-- Days are local (America/Sao_Paulo); NULL category / assignee are ''.
+-- backlog_delta: demands that became open (+) or stopped being open (-) under this
+-- category and assignee that day, so sum(backlog_delta) up to a day is the backlog then.
+
+CREATE TABLE IF NOT EXISTS public.demand_daily_rollups (
+    cabinet_id UUID REFERENCES public.cabinets(id) ON DELETE CASCADE NOT NULL,
+    day DATE NOT NULL,
+    category TEXT NOT NULL DEFAULT '',
+    assigned_to TEXT NOT NULL DEFAULT '',
+    opened BIGINT NOT NULL DEFAULT 0,
+    closed BIGINT NOT NULL DEFAULT 0,
+    reopened BIGINT NOT NULL DEFAULT 0,
+    resolution_seconds_sum BIGINT NOT NULL DEFAULT 0, -- creation -> 'Concluída', over `closed`
+    resolution_seconds_max BIGINT,
+    backlog_delta BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (cabinet_id, day, category, assigned_to)
+);
+
+-- Single-row watermark: events before rolled_up_to are already counted
+CREATE TABLE IF NOT EXISTS public.demand_rollup_state (
+    id BOOLEAN PRIMARY KEY DEFAULT true CHECK (id),
+    rolled_up_to TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+INSERT INTO public.demand_rollup_state (id, rolled_up_to)
+VALUES (true, '1970-01-01 00:00:00+00')
+ON CONFLICT (id) DO NOTHING;
+
+ALTER TABLE public.demand_daily_rollups ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.demand_rollup_state ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Tenant Isolation: Demand Daily Rollups" ON public.demand_daily_rollups
+    FOR SELECT USING (cabinet_id = public.get_user_cabinet_id());
+
+CREATE POLICY "Service Role manages demand daily rollups" ON public.demand_daily_rollups
+    FOR ALL USING (auth.role() = 'service_role');
+
+CREATE POLICY "Service Role manages demand rollup state" ON public.demand_rollup_state
+    FOR ALL USING (auth.role() = 'service_role');
+
+-- Folds events between the watermark and now() - p_grace into the daily rollups
+-- (writers still in flight get the grace period to commit).
+-- Returns the number of rollup rows inserted or updated.
+CREATE OR REPLACE FUNCTION public.refresh_demand_rollups(p_grace INTERVAL DEFAULT INTERVAL '2 minutes')
+RETURNS BIGINT AS $$
+DECLARE
+    window_start TIMESTAMP WITH TIME ZONE;
+    window_end TIMESTAMP WITH TIME ZONE := now() - p_grace;
+    affected BIGINT;
+BEGIN
+    SELECT rolled_up_to INTO window_start
+    FROM public.demand_rollup_state
+    WHERE id
+    FOR UPDATE SKIP LOCKED;
+
+    -- Another worker holds the watermark, or nothing new to roll up
+    IF window_start IS NULL OR window_end <= window_start THEN
+        RETURN 0;
+    END IF;
+
+    INSERT INTO public.demand_daily_rollups AS d
+        (cabinet_id, day, category, assigned_to, opened, closed, reopened,
+         resolution_seconds_sum, resolution_seconds_max, backlog_delta)
+    SELECT cabinet_id, day, category, assigned_to, sum(opened), sum(closed), sum(reopened),
+           COALESCE(sum(resolution_seconds), 0), max(resolution_seconds), sum(backlog_delta)
+    FROM (
+        -- Where the demand is now (new category / assignee)
+        SELECT e.cabinet_id,
+               (e.changed_at AT TIME ZONE 'America/Sao_Paulo')::date AS day,
+               COALESCE(e.to_category, '') AS category,
+               COALESCE(e.to_assigned_to, '') AS assigned_to,
+               (e.event = 'created')::int AS opened,
+               (e.event = 'changed' AND e.to_status = 'Concluída'
+                AND e.from_status IS DISTINCT FROM 'Concluída')::int AS closed,
+               (e.event = 'changed' AND e.from_status = 'Concluída'
+                AND public.demand_is_open(e.to_status))::int AS reopened,
+               CASE WHEN e.event = 'changed' AND e.to_status = 'Concluída'
+                         AND e.from_status IS DISTINCT FROM 'Concluída'
+                    THEN GREATEST(extract(epoch FROM e.changed_at - e.demand_created_at), 0)::bigint
+               END AS resolution_seconds,
+               public.demand_is_open(e.to_status)::int AS backlog_delta
+        FROM public.demand_status_events e
+        WHERE e.event <> 'deleted' AND e.changed_at >= window_start AND e.changed_at < window_end
+        UNION ALL
+        -- Where it was: leaves that backlog
+        SELECT e.cabinet_id,
+               (e.changed_at AT TIME ZONE 'America/Sao_Paulo')::date,
+               COALESCE(e.from_category, ''),
+               COALESCE(e.from_assigned_to, ''),
+               0, 0, 0, NULL, -1
+        FROM public.demand_status_events e
+        WHERE e.event <> 'created' AND public.demand_is_open(e.from_status)
+          AND e.changed_at >= window_start AND e.changed_at < window_end
+    ) x
+    GROUP BY 1, 2, 3, 4
+    ORDER BY 1, 2, 3, 4
+    ON CONFLICT (cabinet_id, day, category, assigned_to)
+    DO UPDATE SET
+        opened = d.opened + EXCLUDED.opened,
+        closed = d.closed + EXCLUDED.closed,
+        reopened = d.reopened + EXCLUDED.reopened,
+        resolution_seconds_sum = d.resolution_seconds_sum + EXCLUDED.resolution_seconds_sum,
+        resolution_seconds_max = GREATEST(d.resolution_seconds_max, EXCLUDED.resolution_seconds_max),
+        backlog_delta = d.backlog_delta + EXCLUDED.backlog_delta;
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+
+    UPDATE public.demand_rollup_state SET rolled_up_to = window_end WHERE id;
+    RETURN affected;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Maintenance RPC for the worker (service role) only: it refreshes every tenant
+REVOKE EXECUTE ON FUNCTION public.refresh_demand_rollups(INTERVAL) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.refresh_demand_rollups(INTERVAL) TO service_role;
+
+-- Backfill: existing demands have no history, so reconstruct the minimum. Each one is
+-- created with its current status at created_at; closed ones are assumed to have
+-- been 'Pendente' until their last update. demands.created_at is nullable: such rows
+-- fall back to their last update, else to now (as the triggers above do).
+LOCK TABLE public.demands IN SHARE MODE;
+
+INSERT INTO public.demand_status_events
+    (cabinet_id, demand_id, event, to_status, to_category, to_assigned_to, demand_created_at, changed_by, changed_at)
+SELECT cabinet_id, id, 'created',
+       CASE WHEN status = 'Concluída' THEN 'Pendente' ELSE status END,
+       category, assigned_to, COALESCE(created_at, updated_at, now()), created_by, COALESCE(created_at, updated_at, now())
+FROM public.demands
+WHERE cabinet_id IS NOT NULL
+ORDER BY id;
+
+INSERT INTO public.demand_status_events
+    (cabinet_id, demand_id, event, from_status, to_status, from_category, to_category,
+     from_assigned_to, to_assigned_to, demand_created_at, changed_at)
+SELECT cabinet_id, id, 'changed', 'Pendente', status, category, category,
+       assigned_to, assigned_to, COALESCE(created_at, updated_at, now()), COALESCE(GREATEST(updated_at, created_at), now())
+FROM public.demands
+WHERE cabinet_id IS NOT NULL AND status = 'Concluída'
+ORDER BY id;
+
+SELECT public.refresh_demand_rollups();
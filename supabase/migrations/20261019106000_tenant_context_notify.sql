@@ -0,0 +1,57 @@
+-- Migration: Tenant context invalidation (feature flags + NOTIFY)
+-- Description: The worker and services keep a TenantContext per cabinet (plan, status,
+-- agent configuration, feature flags, credential availability) in an LRU
+-- (app/services/tenant_context.py) instead of reloading the cabinet on every
+-- operation. These triggers publish the cabinet id on the `tenant_context` channel
+-- whenever something a context holds changes, so caches drop it right away.
+
+-- Per-cabinet feature switches, e.g. {"birthday_greetings": true}
+ALTER TABLE public.cabinets ADD COLUMN IF NOT EXISTS feature_flags JSONB NOT NULL DEFAULT '{}'::jsonb;
+
+CREATE OR REPLACE FUNCTION public.notify_tenant_context()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed UUID;
+BEGIN
+    IF TG_TABLE_NAME = 'cabinets' THEN
+        changed := COALESCE(NEW.id, OLD.id);
+    ELSE
+        changed := COALESCE(NEW.cabinet_id, OLD.cabinet_id);
+    END IF;
+    -- Identical payloads within a transaction are delivered once
+    PERFORM pg_notify('tenant_context', changed::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS cabinets_tenant_context_update ON public.cabinets;
+DROP TRIGGER IF EXISTS cabinets_tenant_context_delete ON public.cabinets;
+DROP TRIGGER IF EXISTS agent_configurations_tenant_context ON public.agent_configurations;
+
+-- Only columns a TenantContext holds; e.g. Google access token refreshes stay quiet
+CREATE TRIGGER cabinets_tenant_context_update
+    AFTER UPDATE ON public.cabinets
+    FOR EACH ROW
+    WHEN (
+        OLD.name IS DISTINCT FROM NEW.name
+        OR OLD.plan IS DISTINCT FROM NEW.plan
+        OR OLD.plan_tier IS DISTINCT FROM NEW.plan_tier
+        OR OLD.status IS DISTINCT FROM NEW.status
+        OR OLD.official_name IS DISTINCT FROM NEW.official_name
+        OR OLD.feature_flags IS DISTINCT FROM NEW.feature_flags
+        OR OLD.gemini_api_key IS DISTINCT FROM NEW.gemini_api_key
+        OR OLD.openai_api_key IS DISTINCT FROM NEW.openai_api_key
+        OR OLD.gov_credentials IS DISTINCT FROM NEW.gov_credentials
+        OR OLD.google_refresh_token IS DISTINCT FROM NEW.google_refresh_token
+    )
+    EXECUTE PROCEDURE public.notify_tenant_context();
+
+CREATE TRIGGER cabinets_tenant_context_delete
+    AFTER DELETE ON public.cabinets
+    FOR EACH ROW
+    EXECUTE PROCEDURE public.notify_tenant_context();
+
+CREATE TRIGGER agent_configurations_tenant_context
+    AFTER INSERT OR UPDATE OR DELETE ON public.agent_configurations
+    FOR EACH ROW
+    EXECUTE PROCEDURE public.notify_tenant_context();
@@ -0,0 +1,21 @@
+-- Migration: Daily birthday notifications
+-- Description: Birthday lists were computed on every dashboard/report open by fetching
+-- all voters. The worker now runs a daily job (tasks/birthday_notifications.py) that,
+-- per cabinet, reads today's and upcoming birthdays through idx_voters_cabinet_birthday
+-- and writes one notification per voter and birthday with a single bulk insert; the
+-- dashboard reads that small set. Cabinets with the `birthday_greetings` feature flag
+-- also get rate-limited WhatsApp greeting tasks (send_birthday_greeting).
+
+ALTER TABLE public.notifications
+    ADD COLUMN IF NOT EXISTS voter_id BIGINT REFERENCES public.voters(id) ON DELETE CASCADE;
+ALTER TABLE public.notifications ADD COLUMN IF NOT EXISTS event_date DATE;
+
+-- One notification per voter, kind and date: re-runs of the job insert nothing twice
+CREATE UNIQUE INDEX IF NOT EXISTS idx_notifications_voter_event
+ON public.notifications(cabinet_id, type, voter_id, event_date)
+WHERE voter_id IS NOT NULL;
+
+-- Dashboard: upcoming events of a kind
+CREATE INDEX IF NOT EXISTS idx_notifications_cabinet_type_event_date
+ON public.notifications(cabinet_id, type, event_date)
+WHERE event_date IS NOT NULL;
@@ -0,0 +1,30 @@
+-- Migration: Per-cabinet WhatsApp instance
+-- Description: The worker used one Evolution API instance (EVOLUTION_INSTANCE) for every
+-- cabinet, so all tenants' citizens would have been answered from the same number.
+-- Each cabinet now names its own instance; cabinets without one keep the
+-- non-streaming path (n8n sends the reply) and get no birthday greetings.
+
+ALTER TABLE public.cabinets ADD COLUMN IF NOT EXISTS whatsapp_instance TEXT;
+
+COMMENT ON COLUMN public.cabinets.whatsapp_instance IS 'Evolution API instance connected to the cabinet''s WhatsApp number';
+
+-- The instance is part of the TenantContext: invalidate cached contexts when it changes
+DROP TRIGGER IF EXISTS cabinets_tenant_context_update ON public.cabinets;
+
+CREATE TRIGGER cabinets_tenant_context_update
+    AFTER UPDATE ON public.cabinets
+    FOR EACH ROW
+    WHEN (
+        OLD.name IS DISTINCT FROM NEW.name
+        OR OLD.plan IS DISTINCT FROM NEW.plan
+        OR OLD.plan_tier IS DISTINCT FROM NEW.plan_tier
+        OR OLD.status IS DISTINCT FROM NEW.status
+        OR OLD.official_name IS DISTINCT FROM NEW.official_name
+        OR OLD.feature_flags IS DISTINCT FROM NEW.feature_flags
+        OR OLD.whatsapp_instance IS DISTINCT FROM NEW.whatsapp_instance
+        OR OLD.gemini_api_key IS DISTINCT FROM NEW.gemini_api_key
+        OR OLD.openai_api_key IS DISTINCT FROM NEW.openai_api_key
+        OR OLD.gov_credentials IS DISTINCT FROM NEW.gov_credentials
+        OR OLD.google_refresh_token IS DISTINCT FROM NEW.google_refresh_token
+    )
+    EXECUTE PROCEDURE public.notify_tenant_context();
@@ -0,0 +1,11 @@
+-- Migration: Maintain cabinets.updated_at
+-- Description: cabinets.updated_at only had a default, so edits to official_name (the
+-- {{politician_name}} of the agent prompt) never changed the fingerprint the worker's
+-- PromptCache polls, and compiled prompts kept the old name. Touch it on every update,
+-- like agent_configurations.
+
+DROP TRIGGER IF EXISTS update_cabinets_updated_at ON public.cabinets;
+CREATE TRIGGER update_cabinets_updated_at
+    BEFORE UPDATE ON public.cabinets
+    FOR EACH ROW
+    EXECUTE PROCEDURE public.update_updated_at_column();
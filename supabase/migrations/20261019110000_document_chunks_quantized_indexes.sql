@@ -0,0 +1,22 @@
+-- Migration: HNSW indexes for the quantized document_chunks columns
+-- Description: Indexes used by match_documents_halfvec / match_documents_quantized
+-- (see 20261019091000_document_chunks_quantization.sql). Kept apart from that migration
+-- so they are built once, after the halfvec backfill, instead of being maintained row by
+-- row while it runs. CONCURRENTLY keeps document_chunks writable during the build; it
+-- cannot run inside a transaction block, so apply this file statement by statement
+-- (e.g. `psql -f`). A failed build leaves an INVALID index: drop it and re-run.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS document_chunks_cabinet_idx
+    ON public.document_chunks (cabinet_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS document_chunks_embedding_half_hnsw_idx
+    ON public.document_chunks USING hnsw (embedding_half halfvec_cosine_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS document_chunks_embedding_openai_half_hnsw_idx
+    ON public.document_chunks USING hnsw (embedding_openai_half halfvec_cosine_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS document_chunks_embedding_bq_hnsw_idx
+    ON public.document_chunks USING hnsw ((binary_quantize(embedding_half)::bit(768)) bit_hamming_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS document_chunks_embedding_openai_bq_hnsw_idx
+    ON public.document_chunks USING hnsw ((binary_quantize(embedding_openai_half)::bit(1536)) bit_hamming_ops);
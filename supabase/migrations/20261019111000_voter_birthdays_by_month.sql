@@ -0,0 +1,18 @@
+-- Migration: Birthdays of a month through idx_voters_cabinet_birthday
+-- Description: The birthday report (hooks/useReports.ts) downloaded every voter with a
+-- birth date and filtered by month in the browser. This RPC reads one month of the
+-- caller's cabinet from the (cabinet_id, month, day) expression index instead; the
+-- expressions must stay identical to the index (20261019099000_voter_analytics_indexes.sql).
+-- SECURITY INVOKER: the voters RLS policies still apply.
+
+CREATE OR REPLACE FUNCTION public.voter_birthdays_in_month(p_month INT)
+RETURNS TABLE (id BIGINT, name TEXT, birth_date DATE, phone TEXT, city TEXT) AS $$
+    SELECT v.id, v.name, v.birth_date, v.phone, v.city
+    FROM public.voters v
+    WHERE v.cabinet_id = public.get_user_cabinet_id()
+      AND v.birth_date IS NOT NULL
+      AND EXTRACT(MONTH FROM v.birth_date)::int = p_month
+    ORDER BY EXTRACT(DAY FROM v.birth_date)::int, v.name;
+$$ LANGUAGE sql STABLE;
+
+GRANT EXECUTE ON FUNCTION public.voter_birthdays_in_month(INT) TO authenticated;
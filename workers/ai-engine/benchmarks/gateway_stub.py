@@ -0,0 +1,184 @@
+"""
+Local stand-in for the agent-gateway Edge Function, for load tests.
+
+Serves POST /functions/v1/agent-gateway with the same response envelope as the
+real function ({"success": true, "data": ...}) without touching Supabase or
+Gemini. Latency, HTTP errors and `success: false` payloads are configurable so
+the worker can be measured under realistic and degraded conditions.
+
+Latency distributions (--latency):
+    fixed:0.4               always 400 ms
+    uniform:0.2,1.5         uniform between 200 ms and 1.5 s
+    normal:0.8,0.2          mean 800 ms, std 200 ms (clipped at 0)
+    lognormal:-0.5,0.6      exp(N(mu, sigma)) seconds, long tail like LLM calls
+
+Usage:
+    python benchmarks/gateway_stub.py --port 8787 --latency lognormal:-0.5,0.6 \
+        --error-rate 0.02 --failure-rate 0.01
+    # worker side
+    AGENT_GATEWAY_URL=http://127.0.0.1:8787/functions/v1/agent-gateway python worker.py
+
+Requests with "stream": true are answered as Server-Sent Events like the real
+gateway: the first delta arrives after --ttfb-share of the sampled latency and
+the rest of the answer is spread over the remainder.
+
+GET /stats returns request counts per outcome.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+GATEWAY_PATH = "/functions/v1/agent-gateway"
+
+
+def parse_latency(spec: str, rng: random.Random) -> Callable[[], float]:
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda: rng.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class GatewayStub:
+    def __init__(self, latency: Callable[[], float], error_rate: float, failure_rate: float, seed: int):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.counts = {"success": 0, "http_error": 0, "failure": 0, "bad_request": 0}
+        self._lock = threading.Lock()
+
+    def outcome(self) -> str:
+        with self._lock:
+            roll = self.rng.random()
+        if roll < self.error_rate:
+            return "http_error"
+        if roll < self.error_rate + self.failure_rate:
+            return "failure"
+        return "success"
+
+    def count(self, outcome: str) -> None:
+        with self._lock:
+            self.counts[outcome] += 1
+
+
+STREAM_ANSWER = (
+    "Obrigado pela mensagem. O gabinete já registrou a sua solicitação e vai acompanhar o caso. "
+    "O posto de saúde do bairro atende de segunda a sexta, das 7h às 17h. "
+    "Se precisar de mais alguma informação, é só responder por aqui."
+)
+
+
+def make_handler(stub: GatewayStub, ttfb_share: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real gateway
+
+        def _reply(self, status: int, body: dict) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream(self, latency: float, message: str) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            words = f"{STREAM_ANSWER} ({message[:40]})".split(" ")
+            time.sleep(latency * ttfb_share)
+            step = latency * (1 - ttfb_share) / len(words)
+            for i, word in enumerate(words):
+                text = word if i == 0 else " " + word
+                self.wfile.write(f"event: delta\ndata: {json.dumps({'text': text})}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(step)
+            done = {"success": True, "data": {"role": "assistant", "content": " ".join(words)}}
+            self.wfile.write(f"event: done\ndata: {json.dumps(done)}\n\n".encode())
+            self.close_connection = True
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._reply(200, stub.counts)
+            else:
+                self._reply(404, {"error": "Not found"})
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if self.path != GATEWAY_PATH:
+                self._reply(404, {"error": "Not found"})
+                return
+            try:
+                request = json.loads(body or b"{}")
+                message = request["args"]["message"]
+            except (ValueError, KeyError, TypeError):
+                stub.count("bad_request")
+                self._reply(400, {"error": "Invalid request body"})
+                return
+            if not self.headers.get("x-agent-token"):
+                stub.count("bad_request")
+                self._reply(401, {"error": "Missing x-agent-token"})
+                return
+
+            latency = stub.latency()
+            outcome = stub.outcome()
+            stub.count(outcome)
+            if outcome == "success" and request.get("stream"):
+                self._stream(latency, message)
+                return
+            time.sleep(latency)
+            if outcome == "http_error":
+                self._reply(500, {"error": "Simulated gateway error"})
+            elif outcome == "failure":
+                self._reply(200, {"success": False, "error": "Simulated tool failure"})
+            else:
+                self._reply(200, {"success": True, "data": {
+                    "role": "assistant",
+                    "content": f"Resposta simulada para: {message[:80]}",
+                }})
+
+        def log_message(self, format, *args):
+            pass  # per-request logging would dominate the measurement
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", default="lognormal:-0.5,0.6")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of HTTP 500 responses")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of 200 responses with success: false")
+    parser.add_argument("--ttfb-share", type=float, default=0.15, help="Share of latency before the first streamed delta")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    stub = GatewayStub(parse_latency(args.latency, rng), args.error_rate, args.failure_rate, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(stub, args.ttfb_share))
+    server.daemon_threads = True
+    print(f"agent-gateway stub on http://{args.host}:{args.port}{GATEWAY_PATH} (latency {args.latency})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(stub.counts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Memory footprint vs recall for document_chunks vector storage options.
+
+Compares, on a synthetic clustered corpus shaped like our embeddings:
+- vector (float32)          : current storage / HNSW index
+- halfvec (float16)         : embedding_half / embedding_openai_half
+- bit (binary quantization) : Hamming-distance prefilter only
+- bit + re-rank             : match_documents_quantized (prefilter, then full precision)
+
+Recall is recall@k against exact float32 cosine search. Index size estimates use
+pgvector's HNSW layout (element vector + ~2*m neighbor TIDs of 6 bytes at layer 0).
+
+Usage:
+    python benchmarks/vector_quantization.py --rows 50000 --dims 768
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+HNSW_M = 16  # pgvector default
+TID_BYTES = 6
+HNSW_TUPLE_OVERHEAD = 24
+
+
+def make_corpus(rows: int, dims: int, clusters: int, queries: int, seed: int):
+    """Clustered unit vectors; queries are perturbed corpus points, like real questions."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dims)).astype(np.float32)
+    assignment = rng.integers(0, clusters, size=rows)
+    corpus = centers[assignment] + 0.6 * rng.normal(size=(rows, dims)).astype(np.float32)
+    corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+
+    picks = rng.integers(0, rows, size=queries)
+    query_set = corpus[picks] + 0.05 * rng.normal(size=(queries, dims)).astype(np.float32)
+    query_set /= np.linalg.norm(query_set, axis=1, keepdims=True)
+    return corpus, query_set.astype(np.float32)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    idx = np.argpartition(-scores, k, axis=1)[:, :k]
+    order = np.take_along_axis(scores, idx, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(idx, order, axis=1)
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint16)
+
+
+def hamming_scores(packed_corpus: np.ndarray, packed_queries: np.ndarray) -> np.ndarray:
+    """Negative Hamming distance (higher is closer) between packed bit vectors."""
+    scores = np.empty((packed_queries.shape[0], packed_corpus.shape[0]), dtype=np.int32)
+    for i, q in enumerate(packed_queries):
+        scores[i] = -_POPCOUNT[np.bitwise_xor(packed_corpus, q)].sum(axis=1)
+    return scores
+
+
+def index_bytes(rows: int, vector_bytes: int) -> int:
+    return rows * (vector_bytes + 2 * HNSW_M * TID_BYTES + HNSW_TUPLE_OVERHEAD)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--dims", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    corpus, queries = make_corpus(args.rows, args.dims, args.clusters, args.queries, args.seed)
+    truth = top_k(queries @ corpus.T, args.k)
+
+    results = []
+
+    start = time.perf_counter()
+    found = top_k(queries @ corpus.T, args.k)
+    results.append(("vector (float32)", 4 * args.dims, recall(found, truth), time.perf_counter() - start))
+
+    half = corpus.astype(np.float16)
+    start = time.perf_counter()
+    found = top_k(queries @ half.astype(np.float32).T, args.k)
+    results.append(("halfvec (float16)", 2 * args.dims, recall(found, truth), time.perf_counter() - start))
+
+    packed_corpus = np.packbits(corpus > 0, axis=1)
+    packed_queries = np.packbits(queries > 0, axis=1)
+    start = time.perf_counter()
+    hamming = hamming_scores(packed_corpus, packed_queries)
+    bit_time = time.perf_counter() - start
+    found = top_k(hamming, args.k)
+    results.append(("bit (no re-rank)", args.dims // 8, recall(found, truth), bit_time))
+
+    for multiplier in (2, 4, 8, 16):
+        start = time.perf_counter()
+        candidates = top_k(hamming, args.k * multiplier)
+        reranked = np.empty((len(queries), args.k), dtype=np.int64)
+        for i, cand in enumerate(candidates):
+            scores = corpus[cand] @ queries[i]
+            reranked[i] = cand[np.argsort(-scores)[:args.k]]
+        elapsed = bit_time + time.perf_counter() - start
+        results.append((f"bit + re-rank x{multiplier}", args.dims // 8, recall(reranked, truth), elapsed))
+
+    print(f"rows={args.rows} dims={args.dims} queries={args.queries} k={args.k}\n")
+    print(f"{'storage':<22}{'bytes/vec':>10}{'HNSW est. (MB)':>16}{'recall@k':>10}{'time (s)':>10}")
+    for name, vector_bytes, rec, elapsed in results:
+        size_mb = index_bytes(args.rows, vector_bytes) / 1024 / 1024
+        print(f"{name:<22}{vector_bytes:>10}{size_mb:>16.1f}{rec:>10.3f}{elapsed:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Voter search latency: leading-wildcard ILIKE vs trigram / full-text indexes.
+
+Loads a synthetic base (default 1M voters, Brazilian names and addresses, 90% in
+the measured cabinet) into a session-local temp table named `voters`. pg_temp
+comes first in the search path, so the unqualified queries of
+app.services.search_service run against it unchanged and public.voters is
+never touched. Every query is timed on the bare table (what production had:
+sequential scans) and again after creating the indexes of migration
+20261019102000_search_indexes.sql.
+
+Needs the worker environment (config.py) with DATABASE_URL (postgresql+psycopg://...)
+pointing at a database with that migration applied.
+
+Usage:
+    python benchmarks/voter_search.py --rows 1000000 --repeat 5
+"""
+
+import os
+import sys
+import time
+import uuid
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from database import engine  # noqa: E402  (also puts the repo root on sys.path)
+from app.services.search_service import SearchService  # noqa: E402
+
+FIRST_NAMES = (
+    "Maria", "José", "Ana", "João", "Antônio", "Francisco", "Carlos", "Paulo", "Pedro", "Lucas",
+    "Luiz", "Marcos", "Luís", "Gabriel", "Rafael", "Francisca", "Daniel", "Marcelo", "Bruno", "Eduardo",
+    "Felipe", "Raimundo", "Rodrigo", "Antônia", "Adriana", "Juliana", "Márcia", "Fernanda", "Patrícia", "Aline",
+    "Sandra", "Camila", "Amanda", "Bruna", "Jéssica", "Letícia", "Júlia", "Luciana", "Vanessa", "Mariana",
+    "Gustavo", "Thiago", "Leonardo", "Mateus", "André", "Fernando", "Fábio", "Sebastião", "Vitória", "Beatriz",
+)
+SURNAMES = (
+    "Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima", "Gomes",
+    "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes", "Soares", "Fernandes", "Vieira", "Barbosa",
+    "Rocha", "Dias", "Nascimento", "Andrade", "Moreira", "Nunes", "Marques", "Machado", "Mendes", "Freitas",
+    "Cardoso", "Ramos", "Gonçalves", "Santana", "Teixeira", "Araújo", "Conceição", "Pinto", "Moura", "Cavalcanti",
+)
+NEIGHBORHOODS = (
+    "Centro", "Setor Bueno", "Setor Oeste", "Jardim América", "Jardim Goiás", "Setor Marista", "Vila Nova",
+    "Setor Pedro Ludovico", "Parque Amazônia", "Jardim Europa", "Setor Universitário", "Vila Redenção",
+    "Jardim Novo Mundo", "Setor Campinas", "Residencial Eldorado", "Jardim Guanabara", "Setor Leste Vila Nova",
+    "Parque Atheneu", "Vila Canaã", "Setor Coimbra", "Jardim Curitiba", "Setor Sul", "Setor Aeroporto",
+    "Vila São José", "Conjunto Vera Cruz", "Setor Faiçalville", "Jardim Balneário Meia Ponte", "Cidade Jardim",
+)
+CITIES = ("Goiânia", "Aparecida de Goiânia", "Anápolis", "Trindade", "Senador Canedo", "Goianira")
+STREETS = (
+    "Rua", "Avenida", "Alameda", "Travessa",
+)
+STREET_NAMES = (
+    "T-63", "Anhanguera", "Goiás", "República do Líbano", "das Flores", "Dom Pedro II", "Tiradentes",
+    "Castelo Branco", "São Paulo", "Independência", "85", "136", "C-235", "Bela Vista", "Santos Dumont",
+)
+
+
+def cpf(rng: random.Random) -> str:
+    digits = [rng.randrange(10) for _ in range(9)]
+    for position in (9, 10):
+        total = sum(d * w for d, w in zip(digits, range(position + 1, 1, -1)))
+        digits.append(total * 10 % 11 % 10)
+    return "".join(map(str, digits))
+
+
+def synthetic_voters(rows: int, cabinet_id: uuid.UUID, other_cabinet_id: uuid.UUID, seed: int):
+    rng = random.Random(seed)
+    for _ in range(rows):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(SURNAMES)} {rng.choice(SURNAMES)}"
+        yield (
+            cabinet_id if rng.random() < 0.9 else other_cabinet_id,
+            name,
+            cpf(rng),
+            f"629{rng.randrange(10**7, 10**8)}",
+            f"{rng.choice(STREETS)} {rng.choice(STREET_NAMES)}, {rng.randrange(1, 2000)}",
+            rng.choice(NEIGHBORHOODS),
+            rng.choice(CITIES),
+        )
+
+
+INDEXES = (
+    "CREATE INDEX ON pg_temp.voters (cabinet_id)",
+    "CREATE INDEX ON pg_temp.voters USING gin (search_vector)",
+    "CREATE INDEX ON pg_temp.voters USING gin (public.search_normalize(name) extensions.gin_trgm_ops)",
+    "CREATE INDEX ON pg_temp.voters (cabinet_id, public.search_normalize(name) text_pattern_ops)",
+    "CREATE INDEX ON pg_temp.voters USING gin (neighborhood extensions.gin_trgm_ops)",
+    "CREATE INDEX ON pg_temp.voters USING gin (city extensions.gin_trgm_ops)",
+    "CREATE INDEX ON pg_temp.voters (cabinet_id, public.normalize_cpf(cpf)) WHERE public.normalize_cpf(cpf) IS NOT NULL",
+)
+
+
+def load(session: Session, rows: int, cabinet_id: uuid.UUID, seed: int) -> float:
+    session.execute(text(
+        "CREATE TEMP TABLE voters (LIKE public.voters INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING IDENTITY)"
+    ))
+    started = time.perf_counter()
+    driver_connection = session.connection().connection.driver_connection
+    with driver_connection.cursor() as cursor:
+        with cursor.copy(
+            "COPY pg_temp.voters (cabinet_id, name, cpf, phone, address, neighborhood, city) FROM STDIN"
+        ) as copy:
+            for row in synthetic_voters(rows, cabinet_id, uuid.uuid4(), seed):
+                copy.write_row(row)
+    session.execute(text("ANALYZE pg_temp.voters"))
+    return time.perf_counter() - started
+
+
+def timed(fn, repeat: int) -> float:
+    """Median wall time in ms (first call warms the cache and is discarded)."""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def workloads(session: Session, cabinet_id: uuid.UUID):
+    service = SearchService(session)
+    params = {"cabinet_id": cabinet_id}
+
+    def scalar(sql: str, **extra):
+        return lambda: session.execute(text(sql), {**params, **extra}).all()
+
+    def page_five():
+        cursor = None
+        for _ in range(5):
+            cursor = service.search_voters(cabinet_id, "maria silva", cursor=cursor)["next_cursor"]
+
+    return [
+        ("report: ilike neighborhood '%canaa%' (count)",
+         scalar("SELECT count(*) FROM voters WHERE cabinet_id = :cabinet_id AND neighborhood ILIKE '%Canaã%'")),
+        ("report: ilike city '%trindade%' (count)",
+         scalar("SELECT count(*) FROM voters WHERE cabinet_id = :cabinet_id AND city ILIKE '%trindade%'")),
+        ("autocomplete: old ilike name '%Sebast%' order by name",
+         scalar("SELECT id, name FROM voters WHERE cabinet_id = :cabinet_id AND name ILIKE '%Sebast%' ORDER BY name LIMIT 10")),
+        ("autocomplete: service 'sebast'", lambda: service.autocomplete_voters(cabinet_id, "sebast")),
+        ("autocomplete: service 'jo' (name start)", lambda: service.autocomplete_voters(cabinet_id, "jo")),
+        ("search: old ilike name/cpf/address 'Conceição Moura'",
+         scalar("SELECT * FROM voters WHERE cabinet_id = :cabinet_id AND (name ILIKE '%Conceição Moura%' "
+                "OR cpf ILIKE '%Conceição Moura%' OR address ILIKE '%Conceição Moura%') ORDER BY created_at DESC")),
+        ("search: service 'conceicao moura' (page 1)", lambda: service.search_voters(cabinet_id, "conceicao moura")),
+        ("search: service with a typo 'sebastiao cavalcnti'",
+         lambda: service.search_voters(cabinet_id, "sebastiao cavalcnti")),
+        ("search: service 'maria silva', 5 keyset pages", page_five),
+        ("search: old offset page 5 ilike 'maria silva'",
+         scalar("SELECT * FROM voters WHERE cabinet_id = :cabinet_id AND name ILIKE '%maria silva%' "
+                "ORDER BY created_at DESC LIMIT 20 OFFSET 80")),
+        ("search: service by CPF", lambda: service.search_voters(cabinet_id, "529.982.247-25")),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if engine is None:
+        raise SystemExit("DATABASE_URL is required")
+
+    cabinet_id = uuid.uuid4()
+    with engine.connect() as connection:
+        session = Session(bind=connection)
+        try:
+            load_seconds = load(session, args.rows, cabinet_id, args.seed)
+            print(f"Loaded {args.rows:,} synthetic voters in {load_seconds:.1f}s")
+
+            queries = workloads(session, cabinet_id)
+            bare = {name: timed(fn, args.repeat) for name, fn in queries}
+
+            started = time.perf_counter()
+            for statement in INDEXES:
+                session.execute(text(statement))
+            session.execute(text("ANALYZE pg_temp.voters"))
+            print(f"Built search indexes in {time.perf_counter() - started:.1f}s\n")
+            indexed = {name: timed(fn, args.repeat) for name, fn in queries}
+
+            width = max(len(name) for name, _ in queries)
+            print(f"{'query':<{width}}  {'no index ms':>12}  {'indexed ms':>11}  {'speedup':>8}")
+            for name, _ in queries:
+                speedup = bare[name] / indexed[name] if indexed[name] else float("inf")
+                print(f"{name:<{width}}  {bare[name]:>12.1f}  {indexed[name]:>11.1f}  {speedup:>7.1f}x")
+        finally:
+            session.rollback()  # never committed: the temp table and its indexes go away
+            session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import os
+import sys
+from typing import Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+from config import DATABASE_URL
+
+# The worker shares ORM models and services with the Python backend (app/ at the repo root)
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+
+engine: Optional[Engine] = create_engine(
+    DATABASE_URL,
+    pool_size=5,
+    max_overflow=5,
+    pool_pre_ping=True,
+) if DATABASE_URL else None
+
+SessionLocal: Optional[sessionmaker] = sessionmaker(
+    bind=engine,
+    autoflush=False,
+    expire_on_commit=False,
+) if engine else None
@@ -0,0 +1,119 @@
+import time
+import logging
+import threading
+from collections import deque
+from typing import Deque, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker over a rolling window of calls.
+
+    The circuit opens when, over the last `window_size` calls (and at least
+    `min_calls`), the failure rate reaches `failure_rate_threshold` or the
+    share of calls slower than `slow_call_seconds` reaches
+    `slow_call_rate_threshold`. After `open_seconds` it lets
+    `half_open_max_calls` trial calls through: if they all succeed quickly it
+    closes, otherwise it opens again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        window_size: int = 20,
+        min_calls: int = 10,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 15.0,
+        slow_call_rate_threshold: float = 0.8,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 2,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self._calls: Deque[Tuple[bool, bool]] = deque(maxlen=window_size)  # (failed, slow)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._trial_calls = 0
+        self._trial_successes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._trial_calls = self._trial_successes = 0
+            logger.info(f"Circuit '{self.name}' half-open, sending trial calls")
+        return self._state
+
+    def _open(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+
+    def before_call(self) -> None:
+        """Raises CircuitOpenError if the call must not be made now."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.OPEN:
+                raise CircuitOpenError(self.name, self.open_seconds - (time.monotonic() - self._opened_at))
+            if state == self.HALF_OPEN:
+                if self._trial_calls >= self.half_open_max_calls:
+                    raise CircuitOpenError(self.name, min(self.open_seconds, 5.0))
+                self._trial_calls += 1
+
+    def cancel_call(self) -> None:
+        """Returns a permit taken by before_call() for a call that was never made."""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._trial_calls > 0:
+                self._trial_calls -= 1
+
+    def record(self, ok: bool, duration: float) -> None:
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            state = self._current_state()
+            if state == self.HALF_OPEN:
+                if ok and not slow:
+                    self._trial_successes += 1
+                    if self._trial_successes >= self.half_open_max_calls:
+                        self._state = self.CLOSED
+                        self._calls.clear()
+                        logger.info(f"Circuit '{self.name}' closed")
+                else:
+                    self._open()
+                    logger.warning(f"Circuit '{self.name}' re-opened after a failed trial call")
+                return
+            if state == self.OPEN:
+                return  # late result of a call started before the circuit opened
+
+            self._calls.append((not ok, slow))
+            if len(self._calls) < self.min_calls:
+                return
+            failure_rate = sum(failed for failed, _ in self._calls) / len(self._calls)
+            slow_rate = sum(slow for _, slow in self._calls) / len(self._calls)
+            if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+                self._open()
+                logger.warning(
+                    f"Circuit '{self.name}' opened for {self.open_seconds:.0f}s "
+                    f"(failure rate {failure_rate:.0%}, slow rate {slow_rate:.0%})"
+                )
@@ -0,0 +1,66 @@
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit on concurrent calls to a slow dependency.
+
+    Every call that finishes within `target_latency` grows the limit by
+    `increase / limit` (about +1 per round of calls); a failed or slow call
+    multiplies it by `decrease_factor`, at most once per `target_latency` so a
+    burst of simultaneous timeouts counts as one congestion signal.
+    """
+
+    def __init__(
+        self,
+        initial_limit: float = 4,
+        min_limit: float = 1,
+        max_limit: float = 16,
+        target_latency: float = 8.0,
+        increase: float = 1.0,
+        decrease_factor: float = 0.7,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return max(int(self._limit), int(self.min_limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self, timeout: float) -> bool:
+        """Waits up to `timeout` seconds for a slot. Returns False if none freed up."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._in_flight < self.limit, timeout=timeout):
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self, latency: float, ok: bool) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if not ok or latency > self.target_latency:
+                if now - self._last_decrease >= self.target_latency:
+                    previous = self.limit
+                    self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+                    self._last_decrease = now
+                    if self.limit != previous:
+                        logger.info(f"Concurrency limit lowered to {self.limit} (latency {latency:.1f}s, ok={ok})")
+            else:
+                self._limit = min(self.max_limit, self._limit + self.increase / self._limit)
+            self._cond.notify_all()
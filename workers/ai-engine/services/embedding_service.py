@@ -0,0 +1,139 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import httpx
+from supabase import Client
+
+from database import REPO_ROOT  # noqa: F401  (puts the repo root on sys.path for app.*)
+from app.services.tenant_context import TenantContextCache, postgrest_loader
+
+logger = logging.getLogger(__name__)
+
+GEMINI_EMBEDDING_MODEL = "text-embedding-004"  # 768 dims, matches document_chunks.embedding
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/models"
+GEMINI_EMBED_URL = f"{GEMINI_BASE_URL}/{GEMINI_EMBEDDING_MODEL}:embedContent"
+GEMINI_BATCH_EMBED_URL = f"{GEMINI_BASE_URL}/{GEMINI_EMBEDDING_MODEL}:batchEmbedContents"
+
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"  # 1536 dims, matches document_chunks.embedding_openai
+OPENAI_EMBED_URL = "https://api.openai.com/v1/embeddings"
+
+# document_chunks column -> (provider, cabinets key column, dimensions)
+EMBEDDING_COLUMNS = {
+    "embedding": ("gemini", "gemini_api_key", 768),
+    "embedding_openai": ("openai", "openai_api_key", 1536),
+}
+
+
+class EmbeddingService:
+    """
+    Generates embeddings for the worker using the cabinet's own provider keys.
+
+    Embeddings of recent queries are kept in a small LRU so repeated questions
+    (very common on WhatsApp) don't pay for a second embedding call.
+    """
+
+    def __init__(
+        self,
+        supabase: Client,
+        cache_size: int = 2048,
+        api_key_ttl_seconds: int = 300,
+        timeout: float = 10.0,
+        tenant_contexts: Optional[TenantContextCache] = None,
+    ):
+        self.supabase = supabase
+        self.cache_size = cache_size
+        self.timeout = timeout
+        # Provider keys come from the cabinet's TenantContext (shared with the rest of the worker)
+        self.tenant_contexts = tenant_contexts or TenantContextCache(
+            postgrest_loader(supabase), ttl_seconds=api_key_ttl_seconds
+        )
+        self._cache: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Collapses whitespace and case so trivially different messages share a cache slot."""
+        return " ".join(text.lower().split())
+
+    def get_api_key(self, cabinet_id: str, key_column: str = "gemini_api_key") -> Optional[str]:
+        """Returns one of the cabinet's provider keys (from its cached TenantContext)."""
+        context = self.tenant_contexts.get(cabinet_id)
+        return context.api_key(key_column) if context else None
+
+    async def embed_query(self, cabinet_id: str, text: str) -> Optional[List[float]]:
+        """
+        Embeds a query text for the given cabinet.
+
+        Returns:
+            The embedding values, or None if the cabinet has no Gemini key configured.
+        """
+        key = (GEMINI_EMBEDDING_MODEL, self.normalize(text))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        api_key = self.get_api_key(cabinet_id)
+        if not api_key:
+            return None
+
+        async with httpx.AsyncClient() as client:
+            response = await client.post(
+                GEMINI_EMBED_URL,
+                params={"key": api_key},
+                json={
+                    "model": f"models/{GEMINI_EMBEDDING_MODEL}",
+                    "content": {"parts": [{"text": text}]},
+                },
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            values = response.json()["embedding"]["values"]
+
+        with self._lock:
+            self._cache[key] = values
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return values
+
+    async def embed_documents(self, cabinet_id: str, texts: List[str], column: str) -> List[List[float]]:
+        """
+        Embeds a batch of texts for storage in the given document_chunks column.
+
+        Raises:
+            ValueError: If the column is unknown or the cabinet lacks the provider key.
+        """
+        if column not in EMBEDDING_COLUMNS:
+            raise ValueError(f"Unknown embedding column: {column}")
+        provider, key_column, _ = EMBEDDING_COLUMNS[column]
+
+        api_key = self.get_api_key(cabinet_id, key_column)
+        if not api_key:
+            raise ValueError(f"Cabinet {cabinet_id} has no {key_column} configured")
+
+        async with httpx.AsyncClient() as client:
+            if provider == "gemini":
+                response = await client.post(
+                    GEMINI_BATCH_EMBED_URL,
+                    params={"key": api_key},
+                    json={"requests": [
+                        {"model": f"models/{GEMINI_EMBEDDING_MODEL}", "content": {"parts": [{"text": t}]}}
+                        for t in texts
+                    ]},
+                    timeout=self.timeout * 3,
+                )
+                response.raise_for_status()
+                return [item["values"] for item in response.json()["embeddings"]]
+
+            response = await client.post(
+                OPENAI_EMBED_URL,
+                headers={"Authorization": f"Bearer {api_key}"},
+                json={"model": OPENAI_EMBEDDING_MODEL, "input": texts},
+                timeout=self.timeout * 3,
+            )
+            response.raise_for_status()
+            data = sorted(response.json()["data"], key=lambda item: item["index"])
+            return [item["embedding"] for item in data]
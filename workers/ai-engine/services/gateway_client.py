@@ -0,0 +1,112 @@
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from services.concurrency import AdaptiveConcurrencyLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class GatewayUnavailable(Exception):
+    """The call was not attempted; the caller should retry after `retry_after` seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AgentGatewayClient:
+    """
+    HTTP client for agent-gateway, guarded by a circuit breaker and an
+    adaptive concurrency limit (both shared by every task in the worker).
+
+    Timeouts, connection errors, 429 and 5xx responses count as failures for
+    both; 4xx responses are the caller's problem and count as successes.
+    Calls refused by the breaker or the limiter raise GatewayUnavailable
+    without touching the network.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        breaker: Optional[CircuitBreaker] = None,
+        limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+        timeout: float = 30.0,
+        acquire_timeout: float = 5.0,
+    ):
+        self.url = url
+        self.breaker = breaker
+        self.limiter = limiter
+        self.timeout = timeout
+        self.acquire_timeout = acquire_timeout
+
+    async def _admit(self) -> None:
+        """Takes a breaker permit and a concurrency slot, or raises GatewayUnavailable."""
+        if self.breaker:
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError as e:
+                raise GatewayUnavailable(str(e), e.retry_after) from e
+
+        if self.limiter:
+            acquired = await asyncio.to_thread(self.limiter.acquire, self.acquire_timeout)
+            if not acquired:
+                if self.breaker:
+                    self.breaker.cancel_call()
+                raise GatewayUnavailable(
+                    f"agent-gateway concurrency limit ({self.limiter.limit}) reached", self.acquire_timeout
+                )
+
+    def _settle(self, latency: float, ok: bool) -> None:
+        if self.limiter:
+            self.limiter.release(latency, ok)
+        if self.breaker:
+            self.breaker.record(ok, latency)
+
+    async def post(self, headers: Dict[str, str], body: Dict[str, Any]) -> httpx.Response:
+        await self._admit()
+        started = time.monotonic()
+        ok = False
+        try:
+            async with httpx.AsyncClient() as client:
+                response = await client.post(self.url, headers=headers, json=body, timeout=self.timeout)
+            ok = response.status_code != 429 and response.status_code < 500
+            return response
+        finally:
+            self._settle(time.monotonic() - started, ok)
+
+    @asynccontextmanager
+    async def stream(self, headers: Dict[str, str], body: Dict[str, Any]) -> AsyncIterator[httpx.Response]:
+        """
+        Like post(), but yields the response as soon as its headers arrive so
+        the body can be read incrementally.
+
+        The concurrency slot is held until the body is consumed. Breaker and
+        limiter see the time to first byte, since a long answer that streams
+        fine is not a slow gateway; any exception while the body is consumed
+        counts as failed, so callers should do slow or fallible work (like
+        sending messages) outside the `async with`.
+        """
+        await self._admit()
+        started = time.monotonic()
+        first_byte = None
+        ok = False
+        try:
+            async with httpx.AsyncClient() as client:
+                # read timeout applies between chunks, so a long stream is fine
+                async with client.stream("POST", self.url, headers=headers, json=body, timeout=self.timeout) as response:
+                    first_byte = time.monotonic() - started
+                    ok = response.status_code != 429 and response.status_code < 500
+                    try:
+                        yield response
+                    except Exception:
+                        # Cut-off streams, undecodable events, errors of the caller's own
+                        ok = False
+                        raise
+        finally:
+            self._settle(first_byte if first_byte is not None else time.monotonic() - started, ok)
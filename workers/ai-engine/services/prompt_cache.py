@@ -0,0 +1,205 @@
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from supabase import Client
+
+from services.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Same defaults agent-gateway applies when rendering the prompt itself
+DEFAULT_SYSTEM_PROMPT = "Você é um assistente útil."
+PLACEHOLDER_DEFAULTS = {
+    "politician_name": "Parlamentar",
+    "tone": "Neutro",
+    "agent_name": "Assistente",
+}
+DATE_PLACEHOLDER = "current_date"
+
+_PLACEHOLDER_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+# (agent_configurations.updated_at, cabinets.updated_at); both touched by BEFORE UPDATE triggers
+Fingerprint = Tuple[Optional[str], Optional[str]]
+
+
+@dataclass
+class RenderedPrompt:
+    text: str
+    tokens: int
+
+
+@dataclass
+class CompiledPrompt:
+    """
+    A system prompt with every per-cabinet placeholder already substituted.
+
+    Only `{{current_date}}` is left open: `segments` alternates literal text and
+    date slots, so rendering is a join with today's date.
+    """
+    segments: List[str]  # literals at even positions, date slots in between
+    static_tokens: int
+    fingerprint: Fingerprint
+    compiled_at: float = field(default_factory=time.monotonic)
+
+    def render(self, current_date: str) -> RenderedPrompt:
+        text = current_date.join(self.segments)
+        date_slots = len(self.segments) - 1
+        return RenderedPrompt(text, self.static_tokens + date_slots * estimate_tokens(current_date))
+
+
+def compile_prompt(template: Optional[str], values: Dict[str, Optional[str]], fingerprint: Fingerprint) -> CompiledPrompt:
+    """Parses the template once, substituting everything except the date."""
+    template = template or DEFAULT_SYSTEM_PROMPT
+    segments, literal, last = [], [], 0
+    for match in _PLACEHOLDER_RE.finditer(template):
+        literal.append(template[last:match.start()])
+        name = match.group(1)
+        if name == DATE_PLACEHOLDER:
+            segments.append("".join(literal))
+            literal = []
+        elif name in PLACEHOLDER_DEFAULTS:
+            literal.append(values.get(name) or PLACEHOLDER_DEFAULTS[name])
+        else:
+            literal.append(match.group(0))  # unknown placeholders are kept verbatim
+        last = match.end()
+    literal.append(template[last:])
+    segments.append("".join(literal))
+    return CompiledPrompt(segments, sum(estimate_tokens(s) for s in segments), fingerprint)
+
+
+class PromptCache:
+    """
+    Per-cabinet cache of compiled AgentConfiguration system prompts.
+
+    The template is fetched and parsed once per cabinet; each message only
+    joins in today's date (formatted once per day). At most every
+    `refresh_seconds` bulk queries (`poll_chunk_size` ids each, so the request
+    URL stays short) read `updated_at` for every cached cabinet's configuration
+    and cabinet row, and changed entries are recompiled on next use. At most
+    `max_cabinets` prompts are kept, least recently used dropped first.
+
+    `token_counts()` reports the estimated size of each compiled prompt.
+    """
+
+    def __init__(
+        self,
+        supabase: Client,
+        refresh_seconds: int = 30,
+        timezone: str = "America/Sao_Paulo",
+        max_cabinets: int = 256,
+        poll_chunk_size: int = 100,
+    ):
+        self.supabase = supabase
+        self.refresh_seconds = refresh_seconds
+        self.timezone = ZoneInfo(timezone)
+        self.max_cabinets = max_cabinets
+        self.poll_chunk_size = poll_chunk_size
+        self._prompts: "OrderedDict[str, CompiledPrompt]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._polled_at = time.monotonic()
+        self._date_cache: Tuple[Optional[date], str] = (None, "")
+
+    def _current_date(self) -> str:
+        today = datetime.now(self.timezone).date()
+        cached_day, formatted = self._date_cache
+        if cached_day != today:
+            formatted = today.strftime("%d/%m/%Y")  # pt-BR, as toLocaleDateString('pt-BR')
+            self._date_cache = (today, formatted)
+        return formatted
+
+    def _compile(self, cabinet_id: str) -> CompiledPrompt:
+        configs = self.supabase.table("agent_configurations")\
+            .select("system_prompt, tone, agent_name, updated_at")\
+            .eq("cabinet_id", cabinet_id)\
+            .limit(1)\
+            .execute().data or []
+        cabinets = self.supabase.table("cabinets")\
+            .select("official_name, updated_at")\
+            .eq("id", cabinet_id)\
+            .limit(1)\
+            .execute().data or []
+        config = configs[0] if configs else {}
+        cabinet = cabinets[0] if cabinets else {}
+
+        compiled = compile_prompt(
+            config.get("system_prompt"),
+            {
+                "politician_name": cabinet.get("official_name"),
+                "tone": config.get("tone"),
+                "agent_name": config.get("agent_name"),
+            },
+            (config.get("updated_at"), cabinet.get("updated_at")),
+        )
+        logger.info(f"Compiled system prompt for cabinet {cabinet_id}: ~{compiled.static_tokens} tokens")
+        return compiled
+
+    def _poll(self) -> None:
+        """Drops cached prompts whose configuration or cabinet changed."""
+        with self._lock:
+            cached = {cabinet_id: prompt.fingerprint for cabinet_id, prompt in self._prompts.items()}
+        if not cached:
+            return
+
+        ids = list(cached)
+        config_versions, cabinet_versions = {}, {}
+        for start in range(0, len(ids), self.poll_chunk_size):
+            chunk = ids[start:start + self.poll_chunk_size]
+            configs = self.supabase.table("agent_configurations")\
+                .select("cabinet_id, updated_at")\
+                .in_("cabinet_id", chunk)\
+                .execute().data or []
+            cabinets = self.supabase.table("cabinets")\
+                .select("id, updated_at")\
+                .in_("id", chunk)\
+                .execute().data or []
+            config_versions.update((row["cabinet_id"], row.get("updated_at")) for row in configs)
+            cabinet_versions.update((row["id"], row.get("updated_at")) for row in cabinets)
+
+        stale = [
+            cabinet_id for cabinet_id, fingerprint in cached.items()
+            if fingerprint != (config_versions.get(cabinet_id), cabinet_versions.get(cabinet_id))
+        ]
+        if stale:
+            logger.info(f"System prompt changed for {len(stale)} cabinet(s), recompiling on next use")
+            self.invalidate(*stale)
+
+    def get(self, cabinet_id: str) -> RenderedPrompt:
+        if time.monotonic() - self._polled_at >= self.refresh_seconds:
+            self._polled_at = time.monotonic()
+            try:
+                self._poll()
+            except Exception as e:
+                logger.warning(f"System prompt freshness check failed: {e}")
+
+        with self._lock:
+            compiled = self._prompts.get(cabinet_id)
+            if compiled is not None:
+                self._prompts.move_to_end(cabinet_id)
+        if compiled is None:
+            compiled = self._compile(cabinet_id)
+            with self._lock:
+                self._prompts[cabinet_id] = compiled
+                self._prompts.move_to_end(cabinet_id)
+                while len(self._prompts) > self.max_cabinets:
+                    self._prompts.popitem(last=False)
+        return compiled.render(self._current_date())
+
+    def invalidate(self, *cabinet_ids: str) -> None:
+        """Forgets the given cabinets' prompts (all of them when called without arguments)."""
+        with self._lock:
+            if not cabinet_ids:
+                self._prompts.clear()
+            for cabinet_id in cabinet_ids:
+                self._prompts.pop(cabinet_id, None)
+
+    def token_counts(self) -> Dict[str, int]:
+        """Estimated static token count of each cached prompt, by cabinet."""
+        with self._lock:
+            return {cabinet_id: prompt.static_tokens for cabinet_id, prompt in self._prompts.items()}
@@ -0,0 +1,101 @@
+import time
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    In-process token bucket.
+
+    Holds up to `capacity` tokens, refilled continuously at `refill_rate`
+    tokens per second. Thread-safe.
+    """
+
+    def __init__(self, capacity: float, refill_rate: float):
+        if capacity <= 0 or refill_rate <= 0:
+            raise ValueError("capacity and refill_rate must be positive")
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute: float, burst: float = 1) -> "TokenBucket":
+        return cls(capacity=max(burst, 1), refill_rate=requests_per_minute / 60.0)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.refill_rate)
+        self._updated_at = now
+
+    def try_acquire(self, cost: float = 1.0) -> float:
+        """
+        Takes `cost` tokens if available.
+
+        Returns:
+            0.0 when the tokens were taken, otherwise the seconds to wait
+            until enough tokens will have accumulated.
+        """
+        if cost > self.capacity:
+            raise ValueError(f"cost {cost} exceeds bucket capacity {self.capacity}")
+        with self._lock:
+            self._refill()
+            if self._tokens >= cost:
+                self._tokens -= cost
+                return 0.0
+            return (cost - self._tokens) / self.refill_rate
+
+    async def acquire(self, cost: float = 1.0) -> None:
+        """Waits until `cost` tokens are available and takes them."""
+        while True:
+            wait = self.try_acquire(cost)
+            if wait == 0.0:
+                return
+            await asyncio.sleep(wait)
+
+
+class CabinetRateLimiter:
+    """
+    Per-cabinet, per-provider token buckets shared by every worker process.
+
+    Buckets live in the cabinet_rate_limits table and are taken atomically by
+    the take_cabinet_rate_limit_tokens RPC; `requests_per_minute` and `burst`
+    are the defaults for cabinets without their own override. When the RPC
+    itself fails the call is allowed, so a limiter outage never stops traffic.
+    """
+
+    def __init__(self, supabase, requests_per_minute: float = 60, burst: float = 10):
+        self.supabase = supabase
+        self.requests_per_minute = requests_per_minute
+        self.burst = burst
+
+    def try_acquire(self, cabinet_id: str, provider: str, cost: float = 1.0) -> float:
+        """Returns 0.0 if the tokens were taken, otherwise the seconds to wait."""
+        try:
+            response = self.supabase.rpc("take_cabinet_rate_limit_tokens", {
+                "p_cabinet_id": cabinet_id,
+                "p_provider": provider,
+                "p_cost": cost,
+                "p_requests_per_minute": self.requests_per_minute,
+                "p_burst": self.burst,
+            }).execute()
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable for cabinet {cabinet_id}, allowing call: {e}")
+            return 0.0
+        return float(response.data or 0.0)
+
+    def refund(self, cabinet_id: str, provider: str, cost: float = 1.0) -> None:
+        """Gives back tokens taken for a call that was never made (capped at the bucket's burst)."""
+        self.try_acquire(cabinet_id, provider, -cost)
+
+    async def acquire(self, cabinet_id: str, provider: str, cost: float = 1.0) -> None:
+        """Waits until the cabinet's bucket grants `cost` tokens."""
+        while True:
+            wait = self.try_acquire(cabinet_id, provider, cost)
+            if wait == 0.0:
+                return
+            await asyncio.sleep(wait)
@@ -0,0 +1,151 @@
+import math
+import logging
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from services.tokens import estimate_tokens, words
+
+logger = logging.getLogger(__name__)
+
+PORTUGUESE_STOPWORDS = {
+    "a", "o", "as", "os", "um", "uma", "uns", "umas", "de", "do", "da", "dos", "das",
+    "em", "no", "na", "nos", "nas", "por", "para", "pra", "com", "sem", "e", "ou", "que",
+    "se", "eu", "voce", "ele", "ela", "eles", "elas", "me", "te", "lhe", "meu", "minha",
+    "seu", "sua", "ao", "aos", "esta", "este", "isso", "isto", "essa", "esse", "qual",
+    "quais", "como", "quando", "onde", "ja", "nao", "sim", "mais", "muito", "tem", "ser",
+}
+
+
+class Scorer(ABC):
+    """
+    Relevance scorer used by the re-ranking stage.
+
+    Implementations score a whole batch of documents against one query so
+    remote scorers (e.g. a cross-encoder endpoint) can amortize a call.
+    """
+
+    @abstractmethod
+    def score(self, query: str, documents: List[str]) -> List[float]:
+        ...
+
+
+class BM25Scorer(Scorer):
+    """
+    Lexical BM25 over the candidate set itself (no external index), with
+    accent folding and Portuguese stopwords. Runs fully offline.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+    @staticmethod
+    def _terms(text: str) -> List[str]:
+        return [w for w in words(text) if w not in PORTUGUESE_STOPWORDS and len(w) > 1]
+
+    def score(self, query: str, documents: List[str]) -> List[float]:
+        query_terms = set(self._terms(query))
+        if not query_terms or not documents:
+            return [0.0] * len(documents)
+
+        doc_terms = [Counter(self._terms(doc)) for doc in documents]
+        lengths = [sum(tf.values()) for tf in doc_terms]
+        avg_length = (sum(lengths) / len(lengths)) or 1.0
+        n = len(documents)
+        idf = {}
+        for term in query_terms:
+            df = sum(1 for tf in doc_terms if term in tf)
+            idf[term] = math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+        scores = []
+        for tf, length in zip(doc_terms, lengths):
+            total = 0.0
+            for term in query_terms:
+                freq = tf.get(term, 0)
+                if freq:
+                    total += idf[term] * freq * (self.k1 + 1) / (
+                        freq + self.k1 * (1 - self.b + self.b * length / avg_length)
+                    )
+            scores.append(total)
+        return scores
+
+
+class Reranker:
+    """
+    Re-ranks over-fetched retrieval candidates and trims them to a token budget.
+
+    The final score blends the vector similarity with the scorer's output
+    (min-max normalized over the candidate set):
+        score = vector_weight * similarity + (1 - vector_weight) * relevance
+    """
+
+    def __init__(
+        self,
+        scorer: Optional[Scorer] = None,
+        batch_size: int = 32,
+        vector_weight: float = 0.5,
+        min_score: float = 0.0,
+    ):
+        self.scorer = scorer or BM25Scorer()
+        self.batch_size = batch_size
+        self.vector_weight = vector_weight
+        self.min_score = min_score
+
+    def _relevance(self, query: str, documents: List[str]) -> List[float]:
+        scores: List[float] = []
+        for start in range(0, len(documents), self.batch_size):
+            scores.extend(self.scorer.score(query, documents[start:start + self.batch_size]))
+        if not scores:
+            return scores
+        low, high = min(scores), max(scores)
+        if high == low:
+            return [0.0] * len(scores)
+        return [(s - low) / (high - low) for s in scores]
+
+    def rerank(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        match_count: int,
+        token_budget: Optional[int] = None,
+        min_similarity: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns at most `match_count` candidates, best first, whose combined
+        content fits in `token_budget` estimated tokens.
+
+        Candidates below `min_similarity` still count for normalizing the
+        relevance scores but are never returned.
+
+        Candidates need 'content' and 'similarity'; a 'rerank_score' is added.
+        """
+        if not candidates:
+            return []
+
+        relevance = self._relevance(query, [c["content"] for c in candidates])
+        scored = []
+        for candidate, rel in zip(candidates, relevance):
+            similarity = float(candidate.get("similarity") or 0.0)
+            if min_similarity is not None and similarity < min_similarity:
+                continue
+            score = self.vector_weight * similarity + (1 - self.vector_weight) * rel
+            if score >= self.min_score:
+                scored.append({**candidate, "rerank_score": score})
+        scored.sort(key=lambda c: c["rerank_score"], reverse=True)
+
+        selected: List[Dict[str, Any]] = []
+        used_tokens = 0
+        for candidate in scored:
+            if len(selected) >= match_count:
+                break
+            cost = estimate_tokens(candidate["content"])
+            if token_budget is not None and used_tokens + cost > token_budget:
+                continue  # a shorter, lower-ranked chunk may still fit
+            selected.append(candidate)
+            used_tokens += cost
+
+        logger.debug(
+            f"Re-ranked {len(candidates)} candidates to {len(selected)} chunks (~{used_tokens} tokens)"
+        )
+        return selected
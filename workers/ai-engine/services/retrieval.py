@@ -0,0 +1,94 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+from supabase import Client
+
+from services.vector_index import InMemoryVectorIndex
+from services.reranker import Reranker
+
+logger = logging.getLogger(__name__)
+
+
+class RetrievalService:
+    """
+    Knowledge-base retrieval for the worker.
+
+    Small tenants are answered from the in-worker InMemoryVectorIndex when it
+    is enabled and warm; everything else (large tenants, cold caches, errors)
+    falls back transparently to pgvector via the match_documents_quantized RPC.
+
+    With a reranker, `match_count * overfetch` candidates above the looser
+    `candidate_threshold` are fetched and re-scored in batches. The looser
+    candidates only widen the set relevance is normalized over: results are
+    still held to `match_threshold`, then trimmed to `token_budget`, so only
+    chunks that earn their prompt tokens are kept.
+    """
+
+    def __init__(
+        self,
+        supabase: Client,
+        vector_index: Optional[InMemoryVectorIndex] = None,
+        match_threshold: float = 0.7,
+        match_count: int = 5,
+        reranker: Optional[Reranker] = None,
+        overfetch: int = 4,
+        candidate_threshold: float = 0.5,
+        token_budget: Optional[int] = 800,
+    ):
+        self.supabase = supabase
+        self.vector_index = vector_index
+        self.match_threshold = match_threshold
+        self.match_count = match_count
+        self.reranker = reranker
+        self.overfetch = overfetch
+        self.candidate_threshold = candidate_threshold
+        self.token_budget = token_budget
+
+    def _search_local(self, cabinet_id: str, query_embedding: List[float], match_count: int, match_threshold: float):
+        if not self.vector_index:
+            return None
+        try:
+            return self.vector_index.search(cabinet_id, query_embedding, match_count, match_threshold)
+        except Exception as e:
+            logger.warning(f"In-memory vector search failed for cabinet {cabinet_id}, using pgvector: {e}")
+            return None
+
+    def _search_pgvector(self, cabinet_id: str, query_embedding: List[float], match_count: int, match_threshold: float):
+        response = self.supabase.rpc("match_documents_quantized", {
+            "query_embedding": query_embedding,
+            "match_threshold": match_threshold,
+            "match_count": match_count,
+            "filter_cabinet_id": cabinet_id,
+        }).execute()
+        return response.data or []
+
+    def search(
+        self,
+        cabinet_id: str,
+        query_embedding: List[float],
+        match_count: Optional[int] = None,
+        match_threshold: Optional[float] = None,
+        query_text: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns the cabinet's chunks most relevant to the query.
+
+        Each result has 'id', 'content', 'metadata' and 'similarity' (plus
+        'rerank_score' when re-ranked), best first. Re-ranking needs `query_text`.
+        """
+        match_count = match_count or self.match_count
+        match_threshold = self.match_threshold if match_threshold is None else match_threshold
+
+        rerank = self.reranker is not None and bool(query_text)
+        fetch_count = match_count * self.overfetch if rerank else match_count
+        fetch_threshold = min(self.candidate_threshold, match_threshold) if rerank else match_threshold
+
+        results = self._search_local(cabinet_id, query_embedding, fetch_count, fetch_threshold)
+        if results is None:
+            results = self._search_pgvector(cabinet_id, query_embedding, fetch_count, fetch_threshold)
+
+        if rerank:
+            results = self.reranker.rerank(
+                query_text, results, match_count, self.token_budget, min_similarity=match_threshold
+            )
+        return results
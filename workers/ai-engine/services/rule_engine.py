@@ -0,0 +1,212 @@
+import time
+import logging
+import threading
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from supabase import Client
+
+from services.tokens import fold
+
+logger = logging.getLogger(__name__)
+
+# (rule_count, max(updated_at)) from get_agent_rules_fingerprint
+Fingerprint = Tuple[int, Optional[str]]
+
+
+@dataclass
+class RuleMatch:
+    rule_id: str
+    action_type: str
+    response_text: Optional[str]
+    keyword: str
+    start: int
+
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher: finds every occurrence of every pattern in one pass
+    over the text, independent of how many patterns there are.
+
+    Patterns are matched on whole words only ("oi" does not fire inside "coisa").
+    Callers are expected to normalize patterns and text the same way.
+    """
+
+    def __init__(self, patterns: List[Tuple[str, Any]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, Any]]] = [[]]  # (pattern length, value)
+        for pattern, value in patterns:
+            if pattern:
+                self._add(pattern, value)
+        self._link()
+
+    def _add(self, pattern: str, value: Any) -> None:
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(pattern), value))
+
+    def _link(self) -> None:
+        # Breadth-first so every failure target is finished before it is used
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def search(self, text: str) -> List[Tuple[int, int, Any]]:
+        """Returns (start, end, value) for every whole-word occurrence."""
+        matches = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for length, value in self._out[node]:
+                start, end = i - length + 1, i + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                    matches.append((start, end, value))
+        return matches
+
+
+def normalize(text: str) -> str:
+    """Accent/case folding with whitespace collapsed, used for rules and messages alike."""
+    return " ".join(fold(text).split())
+
+
+@dataclass
+class _CompiledRules:
+    automaton: AhoCorasick
+    rules: Dict[str, Dict[str, Any]]
+    fingerprint: Optional[Fingerprint]
+    checked_at: float = field(default_factory=time.monotonic)
+
+
+class KeywordRuleEngine:
+    """
+    Matches incoming messages against a cabinet's active agent_rules.
+
+    Each cabinet's keywords are compiled once into an Aho-Corasick automaton
+    (accent- and case-normalized) and cached; the `get_agent_rules_fingerprint`
+    RPC is polled at most every `refresh_seconds` and a changed fingerprint
+    recompiles the rules. When several keywords match, the longest keyword
+    wins (most specific rule), then the earliest occurrence.
+
+    At most `max_cabinets` cabinets keep their compiled rules (least
+    recently used are dropped and recompiled on their next message).
+
+    Rule hits are counted in memory and written with one
+    `increment_agent_rule_usage` call per `flush_usage()`.
+    """
+
+    def __init__(self, supabase: Client, refresh_seconds: int = 30, max_cabinets: int = 256):
+        self.supabase = supabase
+        self.refresh_seconds = refresh_seconds
+        self.max_cabinets = max_cabinets
+        self._cabinets: "OrderedDict[str, _CompiledRules]" = OrderedDict()
+        self._pending_usage: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def _fingerprint(self, cabinet_id: str) -> Optional[Fingerprint]:
+        rows = self.supabase.rpc("get_agent_rules_fingerprint", {"p_cabinet_id": cabinet_id}).execute().data or []
+        if not rows:
+            return None
+        return int(rows[0].get("rule_count") or 0), rows[0].get("last_updated_at")
+
+    def _compile(self, cabinet_id: str, fingerprint: Optional[Fingerprint]) -> _CompiledRules:
+        rows = self.supabase.table("agent_rules")\
+            .select("id, keywords, action_type, response_text, created_at")\
+            .eq("cabinet_id", cabinet_id)\
+            .eq("is_active", True)\
+            .order("created_at")\
+            .execute().data or []
+
+        patterns = []
+        for row in rows:
+            for keyword in row.get("keywords") or []:
+                patterns.append((normalize(keyword or ""), row["id"]))
+        compiled = _CompiledRules(AhoCorasick(patterns), {row["id"]: row for row in rows}, fingerprint)
+        logger.info(f"Compiled {len(rows)} agent rules ({len(patterns)} keywords) for cabinet {cabinet_id}")
+        return compiled
+
+    def _rules_for(self, cabinet_id: str) -> _CompiledRules:
+        with self._lock:
+            compiled = self._cabinets.get(cabinet_id)
+            if compiled:
+                self._cabinets.move_to_end(cabinet_id)
+        if compiled and time.monotonic() - compiled.checked_at < self.refresh_seconds:
+            return compiled
+
+        fingerprint = self._fingerprint(cabinet_id)
+        if compiled is None or compiled.fingerprint != fingerprint:
+            compiled = self._compile(cabinet_id, fingerprint)
+        compiled.checked_at = time.monotonic()
+        with self._lock:
+            self._cabinets[cabinet_id] = compiled
+            self._cabinets.move_to_end(cabinet_id)
+            while len(self._cabinets) > self.max_cabinets:
+                self._cabinets.popitem(last=False)
+        return compiled
+
+    def match(self, cabinet_id: str, message_text: str) -> Optional[RuleMatch]:
+        """Returns the rule fired by the message, or None."""
+        compiled = self._rules_for(cabinet_id)
+        if not compiled.rules:
+            return None
+
+        text = normalize(message_text)
+        hits = compiled.automaton.search(text)
+        if not hits:
+            return None
+
+        start, end, rule_id = min(hits, key=lambda hit: (-(hit[1] - hit[0]), hit[0]))
+        rule = compiled.rules[rule_id]
+        with self._lock:
+            self._pending_usage[rule_id] += 1
+        return RuleMatch(
+            rule_id=rule_id,
+            action_type=rule.get("action_type") or "text_response",
+            response_text=rule.get("response_text"),
+            keyword=text[start:end],
+            start=start,
+        )
+
+    def invalidate(self, cabinet_id: Optional[str] = None) -> None:
+        with self._lock:
+            if cabinet_id is None:
+                self._cabinets.clear()
+            else:
+                self._cabinets.pop(cabinet_id, None)
+
+    def flush_usage(self) -> int:
+        """Writes accumulated usage_count increments. Returns the number of rules updated."""
+        with self._lock:
+            pending, self._pending_usage = self._pending_usage, Counter()
+        if not pending:
+            return 0
+        try:
+            response = self.supabase.rpc("increment_agent_rule_usage", {"p_counts": dict(pending)}).execute()
+            return int(response.data or 0)
+        except Exception:
+            # Put the counts back so the next flush retries them
+            with self._lock:
+                self._pending_usage.update(pending)
+            raise
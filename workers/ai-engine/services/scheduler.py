@@ -0,0 +1,68 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, List
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PeriodicJob:
+    name: str
+    interval_seconds: float
+    func: Callable[[], Any]
+    next_run_at: float = 0.0
+    background: bool = False
+    running: bool = False
+
+
+class PeriodicScheduler:
+    """
+    Runs maintenance jobs from the worker's own loop.
+
+    `run_due()` is called between tasks and executes every job whose interval
+    has elapsed. Jobs run inline, so they should be short RPC calls; jobs that
+    loop over cabinets are added with `background=True` and run on a single
+    background thread instead, skipping a turn while the previous run is still
+    going. Failures are logged and retried at the next interval. Jobs that must
+    not overlap across worker processes guard themselves in SQL (advisory or
+    row locks).
+    """
+
+    def __init__(self):
+        self.jobs: List[PeriodicJob] = []
+        self._background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="periodic-jobs")
+
+    def add(
+        self, name: str, interval_seconds: float, func: Callable[[], Any], run_on_start: bool = True,
+        background: bool = False,
+    ) -> None:
+        next_run_at = 0.0 if run_on_start else time.monotonic() + interval_seconds
+        self.jobs.append(PeriodicJob(name, interval_seconds, func, next_run_at, background))
+
+    @staticmethod
+    def _run(job: PeriodicJob) -> None:
+        try:
+            result = job.func()
+            logger.info(f"Periodic job {job.name} finished: {result}")
+        except Exception as e:
+            logger.error(f"Periodic job {job.name} failed: {e}")
+        finally:
+            job.running = False
+
+    def run_due(self) -> None:
+        for job in self.jobs:
+            now = time.monotonic()
+            if now < job.next_run_at or job.running:
+                continue
+            job.next_run_at = now + job.interval_seconds
+            job.running = True
+            if job.background:
+                self._background.submit(self._run, job)
+            else:
+                self._run(job)
+
+    def shutdown(self) -> None:
+        """Waits for a background job still running."""
+        self._background.shutdown(wait=True)
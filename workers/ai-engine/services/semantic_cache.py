@@ -0,0 +1,207 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from supabase import Client
+
+logger = logging.getLogger(__name__)
+
+# (agent_configurations.updated_at, knowledge_base_versions.version)
+Fingerprint = Tuple[Optional[str], int]
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: Any
+    created_at: float
+
+
+@dataclass
+class _CabinetCache:
+    """Fixed-size ring of unit-normalized question embeddings for one cabinet."""
+    vectors: np.ndarray
+    entries: List[Optional[CachedAnswer]]
+    fingerprint: Optional[Fingerprint] = None
+    fingerprint_checked_at: float = 0.0
+    next_slot: int = 0
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    expired: int = 0
+    invalidations: int = 0
+    per_cabinet_hits: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class SemanticAnswerCache:
+    """
+    Per-cabinet semantic response cache for the WhatsApp agent path.
+
+    A new question is answered from the cache when its embedding is within
+    `max_distance` (cosine distance) of a recently answered question and the
+    cabinet's AgentConfiguration and knowledge base have not changed since the
+    answer was stored. Change detection uses the `get_agent_cache_fingerprint`
+    RPC, polled at most every `version_check_seconds` per cabinet and never
+    while holding the lock.
+
+    At most `max_cabinets` cabinets keep a ring (least recently used are
+    dropped), since each holds `max_entries` full embeddings.
+
+    Answers only depend on the question for a conversation's first turn:
+    callers must not look up or store turns that have history.
+    """
+
+    def __init__(
+        self,
+        supabase: Client,
+        max_distance: float = 0.08,
+        ttl_seconds: int = 3600,
+        max_entries: int = 512,
+        version_check_seconds: int = 15,
+        dimensions: int = 768,
+        log_stats_every: int = 100,
+        max_cabinets: int = 64,
+    ):
+        self.supabase = supabase
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.version_check_seconds = version_check_seconds
+        self.dimensions = dimensions
+        self.log_stats_every = log_stats_every
+        self.max_cabinets = max_cabinets
+        self.stats = CacheStats()
+        self._cabinets: "OrderedDict[str, _CabinetCache]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cabinet_cache(self, cabinet_id: str) -> _CabinetCache:
+        """The cabinet's ring, created if needed (LRU over cabinets); call with the lock held."""
+        cache = self._cabinets.get(cabinet_id)
+        if cache is None:
+            cache = self._cabinets[cabinet_id] = _CabinetCache(
+                vectors=np.zeros((self.max_entries, self.dimensions), dtype=np.float32),
+                entries=[None] * self.max_entries,
+            )
+            while len(self._cabinets) > self.max_cabinets:
+                self._cabinets.popitem(last=False)
+        else:
+            self._cabinets.move_to_end(cabinet_id)
+        return cache
+
+    def _fetch_fingerprint(self, cabinet_id: str) -> Fingerprint:
+        response = self.supabase.rpc(
+            "get_agent_cache_fingerprint", {"p_cabinet_id": cabinet_id}
+        ).execute()
+        rows = response.data or []
+        if not rows:
+            return (None, 0)
+        return (rows[0].get("config_updated_at"), int(rows[0].get("kb_version") or 0))
+
+    def _refresh_fingerprint(self, cabinet_id: str) -> None:
+        """Drops the cabinet's entries if its configuration or knowledge base changed."""
+        now = time.monotonic()
+        with self._lock:
+            cache = self._cabinet_cache(cabinet_id)
+            previous_check = cache.fingerprint_checked_at
+            if now - previous_check < self.version_check_seconds:
+                return
+            # Claimed under the lock: concurrent lookups skip the check meanwhile
+            cache.fingerprint_checked_at = now
+
+        try:
+            fingerprint = self._fetch_fingerprint(cabinet_id)
+        except Exception:
+            with self._lock:
+                cache.fingerprint_checked_at = previous_check
+            raise
+
+        with self._lock:
+            self._apply_fingerprint(cabinet_id, cache, fingerprint)
+
+    def _apply_fingerprint(self, cabinet_id: str, cache: _CabinetCache, fingerprint: Fingerprint) -> None:
+        if cache.fingerprint is not None and fingerprint != cache.fingerprint:
+            logger.info(f"Semantic cache invalidated for cabinet {cabinet_id} (config or knowledge base changed)")
+            cache.entries = [None] * self.max_entries
+            cache.next_slot = 0
+            self.stats.invalidations += 1
+        cache.fingerprint = fingerprint
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, cabinet_id: str, embedding: List[float]) -> Optional[CachedAnswer]:
+        """Returns the closest cached answer within `max_distance`, or None on a miss."""
+        query = self._normalize(embedding)
+        self._refresh_fingerprint(cabinet_id)
+        with self._lock:
+            cache = self._cabinet_cache(cabinet_id)
+
+            best: Optional[CachedAnswer] = None
+            now = time.monotonic()
+            live = [i for i, entry in enumerate(cache.entries) if entry is not None]
+            if live:
+                # Cosine similarity of unit vectors is a plain dot product
+                similarities = cache.vectors[live] @ query
+                for position in np.argsort(-similarities):
+                    slot = live[position]
+                    entry = cache.entries[slot]
+                    if 1.0 - float(similarities[position]) > self.max_distance:
+                        break
+                    if now - entry.created_at > self.ttl_seconds:
+                        cache.entries[slot] = None
+                        self.stats.expired += 1
+                        continue
+                    best = entry
+                    break
+
+            if best is not None:
+                self.stats.hits += 1
+                self.stats.per_cabinet_hits[cabinet_id] = self.stats.per_cabinet_hits.get(cabinet_id, 0) + 1
+            else:
+                self.stats.misses += 1
+            self._maybe_log_stats()
+            return best
+
+    def store(self, cabinet_id: str, question: str, embedding: List[float], answer: Any) -> None:
+        """Caches a freshly generated answer, overwriting the oldest slot when full."""
+        with self._lock:
+            cache = self._cabinet_cache(cabinet_id)
+            slot = cache.next_slot
+            cache.vectors[slot] = self._normalize(embedding)
+            cache.entries[slot] = CachedAnswer(question=question, answer=answer, created_at=time.monotonic())
+            cache.next_slot = (slot + 1) % self.max_entries
+            self.stats.stores += 1
+
+    def invalidate(self, cabinet_id: Optional[str] = None) -> None:
+        """Drops cached answers for one cabinet, or for every cabinet if none is given."""
+        with self._lock:
+            if cabinet_id is None:
+                self._cabinets.clear()
+            else:
+                self._cabinets.pop(cabinet_id, None)
+            self.stats.invalidations += 1
+
+    def _maybe_log_stats(self) -> None:
+        lookups = self.stats.hits + self.stats.misses
+        if self.log_stats_every and lookups % self.log_stats_every == 0:
+            logger.info(
+                f"Semantic cache: {lookups} lookups, hit rate {self.stats.hit_rate:.1%}, "
+                f"{self.stats.stores} stores, {self.stats.expired} expired, "
+                f"{self.stats.invalidations} invalidations"
+            )
@@ -0,0 +1,68 @@
+import logging
+from typing import BinaryIO
+from urllib.parse import quote
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class StorageClient:
+    """
+    Streams objects to and from Supabase Storage with the service key.
+
+    The supabase-py storage client reads whole objects into memory; spreadsheets
+    and exports can be hundreds of MB, so transfers here go through files on
+    disk in fixed-size chunks.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, supabase_url: str, service_key: str, timeout: float = 300.0):
+        self.base_url = f"{supabase_url.rstrip('/')}/storage/v1"
+        self.headers = {"Authorization": f"Bearer {service_key}", "apikey": service_key}
+        self.timeout = timeout
+
+    def _object_url(self, bucket: str, path: str) -> str:
+        return f"{self.base_url}/object/{quote(bucket)}/{quote(path.lstrip('/'))}"
+
+    def download_to(self, bucket: str, path: str, fileobj: BinaryIO) -> int:
+        """Writes the object into `fileobj`. Returns the bytes written."""
+        written = 0
+        with httpx.stream("GET", self._object_url(bucket, path), headers=self.headers, timeout=self.timeout) as response:
+            response.raise_for_status()
+            for chunk in response.iter_bytes(self.CHUNK_SIZE):
+                fileobj.write(chunk)
+                written += len(chunk)
+        fileobj.flush()
+        return written
+
+    def upload(self, bucket: str, path: str, fileobj: BinaryIO, content_type: str, upsert: bool = True) -> str:
+        """Uploads `fileobj` from its current position. Returns the object path."""
+        def chunks():
+            while True:
+                chunk = fileobj.read(self.CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+
+        response = httpx.post(
+            self._object_url(bucket, path),
+            headers={**self.headers, "Content-Type": content_type, "x-upsert": "true" if upsert else "false"},
+            content=chunks(),
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return path
+
+    def signed_url(self, bucket: str, path: str, expires_in: int = 3600) -> str:
+        """Temporary download link for a private object."""
+        response = httpx.post(
+            f"{self.base_url}/object/sign/{quote(bucket)}/{quote(path.lstrip('/'))}",
+            headers=self.headers,
+            json={"expiresIn": expires_in},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        signed = response.json().get("signedURL") or response.json().get("signedUrl")
+        return f"{self.base_url}{signed}"
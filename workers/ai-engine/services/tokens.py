@@ -0,0 +1,26 @@
+import re
+import unicodedata
+
+# Gemini/OpenAI tokenizers average ~4 characters per token on Portuguese prose;
+# good enough for budgeting without shipping a tokenizer in the worker.
+CHARS_PER_TOKEN = 4
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token-count estimate for prompt budgeting."""
+    if not text:
+        return 0
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
+
+
+def fold(text: str) -> str:
+    """Lowercases and strips accents ("Saúde" -> "saude")."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def words(text: str) -> list:
+    """Accent- and case-folded word tokens."""
+    return _WORD_RE.findall(fold(text))
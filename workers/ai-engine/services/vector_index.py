@@ -0,0 +1,304 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from supabase import Client
+
+from services.embedding_service import EMBEDDING_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _TenantIndex:
+    """One cabinet's embeddings, memory-mapped from the local cache file, and their chunks."""
+    cabinet_id: str
+    column: str
+    dims: int
+    matrix: np.ndarray  # (rows, dims) float32, unit-normalized
+    ids: List[str]
+    chunks: List[Dict[str, Any]]  # {"content", "metadata"}, aligned with ids
+    watermark: Optional[str]  # max(created_at) already indexed
+    kb_version: int = 0
+    checked_at: float = field(default_factory=time.monotonic)
+    text_bytes: int = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.shape[0] * self.dims * 4 + self.text_bytes
+
+
+class TenantTooLarge(Exception):
+    pass
+
+
+class InMemoryVectorIndex:
+    """
+    Optional in-worker retrieval engine for small tenants.
+
+    A cabinet's DocumentChunk embeddings are stored as one contiguous float32
+    matrix in `cache_dir` (raw `.f32` file plus a JSON sidecar with ids, chunk
+    content and metadata, and the `created_at` watermark) and memory-mapped on
+    load, so a worker restart only re-reads the files. Top-k is a single
+    vectorized dot product and hits are returned with their content, without
+    a database round trip.
+
+    Freshness: at most every `refresh_seconds` the cabinet's knowledge base
+    version (see get_agent_cache_fingerprint) is checked; new rows past the
+    watermark are appended, and a version change with no new rows (updates)
+    or a row-count mismatch (deletes, late commits) triggers a full rebuild.
+
+    Tenants over `max_rows` are never loaded; loaded tenants are evicted in
+    LRU order beyond `max_tenants` / `max_bytes`. `search()` returns None
+    whenever the caller should fall back to pgvector.
+    """
+
+    PAGE_SIZE = 1000
+
+    def __init__(
+        self,
+        supabase: Client,
+        cache_dir: str,
+        max_rows: int = 50_000,
+        max_tenants: int = 32,
+        max_bytes: int = 1024 * 1024 * 1024,
+        refresh_seconds: int = 60,
+    ):
+        self.supabase = supabase
+        self.cache_dir = cache_dir
+        self.max_rows = max_rows
+        self.max_tenants = max_tenants
+        self.max_bytes = max_bytes
+        self.refresh_seconds = refresh_seconds
+        self._tenants: "OrderedDict[Tuple[str, str], _TenantIndex]" = OrderedDict()
+        self._too_large: Dict[Tuple[str, str], float] = {}
+        self._loading: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+        self._loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vector-index-loader")
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # --- Local cache files -------------------------------------------------
+
+    def _paths(self, cabinet_id: str, column: str) -> Tuple[str, str]:
+        base = os.path.join(self.cache_dir, f"{cabinet_id}.{column}")
+        return f"{base}.f32", f"{base}.json"
+
+    def _read_cache(self, cabinet_id: str, column: str, dims: int) -> Optional[_TenantIndex]:
+        matrix_path, meta_path = self._paths(cabinet_id, column)
+        if not (os.path.exists(matrix_path) and os.path.exists(meta_path)):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if "chunks" not in meta:  # written before content was cached
+            return None
+        rows = len(meta["ids"])
+        if os.path.getsize(matrix_path) != rows * dims * 4:
+            logger.warning(f"Vector cache for cabinet {cabinet_id} is inconsistent, rebuilding")
+            return None
+        matrix = np.memmap(matrix_path, dtype=np.float32, mode="r", shape=(rows, dims)) if rows else np.zeros((0, dims), dtype=np.float32)
+        return _TenantIndex(
+            cabinet_id, column, dims, matrix, meta["ids"], meta["chunks"], meta.get("watermark"),
+            meta.get("kb_version", 0), text_bytes=self._text_bytes(meta["chunks"]),
+        )
+
+    def _write_meta(self, index: _TenantIndex) -> None:
+        _, meta_path = self._paths(index.cabinet_id, index.column)
+        tmp_path = f"{meta_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "ids": index.ids, "chunks": index.chunks, "watermark": index.watermark, "kb_version": index.kb_version,
+            }, f)
+        os.replace(tmp_path, meta_path)
+
+    # --- Postgres ------------------------------------------------------------
+
+    def _kb_version(self, cabinet_id: str) -> int:
+        rows = self.supabase.rpc("get_agent_cache_fingerprint", {"p_cabinet_id": cabinet_id}).execute().data or []
+        return int(rows[0].get("kb_version") or 0) if rows else 0
+
+    def _remote_count(self, cabinet_id: str, column: str) -> int:
+        response = self.supabase.table("document_chunks")\
+            .select("id", count="exact")\
+            .eq("cabinet_id", cabinet_id)\
+            .not_.is_(column, "null")\
+            .limit(1)\
+            .execute()
+        return response.count or 0
+
+    def _fetch_since(self, cabinet_id: str, column: str, watermark: Optional[str]):
+        """Yields pages of (id, created_at, content, metadata, embedding) ordered by created_at."""
+        offset = 0
+        while True:
+            query = self.supabase.table("document_chunks")\
+                .select(f"id, created_at, content, metadata, {column}")\
+                .eq("cabinet_id", cabinet_id)\
+                .not_.is_(column, "null")
+            if watermark:
+                query = query.gt("created_at", watermark)
+            rows = query.order("created_at").order("id")\
+                .range(offset, offset + self.PAGE_SIZE - 1).execute().data or []
+            if not rows:
+                return
+            yield rows
+            if len(rows) < self.PAGE_SIZE:
+                return
+            offset += len(rows)
+
+    @staticmethod
+    def _text_bytes(chunks: List[Dict[str, Any]]) -> int:
+        return sum(len(chunk["content"] or "") for chunk in chunks)
+
+    @staticmethod
+    def _to_matrix(rows: List[Dict[str, Any]], column: str, dims: int) -> np.ndarray:
+        matrix = np.empty((len(rows), dims), dtype=np.float32)
+        for i, row in enumerate(rows):
+            value = row[column]
+            matrix[i] = json.loads(value) if isinstance(value, str) else value
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    # --- Build / refresh -----------------------------------------------------
+
+    def _append(self, index: _TenantIndex, kb_version: int, matrix_path: Optional[str] = None) -> _TenantIndex:
+        """Appends rows newer than the watermark to the cache file and re-maps it."""
+        matrix_path = matrix_path or self._paths(index.cabinet_id, index.column)[0]
+        ids = list(index.ids)
+        chunks = list(index.chunks)
+        known = set(ids)
+        watermark = index.watermark
+        with open(matrix_path, "ab") as f:
+            for page in self._fetch_since(index.cabinet_id, index.column, index.watermark):
+                page = [row for row in page if row["id"] not in known]
+                if len(ids) + len(page) > self.max_rows:
+                    raise TenantTooLarge(index.cabinet_id)
+                if page:
+                    f.write(self._to_matrix(page, index.column, index.dims).tobytes())
+                    ids.extend(row["id"] for row in page)
+                    chunks.extend({"content": row["content"], "metadata": row["metadata"]} for row in page)
+                    known.update(row["id"] for row in page)
+                    watermark = page[-1]["created_at"]
+
+        rows = len(ids)
+        matrix = np.memmap(matrix_path, dtype=np.float32, mode="r", shape=(rows, index.dims)) if rows else np.zeros((0, index.dims), dtype=np.float32)
+        refreshed = _TenantIndex(
+            index.cabinet_id, index.column, index.dims, matrix, ids, chunks, watermark, kb_version,
+            text_bytes=self._text_bytes(chunks),
+        )
+        self._write_meta(refreshed)
+        return refreshed
+
+    def _build(self, cabinet_id: str, column: str, dims: int, kb_version: int) -> _TenantIndex:
+        # Build into a new file and swap it in: truncating a file that a live
+        # memmap still points at would crash concurrent searches.
+        matrix_path, _ = self._paths(cabinet_id, column)
+        tmp_path = f"{matrix_path}.tmp"
+        open(tmp_path, "wb").close()
+        empty = _TenantIndex(cabinet_id, column, dims, np.zeros((0, dims), dtype=np.float32), [], [], None, kb_version)
+        index = self._append(empty, kb_version, matrix_path=tmp_path)
+        os.replace(tmp_path, matrix_path)
+        return index
+
+    def _load_or_refresh(self, cabinet_id: str, column: str, current: Optional[_TenantIndex]) -> _TenantIndex:
+        dims = EMBEDDING_COLUMNS[column][2]
+        if self._remote_count(cabinet_id, column) > self.max_rows:
+            raise TenantTooLarge(cabinet_id)
+
+        kb_version = self._kb_version(cabinet_id)
+        index = current or self._read_cache(cabinet_id, column, dims)
+        if index is None:
+            index = self._build(cabinet_id, column, dims, kb_version)
+        elif index.kb_version != kb_version:
+            known = len(index.ids)
+            index = self._append(index, kb_version)
+            # Nothing new to append means rows were updated or deleted: cached content may be stale
+            if len(index.ids) == known or len(index.ids) != self._remote_count(cabinet_id, column):
+                logger.info(f"Vector index for cabinet {cabinet_id} diverged (deletes/updates), rebuilding")
+                index = self._build(cabinet_id, column, dims, kb_version)
+        index.checked_at = time.monotonic()
+        return index
+
+    def _load_in_background(self, key: Tuple[str, str], current: Optional[_TenantIndex]) -> None:
+        cabinet_id, column = key
+        try:
+            started = time.monotonic()
+            index = self._load_or_refresh(cabinet_id, column, current)
+            with self._lock:
+                self._tenants[key] = index
+                self._tenants.move_to_end(key)
+                self._evict()
+            logger.info(
+                f"Vector index ready for cabinet {cabinet_id}: {len(index.ids)} chunks "
+                f"in {time.monotonic() - started:.1f}s"
+            )
+        except TenantTooLarge:
+            with self._lock:
+                self._too_large[key] = time.monotonic()
+                self._tenants.pop(key, None)
+            logger.info(f"Cabinet {cabinet_id} exceeds {self.max_rows} chunks, using pgvector")
+        except Exception as e:
+            logger.error(f"Failed to load vector index for cabinet {cabinet_id}: {e}")
+        finally:
+            with self._lock:
+                self._loading.discard(key)
+
+    def _evict(self) -> None:
+        """Drops least-recently-used tenants from memory (cache files are kept)."""
+        total = sum(index.nbytes for index in self._tenants.values())
+        while self._tenants and (len(self._tenants) > self.max_tenants or total > self.max_bytes):
+            key, index = self._tenants.popitem(last=False)
+            total -= index.nbytes
+            logger.info(f"Evicted cold vector index for cabinet {key[0]}")
+
+    # --- Public API ----------------------------------------------------------
+
+    def search(
+        self, cabinet_id: str, query_embedding: List[float], match_count: int, match_threshold: float,
+        column: str = "embedding",
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Returns [{"id", "content", "metadata", "similarity"}] best-first, or None if
+        the tenant is not (yet) served from memory and the caller should query
+        pgvector instead.
+        """
+        key = (cabinet_id, column)
+        now = time.monotonic()
+        with self._lock:
+            too_large_since = self._too_large.get(key)
+            if too_large_since and now - too_large_since < self.refresh_seconds * 10:
+                return None
+            index = self._tenants.get(key)
+            needs_load = (index is None or now - index.checked_at > self.refresh_seconds) and key not in self._loading
+            if needs_load:
+                self._loading.add(key)
+                self._loader.submit(self._load_in_background, key, index)
+            if index is None:
+                return None
+            self._tenants.move_to_end(key)
+
+        if not index.ids:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        scores = index.matrix @ query
+        k = min(match_count, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {"id": index.ids[i], **index.chunks[i], "similarity": float(scores[i])}
+            for i in top if scores[i] > match_threshold
+        ]
+
+    def invalidate(self, cabinet_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._tenants if k[0] == cabinet_id]:
+                self._tenants.pop(key)
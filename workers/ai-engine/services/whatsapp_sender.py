@@ -0,0 +1,93 @@
+import re
+import logging
+from typing import List, Optional
+from urllib.parse import quote
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# End of a sentence: terminal punctuation (plus closing quotes/brackets) followed by
+# whitespace, or a line break
+_SENTENCE_END_RE = re.compile(r"(?:[.!?…]+[\"')\]]*\s+|\n+)")
+
+
+class SentenceChunker:
+    """
+    Groups streamed text deltas into sentence-sized WhatsApp messages.
+
+    A piece is emitted at the first sentence boundary after `min_chars`
+    characters; if no boundary shows up before `max_chars`, the text is cut at
+    the last space so a run-on answer still flows.
+    """
+
+    def __init__(self, min_chars: int = 80, max_chars: int = 600):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, delta: str) -> List[str]:
+        """Adds a delta and returns the pieces now complete."""
+        self._buffer += delta
+        pieces = []
+        while True:
+            cut = self._next_cut()
+            if cut is None:
+                return pieces
+            piece, self._buffer = self._buffer[:cut].strip(), self._buffer[cut:]
+            if piece:
+                pieces.append(piece)
+
+    def flush(self) -> Optional[str]:
+        """Returns whatever is left at the end of the stream."""
+        piece, self._buffer = self._buffer.strip(), ""
+        return piece or None
+
+    def _next_cut(self) -> Optional[int]:
+        for match in _SENTENCE_END_RE.finditer(self._buffer, self.min_chars):
+            if match.end() <= self.max_chars:
+                return match.end()
+            break
+        if len(self._buffer) < self.max_chars:
+            return None
+        space = self._buffer.rfind(" ", self.min_chars, self.max_chars)
+        return space + 1 if space > 0 else self.max_chars
+
+
+class EvolutionWhatsAppSender:
+    """
+    Sends text messages through an Evolution API instance (same endpoint the
+    n8n flows used). Every cabinet has its own instance, i.e. its own number
+    (cabinets.whatsapp_instance): the worker keeps one unbound sender and
+    binds it per message with `for_instance()`.
+    """
+
+    def __init__(self, api_url: str, api_key: str, instance: Optional[str] = None, timeout: float = 10.0):
+        self.api_url = api_url.rstrip("/")
+        self.api_key = api_key
+        self.instance = instance
+        self.timeout = timeout
+
+    def for_instance(self, instance: str) -> "EvolutionWhatsAppSender":
+        return EvolutionWhatsAppSender(self.api_url, self.api_key, instance, self.timeout)
+
+    @property
+    def url(self) -> str:
+        if not self.instance:
+            raise ValueError("EvolutionWhatsAppSender is not bound to an instance")
+        return f"{self.api_url}/message/sendText/{quote(self.instance, safe='')}"
+
+    @staticmethod
+    def normalize_number(phone_number: str) -> str:
+        """Accepts plain numbers and remote JIDs (5511...@s.whatsapp.net)."""
+        return phone_number.split("@", 1)[0]
+
+    async def send_text(self, phone_number: str, text: str) -> None:
+        async with httpx.AsyncClient() as client:
+            response = await client.post(
+                self.url,
+                headers={"apikey": self.api_key},
+                json={"number": self.normalize_number(phone_number), "text": text},
+                timeout=self.timeout,
+            )
+        response.raise_for_status()
@@ -0,0 +1,39 @@
+import logging
+from typing import List
+
+from supabase import Client
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_agent_log_rollups(supabase: Client, grace_seconds: int = 300) -> int:
+    """
+    Folds new agent_logs rows into agent_log_rollups_hourly.
+
+    Rows younger than `grace_seconds` are left for the next run so buffered
+    writers (AgentLogWriter) have time to land them.
+
+    Returns:
+        int: Number of rollup rows inserted or updated.
+    """
+    response = supabase.rpc("refresh_agent_log_rollups", {"p_grace": f"{grace_seconds} seconds"}).execute()
+    return int(response.data or 0)
+
+
+def enforce_agent_logs_retention(supabase: Client, retention_months: int = 12, months_ahead: int = 3) -> List[str]:
+    """
+    Keeps agent_logs partitions in shape: creates the upcoming monthly
+    partitions and detaches/drops the ones older than `retention_months`.
+
+    Rollups are refreshed first, so hourly counts outlive the raw rows.
+
+    Returns:
+        list: Names of the dropped partitions.
+    """
+    supabase.rpc("ensure_agent_logs_partitions", {"p_months_ahead": months_ahead}).execute()
+    refresh_agent_log_rollups(supabase)
+    response = supabase.rpc("drop_old_agent_logs_partitions", {"p_retention_months": retention_months}).execute()
+    dropped = [row if isinstance(row, str) else next(iter(row.values())) for row in response.data or []]
+    if dropped:
+        logger.info(f"Dropped agent_logs partitions older than {retention_months} months: {', '.join(dropped)}")
+    return dropped
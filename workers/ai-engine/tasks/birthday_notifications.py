@@ -0,0 +1,251 @@
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from sqlalchemy import column, or_, select, table
+from sqlalchemy.dialects.postgresql import JSONB, UUID, insert
+from sqlalchemy.orm import Session
+
+from app.models.cabinet import Cabinet
+from app.models.notification import Notification
+from app.services.analytics import VoterAnalyticsService
+from app.services.cabinet_stats_service import STATS_TIMEZONE, CabinetStatsService
+from app.services.tenant_context import ACTIVE_STATUSES, TenantContextCache
+from tasks.errors import TaskDeferred
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_TYPE = "birthday"
+GREETING_TASK_TYPE = "send_birthday_greeting"
+# Cabinet feature flag (cabinets.feature_flags) opting into WhatsApp greetings
+GREETING_FEATURE = "birthday_greetings"
+
+DEFAULT_GREETING_TEMPLATE = (
+    "Olá, {first_name}! Feliz aniversário! 🎉 Desejamos muita saúde e alegria. "
+    "Um abraço de {official_name}."
+)
+
+# Only the columns the job writes; background_tasks has no model
+background_tasks = table(
+    "background_tasks",
+    column("cabinet_id", UUID(as_uuid=True)),
+    column("task_type"),
+    column("payload", JSONB),
+    column("run_after"),
+)
+
+
+def _notification_text(item: Dict[str, Any]) -> Dict[str, str]:
+    when = "hoje" if item["days_until"] == 0 else (
+        "amanhã" if item["days_until"] == 1 else "em " + date.fromisoformat(item["date"]).strftime("%d/%m")
+    )
+    age = f" ({item['age']} anos)" if item.get("age") else ""
+    return {
+        "title": f"Aniversário de {item['name']}",
+        "message": f"{item['name']} faz aniversário {when}{age}.",
+    }
+
+
+class BirthdayNotificationJob:
+    """
+    Daily job writing today's and upcoming voter birthdays into notifications,
+    one row per voter and birthday, so dashboards read that small set instead
+    of scanning voters.
+
+    Birthdays come from VoterAnalyticsService.upcoming_birthdays (an index
+    range on idx_voters_cabinet_birthday) and are written with one INSERT
+    per cabinet; the unique (cabinet_id, type, voter_id, event_date) index
+    makes re-runs and concurrent workers harmless. For cabinets with the
+    `birthday_greetings` feature flag, birthdays falling today that were
+    newly notified also get a send_birthday_greeting task, spread from
+    `greeting_hour` at `greetings_per_minute`. That only spaces the tasks:
+    each send also takes a token from the cabinet's `whatsapp` bucket
+    (CABINET_RATE_LIMIT_REQUESTS_PER_MINUTE), which only greetings draw from;
+    replies to incoming messages are not counted against it.
+
+    The job loops over every cabinet, so the worker runs it off the poll loop
+    (a background periodic job).
+
+    Cabinets that fail are retried on the next run the same day.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        tenant_contexts: Optional[TenantContextCache] = None,
+        days_ahead: int = 7,
+        retention_days: int = 30,
+        greetings_enabled: bool = False,
+        greeting_hour: int = 9,
+        greetings_per_minute: float = 20,
+    ):
+        self.session_factory = session_factory
+        self.tenant_contexts = tenant_contexts
+        self.days_ahead = days_ahead
+        self.retention_days = retention_days
+        self.greetings_enabled = greetings_enabled and tenant_contexts is not None
+        self.greeting_hour = greeting_hour
+        self.greetings_per_minute = greetings_per_minute
+        self._last_day: Optional[date] = None
+        self._failed: Set = set()  # cabinets of _last_day still to retry
+
+    def run(self) -> int:
+        """
+        Runs once per local day (America/Sao_Paulo); later calls the same day
+        only retry the cabinets that failed, and return 0 right away once none
+        are left, so the scheduler interval can be short.
+
+        Returns:
+            int: Notifications created.
+        """
+        today = CabinetStatsService.today()
+        retrying = self._last_day == today
+        if retrying and not self._failed:
+            return 0
+
+        created = 0
+        failed = set()
+        with self.session_factory() as session:
+            if retrying:
+                cabinet_ids = list(self._failed)
+            else:
+                cabinet_ids = session.scalars(
+                    select(Cabinet.id).where(or_(Cabinet.status.is_(None), Cabinet.status.in_(ACTIVE_STATUSES)))
+                ).all()
+            for cabinet_id in cabinet_ids:
+                try:
+                    created += self._notify_cabinet(session, cabinet_id, today)
+                except Exception as e:
+                    session.rollback()
+                    failed.add(cabinet_id)
+                    logger.error(f"Birthday notifications failed for cabinet {cabinet_id}: {e}")
+
+            session.execute(
+                Notification.__table__.delete().where(
+                    Notification.type == NOTIFICATION_TYPE,
+                    Notification.event_date < today - timedelta(days=self.retention_days),
+                )
+            )
+            session.commit()
+
+        self._last_day = today
+        self._failed = failed
+        if created:
+            logger.info(f"Created {created} birthday notifications for {today.isoformat()}")
+        return created
+
+    def _notify_cabinet(self, session: Session, cabinet_id, today: date) -> int:
+        birthdays = VoterAnalyticsService(session).upcoming_birthdays(cabinet_id, days=self.days_ahead, today=today)
+        if not birthdays:
+            return 0
+
+        statement = insert(Notification).values([
+            {
+                "cabinet_id": cabinet_id,
+                "type": NOTIFICATION_TYPE,
+                "category": "voters",
+                "voter_id": item["id"],
+                "event_date": date.fromisoformat(item["date"]),
+                **_notification_text(item),
+            }
+            for item in birthdays
+        ])
+        inserted = set(session.scalars(
+            statement.on_conflict_do_nothing(
+                index_elements=[Notification.cabinet_id, Notification.type, Notification.voter_id, Notification.event_date],
+                index_where=Notification.voter_id.is_not(None),
+            ).returning(Notification.voter_id)
+        ))
+
+        greetings = [
+            item for item in birthdays
+            if item["days_until"] == 0 and item["phone"] and item["id"] in inserted
+        ]
+        if greetings and self._greetings_on(cabinet_id):
+            self._enqueue_greetings(session, cabinet_id, today, greetings)
+
+        session.commit()
+        return len(inserted)
+
+    def _greetings_on(self, cabinet_id) -> bool:
+        if not self.greetings_enabled:
+            return False
+        context = self.tenant_contexts.get(cabinet_id)
+        return (
+            context is not None and context.is_active and context.feature(GREETING_FEATURE)
+            and bool(context.whatsapp_instance)
+        )
+
+    def _enqueue_greetings(self, session: Session, cabinet_id, today: date, greetings: List[Dict[str, Any]]) -> None:
+        # Spread the sends instead of waking them all at once; the rate limiter still has the last word
+        start = max(
+            datetime.combine(today, time(self.greeting_hour), tzinfo=STATS_TIMEZONE),
+            datetime.now(STATS_TIMEZONE),
+        )
+        spacing = 60.0 / self.greetings_per_minute
+        session.execute(insert(background_tasks).values([
+            {
+                "cabinet_id": cabinet_id,
+                "task_type": GREETING_TASK_TYPE,
+                "payload": {
+                    "cabinet_id": str(cabinet_id),
+                    "voter_id": item["id"],
+                    "name": item["name"],
+                    "phone": item["phone"],
+                    "date": item["date"],
+                },
+                "run_after": start + timedelta(seconds=index * spacing),
+            }
+            for index, item in enumerate(greetings)
+        ]))
+
+
+class BirthdayGreetingTask:
+    """
+    Sends one birthday greeting over WhatsApp (task send_birthday_greeting,
+    enqueued by BirthdayNotificationJob) from the cabinet's own WhatsApp
+    instance. Deferred while the cabinet's `whatsapp` rate limit is
+    exhausted; dropped once the birthday has passed.
+    """
+
+    def __init__(
+        self,
+        whatsapp_sender,
+        cabinet_limiter=None,
+        tenant_contexts: Optional[TenantContextCache] = None,
+        template: str = DEFAULT_GREETING_TEMPLATE,
+    ):
+        self.whatsapp_sender = whatsapp_sender
+        self.cabinet_limiter = cabinet_limiter
+        self.tenant_contexts = tenant_contexts
+        self.template = template
+
+    async def execute(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        cabinet_id = payload.get("cabinet_id")
+        phone = payload.get("phone")
+        if not cabinet_id or not phone:
+            raise ValueError("send_birthday_greeting needs cabinet_id and phone")
+        if payload.get("date") and payload["date"] != CabinetStatsService.today().isoformat():
+            logger.info(f"Birthday greeting for voter {payload.get('voter_id')} skipped: {payload['date']} has passed")
+            return {"sent": False}
+
+        context = self.tenant_contexts.get(cabinet_id) if self.tenant_contexts else None
+        if context is None or not (context.is_active and context.feature(GREETING_FEATURE)):
+            return {"sent": False}
+        if not context.whatsapp_instance:
+            logger.info(f"Birthday greeting skipped: cabinet {cabinet_id} has no WhatsApp instance")
+            return {"sent": False}
+
+        if self.cabinet_limiter:
+            wait = self.cabinet_limiter.try_acquire(cabinet_id, "whatsapp")
+            if wait > 0:
+                raise TaskDeferred(wait, f"Cabinet {cabinet_id} WhatsApp quota exhausted")
+
+        name = (payload.get("name") or "").strip()
+        text = self.template.format(
+            name=name,
+            first_name=name.split(" ")[0] if name else "",
+            official_name=context.official_name or context.name,
+        )
+        await self.whatsapp_sender.for_instance(context.whatsapp_instance).send_text(phone, text)
+        return {"sent": True}
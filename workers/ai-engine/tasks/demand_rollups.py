@@ -0,0 +1,15 @@
+from supabase import Client
+
+
+def refresh_demand_rollups(supabase: Client, grace_seconds: int = 120) -> int:
+    """
+    Folds new demand_status_events rows into demand_daily_rollups.
+
+    Events younger than `grace_seconds` are left for the next run so
+    transactions still in flight can commit theirs.
+
+    Returns:
+        int: Number of rollup rows inserted or updated.
+    """
+    response = supabase.rpc("refresh_demand_rollups", {"p_grace": f"{grace_seconds} seconds"}).execute()
+    return int(response.data or 0)
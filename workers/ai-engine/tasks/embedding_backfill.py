@@ -0,0 +1,256 @@
+import time
+import asyncio
+import logging
+import argparse
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+from supabase import Client
+
+from services.embedding_service import EmbeddingService, EMBEDDING_COLUMNS
+from services.rate_limiter import TokenBucket, CabinetRateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBackfillTask:
+    """
+    Re-embeds a cabinet's document chunks into a target column (embedding or
+    embedding_openai) so a cabinet can switch embedding providers without
+    losing search.
+
+    Progress lives in the `embedding_migrations` table: every batch advances the
+    keyset checkpoint (`last_chunk_id`) and updates processed counts and ETA, so
+    an interrupted run resumes where it stopped. A final sweep from the start
+    picks up chunks ingested behind the checkpoint; chunks ingested after the
+    job completes are covered by running it again, which only embeds rows
+    still missing the target column.
+
+    Batch writes go through `apply_chunk_embeddings`, which does not bump the
+    cabinet's knowledge base version; each run bumps it once when it stops
+    (completed, paused or failed), so the semantic answer cache is invalidated
+    once rather than once per batch.
+
+    Payload format (task_type = "embedding_backfill"):
+    {
+        "migration_id": "uuid"  # resume an existing job, or:
+        "cabinet_id": "uuid", "target_column": "embedding_openai", "source_type": "upload" | null
+    }
+    """
+
+    MAX_RATE_LIMIT_RETRIES = 5
+
+    def __init__(
+        self,
+        supabase: Client,
+        embedding_service: EmbeddingService,
+        batch_size: int = 64,
+        requests_per_minute: float = 60,
+        cabinet_limiter: Optional[CabinetRateLimiter] = None,
+    ):
+        self.supabase = supabase
+        self.embedding_service = embedding_service
+        self.batch_size = batch_size
+        self.limiter = TokenBucket.per_minute(requests_per_minute)
+        # Shares the cabinet's provider quota with the WhatsApp traffic on the same key
+        self.cabinet_limiter = cabinet_limiter
+
+    def create_or_resume(self, cabinet_id: str, target_column: str, source_type: Optional[str] = None) -> Dict[str, Any]:
+        """Returns the active job for cabinet/target/source, creating it if needed."""
+        if target_column not in EMBEDDING_COLUMNS:
+            raise ValueError(f"Unknown embedding column: {target_column}")
+
+        query = self.supabase.table("embedding_migrations")\
+            .select("*")\
+            .eq("cabinet_id", cabinet_id)\
+            .eq("target_column", target_column)\
+            .in_("status", ["pending", "running", "paused"])
+        query = query.eq("source_type", source_type) if source_type else query.is_("source_type", "null")
+        existing = query.limit(1).execute().data
+        if existing:
+            return existing[0]
+
+        created = self.supabase.table("embedding_migrations")\
+            .insert({
+                "cabinet_id": cabinet_id,
+                "target_column": target_column,
+                "source_type": source_type,
+                "status": "pending",
+            })\
+            .execute()
+        return created.data[0]
+
+    def _missing_chunks_query(self, migration: Dict[str, Any], columns: str, **select_kwargs):
+        query = self.supabase.table("document_chunks")\
+            .select(columns, **select_kwargs)\
+            .eq("cabinet_id", migration["cabinet_id"])\
+            .is_(migration["target_column"], "null")
+        if migration.get("source_type"):
+            query = query.eq("source_type", migration["source_type"])
+        return query
+
+    def _count_missing(self, migration: Dict[str, Any]) -> int:
+        response = self._missing_chunks_query(migration, "id", count="exact").limit(1).execute()
+        return response.count or 0
+
+    def _fetch_batch(self, migration: Dict[str, Any], after_id: Optional[str]) -> List[Dict[str, Any]]:
+        query = self._missing_chunks_query(migration, "id, content")
+        if after_id:
+            query = query.gt("id", after_id)
+        return query.order("id").limit(self.batch_size).execute().data or []
+
+    def _update(self, migration_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        response = self.supabase.table("embedding_migrations")\
+            .update(fields)\
+            .eq("id", migration_id)\
+            .execute()
+        return response.data[0] if response.data else {}
+
+    def _bump_kb_version(self, cabinet_id: str) -> None:
+        try:
+            self.supabase.rpc("bump_cabinet_knowledge_base_version", {"p_cabinet_id": cabinet_id}).execute()
+        except Exception as e:
+            logger.error(f"Failed to bump knowledge base version for cabinet {cabinet_id}: {e}")
+
+    async def _embed_with_retry(self, cabinet_id: str, texts: List[str], column: str) -> List[List[float]]:
+        for attempt in range(self.MAX_RATE_LIMIT_RETRIES):
+            await self.limiter.acquire()
+            if self.cabinet_limiter:
+                await self.cabinet_limiter.acquire(cabinet_id, EMBEDDING_COLUMNS[column][0])
+            try:
+                return await self.embedding_service.embed_documents(cabinet_id, texts, column)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code != 429:
+                    raise
+                retry_after = float(e.response.headers.get("retry-after") or 2 ** attempt)
+                logger.warning(f"Provider rate limit hit, retrying batch in {retry_after:.0f}s")
+                await asyncio.sleep(retry_after)
+        raise RuntimeError("Provider kept rate limiting the backfill; giving up on this run")
+
+    async def execute(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if payload.get("migration_id"):
+            rows = self.supabase.table("embedding_migrations")\
+                .select("*").eq("id", payload["migration_id"]).limit(1).execute().data
+            if not rows:
+                raise ValueError(f"Embedding migration {payload['migration_id']} not found")
+            migration = rows[0]
+        else:
+            if not payload.get("cabinet_id") or not payload.get("target_column"):
+                raise ValueError("Missing required fields: 'cabinet_id' and 'target_column' (or 'migration_id').")
+            migration = self.create_or_resume(payload["cabinet_id"], payload["target_column"], payload.get("source_type"))
+
+        if migration["status"] == "completed":
+            return {"status": "success", "migration": migration}
+
+        migration_id = migration["id"]
+        processed = migration.get("processed_chunks") or 0
+        failed_ids = set()  # chunks still missing after this run; earlier failures are retried
+        remaining = self._count_missing(migration)
+        migration = self._update(migration_id, {
+            "status": "running",
+            "total_chunks": processed + remaining,
+            "started_at": migration.get("started_at") or datetime.utcnow().isoformat(),
+            "error_details": None,
+        })
+        logger.info(
+            f"Embedding backfill {migration_id}: {remaining} chunks to embed into "
+            f"{migration['target_column']} for cabinet {migration['cabinet_id']}"
+        )
+
+        checkpoint = migration.get("last_chunk_id")
+        swept = False  # one final pass from the start catches rows inserted behind the checkpoint
+        run_started = time.monotonic()
+        run_processed = 0
+
+        try:
+            while True:
+                batch = self._fetch_batch(migration, checkpoint)
+                if not batch:
+                    if checkpoint is None or swept:
+                        break
+                    checkpoint, swept = None, True
+                    continue
+
+                try:
+                    vectors = await self._embed_with_retry(
+                        migration["cabinet_id"], [row["content"] for row in batch], migration["target_column"]
+                    )
+                    self.supabase.rpc("apply_chunk_embeddings", {
+                        "p_target_column": migration["target_column"],
+                        "p_embeddings": [{"id": row["id"], "embedding": v} for row, v in zip(batch, vectors)],
+                    }).execute()
+                    processed += len(batch)
+                    run_processed += len(batch)
+                    failed_ids.difference_update(row["id"] for row in batch)
+                except (httpx.HTTPError, ValueError) as e:
+                    # Skip past the batch; the final sweep retries it once
+                    logger.error(f"Embedding backfill {migration_id}: batch failed: {e}")
+                    failed_ids.update(row["id"] for row in batch)
+
+                checkpoint = batch[-1]["id"]
+                elapsed = time.monotonic() - run_started
+                rate = run_processed / elapsed if elapsed > 0 else 0.0
+                left = max((migration.get("total_chunks") or 0) - processed - len(failed_ids), 0)
+                migration = self._update(migration_id, {
+                    "processed_chunks": processed,
+                    "failed_chunks": len(failed_ids),
+                    "last_chunk_id": checkpoint,
+                    "chunks_per_second": round(rate, 2),
+                    "eta_seconds": int(left / rate) if rate else None,
+                }) or migration
+                logger.info(
+                    f"Embedding backfill {migration_id}: {processed}/{migration.get('total_chunks')} "
+                    f"({rate:.1f} chunks/s, ETA {migration.get('eta_seconds')}s)"
+                )
+
+                if migration.get("status") == "paused":
+                    logger.info(f"Embedding backfill {migration_id} paused at {checkpoint}")
+                    return {"status": "paused", "migration": migration}
+
+        except Exception as e:
+            self._update(migration_id, {"status": "failed", "error_details": str(e)})
+            raise
+        finally:
+            if run_processed:
+                self._bump_kb_version(migration["cabinet_id"])
+
+        migration = self._update(migration_id, {
+            "status": "completed",
+            "completed_at": datetime.utcnow().isoformat(),
+            "eta_seconds": 0,
+            "failed_chunks": len(failed_ids),
+            "error_details": f"{len(failed_ids)} chunks could not be embedded" if failed_ids else None,
+        })
+        logger.info(f"Embedding backfill {migration_id} completed: {processed} embedded, {len(failed_ids)} failed")
+        return {"status": "success", "migration": migration}
+
+
+def main():
+    """Command-line entry point: python -m tasks.embedding_backfill --cabinet-id ... --target ..."""
+    from supabase import create_client
+    from config import SUPABASE_URL, SUPABASE_SERVICE_KEY
+
+    parser = argparse.ArgumentParser(description="Re-embed a cabinet's document chunks into another column.")
+    parser.add_argument("--cabinet-id", required=True)
+    parser.add_argument("--target", required=True, choices=sorted(EMBEDDING_COLUMNS))
+    parser.add_argument("--source-type", default=None)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--rpm", type=float, default=60, help="Provider requests per minute")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+    task = EmbeddingBackfillTask(
+        supabase, EmbeddingService(supabase), batch_size=args.batch_size, requests_per_minute=args.rpm
+    )
+    result = asyncio.run(task.execute({
+        "cabinet_id": args.cabinet_id,
+        "target_column": args.target,
+        "source_type": args.source_type,
+    }))
+    print(result["status"], result["migration"].get("processed_chunks"), "chunks embedded")
+
+
+if __name__ == "__main__":
+    main()
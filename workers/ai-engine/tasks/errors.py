@@ -0,0 +1,11 @@
+class TaskDeferred(Exception):
+    """
+    Raised by a task handler to put its task back on the queue instead of
+    failing it: the worker sets it to pending with run_after = now + delay
+    and does not count an attempt.
+    """
+
+    def __init__(self, delay_seconds: float, reason: str):
+        super().__init__(reason)
+        self.delay_seconds = delay_seconds
+        self.reason = reason
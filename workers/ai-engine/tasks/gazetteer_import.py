@@ -0,0 +1,142 @@
+import csv
+import logging
+import argparse
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.geo import GeocodedPlace
+from tasks.voter_import import _fold
+
+logger = logging.getLogger(__name__)
+
+# Gazetteer headers accepted for each field, compared lowercased and without accents
+HEADER_ALIASES = {
+    "city": ("city", "cidade", "municipio", "nome_municipio"),
+    "neighborhood": ("neighborhood", "bairro", "nome_bairro"),
+    "state": ("state", "uf", "estado"),
+    "lat": ("lat", "latitude"),
+    "lng": ("lng", "lon", "long", "longitude"),
+}
+
+_ALIAS_FIELDS = {_fold(alias): field for field, aliases in HEADER_ALIASES.items() for alias in aliases}
+
+
+def _coordinate(value: str, limit: float) -> Optional[float]:
+    try:
+        number = float(value.strip().replace(",", "."))
+    except (AttributeError, ValueError):
+        return None
+    return number if -limit <= number <= limit else None
+
+
+def iter_gazetteer(path: str, source: str) -> Iterator[Dict[str, Any]]:
+    """
+    Places of a gazetteer CSV (IBGE-style: city, neighborhood, state, lat, lng;
+    ',' or ';' separated). Rows without a neighborhood are city centroids;
+    rows without valid coordinates are skipped.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as fileobj:
+        sample = fileobj.read(64 * 1024)
+        fileobj.seek(0)
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        reader = csv.reader(fileobj, dialect)
+        header = [_ALIAS_FIELDS.get(_fold(column)) for column in next(reader, [])]
+        missing = {"city", "lat", "lng"} - set(header)
+        if missing:
+            raise ValueError(f"Gazetteer {path} lacks columns: {', '.join(sorted(missing))}")
+
+        for line_number, row in enumerate(reader, start=2):
+            values = {field: cell.strip() for field, cell in zip(header, row) if field}
+            lat, lng = _coordinate(values.get("lat"), 90), _coordinate(values.get("lng"), 180)
+            if not values.get("city") or lat is None or lng is None:
+                logger.debug(f"Gazetteer line {line_number} skipped: {row}")
+                continue
+            yield {
+                "city": values["city"],
+                "neighborhood": values.get("neighborhood") or None,
+                "state": values.get("state") or None,
+                "lat": lat,
+                "lng": lng,
+                "source": source,
+            }
+
+
+class GazetteerImportTask:
+    """
+    Loads neighborhood and city centroids into geocoded_places (the geocoding
+    cache of the density map) from a local gazetteer file. Re-running with a
+    newer file updates coordinates in place; places match on their
+    normalized keys, so accents and case do not create duplicates.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], batch_size: int = 1000):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+
+    def _flush(self, session: Session, batch: List[Dict[str, Any]]) -> None:
+        # Later duplicates of a key in the same statement would make ON CONFLICT fail
+        unique = list({(_fold(row["city"]), _fold(row["neighborhood"] or "")): row for row in batch}.values())
+        statement = insert(GeocodedPlace).values(unique)
+        session.execute(statement.on_conflict_do_update(
+            index_elements=[GeocodedPlace.city_key, GeocodedPlace.neighborhood_key],
+            set_={
+                "city": statement.excluded.city,
+                "neighborhood": statement.excluded.neighborhood,
+                "state": statement.excluded.state,
+                "lat": statement.excluded.lat,
+                "lng": statement.excluded.lng,
+                "source": statement.excluded.source,
+                "updated_at": func.timezone("utc", func.now()),
+            },
+            # Unchanged rows keep their updated_at, so cached maps stay valid
+            where=(GeocodedPlace.lat != statement.excluded.lat) | (GeocodedPlace.lng != statement.excluded.lng),
+        ))
+        session.commit()
+
+    def execute(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        path = payload.get("path")
+        if not path:
+            raise ValueError("import_gazetteer needs a path")
+        source = payload.get("source") or "gazetteer"
+
+        places = 0
+        with self.session_factory() as session:
+            batch: List[Dict[str, Any]] = []
+            for place in iter_gazetteer(path, source):
+                batch.append(place)
+                if len(batch) >= self.batch_size:
+                    self._flush(session, batch)
+                    places += len(batch)
+                    batch = []
+            if batch:
+                self._flush(session, batch)
+                places += len(batch)
+
+        logger.info(f"Gazetteer {path}: {places} places loaded")
+        return {"places": places}
+
+
+def main():
+    """Command-line entry point: python -m tasks.gazetteer_import --path bairros.csv"""
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Load a gazetteer CSV into geocoded_places.")
+    parser.add_argument("--path", required=True)
+    parser.add_argument("--source", default="gazetteer")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if SessionLocal is None:
+        raise SystemExit("DATABASE_URL is required")
+    print(GazetteerImportTask(SessionLocal, batch_size=args.batch_size).execute({
+        "path": args.path,
+        "source": args.source,
+    }))
+
+
+if __name__ == "__main__":
+    main()
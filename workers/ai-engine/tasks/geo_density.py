@@ -0,0 +1,23 @@
+import logging
+from typing import Callable, Iterable
+
+from sqlalchemy.orm import Session
+
+from app.services.geo_density_service import GeoDensityService
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_geo_density(session_factory: Callable[[], Session], levels: Iterable[str] = ("neighborhood",)) -> int:
+    """
+    Recomputes the density maps whose counters or gazetteer changed since
+    they were cached, so dashboards rarely pay for a recompute.
+
+    Returns:
+        int: Number of cabinet maps rewritten.
+    """
+    with session_factory() as session:
+        refreshed = GeoDensityService(session).refresh_stale(levels)
+    if refreshed:
+        logger.info(f"Refreshed {refreshed} cabinet density maps")
+    return refreshed
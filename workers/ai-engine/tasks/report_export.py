@@ -0,0 +1,395 @@
+import os
+import csv
+import gzip
+import time
+import logging
+import argparse
+import tempfile
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import Integer, cast, extract, func, select, update
+from sqlalchemy.orm import Session
+
+from app.models.demand import Demand
+from app.models.report_export import ReportExport
+from app.models.voter import Voter
+from app.services.search_service import escape_like
+from services.storage import StorageClient
+
+logger = logging.getLogger(__name__)
+
+# Timestamps are written in the cabinets' local time (Excel has no time zones)
+EXPORT_TIMEZONE = ZoneInfo("America/Sao_Paulo")
+
+# Rows per Excel sheet; longer exports continue on "Dados 2", "Dados 3", ...
+XLSX_MAX_ROWS = 1_048_575
+
+
+def _contains(column, value: str):
+    return column.ilike(f"%{escape_like(value)}%")
+
+
+# report -> (model, [(header, column, kind)], {filter: condition builder})
+# kind: "int" | "text" | "date" | "timestamp"
+REPORTS: Dict[str, Tuple[Any, List[Tuple[str, Any, str]], Dict[str, Callable[[Any], Any]]]] = {
+    "voters": (
+        Voter,
+        [
+            ("ID", Voter.id, "int"),
+            ("Nome", Voter.name, "text"),
+            ("CPF", Voter.cpf, "text"),
+            ("Telefone", Voter.phone, "text"),
+            ("Endereço", Voter.address, "text"),
+            ("Bairro", Voter.neighborhood, "text"),
+            ("Cidade", Voter.city, "text"),
+            ("Nascimento", Voter.birth_date, "date"),
+            ("Categoria", Voter.category, "text"),
+            ("Status", Voter.status, "text"),
+            ("Origem", Voter.source, "text"),
+            ("Cadastrado em", Voter.created_at, "timestamp"),
+        ],
+        {
+            # substring filters as the report screens send them (trigram indexed)
+            "neighborhood": lambda value: _contains(Voter.neighborhood, value),
+            "city": lambda value: _contains(Voter.city, value),
+            "category": lambda value: Voter.category == value,
+            "status": lambda value: Voter.status == value,
+            "source": lambda value: Voter.source == value,
+            "birth_month": lambda value: cast(extract("month", Voter.birth_date), Integer) == int(value),
+            "created_from": lambda value: Voter.created_at >= date.fromisoformat(value),
+            "created_to": lambda value: Voter.created_at < date.fromisoformat(value) + timedelta(days=1),
+        },
+    ),
+    "demands": (
+        Demand,
+        [
+            ("Protocolo", Demand.id, "int"),
+            ("Título", Demand.title, "text"),
+            ("Descrição", Demand.description, "text"),
+            ("Beneficiário", Demand.beneficiary, "text"),
+            ("Categoria", Demand.category, "text"),
+            ("Status", Demand.status, "text"),
+            ("Prioridade", Demand.priority, "text"),
+            ("Responsável", Demand.assigned_to, "text"),
+            ("Protocolo externo", Demand.external_id, "text"),
+            ("Criada em", Demand.created_at, "timestamp"),
+            ("Atualizada em", Demand.updated_at, "timestamp"),
+        ],
+        {
+            "status": lambda value: Demand.status == value,
+            "category": lambda value: Demand.category == value,
+            "priority": lambda value: Demand.priority == value,
+            "assigned_to": lambda value: Demand.assigned_to == value,
+            "created_from": lambda value: Demand.created_at >= date.fromisoformat(value),
+            "created_to": lambda value: Demand.created_at < date.fromisoformat(value) + timedelta(days=1),
+        },
+    ),
+}
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "csv.gz": "application/gzip",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _local(value: Optional[datetime]) -> Optional[datetime]:
+    """Aware timestamp -> naive local time."""
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(EXPORT_TIMEZONE).replace(tzinfo=None)
+    return value
+
+
+class CsvWriter:
+    """';'-separated UTF-8 with BOM (opens in pt-BR Excel), gzip-compressed on the fly if asked."""
+
+    def __init__(self, path: str, headers: Sequence[str], kinds: Sequence[str], compress: bool):
+        self.kinds = kinds
+        if compress:
+            self.file = gzip.open(path, "wt", encoding="utf-8-sig", newline="", compresslevel=6)
+        else:
+            self.file = open(path, "w", encoding="utf-8-sig", newline="")
+        self.writer = csv.writer(self.file, delimiter=";")
+        self.writer.writerow(headers)
+
+    def _cell(self, value: Any, kind: str) -> Any:
+        if value is None:
+            return ""
+        if kind == "date":
+            return value.strftime("%d/%m/%Y")
+        if kind == "timestamp":
+            return _local(value).strftime("%d/%m/%Y %H:%M")
+        return value
+
+    def write_rows(self, rows: Sequence[Sequence[Any]]) -> None:
+        self.writer.writerows([self._cell(value, kind) for value, kind in zip(row, self.kinds)] for row in rows)
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class XlsxWriter:
+    """openpyxl write-only workbook: rows go to temporary XML parts, not memory."""
+
+    def __init__(self, path: str, headers: Sequence[str], kinds: Sequence[str]):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise RuntimeError("openpyxl is required to export .xlsx files")
+        self.path = path
+        self.headers = list(headers)
+        self.kinds = kinds
+        self.workbook = Workbook(write_only=True)
+        self.sheets = 0
+        self._new_sheet()
+
+    def _new_sheet(self) -> None:
+        self.sheets += 1
+        self.sheet = self.workbook.create_sheet("Dados" if self.sheets == 1 else f"Dados {self.sheets}")
+        self.sheet.append(self.headers)
+        self.sheet_rows = 0
+
+    def write_rows(self, rows: Sequence[Sequence[Any]]) -> None:
+        for row in rows:
+            if self.sheet_rows >= XLSX_MAX_ROWS:
+                self._new_sheet()
+            self.sheet.append([
+                _local(value) if kind == "timestamp" else value for value, kind in zip(row, self.kinds)
+            ])
+            self.sheet_rows += 1
+
+    def close(self) -> None:
+        self.workbook.save(self.path)  # deflate-compressed zip
+
+
+class ParquetWriter:
+    """One zstd-compressed row group per fetched batch."""
+
+    def __init__(self, path: str, headers: Sequence[str], kinds: Sequence[str]):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("pyarrow is required to export .parquet files")
+        self.pa = pa
+        types = {
+            "int": pa.int64(),
+            "text": pa.string(),
+            "date": pa.date32(),
+            "timestamp": pa.timestamp("us", tz="UTC"),
+        }
+        self.schema = pa.schema([(header, types[kind]) for header, kind in zip(headers, kinds)])
+        self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write_rows(self, rows: Sequence[Sequence[Any]]) -> None:
+        if not rows:
+            return
+        columns = list(zip(*rows))
+        arrays = [self.pa.array(values, type=field.type) for values, field in zip(columns, self.schema)]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class ReportExportTask:
+    """
+    Streams a report from Postgres into a CSV / XLSX / Parquet file in storage.
+
+    Rows come through a server-side cursor (`yield_per`), one batch at a time,
+    and each batch is appended to the file on disk right away: CSV through
+    gzip, XLSX through openpyxl's write-only mode, Parquet as one compressed
+    row group. Memory is bounded by the batch size whatever the report size.
+    The file is then uploaded to the private `report-exports` bucket and a
+    signed download link is written back to the `report_exports` row.
+
+    Payload format (task_type = "export_report"):
+    {
+        "export_id": "uuid"  # report_exports row created by the app, or:
+        "cabinet_id": "uuid", "report": "voters" | "demands", "format": "csv" | "xlsx" | "parquet",
+        "filters": {"neighborhood": "Centro", ...}, "created_by": "uuid",
+        "compress": true  # csv only: .csv.gz (default)
+    }
+    """
+
+    BUCKET = "report-exports"
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        storage: StorageClient,
+        batch_size: int = 5000,
+        link_ttl_seconds: int = 7 * 24 * 3600,
+        progress_interval: float = 2.0,
+    ):
+        self.session_factory = session_factory
+        self.storage = storage
+        self.batch_size = batch_size
+        self.link_ttl_seconds = link_ttl_seconds
+        self.progress_interval = progress_interval
+
+    def create_or_resume(self, session: Session, payload: Dict[str, Any]) -> ReportExport:
+        if payload.get("export_id"):
+            export = session.get(ReportExport, payload["export_id"])
+            if export is None:
+                raise ValueError(f"Report export {payload['export_id']} not found")
+            return export
+        if not payload.get("cabinet_id") or not payload.get("report"):
+            raise ValueError("export_report needs export_id, or cabinet_id and report")
+        export = ReportExport(
+            cabinet_id=payload["cabinet_id"],
+            report=payload["report"],
+            format=payload.get("format") or "csv",
+            filters=payload.get("filters") or {},
+            created_by=payload.get("created_by"),
+            status="pending",
+        )
+        session.add(export)
+        session.flush()
+        return export
+
+    @staticmethod
+    def build_query(report: str, cabinet_id, filters: Dict[str, Any]):
+        """(SELECT of the report rows ordered by id, count query, headers, kinds)."""
+        if report not in REPORTS:
+            raise ValueError(f"Unknown report: {report}")
+        model, columns, filter_builders = REPORTS[report]
+        unknown = set(filters) - set(filter_builders)
+        if unknown:
+            raise ValueError(f"Unknown filters for {report}: {', '.join(sorted(unknown))}")
+
+        conditions = [model.cabinet_id == cabinet_id]
+        conditions += [filter_builders[name](value) for name, value in filters.items() if value not in (None, "")]
+        query = select(*[column for _, column, _ in columns]).where(*conditions).order_by(model.id)
+        count = select(func.count()).select_from(model).where(*conditions)
+        return query, count, [header for header, _, _ in columns], [kind for _, _, kind in columns]
+
+    def _writer(self, fmt: str, path: str, headers, kinds, compress: bool):
+        if fmt == "csv":
+            return CsvWriter(path, headers, kinds, compress)
+        if fmt == "xlsx":
+            return XlsxWriter(path, headers, kinds)
+        if fmt == "parquet":
+            return ParquetWriter(path, headers, kinds)
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    def _progress(self, export_id, **values) -> None:
+        with self.session_factory() as session:
+            session.execute(update(ReportExport).where(ReportExport.id == export_id).values(**values))
+            session.commit()
+
+    def execute(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        with self.session_factory() as session:
+            export = self.create_or_resume(session, payload)
+            if export.status == "completed":
+                session.commit()
+                return {"status": "completed", "export_id": str(export.id), "download_url": export.download_url}
+            export.status = "running"
+            export.started_at = datetime.now(timezone.utc)
+            export.exported_rows = 0
+            export.error_details = None
+            session.commit()
+            export_id, cabinet_id = export.id, export.cabinet_id
+            report, fmt, filters = export.report, export.format, dict(export.filters or {})
+
+        compress = fmt == "csv" and payload.get("compress", True)
+        extension = "csv.gz" if compress else fmt
+        stamp = datetime.now(EXPORT_TIMEZONE).strftime("%Y-%m-%d")
+        object_path = f"{cabinet_id}/{report}_{stamp}_{export_id}.{extension}"
+
+        try:
+            query, count, headers, kinds = self.build_query(report, cabinet_id, filters)
+            with tempfile.TemporaryDirectory(prefix="report-export-") as workdir:
+                path = os.path.join(workdir, f"export.{extension}")
+                started = time.monotonic()
+                exported = 0
+
+                with self.session_factory() as session:
+                    total = session.scalar(count) or 0
+                    self._progress(export_id, total_rows=total)
+                    writer = self._writer(fmt, path, headers, kinds, compress)
+                    try:
+                        last_progress = time.monotonic()
+                        # yield_per: psycopg server-side cursor, batch_size rows per round trip
+                        result = session.execute(query.execution_options(yield_per=self.batch_size))
+                        for batch in result.partitions():
+                            writer.write_rows(batch)
+                            exported += len(batch)
+                            if time.monotonic() - last_progress >= self.progress_interval:
+                                self._progress(export_id, exported_rows=exported)
+                                last_progress = time.monotonic()
+                    finally:
+                        writer.close()
+                    session.rollback()  # read-only; ends the cursor's transaction
+
+                size = os.path.getsize(path)
+                with open(path, "rb") as f:
+                    self.storage.upload(self.BUCKET, object_path, f, CONTENT_TYPES[extension])
+                download_url = self.storage.signed_url(self.BUCKET, object_path, self.link_ttl_seconds)
+
+            elapsed = time.monotonic() - started
+            self._progress(
+                export_id,
+                status="completed",
+                exported_rows=exported,
+                file_path=object_path,
+                file_bytes=size,
+                download_url=download_url,
+                expires_at=datetime.now(timezone.utc) + timedelta(seconds=self.link_ttl_seconds),
+                completed_at=datetime.now(timezone.utc),
+            )
+            logger.info(
+                f"Report export {export_id}: {exported} {report} rows as {extension} "
+                f"({size / 1024 / 1024:.1f} MB) in {elapsed:.1f}s"
+            )
+            return {
+                "status": "completed",
+                "export_id": str(export_id),
+                "rows": exported,
+                "file_path": object_path,
+                "download_url": download_url,
+            }
+
+        except Exception as e:
+            self._progress(export_id, status="failed", error_details=str(e))
+            raise
+
+
+def main():
+    """Command-line entry point: python -m tasks.report_export --cabinet-id ... --report voters --format xlsx"""
+    import json
+    from config import SUPABASE_URL, SUPABASE_SERVICE_KEY
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Export a cabinet report to storage.")
+    parser.add_argument("--export-id", default=None)
+    parser.add_argument("--cabinet-id", default=None)
+    parser.add_argument("--report", choices=sorted(REPORTS), default=None)
+    parser.add_argument("--format", choices=("csv", "xlsx", "parquet"), default="csv")
+    parser.add_argument("--filters", default="{}", help='JSON, e.g. {"city": "Goiânia"}')
+    parser.add_argument("--no-compress", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if SessionLocal is None:
+        raise SystemExit("DATABASE_URL is required")
+    task = ReportExportTask(SessionLocal, StorageClient(SUPABASE_URL, SUPABASE_SERVICE_KEY), batch_size=args.batch_size)
+    result = task.execute({
+        "export_id": args.export_id,
+        "cabinet_id": args.cabinet_id,
+        "report": args.report,
+        "format": args.format,
+        "filters": json.loads(args.filters),
+        "compress": not args.no_compress,
+    })
+    print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import time
+import logging
+import argparse
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.models.cabinet import Cabinet
+from app.models.secret_rotation import SecretRotation
+from app.services.crypto_service import CryptoService
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("pending", "running", "paused")
+
+
+class SecretRotationTask:
+    """
+    Re-encrypts every cabinet's gov_credentials.password_enc with the primary
+    key of the CryptoService key ring, so an old key can be retired without
+    downtime: decryption keeps working with any ring key while this runs.
+
+    Each batch locks its cabinets (FOR UPDATE), rotates the ciphertexts and
+    advances the `secret_rotations` checkpoint in one transaction, so an interrupted run resumes where it stopped and never
+    re-encrypts a row twice. Setting the row's status to 'paused' stops the
+    run after the current batch.
+
+    Payload format (task_type = "rotate_secrets"):
+    {
+        "rotation_id": "uuid"  # optional: resume a specific run
+    }
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        crypto_service: Optional[CryptoService] = None,
+        batch_size: int = 100,
+    ):
+        self.session_factory = session_factory
+        self.crypto = crypto_service or CryptoService()
+        self.batch_size = batch_size
+
+    def _stale_filter(self):
+        """Cabinets with a secret not yet on the primary key."""
+        return (
+            Cabinet.gov_credentials.has_key("password_enc"),
+            Cabinet.gov_credentials["key_version"].astext.is_distinct_from(self.crypto.primary_version),
+        )
+
+    def create_or_resume(self, session: Session, rotation_id: Optional[str] = None) -> SecretRotation:
+        """Returns the active run towards the primary key, creating it if needed."""
+        if rotation_id:
+            rotation = session.get(SecretRotation, rotation_id)
+            if rotation is None:
+                raise ValueError(f"Secret rotation {rotation_id} not found")
+        else:
+            rotation = session.scalars(
+                select(SecretRotation).where(SecretRotation.status.in_(ACTIVE_STATUSES)).limit(1)
+            ).first()
+
+        if rotation is not None and rotation.status in ACTIVE_STATUSES and rotation.key_version != self.crypto.primary_version:
+            # The ring moved on while this run was active; a fresh run covers both keys
+            rotation.status = "failed"
+            rotation.error_details = f"Superseded by key version {self.crypto.primary_version}"
+            session.flush()
+            rotation = None
+
+        if rotation is None:
+            rotation = SecretRotation(key_version=self.crypto.primary_version, status="pending")
+            session.add(rotation)
+            session.flush()
+        return rotation
+
+    def _count_stale(self, session: Session) -> int:
+        return session.scalar(select(func.count()).select_from(Cabinet).where(*self._stale_filter())) or 0
+
+    def _rotate_batch(self, session: Session, rotation: SecretRotation) -> int:
+        """Re-encrypts one batch and advances the checkpoint. Returns the rows examined."""
+        query = select(Cabinet.id, Cabinet.gov_credentials).where(*self._stale_filter())
+        if rotation.last_cabinet_id:
+            query = query.where(Cabinet.id > rotation.last_cabinet_id)
+        rows = session.execute(
+            query.order_by(Cabinet.id).limit(self.batch_size).with_for_update()
+        ).all()
+        if not rows:
+            return 0
+
+        updates = []
+        for cabinet_id, creds in rows:
+            try:
+                password_enc = self.crypto.rotate(creds["password_enc"])
+            except ValueError as e:
+                # Encrypted with a key no longer in the ring: needs the cabinet to re-enter it
+                logger.error(f"Secret rotation {rotation.id}: cabinet {cabinet_id}: {e}")
+                rotation.failed_secrets = (rotation.failed_secrets or 0) + 1
+                continue
+            updates.append({
+                "id": cabinet_id,
+                "gov_credentials": {**creds, "password_enc": password_enc, "key_version": self.crypto.primary_version},
+            })
+
+        if updates:
+            session.execute(update(Cabinet), updates)
+        rotation.processed_secrets = (rotation.processed_secrets or 0) + len(updates)
+        rotation.last_cabinet_id = rows[-1][0]
+        return len(rows)
+
+    def execute(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        with self.session_factory() as session:
+            rotation = self.create_or_resume(session, payload.get("rotation_id"))
+            if rotation.status in ("completed", "failed"):
+                session.commit()
+                return {"status": rotation.status, "rotation_id": str(rotation.id)}
+
+            rotation_id = rotation.id
+            remaining = self._count_stale(session)
+            rotation.status = "running"
+            rotation.total_secrets = (rotation.processed_secrets or 0) + remaining
+            rotation.started_at = rotation.started_at or datetime.now(timezone.utc)
+            rotation.error_details = None
+            session.commit()
+        logger.info(
+            f"Secret rotation {rotation_id}: {remaining} secrets to re-encrypt with key version "
+            f"{self.crypto.primary_version} (ring: {', '.join(self.crypto.versions)})"
+        )
+
+        run_started = time.monotonic()
+        run_processed = 0
+        try:
+            while True:
+                with self.session_factory() as session:
+                    rotation = session.get(SecretRotation, rotation_id, with_for_update=True)
+                    if rotation.status == "paused":
+                        logger.info(f"Secret rotation {rotation_id} paused at {rotation.last_cabinet_id}")
+                        return {"status": "paused", "rotation_id": str(rotation_id)}
+
+                    before = rotation.processed_secrets or 0
+                    examined = self._rotate_batch(session, rotation)
+                    run_processed += (rotation.processed_secrets or 0) - before
+                    elapsed = time.monotonic() - run_started
+                    rotation.secrets_per_second = round(run_processed / elapsed, 2) if elapsed > 0 else None
+                    if examined == 0:
+                        rotation.status = "completed"
+                        rotation.completed_at = datetime.now(timezone.utc)
+                        if rotation.failed_secrets:
+                            rotation.error_details = f"{rotation.failed_secrets} secrets could not be decrypted with the key ring"
+                    session.commit()
+
+                    logger.info(
+                        f"Secret rotation {rotation_id}: {rotation.processed_secrets}/{rotation.total_secrets} "
+                        f"re-encrypted, {rotation.failed_secrets or 0} failed"
+                    )
+                    if examined == 0:
+                        return {
+                            "status": "success",
+                            "rotation_id": str(rotation_id),
+                            "processed": rotation.processed_secrets,
+                            "failed": rotation.failed_secrets or 0,
+                        }
+
+        except Exception as e:
+            with self.session_factory() as session:
+                session.execute(
+                    update(SecretRotation)
+                    .where(SecretRotation.id == rotation_id)
+                    .values(status="failed", error_details=str(e))
+                )
+                session.commit()
+            raise
+
+
+def main():
+    """Command-line entry point: python -m tasks.secret_rotation [--rotation-id ...]"""
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Re-encrypt cabinet secrets with the primary key of APP_SECRET_KEYS.")
+    parser.add_argument("--rotation-id", default=None)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if SessionLocal is None:
+        raise SystemExit("DATABASE_URL is required")
+    result = SecretRotationTask(SessionLocal, batch_size=args.batch_size).execute({"rotation_id": args.rotation_id})
+    print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,567 @@
+import os
+import csv
+import time
+import codecs
+import logging
+import argparse
+import tempfile
+import unicodedata
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import text, update
+from sqlalchemy.orm import Session
+
+from app.models.voter_import import VoterImport
+from services.storage import StorageClient
+
+logger = logging.getLogger(__name__)
+
+# Columns loaded into voters, in COPY order
+FIELDS = ("name", "cpf", "phone", "address", "neighborhood", "city", "birth_date", "category")
+
+# Spreadsheet headers accepted for each field (same aliases ImportVotersModal used),
+# compared lowercased and without accents
+HEADER_ALIASES = {
+    "name": ("name", "nome", "nome completo", "nome_completo"),
+    "cpf": ("cpf", "user_cpf", "documento"),
+    "phone": ("phone", "telefone", "celular", "whatsapp", "tel", "telefone/whatsapp"),
+    "address": ("address", "endereço", "endereco", "logradouro", "rua", "adress"),
+    "neighborhood": ("neighborhood", "bairro"),
+    "birth_date": ("birth_date", "data de nascimento", "nascimento", "aniversário", "aniversario", "data_nascimento"),
+    "category": ("category", "categoria", "tipo"),
+    "city": ("city", "cidade", "município", "municipio"),
+}
+
+DEFAULT_CATEGORY = "Indeciso"
+IMPORT_SOURCE = "Importação"
+# Only spreadsheets uploaded here, under the cabinet's own folder, are imported
+IMPORT_BUCKET = "voter-imports"
+
+ERROR_FILE_HEADER = ("linha", "motivo", "nome", "cpf", "telefone", "endereco", "bairro", "cidade", "nascimento", "categoria")
+
+EXCEL_EPOCH = date(1899, 12, 30)
+
+
+class RowError(ValueError):
+    """A spreadsheet row that cannot be imported; the message goes to the error file."""
+
+
+def _fold(value: str) -> str:
+    """Lowercase, accent-free, single-spaced header."""
+    value = unicodedata.normalize("NFKD", str(value)).encode("ascii", "ignore").decode("ascii")
+    return " ".join(value.lower().split())
+
+
+_ALIAS_FIELDS = {_fold(alias): field for field, aliases in HEADER_ALIASES.items() for alias in aliases}
+
+
+def _text(value: Any) -> Optional[str]:
+    """Cell value as stripped text; numbers typed into Excel lose the '.0'."""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = str(value).strip()
+    return value or None
+
+
+def normalize_cpf(value: Any) -> Optional[str]:
+    """11 digits with valid check digits (same as public.normalize_cpf plus validation)."""
+    raw = _text(value)
+    if raw is None:
+        return None
+    digits = "".join(ch for ch in raw if ch.isdigit())
+    if not digits:
+        return None
+    if 9 <= len(digits) < 11:
+        digits = digits.zfill(11)  # leading zeros dropped by a numeric spreadsheet cell
+    if len(digits) != 11 or digits == digits[0] * 11:
+        raise RowError(f"CPF inválido: {raw}")
+    for position in (9, 10):
+        total = sum(int(digit) * weight for digit, weight in zip(digits[:position], range(position + 1, 1, -1)))
+        if (total * 10) % 11 % 10 != int(digits[position]):
+            raise RowError(f"CPF inválido: {raw}")
+    return digits
+
+
+def normalize_phone(value: Any) -> Optional[str]:
+    """DDD + number digits, without +55 or trunk 0 (same as public.normalize_phone)."""
+    raw = _text(value)
+    if raw is None:
+        return None
+    digits = "".join(ch for ch in raw if ch.isdigit())
+    if digits.startswith("55") and len(digits) in (12, 13):
+        digits = digits[2:]
+    else:
+        digits = digits.lstrip("0")
+    if not digits:
+        return None
+    if len(digits) not in (10, 11):
+        raise RowError(f"Telefone inválido: {raw}")
+    return digits
+
+
+def parse_birth_date(value: Any, today: Optional[date] = None) -> Optional[date]:
+    """DD/MM/AAAA, AAAA-MM-DD, Excel date cells and Excel serial numbers."""
+    if value is None or value == "":
+        return None
+    parsed = None
+    if isinstance(value, datetime):
+        parsed = value.date()
+    elif isinstance(value, date):
+        parsed = value
+    elif isinstance(value, (int, float)):
+        parsed = EXCEL_EPOCH + timedelta(days=int(value))
+    else:
+        raw = str(value).strip().split(" ")[0].split("T")[0]
+        if not raw:
+            return None
+        for fmt in ("%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%Y-%m-%d", "%Y/%m/%d"):
+            try:
+                parsed = datetime.strptime(raw, fmt).date()
+                break
+            except ValueError:
+                continue
+    today = today or date.today()
+    if parsed is None or not date(1900, 1, 1) <= parsed <= today:
+        raise RowError(f"Data inválida: {value} (esperado DD/MM/AAAA)")
+    return parsed
+
+
+def _detect_encoding(sample: bytes) -> str:
+    """UTF-8 (with or without BOM), else Windows-1252 as saved by Excel in pt-BR."""
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample)  # tolerates a char cut at the end
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "cp1252"
+
+
+def iter_csv_rows(path: str) -> Iterator[List[Any]]:
+    """Header row first, then data rows, streamed from disk."""
+    with open(path, "rb") as f:
+        sample = f.read(64 * 1024)
+    encoding = _detect_encoding(sample)
+    sample_text = sample.decode(encoding, errors="ignore")
+    try:
+        delimiter = csv.Sniffer().sniff(sample_text, delimiters=",;\t|").delimiter
+    except csv.Error:
+        delimiter = ";" if sample_text.split("\n", 1)[0].count(";") > sample_text.split("\n", 1)[0].count(",") else ","
+
+    with open(path, newline="", encoding=encoding, errors="replace") as f:
+        yield from csv.reader(f, delimiter=delimiter)
+
+
+def iter_xlsx_rows(path: str) -> Iterator[List[Any]]:
+    """Header row first, then data rows of the first sheet, without loading the workbook."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("openpyxl is required to import .xlsx files")
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        workbook.close()
+
+
+def _is_xlsx(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(4) == b"PK\x03\x04"  # zip container
+
+
+def estimate_rows(path: str) -> Optional[int]:
+    """Data rows in the file, for progress; None if unknown."""
+    if _is_xlsx(path):
+        try:
+            from openpyxl import load_workbook
+            workbook = load_workbook(path, read_only=True)
+            max_row = workbook.worksheets[0].max_row
+            workbook.close()
+            return max(max_row - 1, 0) if max_row else None
+        except Exception:
+            return None
+    lines = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            lines += block.count(b"\n")
+    return max(lines - 1, 0)
+
+
+class VoterImportTask:
+    """
+    Loads an uploaded CSV/XLSX spreadsheet into a cabinet's voters.
+
+    The object is streamed from storage to a temporary file and read row by
+    row (csv module / openpyxl read-only), so memory stays flat whatever the
+    file size. Each chunk of normalized rows is COPY'd into a temporary staging
+    table, deduplicated there against existing voters (CPF, or phone for rows
+    without CPF, through the normalize_cpf / normalize_phone expression
+    indexes) and against itself, and inserted with one INSERT ... SELECT. The
+    `voter_imports` counters advance in the same transaction, so an
+    interrupted or failed import resumes after the last loaded chunk; setting
+    its status to 'paused' stops it after the current chunk.
+
+    Rejected rows (invalid data or duplicates) are written with their line
+    number and reason to a CSV uploaded next to the spreadsheet
+    (`error_file_path`).
+
+    Payload format (task_type = "import_voters"):
+    {
+        "import_id": "uuid"  # voter_imports row created with the upload, or:
+        "cabinet_id": "uuid", "path": "<cabinet_id>/file.xlsx", "bucket": "voter-imports", "created_by": "uuid"
+    }
+    """
+
+    STAGE_COLUMNS = ("line",) + FIELDS
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        storage: StorageClient,
+        chunk_size: int = 20000,
+    ):
+        self.session_factory = session_factory
+        self.storage = storage
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def check_source(cabinet_id, bucket: str, path: str) -> None:
+        """
+        The worker downloads with the service key, so a job may only point at
+        its own cabinet's folder of the imports bucket (as the storage and
+        voter_imports policies require for uploads).
+        """
+        segments = (path or "").split("/")
+        if bucket != IMPORT_BUCKET or len(segments) < 2 or segments[0] != str(cabinet_id) or ".." in segments:
+            raise ValueError(f"Voter import source {bucket}/{path} is outside cabinet {cabinet_id}'s import folder")
+
+    def create_or_resume(self, session: Session, payload: Dict[str, Any]) -> VoterImport:
+        if payload.get("import_id"):
+            job = session.get(VoterImport, payload["import_id"])
+            if job is None:
+                raise ValueError(f"Voter import {payload['import_id']} not found")
+            self.check_source(job.cabinet_id, job.bucket, job.path)
+            return job
+        if not payload.get("cabinet_id") or not payload.get("path"):
+            raise ValueError("import_voters needs import_id, or cabinet_id and path")
+        bucket = payload.get("bucket") or IMPORT_BUCKET
+        self.check_source(payload["cabinet_id"], bucket, payload["path"])
+        job = VoterImport(
+            cabinet_id=payload["cabinet_id"],
+            bucket=bucket,
+            path=payload["path"],
+            created_by=payload.get("created_by"),
+            status="pending",
+        )
+        session.add(job)
+        session.flush()
+        return job
+
+    # -- reading -------------------------------------------------------------
+
+    @staticmethod
+    def map_header(header: List[Any]) -> Dict[str, int]:
+        """field -> column index; the first matching column wins."""
+        columns: Dict[str, int] = {}
+        for index, cell in enumerate(header):
+            field = _ALIAS_FIELDS.get(_fold(cell)) if cell is not None else None
+            if field and field not in columns:
+                columns[field] = index
+        if "name" not in columns:
+            raise ValueError("Coluna de nome não encontrada (use 'nome' ou 'name' no cabeçalho)")
+        return columns
+
+    @staticmethod
+    def normalize_row(values: Dict[str, Any]) -> Tuple[Any, ...]:
+        """Raw cell values -> COPY tuple in FIELDS order. Raises RowError."""
+        name = _text(values.get("name"))
+        if not name:
+            raise RowError("Sem nome identificado")
+        return (
+            name,
+            normalize_cpf(values.get("cpf")),
+            normalize_phone(values.get("phone")),
+            _text(values.get("address")),
+            _text(values.get("neighborhood")),
+            _text(values.get("city")),
+            parse_birth_date(values.get("birth_date")),
+            _text(values.get("category")) or DEFAULT_CATEGORY,
+        )
+
+    def iter_records(self, path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """(spreadsheet line, {field: raw value}) for every non-empty data row."""
+        rows = iter_xlsx_rows(path) if _is_xlsx(path) else iter_csv_rows(path)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = self.map_header(header)
+        for line, row in enumerate(rows, start=2):  # line 1 is the header
+            values = {field: row[index] if index < len(row) else None for field, index in columns.items()}
+            if all(_text(value) is None for value in values.values()):
+                continue  # blank line
+            yield line, values
+
+    # -- loading -------------------------------------------------------------
+
+    def _stage(self, session: Session, records: List[Tuple[int, Tuple[Any, ...]]]) -> None:
+        session.execute(text(
+            "CREATE TEMP TABLE IF NOT EXISTS voter_import_stage ("
+            " line INT PRIMARY KEY, name TEXT, cpf TEXT, phone TEXT, address TEXT,"
+            " neighborhood TEXT, city TEXT, birth_date DATE, category TEXT, dup_reason TEXT"
+            ") ON COMMIT DELETE ROWS"
+        ))
+        # COPY through the psycopg connection of the session's transaction
+        driver_connection = session.connection().connection.driver_connection
+        with driver_connection.cursor() as cursor:
+            with cursor.copy(f"COPY voter_import_stage ({', '.join(self.STAGE_COLUMNS)}) FROM STDIN") as copy:
+                for line, values in records:
+                    copy.write_row((line, *values))
+        session.execute(text("ANALYZE voter_import_stage"))
+
+    def _load_chunk(
+        self, session: Session, job: VoterImport, records: List[Tuple[int, Tuple[Any, ...]]]
+    ) -> Tuple[int, List[Tuple[int, str]]]:
+        """Stages, dedupes and inserts one chunk. Returns (inserted, [(line, reason)])."""
+        params = {"cabinet_id": job.cabinet_id, "created_by": job.created_by}
+        # Concurrent imports into the same cabinet would miss each other's rows
+        session.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext('voter_import:' || CAST(:cabinet_id AS text)))"), params
+        )
+        self._stage(session, records)
+
+        session.execute(text("""
+            UPDATE voter_import_stage s SET dup_reason = 'CPF já cadastrado'
+            WHERE s.cpf IS NOT NULL AND EXISTS (
+                SELECT 1 FROM public.voters v
+                WHERE v.cabinet_id = :cabinet_id AND public.normalize_cpf(v.cpf) = s.cpf
+            )
+        """), params)
+        session.execute(text("""
+            UPDATE voter_import_stage s SET dup_reason = 'Telefone já cadastrado'
+            WHERE s.cpf IS NULL AND s.phone IS NOT NULL AND EXISTS (
+                SELECT 1 FROM public.voters v
+                WHERE v.cabinet_id = :cabinet_id AND public.normalize_phone(v.phone) = s.phone
+            )
+        """), params)
+        # Repeated inside the chunk; rows of earlier chunks are already in voters
+        session.execute(text("""
+            UPDATE voter_import_stage s
+            SET dup_reason = 'Repetido no arquivo (linha ' || d.first_line || ')'
+            FROM (
+                SELECT line, min(line) OVER (PARTITION BY COALESCE('cpf:' || cpf, 'phone:' || phone)) AS first_line
+                FROM voter_import_stage
+                WHERE dup_reason IS NULL AND COALESCE(cpf, phone) IS NOT NULL
+            ) d
+            WHERE s.line = d.line AND d.line <> d.first_line
+        """))
+
+        inserted = session.execute(text("""
+            INSERT INTO public.voters
+                (cabinet_id, name, cpf, phone, address, neighborhood, city, birth_date, category,
+                 source, status, created_by)
+            SELECT :cabinet_id, name, cpf, phone, address, neighborhood, city, birth_date, category,
+                   :source, 'active', :created_by
+            FROM voter_import_stage
+            WHERE dup_reason IS NULL
+            ORDER BY line
+        """), {**params, "source": IMPORT_SOURCE}).rowcount
+
+        duplicates = session.execute(text(
+            "SELECT line, dup_reason FROM voter_import_stage WHERE dup_reason IS NOT NULL ORDER BY line"
+        )).all()
+        return inserted, [(line, reason) for line, reason in duplicates]
+
+    # -- error file ----------------------------------------------------------
+
+    def _open_error_file(self, job: VoterImport, workdir: str):
+        """Error CSV for this run; a resumed import keeps the rows rejected before."""
+        path = os.path.join(workdir, "errors.csv")
+        if job.error_file_path and (job.processed_rows or 0) > 0:
+            try:
+                with open(path, "wb") as f:
+                    self.storage.download_to(job.bucket, job.error_file_path, f)
+                return open(path, "a", newline="", encoding="utf-8")
+            except Exception as e:
+                logger.warning(f"Voter import {job.id}: previous error file unavailable: {e}")
+        f = open(path, "w", newline="", encoding="utf-8-sig")  # BOM so Excel reads the accents
+        csv.writer(f, delimiter=";").writerow(ERROR_FILE_HEADER)
+        return f
+
+    def _upload_error_file(self, job_id, bucket: str, cabinet_id, error_file) -> Optional[str]:
+        error_file.flush()
+        object_path = f"{cabinet_id}/errors/{job_id}.csv"
+        try:
+            with open(error_file.name, "rb") as f:
+                self.storage.upload(bucket, object_path, f, "text/csv")
+            return object_path
+        except Exception as e:
+            logger.error(f"Voter import {job_id}: could not upload error file: {e}")
+            return None
+
+    # -- run -----------------------------------------------------------------
+
+    def execute(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        with self.session_factory() as session:
+            job = self.create_or_resume(session, payload)
+            # A failed import resumes from processed_rows like an interrupted one
+            if job.status == "completed":
+                session.commit()
+                return {"status": job.status, "import_id": str(job.id)}
+            job.status = "running"
+            job.started_at = job.started_at or datetime.now(timezone.utc)
+            job.error_details = None
+            session.commit()
+            job_id, bucket, path, cabinet_id = job.id, job.bucket, job.path, job.cabinet_id
+
+        with tempfile.TemporaryDirectory(prefix="voter-import-") as workdir:
+            error_file = None
+            try:
+                source_path = os.path.join(workdir, os.path.basename(path) or "upload")
+                with open(source_path, "wb") as f:
+                    size = self.storage.download_to(bucket, path, f)
+                estimate = estimate_rows(source_path)
+                logger.info(f"Voter import {job_id}: {path} ({size} bytes, ~{estimate} rows) into cabinet {cabinet_id}")
+
+                with self.session_factory() as session:
+                    job = session.get(VoterImport, job_id)
+                    if estimate is not None:
+                        job.total_rows = estimate
+                    error_file = self._open_error_file(job, workdir)
+                    result = self._run(session, job_id, source_path, error_file)
+                    session.commit()
+
+                error_file_path = self._upload_error_file(job_id, bucket, cabinet_id, error_file) \
+                    if result["errors"] or result["duplicates"] else None
+                with self.session_factory() as session:
+                    values = {"error_file_path": error_file_path} if error_file_path else {}
+                    if result["status"] == "completed":
+                        values.update(status="completed", completed_at=datetime.now(timezone.utc))
+                    if values:
+                        session.execute(update(VoterImport).where(VoterImport.id == job_id).values(**values))
+                        session.commit()
+                return {**result, "import_id": str(job_id), "error_file_path": error_file_path}
+
+            except Exception as e:
+                error_file_path = None
+                if error_file is not None:
+                    error_file_path = self._upload_error_file(job_id, bucket, cabinet_id, error_file)
+                with self.session_factory() as session:
+                    values = {"status": "failed", "error_details": str(e)}
+                    if error_file_path:
+                        values["error_file_path"] = error_file_path
+                    session.execute(update(VoterImport).where(VoterImport.id == job_id).values(**values))
+                    session.commit()
+                raise
+            finally:
+                if error_file is not None:
+                    error_file.close()
+
+    def _run(self, session: Session, job_id, source_path: str, error_file) -> Dict[str, Any]:
+        """Reads, normalizes and loads the file chunk by chunk."""
+        writer = csv.writer(error_file, delimiter=";")
+        job = session.get(VoterImport, job_id)
+        skip = job.processed_rows or 0
+        run_started = time.monotonic()
+        run_processed = 0
+
+        records: List[Tuple[int, Tuple[Any, ...]]] = []
+        raw_by_line: Dict[int, Dict[str, Any]] = {}
+        consumed = 0  # data rows read in this chunk (valid or not)
+        # Written only once the chunk commits, so a paused chunk is not reported twice
+        rejected: List[List[Any]] = []
+
+        def flush() -> str:
+            nonlocal records, raw_by_line, consumed, rejected, run_processed
+            job = session.get(VoterImport, job_id, with_for_update=True, populate_existing=True)
+            if job.status == "paused":
+                session.rollback()
+                return "paused"
+
+            inserted, duplicates = self._load_chunk(session, job, records) if records else (0, [])
+            job.processed_rows = (job.processed_rows or 0) + consumed
+            job.inserted_rows = (job.inserted_rows or 0) + inserted
+            job.duplicate_rows = (job.duplicate_rows or 0) + len(duplicates)
+            job.error_rows = (job.error_rows or 0) + len(rejected)
+            job.total_rows = max(job.total_rows or 0, job.processed_rows)
+            run_processed += consumed
+            elapsed = time.monotonic() - run_started
+            job.rows_per_second = round(run_processed / elapsed, 2) if elapsed > 0 else None
+            session.commit()
+            rows = rejected + [self._error_row(line, reason, raw_by_line[line]) for line, reason in duplicates]
+            writer.writerows(sorted(rows, key=lambda row: row[0]))
+            error_file.flush()
+            logger.info(
+                f"Voter import {job_id}: {job.processed_rows}/{job.total_rows} rows, {job.inserted_rows} inserted, "
+                f"{job.duplicate_rows} duplicates, {job.error_rows} errors"
+            )
+            records, raw_by_line, consumed, rejected = [], {}, 0, []
+            return "running"
+
+        for index, (line, values) in enumerate(self.iter_records(source_path)):
+            if index < skip:
+                continue  # loaded by an earlier run
+            consumed += 1
+            try:
+                records.append((line, self.normalize_row(values)))
+                raw_by_line[line] = values
+            except RowError as e:
+                rejected.append(self._error_row(line, str(e), values))
+            if consumed >= self.chunk_size and flush() == "paused":
+                logger.info(f"Voter import {job_id} paused")
+                return self._summary(session, job_id, "paused")
+
+        if consumed and flush() == "paused":
+            return self._summary(session, job_id, "paused")
+        return self._summary(session, job_id, "completed")
+
+    @staticmethod
+    def _error_row(line: int, reason: str, values: Dict[str, Any]) -> List[Any]:
+        return [line, reason] + [
+            "" if values.get(field) is None else values.get(field)
+            for field in ("name", "cpf", "phone", "address", "neighborhood", "city", "birth_date", "category")
+        ]
+
+    @staticmethod
+    def _summary(session: Session, job_id, status: str) -> Dict[str, Any]:
+        job = session.get(VoterImport, job_id, populate_existing=True)
+        return {
+            "status": status,
+            "processed": job.processed_rows or 0,
+            "inserted": job.inserted_rows or 0,
+            "duplicates": job.duplicate_rows or 0,
+            "errors": job.error_rows or 0,
+        }
+
+
+def main():
+    """Command-line entry point: python -m tasks.voter_import --import-id ... | --cabinet-id ... --path ..."""
+    from config import SUPABASE_URL, SUPABASE_SERVICE_KEY
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Import a voters spreadsheet from storage.")
+    parser.add_argument("--import-id", default=None)
+    parser.add_argument("--cabinet-id", default=None)
+    parser.add_argument("--path", default=None)
+    parser.add_argument("--bucket", default=IMPORT_BUCKET)
+    parser.add_argument("--chunk-size", type=int, default=20000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if SessionLocal is None:
+        raise SystemExit("DATABASE_URL is required")
+    task = VoterImportTask(SessionLocal, StorageClient(SUPABASE_URL, SUPABASE_SERVICE_KEY), chunk_size=args.chunk_size)
+    result = task.execute({
+        "import_id": args.import_id,
+        "cabinet_id": args.cabinet_id,
+        "path": args.path,
+        "bucket": args.bucket,
+    })
+    print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,28 @@
 import os
+import json
+import asyncio
+import uuid
 import httpx
 import logging
-from typing import Dict, Any
+from supabase import Client
+from typing import AsyncIterator, Callable, Dict, Any, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from services.embedding_service import EmbeddingService
+from services.semantic_cache import SemanticAnswerCache
+from services.retrieval import RetrievalService
+from services.rule_engine import KeywordRuleEngine, RuleMatch
+from services.prompt_cache import PromptCache
+from services.gateway_client import AgentGatewayClient, GatewayUnavailable
+from services.rate_limiter import CabinetRateLimiter
+from services.whatsapp_sender import EvolutionWhatsAppSender, SentenceChunker
+from services.tokens import estimate_tokens
+from app.services.agent_log_writer import AgentLogWriter
+from app.models.conversation import AgentConversation
+from app.services.conversation_service import ConversationService
+from app.services.tenant_context import TenantContextCache
+from tasks.errors import TaskDeferred
 
 logger = logging.getLogger(__name__)
 
@@ -9,6 +30,8 @@ logger = logging.getLogger(__name__)
 # or define constants for the Edge Function URL if needed.
 # Since we need to call the Edge Function, we need its base URL.
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
+# Override to point the worker at another gateway, e.g. benchmarks/gateway_stub.py
+AGENT_GATEWAY_URL = os.getenv("AGENT_GATEWAY_URL", "")
 
 class ProcessWhatsAppMessageTask:
     """
@@ -16,9 +39,319 @@ class ProcessWhatsAppMessageTask:
     It takes the message payload and forwards it to the Supabase Edge Function (agent-gateway).
     """
     
-    def __init__(self):
+    AGENT_NAME = "whatsapp-python-worker"  # Identifying the source
+
+    # Only free-form answers are safe to reuse; tool calls with side effects are never cached
+    CACHEABLE_ACTIONS = {"simulate_response"}
+    # Actions whose prompt benefits from knowledge-base context
+    RETRIEVAL_ACTIONS = {"simulate_response"}
+    # Actions answering an incoming message, where cabinet keyword rules apply
+    RULE_ACTIONS = {"simulate_response"}
+    # Actions whose reply goes straight back to the citizen, streamed when a sender is set
+    STREAMING_ACTIONS = {"simulate_response"}
+    # Conversation statuses in which a human operator answers instead of the agent
+    HANDOFF_STATUSES = {"human_needed"}
+
+    def __init__(
+        self,
+        semantic_cache: Optional[SemanticAnswerCache] = None,
+        embedding_service: Optional[EmbeddingService] = None,
+        retrieval_service: Optional[RetrievalService] = None,
+        agent_log_writer: Optional[AgentLogWriter] = None,
+        rule_engine: Optional[KeywordRuleEngine] = None,
+        supabase: Optional[Client] = None,
+        prompt_cache: Optional[PromptCache] = None,
+        session_factory: Optional[Callable[[], Session]] = None,
+        history_token_budget: int = 1200,
+        summary_token_budget: int = 300,
+        gateway_client: Optional[AgentGatewayClient] = None,
+        cabinet_limiter: Optional[CabinetRateLimiter] = None,
+        whatsapp_sender: Optional[EvolutionWhatsAppSender] = None,
+        tenant_contexts: Optional[TenantContextCache] = None,
+        stream_min_chars: int = 80,
+        stream_max_chars: int = 600,
+    ):
         # The Edge Function URL is typically derived from the Supabase URL
-        self.gateway_url = f"{SUPABASE_URL}/functions/v1/agent-gateway"
+        self.gateway_url = AGENT_GATEWAY_URL or f"{SUPABASE_URL}/functions/v1/agent-gateway"
+        self.semantic_cache = semantic_cache
+        self.embedding_service = embedding_service
+        self.retrieval_service = retrieval_service
+        self.agent_log_writer = agent_log_writer
+        self.rule_engine = rule_engine
+        self.supabase = supabase
+        self.prompt_cache = prompt_cache
+        # Conversation history needs the direct database connection
+        self.session_factory = session_factory
+        self.history_token_budget = history_token_budget
+        self.summary_token_budget = summary_token_budget
+        # Shared client carries the worker's circuit breaker and concurrency limit
+        self.gateway_client = gateway_client or AgentGatewayClient(self.gateway_url)
+        # Each cabinet's Gemini key has its own quota, shared by all worker processes
+        self.cabinet_limiter = cabinet_limiter
+        # With a sender the worker replies to the citizen itself, streaming gateway answers,
+        # from the cabinet's own WhatsApp instance (found through its TenantContext)
+        self.whatsapp_sender = whatsapp_sender
+        self.tenant_contexts = tenant_contexts
+        self.stream_min_chars = stream_min_chars
+        self.stream_max_chars = stream_max_chars
+
+    def _log_local_answer(self, cabinet_id: Optional[str], action: str, args: Dict[str, Any], source: str) -> None:
+        """Records answers served without agent-gateway, which would otherwise go unlogged."""
+        if self.agent_log_writer:
+            self.agent_log_writer.log(
+                cabinet_id=cabinet_id,
+                agent_name=self.AGENT_NAME,
+                action=action,
+                status="success",
+                payload=args,
+                response_summary={"source": source},
+            )
+
+    def _match_rule(self, cabinet_id: Optional[str], action: str, message_text: str) -> Optional[RuleMatch]:
+        if not (self.rule_engine and cabinet_id) or action not in self.RULE_ACTIONS:
+            return None
+        try:
+            return self.rule_engine.match(cabinet_id, message_text)
+        except Exception as e:
+            logger.warning(f"Keyword rule matching failed for cabinet {cabinet_id}: {e}")
+            return None
+
+    def _request_handoff(self, cabinet_id: str, phone_number: Optional[str]) -> None:
+        """Flags the sender's open conversation for a human operator."""
+        if not (phone_number and self.supabase):
+            return
+        self.supabase.table("agent_conversations")\
+            .update({"status": "human_needed"})\
+            .eq("cabinet_id", cabinet_id)\
+            .eq("external_id", phone_number)\
+            .eq("platform", "whatsapp")\
+            .neq("status", "human_needed")\
+            .execute()
+
+    def _sender_for(self, cabinet_id: Optional[str]) -> Optional[EvolutionWhatsAppSender]:
+        """Sender bound to the cabinet's instance; None (n8n replies, no streaming) when it has none."""
+        if not (self.whatsapp_sender and self.tenant_contexts and cabinet_id):
+            return None
+        try:
+            context = self.tenant_contexts.get(cabinet_id)
+        except Exception as e:
+            logger.warning(f"Could not resolve the WhatsApp instance of cabinet {cabinet_id}: {e}")
+            return None
+        if context is None or not context.whatsapp_instance:
+            return None
+        return self.whatsapp_sender.for_instance(context.whatsapp_instance)
+
+    async def _embed_message(self, cabinet_id: Optional[str], action: str, message_text: str):
+        """Returns the message embedding when the semantic cache or retrieval applies to this request."""
+        if not (self.embedding_service and cabinet_id):
+            return None
+        wants_cache = self.semantic_cache and action in self.CACHEABLE_ACTIONS
+        wants_context = self.retrieval_service and action in self.RETRIEVAL_ACTIONS
+        if not (wants_cache or wants_context):
+            return None
+        try:
+            return await self.embedding_service.embed_query(cabinet_id, message_text)
+        except Exception as e:
+            # Caching and retrieval are enhancements; never fail the message because of them
+            logger.warning(f"Skipping semantic cache and retrieval, embedding failed: {e}")
+            return None
+
+    def _system_prompt(self, cabinet_id: Optional[str], action: str):
+        """Compiled system prompt for actions that talk to the LLM as the cabinet's agent."""
+        if not (self.prompt_cache and cabinet_id) or action not in self.RETRIEVAL_ACTIONS:
+            return None
+        try:
+            return self.prompt_cache.get(cabinet_id)
+        except Exception as e:
+            # agent-gateway renders the prompt itself when none is sent
+            logger.warning(f"Could not compile system prompt for cabinet {cabinet_id}: {e}")
+            return None
+
+    def _handoff_conversation(self, cabinet_id: Optional[str], phone_number: Optional[str]) -> Tuple[bool, Any]:
+        """
+        Whether the sender's conversation waits for (or is with) a human
+        operator, plus its id when it can be recorded to (direct database).
+        """
+        if not (cabinet_id and phone_number):
+            return False, None
+        conversation_id = None
+        try:
+            if self.session_factory:
+                with self.session_factory() as session:
+                    row = session.execute(
+                        select(AgentConversation.id, AgentConversation.status).where(
+                            AgentConversation.cabinet_id == uuid.UUID(str(cabinet_id)),
+                            AgentConversation.platform == "whatsapp",
+                            AgentConversation.external_id == phone_number,
+                        )
+                    ).first()
+                conversation_id, status = row if row else (None, None)
+            elif self.supabase:
+                rows = self.supabase.table("agent_conversations")\
+                    .select("status")\
+                    .eq("cabinet_id", cabinet_id)\
+                    .eq("external_id", phone_number)\
+                    .eq("platform", "whatsapp")\
+                    .limit(1)\
+                    .execute().data or []
+                status = rows[0].get("status") if rows else None
+            else:
+                return False, None
+        except Exception as e:
+            logger.warning(f"Could not read conversation status for {phone_number}, answering: {e}")
+            return False, None
+        return status in self.HANDOFF_STATUSES, conversation_id
+
+    def _load_history(self, cabinet_id: Optional[str], phone_number: Optional[str], sender_name: Optional[str]):
+        """Returns (conversation_id, HistoryWindow) for the sender, or (None, None)."""
+        if not (self.session_factory and cabinet_id and phone_number):
+            return None, None
+        try:
+            with self.session_factory() as session:
+                service = ConversationService(session, count_tokens=estimate_tokens)
+                conversation = service.get_or_create(uuid.UUID(str(cabinet_id)), phone_number, "whatsapp", sender_name)
+                window = service.get_history_window(
+                    conversation.id,
+                    token_budget=self.history_token_budget,
+                    summary_token_budget=self.summary_token_budget,
+                )
+                return conversation.id, window
+        except Exception as e:
+            logger.warning(f"Could not load conversation history for {phone_number}: {e}")
+            return None, None
+
+    def _record_simulation(self, cabinet_id: str, message_text: str, answer: Any) -> Any:
+        """
+        Writes the simulation_messages pair agent-gateway would have written for
+        an answer served from the semantic cache; returns the assistant row.
+        """
+        if not self.supabase:
+            return answer
+        try:
+            rows = self.supabase.table("simulation_messages").insert([
+                {"cabinet_id": cabinet_id, "role": "user", "content": message_text},
+                {"cabinet_id": cabinet_id, "role": "assistant", "content": self._reply_text(answer)},
+            ]).execute().data or []
+        except Exception as e:
+            logger.warning(f"Could not record cached answer for cabinet {cabinet_id}: {e}")
+            return answer
+        return rows[-1] if rows else answer
+
+    def _record_exchange(self, conversation_id, message_text: str, answer: Any, source: str) -> None:
+        """Appends the incoming message and the reply in one batch."""
+        if conversation_id is None:
+            return
+        if isinstance(answer, dict):
+            answer = answer.get("content")
+        messages = [{"sender_type": "user", "content": message_text}]
+        if answer:
+            messages.append({"sender_type": "agent", "content": str(answer), "metadata": {"source": source}})
+        try:
+            with self.session_factory() as session:
+                ConversationService(session, count_tokens=estimate_tokens).append_messages(conversation_id, messages)
+        except Exception as e:
+            logger.warning(f"Could not record conversation {conversation_id}: {e}")
+
+    @staticmethod
+    def _reply_text(answer: Any) -> Optional[str]:
+        if isinstance(answer, dict):
+            answer = answer.get("content")
+        return str(answer) if answer else None
+
+    @staticmethod
+    async def _deliver(sender: EvolutionWhatsAppSender, phone_number: str, text: Optional[str]) -> int:
+        """Sends one WhatsApp message; returns how many were sent."""
+        if not text:
+            return 0
+        try:
+            await sender.send_text(phone_number, text)
+        except httpx.HTTPError as e:
+            raise RuntimeError(f"Could not deliver WhatsApp reply to {phone_number}: {e}") from e
+        return 1
+
+    @staticmethod
+    async def _read_events(response: httpx.Response) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Parses a text/event-stream body into (event, data) pairs."""
+        event, data = "message", []
+        async for line in response.aiter_lines():
+            if line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:"):
+                data.append(line[5:].strip())
+            elif not line and data:
+                yield event, json.loads("\n".join(data))
+                event, data = "message", []
+
+    async def _stream_reply(
+        self, sender: EvolutionWhatsAppSender, headers: Dict[str, str], request_body: Dict[str, Any], phone_number: str
+    ) -> Dict[str, Any]:
+        """
+        Calls agent-gateway in streaming mode and sends the answer to the
+        citizen sentence by sentence as it is generated.
+
+        Returns the same { "success": ..., "data" | "error": ... } body as a
+        non-streaming call, plus the number of WhatsApp messages sent. Errors
+        the gateway reports before streaming starts come back as plain JSON;
+        pieces already sent stay sent if the stream fails later.
+
+        Sentences are queued and sent by a separate task, so WhatsApp sends
+        neither hold the gateway concurrency slot nor count as gateway latency.
+        """
+        pieces: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+
+        async def deliver_queued() -> int:
+            delivered = 0
+            while (piece := await pieces.get()) is not None:
+                delivered += await self._deliver(sender, phone_number, piece)
+            return delivered
+
+        delivery = asyncio.create_task(deliver_queued())
+        try:
+            result = await self._read_stream(headers, request_body, pieces)
+        except BaseException:
+            pieces.put_nowait(None)
+            await asyncio.gather(delivery, return_exceptions=True)
+            raise
+        pieces.put_nowait(None)
+        delivered = await delivery
+        if not result.get("success") and delivered:
+            logger.warning(f"agent-gateway stream failed after {delivered} messages to {phone_number}")
+        return {**result, "delivered": delivered}
+
+    async def _read_stream(
+        self, headers: Dict[str, str], request_body: Dict[str, Any], pieces: "asyncio.Queue[Optional[str]]"
+    ) -> Dict[str, Any]:
+        """Reads the gateway's answer, queueing each complete sentence for delivery."""
+        chunker = SentenceChunker(self.stream_min_chars, self.stream_max_chars)
+        async with self.gateway_client.stream(headers, {**request_body, "stream": True}) as response:
+            if not response.headers.get("content-type", "").startswith("text/event-stream"):
+                # Errors, or a gateway that answered in one piece
+                await response.aread()
+                response.raise_for_status()
+                result = response.json()
+                if result.get("success"):
+                    pieces.put_nowait(self._reply_text(result.get("data")))
+                return result
+            async for event, data in self._read_events(response):
+                if event == "delta":
+                    for piece in chunker.feed(data.get("text", "")):
+                        pieces.put_nowait(piece)
+                elif event == "done":
+                    pieces.put_nowait(chunker.flush())
+                    return data
+                elif event == "error":
+                    return data
+        raise RuntimeError("agent-gateway stream ended before the answer was complete")
+
+    def _retrieve_context(self, cabinet_id: str, action: str, embedding, message_text: str) -> list:
+        if embedding is None or not self.retrieval_service or action not in self.RETRIEVAL_ACTIONS:
+            return []
+        try:
+            chunks = self.retrieval_service.search(cabinet_id, embedding, query_text=message_text)
+            return [chunk["content"] for chunk in chunks]
+        except Exception as e:
+            logger.warning(f"Knowledge-base retrieval failed for cabinet {cabinet_id}: {e}")
+            return []
 
     async def execute(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -41,10 +374,59 @@ class ProcessWhatsAppMessageTask:
         phone_number = payload.get("phone_number")
         agent_token = payload.get("agent_token")
         action = payload.get("action", "simulate_response") # Default to simulate_response
+        cabinet_id = payload.get("cabinet_id")
 
         if not message_text or not agent_token:
             raise ValueError("Missing required fields: 'message_text' or 'agent_token' in payload.")
 
+        sender = self._sender_for(cabinet_id) if phone_number and action in self.STREAMING_ACTIONS else None
+        streaming = sender is not None
+        if action in self.RULE_ACTIONS:
+            in_handoff, conversation_id = self._handoff_conversation(cabinet_id, phone_number)
+            if in_handoff:
+                # A human operator has the conversation: keep the message for them, send nothing
+                logger.info(f"Conversation with {phone_number} is with a human operator, skipping automated reply.")
+                self._record_exchange(conversation_id, message_text, None, "human_handoff")
+                return {"status": "skipped", "reason": "human_handoff"}
+
+        conversation_id, history = None, None
+        if action in self.RETRIEVAL_ACTIONS:
+            conversation_id, history = self._load_history(cabinet_id, phone_number, sender_name)
+
+        rule = self._match_rule(cabinet_id, action, message_text)
+        answers_locally = rule and (
+            rule.action_type == "human_handoff" or (rule.action_type == "text_response" and rule.response_text)
+        )
+        if answers_locally:
+            # Keyword rules answer without the LLM
+            logger.info(f"Agent rule {rule.rule_id} ({rule.action_type}) matched '{rule.keyword}', skipping agent-gateway.")
+            if rule.action_type == "human_handoff":
+                self._request_handoff(cabinet_id, phone_number)
+            self._log_local_answer(cabinet_id, action, {"message": message_text, "sender_phone": phone_number}, f"agent_rule:{rule.action_type}")
+            self._record_exchange(conversation_id, message_text, rule.response_text, f"agent_rule:{rule.action_type}")
+            if streaming:
+                await self._deliver(sender, phone_number, rule.response_text)
+            return {
+                "status": "success",
+                "gateway_response": rule.response_text,
+                "rule": {"id": rule.rule_id, "action_type": rule.action_type, "keyword": rule.keyword},
+            }
+
+        embedding = await self._embed_message(cabinet_id, action, message_text)
+        # Only answers that depend on the question alone are reused: no history, summary or rule hint
+        context_free = not (history and (history.messages or history.summary)) and rule is None
+        cacheable = embedding is not None and self.semantic_cache and action in self.CACHEABLE_ACTIONS and context_free
+        if cacheable:
+            cached = self.semantic_cache.lookup(cabinet_id, embedding)
+            if cached is not None:
+                logger.info(f"Semantic cache hit for cabinet {cabinet_id}, skipping agent-gateway.")
+                self._log_local_answer(cabinet_id, action, {"message": message_text, "sender_phone": phone_number}, "semantic_cache")
+                answer = self._record_simulation(cabinet_id, message_text, cached.answer)
+                self._record_exchange(conversation_id, message_text, answer, "semantic_cache")
+                if streaming:
+                    await self._deliver(sender, phone_number, self._reply_text(answer))
+                return {"status": "success", "gateway_response": answer, "cache": "hit"}
+
         # Prepare formatting matching the N8N HTTP Request node to the agent-gateway
         headers = {
             "Content-Type": "application/json",
@@ -57,37 +439,65 @@ class ProcessWhatsAppMessageTask:
             "sender_phone": phone_number,
             "sender_name": sender_name
         }
+        context = self._retrieve_context(cabinet_id, action, embedding, message_text)
+        if context:
+            args["context"] = context
+        prompt = self._system_prompt(cabinet_id, action)
+        if prompt:
+            args["system_prompt"] = prompt.text
+            args["system_prompt_tokens"] = prompt.tokens
+        if history and history.summary:
+            args["conversation_summary"] = history.summary
+        if history and history.messages:
+            args["history"] = history.as_turns()
+        if rule:
+            # e.g. register_demand: the LLM still extracts the details, hinted by the rule
+            args["matched_rule"] = {"id": rule.rule_id, "action_type": rule.action_type, "keyword": rule.keyword}
 
         request_body = {
             "tool": action,
-            "agent_name": "whatsapp-python-worker",  # Identifying the source
+            "agent_name": self.AGENT_NAME,
             "args": args
         }
 
+        if self.cabinet_limiter and cabinet_id:
+            wait = self.cabinet_limiter.try_acquire(cabinet_id, "gemini")
+            if wait > 0:
+                raise TaskDeferred(wait, f"Cabinet {cabinet_id} Gemini quota exhausted")
+
         try:
-            # Use httpx for async HTTP requests as per Python async patterns
-            async with httpx.AsyncClient() as client:
-                logger.info(f"Sending request to agent-gateway: action={action}")
-                response = await client.post(
-                    self.gateway_url,
-                    headers=headers,
-                    json=request_body,
-                    timeout=30.0 # Agent gateway might take some time (Gemini API)
-                )
+            logger.info(f"Sending request to agent-gateway: action={action}, streaming={streaming}")
+            if streaming:
+                result = await self._stream_reply(sender, headers, request_body, phone_number)
+            else:
+                response = await self.gateway_client.post(headers, request_body)
 
                 # Raise an exception for HTTP error statuses (4xx, 5xx)
                 response.raise_for_status()
-                
+
                 result = response.json()
-                
-                # The agent gateway returns { "success": true, "data": ... } or { "error": ... }
-                if not result.get("success"):
-                     # If the gateway returned a 200 but success is false, treat as error
-                     error_msg = result.get("error", "Unknown error from agent-gateway")
-                     raise RuntimeError(f"Agent Gateway Error: {error_msg}")
-
-                logger.info(f"Successfully processed WhatsApp message via agent-gateway.")
-                return {"status": "success", "gateway_response": result.get("data")}
+
+            # The agent gateway returns { "success": true, "data": ... } or { "error": ... }
+            if not result.get("success"):
+                 # If the gateway returned a 200 but success is false, treat as error
+                 error_msg = result.get("error", "Unknown error from agent-gateway")
+                 raise RuntimeError(f"Agent Gateway Error: {error_msg}")
+
+            logger.info(f"Successfully processed WhatsApp message via agent-gateway.")
+            if cacheable:
+                self.semantic_cache.store(cabinet_id, message_text, embedding, result.get("data"))
+            self._record_exchange(conversation_id, message_text, result.get("data"), "agent-gateway")
+            if streaming:
+                return {"status": "success", "gateway_response": result.get("data"), "delivered": result.get("delivered", 0)}
+            return {"status": "success", "gateway_response": result.get("data")}
+
+        except GatewayUnavailable as e:
+            # Degraded gateway: put the message back on the queue rather than wait on it.
+            # The call never left the worker, so the Gemini token goes back too.
+            if self.cabinet_limiter and cabinet_id:
+                self.cabinet_limiter.refund(cabinet_id, "gemini")
+            logger.warning(f"Deferring message from {phone_number}: {e}")
+            raise TaskDeferred(e.retry_after, str(e)) from e
 
         except httpx.HTTPStatusError as e:
             # Captures HTTP errors like 500 Internal Server Error, 401 Unauthorized, etc.
@@ -1,11 +1,67 @@
 import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from supabase import create_client, Client
 from typing import Optional
 import asyncio
-from config import SUPABASE_URL, SUPABASE_SERVICE_KEY
-from tasks.whatsapp_handler import ProcessWhatsAppMessageTask
+from config import (
+    SUPABASE_URL, SUPABASE_SERVICE_KEY,
+    SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_MAX_DISTANCE, SEMANTIC_CACHE_TTL_SECONDS,
+    SEMANTIC_CACHE_MAX_ENTRIES, SEMANTIC_CACHE_VERSION_CHECK_SECONDS, SEMANTIC_CACHE_MAX_CABINETS,
+    VECTOR_INDEX_ENABLED, VECTOR_INDEX_CACHE_DIR, VECTOR_INDEX_MAX_ROWS,
+    VECTOR_INDEX_MAX_TENANTS, VECTOR_INDEX_MAX_BYTES, VECTOR_INDEX_REFRESH_SECONDS,
+    RETRIEVAL_MATCH_COUNT, RETRIEVAL_MATCH_THRESHOLD, RETRIEVAL_RERANK_ENABLED,
+    RETRIEVAL_OVERFETCH, RETRIEVAL_CANDIDATE_THRESHOLD, RETRIEVAL_TOKEN_BUDGET,
+    AGENT_LOG_BUFFER_SIZE, AGENT_LOG_BATCH_SIZE, AGENT_LOG_FLUSH_INTERVAL, AGENT_LOG_OVERFLOW_POLICY,
+    AGENT_LOGS_RETENTION_MONTHS, AGENT_LOGS_ROLLUP_INTERVAL_SECONDS, AGENT_LOGS_ROLLUP_GRACE_SECONDS,
+    AGENT_LOGS_RETENTION_INTERVAL_SECONDS,
+    AGENT_RULES_ENABLED, AGENT_RULES_REFRESH_SECONDS, AGENT_RULES_USAGE_FLUSH_SECONDS, AGENT_RULES_MAX_CABINETS,
+    PROMPT_CACHE_REFRESH_SECONDS, PROMPT_CACHE_MAX_CABINETS, PROMPT_TIMEZONE,
+    CONVERSATION_HISTORY_TOKEN_BUDGET, CONVERSATION_SUMMARY_TOKEN_BUDGET,
+    WORKER_MAX_CONCURRENCY, AGENT_GATEWAY_TIMEOUT_SECONDS, AGENT_GATEWAY_TARGET_LATENCY_SECONDS,
+    AGENT_GATEWAY_INITIAL_CONCURRENCY, AGENT_GATEWAY_BREAKER_FAILURE_RATE, AGENT_GATEWAY_BREAKER_SLOW_CALL_SECONDS,
+    AGENT_GATEWAY_BREAKER_OPEN_SECONDS,
+    CABINET_RATE_LIMIT_ENABLED, CABINET_RATE_LIMIT_REQUESTS_PER_MINUTE, CABINET_RATE_LIMIT_BURST,
+    EVOLUTION_API_URL, EVOLUTION_API_KEY,
+    WHATSAPP_STREAMING_ENABLED, WHATSAPP_STREAM_MIN_CHARS, WHATSAPP_STREAM_MAX_CHARS,
+    VOTER_IMPORT_CHUNK_SIZE,
+    REPORT_EXPORT_BATCH_SIZE, REPORT_EXPORT_LINK_TTL_SECONDS,
+    GEO_DENSITY_REFRESH_SECONDS, GEO_DENSITY_LEVELS,
+    DEMAND_ROLLUP_INTERVAL_SECONDS, DEMAND_ROLLUP_GRACE_SECONDS,
+    TENANT_CONTEXT_MAX_ENTRIES, TENANT_CONTEXT_TTL_SECONDS,
+    BIRTHDAY_JOB_INTERVAL_SECONDS, BIRTHDAY_DAYS_AHEAD, BIRTHDAY_NOTIFICATION_RETENTION_DAYS,
+    BIRTHDAY_GREETINGS_ENABLED, BIRTHDAY_GREETING_HOUR, BIRTHDAY_GREETINGS_PER_MINUTE, BIRTHDAY_GREETING_TEMPLATE,
+)
+from database import SessionLocal, engine
+from app.services.agent_log_writer import AgentLogWriter
+from app.services.tenant_context import TenantContextCache, session_loader, postgrest_loader
+from services.embedding_service import EmbeddingService
+from services.semantic_cache import SemanticAnswerCache
+from services.vector_index import InMemoryVectorIndex
+from services.retrieval import RetrievalService
+from services.reranker import Reranker
+from services.scheduler import PeriodicScheduler
+from services.rule_engine import KeywordRuleEngine
+from services.prompt_cache import PromptCache
+from services.circuit_breaker import CircuitBreaker
+from services.concurrency import AdaptiveConcurrencyLimiter
+from services.gateway_client import AgentGatewayClient
+from services.rate_limiter import CabinetRateLimiter
+from services.whatsapp_sender import EvolutionWhatsAppSender
+from services.storage import StorageClient
+from tasks.errors import TaskDeferred
+from tasks.whatsapp_handler import ProcessWhatsAppMessageTask, AGENT_GATEWAY_URL
+from tasks.embedding_backfill import EmbeddingBackfillTask
+from tasks.secret_rotation import SecretRotationTask
+from tasks.voter_import import VoterImportTask
+from tasks.report_export import ReportExportTask
+from tasks.gazetteer_import import GazetteerImportTask
+from tasks.geo_density import refresh_geo_density
+from tasks.demand_rollups import refresh_demand_rollups
+from tasks.birthday_notifications import BirthdayNotificationJob, BirthdayGreetingTask, DEFAULT_GREETING_TEMPLATE
+from tasks.agent_logs_maintenance import refresh_agent_log_rollups, enforce_agent_logs_retention
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -16,6 +72,130 @@ class TaskQueueWorker:
         self.running = False
         self.poll_interval = 5  # seconds
 
+        # Tasks run concurrently, bounded by the adaptive agent-gateway limit
+        self.executor = ThreadPoolExecutor(max_workers=WORKER_MAX_CONCURRENCY, thread_name_prefix="task")
+        self._active_tasks = 0
+        self._active_lock = threading.Lock()
+
+        # Shared across tasks so caches survive between messages
+        self.tenant_contexts = TenantContextCache(
+            session_loader(SessionLocal) if SessionLocal else postgrest_loader(self.supabase),
+            max_entries=TENANT_CONTEXT_MAX_ENTRIES,
+            ttl_seconds=TENANT_CONTEXT_TTL_SECONDS,
+        )
+        if engine is not None:
+            self.tenant_contexts.listen(engine)
+        self.embedding_service = EmbeddingService(self.supabase, tenant_contexts=self.tenant_contexts)
+        self.semantic_cache = SemanticAnswerCache(
+            self.supabase,
+            max_distance=SEMANTIC_CACHE_MAX_DISTANCE,
+            ttl_seconds=SEMANTIC_CACHE_TTL_SECONDS,
+            max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+            version_check_seconds=SEMANTIC_CACHE_VERSION_CHECK_SECONDS,
+            max_cabinets=SEMANTIC_CACHE_MAX_CABINETS,
+        ) if SEMANTIC_CACHE_ENABLED else None
+        self.vector_index = InMemoryVectorIndex(
+            self.supabase,
+            cache_dir=VECTOR_INDEX_CACHE_DIR,
+            max_rows=VECTOR_INDEX_MAX_ROWS,
+            max_tenants=VECTOR_INDEX_MAX_TENANTS,
+            max_bytes=VECTOR_INDEX_MAX_BYTES,
+            refresh_seconds=VECTOR_INDEX_REFRESH_SECONDS,
+        ) if VECTOR_INDEX_ENABLED else None
+        self.retrieval_service = RetrievalService(
+            self.supabase,
+            vector_index=self.vector_index,
+            match_threshold=RETRIEVAL_MATCH_THRESHOLD,
+            match_count=RETRIEVAL_MATCH_COUNT,
+            reranker=Reranker() if RETRIEVAL_RERANK_ENABLED else None,
+            overfetch=RETRIEVAL_OVERFETCH,
+            candidate_threshold=RETRIEVAL_CANDIDATE_THRESHOLD,
+            token_budget=RETRIEVAL_TOKEN_BUDGET,
+        )
+        # Logs for answers produced without agent-gateway (which logs its own calls)
+        self.agent_log_writer = AgentLogWriter(
+            SessionLocal,
+            max_buffer=AGENT_LOG_BUFFER_SIZE,
+            batch_size=AGENT_LOG_BATCH_SIZE,
+            flush_interval=AGENT_LOG_FLUSH_INTERVAL,
+            overflow_policy=AGENT_LOG_OVERFLOW_POLICY,
+        ).start() if SessionLocal else None
+        self.rule_engine = KeywordRuleEngine(
+            self.supabase, refresh_seconds=AGENT_RULES_REFRESH_SECONDS, max_cabinets=AGENT_RULES_MAX_CABINETS
+        ) if AGENT_RULES_ENABLED else None
+        self.gateway_limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=AGENT_GATEWAY_INITIAL_CONCURRENCY,
+            max_limit=WORKER_MAX_CONCURRENCY,
+            target_latency=AGENT_GATEWAY_TARGET_LATENCY_SECONDS,
+        )
+        self.gateway_client = AgentGatewayClient(
+            AGENT_GATEWAY_URL or f"{SUPABASE_URL}/functions/v1/agent-gateway",
+            breaker=CircuitBreaker(
+                "agent-gateway",
+                failure_rate_threshold=AGENT_GATEWAY_BREAKER_FAILURE_RATE,
+                slow_call_seconds=AGENT_GATEWAY_BREAKER_SLOW_CALL_SECONDS,
+                open_seconds=AGENT_GATEWAY_BREAKER_OPEN_SECONDS,
+            ),
+            limiter=self.gateway_limiter,
+            timeout=AGENT_GATEWAY_TIMEOUT_SECONDS,
+        )
+        self.cabinet_limiter = CabinetRateLimiter(
+            self.supabase,
+            requests_per_minute=CABINET_RATE_LIMIT_REQUESTS_PER_MINUTE,
+            burst=CABINET_RATE_LIMIT_BURST,
+        ) if CABINET_RATE_LIMIT_ENABLED else None
+        # Bound to each cabinet's own instance per message
+        self.whatsapp_sender = EvolutionWhatsAppSender(
+            EVOLUTION_API_URL, EVOLUTION_API_KEY
+        ) if WHATSAPP_STREAMING_ENABLED and EVOLUTION_API_URL else None
+        self.prompt_cache = PromptCache(
+            self.supabase,
+            refresh_seconds=PROMPT_CACHE_REFRESH_SECONDS,
+            timezone=PROMPT_TIMEZONE,
+            max_cabinets=PROMPT_CACHE_MAX_CABINETS,
+        )
+        self.storage = StorageClient(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+
+        # Maintenance jobs run between tasks
+        self.scheduler = PeriodicScheduler()
+        self.scheduler.add(
+            "agent_logs_rollup",
+            AGENT_LOGS_ROLLUP_INTERVAL_SECONDS,
+            lambda: refresh_agent_log_rollups(self.supabase, AGENT_LOGS_ROLLUP_GRACE_SECONDS),
+        )
+        self.scheduler.add(
+            "agent_logs_retention",
+            AGENT_LOGS_RETENTION_INTERVAL_SECONDS,
+            lambda: enforce_agent_logs_retention(self.supabase, AGENT_LOGS_RETENTION_MONTHS),
+        )
+        self.scheduler.add(
+            "demand_rollups",
+            DEMAND_ROLLUP_INTERVAL_SECONDS,
+            lambda: refresh_demand_rollups(self.supabase, DEMAND_ROLLUP_GRACE_SECONDS),
+        )
+        if self.rule_engine:
+            self.scheduler.add("agent_rules_usage", AGENT_RULES_USAGE_FLUSH_SECONDS, self.rule_engine.flush_usage)
+        if SessionLocal:
+            self.scheduler.add(
+                "geo_density_refresh",
+                GEO_DENSITY_REFRESH_SECONDS,
+                lambda: refresh_geo_density(SessionLocal, GEO_DENSITY_LEVELS),
+                background=True,
+            )
+            self.birthday_job = BirthdayNotificationJob(
+                SessionLocal,
+                tenant_contexts=self.tenant_contexts,
+                days_ahead=BIRTHDAY_DAYS_AHEAD,
+                retention_days=BIRTHDAY_NOTIFICATION_RETENTION_DAYS,
+                # Greetings without a WhatsApp sender would only pile up failed tasks
+                greetings_enabled=BIRTHDAY_GREETINGS_ENABLED and self.whatsapp_sender is not None,
+                greeting_hour=BIRTHDAY_GREETING_HOUR,
+                greetings_per_minute=BIRTHDAY_GREETINGS_PER_MINUTE,
+            )
+            self.scheduler.add(
+                "birthday_notifications", BIRTHDAY_JOB_INTERVAL_SECONDS, self.birthday_job.run, background=True
+            )
+
     def process_task(self, task: dict):
         """
         Routes the task to specific handlers based on task['task_type'].
@@ -30,10 +210,63 @@ class TaskQueueWorker:
             # handle_example_task(payload)
             time.sleep(1) # simulate work
         elif task_type == "process_whatsapp_message":
-            handler = ProcessWhatsAppMessageTask()
+            handler = ProcessWhatsAppMessageTask(
+                semantic_cache=self.semantic_cache,
+                embedding_service=self.embedding_service,
+                retrieval_service=self.retrieval_service,
+                agent_log_writer=self.agent_log_writer,
+                rule_engine=self.rule_engine,
+                supabase=self.supabase,
+                prompt_cache=self.prompt_cache,
+                session_factory=SessionLocal,
+                history_token_budget=CONVERSATION_HISTORY_TOKEN_BUDGET,
+                summary_token_budget=CONVERSATION_SUMMARY_TOKEN_BUDGET,
+                gateway_client=self.gateway_client,
+                cabinet_limiter=self.cabinet_limiter,
+                whatsapp_sender=self.whatsapp_sender,
+                tenant_contexts=self.tenant_contexts,
+                stream_min_chars=WHATSAPP_STREAM_MIN_CHARS,
+                stream_max_chars=WHATSAPP_STREAM_MAX_CHARS,
+            )
             # Because the execute method is async (using httpx), we need to run it in the event loop
             # Or use asyncio.run if this worker loop remains sync. Since worker loop is sync:
             asyncio.run(handler.execute(payload))
+        elif task_type == "embedding_backfill":
+            handler = EmbeddingBackfillTask(
+                self.supabase, self.embedding_service, cabinet_limiter=self.cabinet_limiter
+            )
+            asyncio.run(handler.execute(payload))
+        elif task_type == "rotate_secrets":
+            if SessionLocal is None:
+                raise RuntimeError("rotate_secrets needs DATABASE_URL")
+            SecretRotationTask(SessionLocal).execute(payload)
+        elif task_type == "import_voters":
+            if SessionLocal is None:
+                raise RuntimeError("import_voters needs DATABASE_URL")
+            VoterImportTask(SessionLocal, self.storage, chunk_size=VOTER_IMPORT_CHUNK_SIZE).execute(payload)
+        elif task_type == "export_report":
+            if SessionLocal is None:
+                raise RuntimeError("export_report needs DATABASE_URL")
+            ReportExportTask(
+                SessionLocal,
+                self.storage,
+                batch_size=REPORT_EXPORT_BATCH_SIZE,
+                link_ttl_seconds=REPORT_EXPORT_LINK_TTL_SECONDS,
+            ).execute(payload)
+        elif task_type == "import_gazetteer":
+            if SessionLocal is None:
+                raise RuntimeError("import_gazetteer needs DATABASE_URL")
+            GazetteerImportTask(SessionLocal).execute(payload)
+        elif task_type == "send_birthday_greeting":
+            if self.whatsapp_sender is None:
+                raise RuntimeError("send_birthday_greeting needs the Evolution API configured")
+            handler = BirthdayGreetingTask(
+                self.whatsapp_sender,
+                cabinet_limiter=self.cabinet_limiter,
+                tenant_contexts=self.tenant_contexts,
+                template=BIRTHDAY_GREETING_TEMPLATE or DEFAULT_GREETING_TEMPLATE,
+            )
+            asyncio.run(handler.execute(payload))
         else:
             logger.warning(f"Unknown task type: {task_type}")
 
@@ -51,45 +284,80 @@ class TaskQueueWorker:
             logger.error(f"Error fetching task: {e}")
             return None
 
+    def defer_task(self, task: dict, deferred: TaskDeferred) -> None:
+        """Returns the task to the queue, not to be claimed before now + delay."""
+        self.supabase.rpc("defer_task", {
+            "p_task_id": task["id"],
+            "p_delay_seconds": max(deferred.delay_seconds, 1.0),
+            "p_reason": deferred.reason,
+        }).execute()
+        logger.info(f"Task {task['id']} deferred for {deferred.delay_seconds:.0f}s: {deferred.reason}")
+
+    def run_task(self, task: dict) -> None:
+        try:
+            self.process_task(task)
+
+            # Mark as completed
+            self.supabase.table("background_tasks")\
+                .update({
+                    "status": "completed",
+                    "updated_at": datetime.utcnow().isoformat()
+                })\
+                .eq("id", task["id"])\
+                .execute()
+
+            logger.info(f"Task {task['id']} completed successfully.")
+
+        except TaskDeferred as deferred:
+            try:
+                self.defer_task(task, deferred)
+            except Exception as e:
+                logger.error(f"Failed to defer task {task['id']}: {e}")
+
+        except Exception as e:
+            logger.error(f"Task {task['id']} failed: {e}")
+            # Mark as failed
+            attempts = task.get("attempts", 0) + 1
+            try:
+                self.supabase.table("background_tasks")\
+                    .update({
+                        "status": "failed",
+                        "error_details": str(e),
+                        "attempts": attempts,
+                        "updated_at": datetime.utcnow().isoformat()
+                    })\
+                    .eq("id", task["id"])\
+                    .execute()
+            except Exception as update_error:
+                logger.error(f"Failed to mark task {task['id']} as failed: {update_error}")
+
+        finally:
+            with self._active_lock:
+                self._active_tasks -= 1
+
+    def has_capacity(self) -> bool:
+        with self._active_lock:
+            return self._active_tasks < min(WORKER_MAX_CONCURRENCY, self.gateway_limiter.limit)
+
     def start(self):
         self.running = True
         logger.info("Starting Task Queue Worker...")
-        
+
         while self.running:
             try:
+                self.scheduler.run_due()
+                if not self.has_capacity():
+                    time.sleep(0.05)
+                    continue
+
                 task = self.fetch_and_lock_task()
-                
                 if not task:
                     time.sleep(self.poll_interval)
                     continue
 
-                try:
-                    self.process_task(task)
-                    
-                    # Mark as completed
-                    self.supabase.table("background_tasks")\
-                        .update({
-                            "status": "completed", 
-                            "updated_at": datetime.utcnow().isoformat()
-                        })\
-                        .eq("id", task["id"])\
-                        .execute()
-                        
-                    logger.info(f"Task {task['id']} completed successfully.")
-                    
-                except Exception as e:
-                    logger.error(f"Task {task['id']} failed: {e}")
-                    # Mark as failed
-                    attempts = task.get("attempts", 0) + 1
-                    self.supabase.table("background_tasks")\
-                        .update({
-                            "status": "failed", 
-                            "error_details": str(e),
-                            "attempts": attempts,
-                            "updated_at": datetime.utcnow().isoformat()
-                        })\
-                        .eq("id", task["id"])\
-                        .execute()
+                with self._active_lock:
+                    self._active_tasks += 1
+                self.executor.submit(self.run_task, task)
 
             except Exception as e:
                 logger.error(f"Worker iteration error: {e}")
@@ -98,6 +366,16 @@ class TaskQueueWorker:
     def stop(self):
         self.running = False
         logger.info("Stopping Worker...")
+        self.executor.shutdown(wait=True)
+        self.scheduler.shutdown()
+        if self.rule_engine:
+            try:
+                self.rule_engine.flush_usage()
+            except Exception as e:
+                logger.error(f"Failed to flush agent rule usage counts: {e}")
+        if self.agent_log_writer:
+            self.agent_log_writer.close()
+        self.tenant_contexts.stop()
 
 if __name__ == "__main__":
     worker = TaskQueueWorker()